@@ -15,16 +15,30 @@
 import pathlib
 import re
 import shutil
+import struct
 import sys
 import tarfile
 import tempfile
+import threading
 import time
 import urllib.error
 import urllib.parse
 import urllib.request
 import warnings
 from contextlib import closing
-from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Union
+from typing import (
+    Any,
+    BinaryIO,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Pattern,
+    Set,
+    Tuple,
+    Union,
+)
 
 import llnl.util.filesystem as fsys
 import llnl.util.lang
@@ -32,9 +46,11 @@
 from llnl.util.filesystem import BaseDirectoryVisitor, mkdirp, visit_directory_tree
 from llnl.util.symlink import readlink
 
+import spack.buildcache_index as buildcache_index
 import spack.caches
 import spack.config as config
 import spack.database as spack_db
+import spack.database_index
 import spack.deptypes as dt
 import spack.error
 import spack.hash_types as ht
@@ -53,9 +69,10 @@
 import spack.user_environment
 import spack.util.archive
 import spack.util.crypto
+import spack.util.elf as elf
 import spack.util.file_cache as file_cache
-import spack.util.filesystem as ssys
 import spack.util.gpg
+import spack.util.hash
 import spack.util.parallel
 import spack.util.path
 import spack.util.spack_json as sjson
@@ -94,6 +111,10 @@
 #: Version 2: includes parent directories of the package prefix in the tarball
 CURRENT_BUILD_CACHE_LAYOUT_VERSION = 2
 
+#: Number of binaries, and of text files, relocated by a single task when installing from a
+#: buildcache. Chunks are relocated in parallel.
+RELOCATION_CHUNK_SIZE = 64
+
 
 class BuildCacheDatabase(spack_db.Database):
     """A database for binary buildcaches.
@@ -133,6 +154,56 @@ def __init__(self, errors):
         super().__init__(self.message)
 
 
+class _MirrorIndex:
+    """Specs in the cached buildcache index of a mirror, read from a binary index. A spec is
+    decoded, together with its dependencies, only when it's looked up."""
+
+    def __init__(self, index: spack.database_index.BinaryIndex, path: str) -> None:
+        self.index = index
+        self._records = spack_db.LazyInstallRecords(
+            index, spack_db.reader(spack_db._DB_VERSION), path
+        )
+        # DAG hashes of the available specs of each package, computed lazily
+        self._hashes_by_name: Optional[Dict[str, List[str]]] = None
+
+    def _is_available(self, i: int) -> bool:
+        summary = self.index.summary(i)
+        return summary.external or summary.in_buildcache
+
+    def spec(self, dag_hash: str) -> Optional[spack.spec.Spec]:
+        """Returns the spec with a DAG hash, if it's available in the mirror"""
+        i = self.index.find(dag_hash)
+        if i < 0 or not self._is_available(i):
+            return None
+        return self._records[dag_hash].spec
+
+    def hashes(self, name: Optional[str] = None) -> List[str]:
+        """Returns the DAG hashes of the available specs, of a single package if given"""
+        if self._hashes_by_name is None:
+            self._hashes_by_name = collections.defaultdict(list)
+            for i, dag_hash in enumerate(self.index.hashes()):
+                if self._is_available(i):
+                    self._hashes_by_name[self.index.summary(i).name].append(dag_hash)
+        if name is not None:
+            return self._hashes_by_name.get(name, [])
+        return [h for hashes in self._hashes_by_name.values() for h in hashes]
+
+
+def _run_in_daemon_thread(function, *args) -> concurrent.futures.Future:
+    """Calls a function in a new daemon thread, and returns the future of its result."""
+    future: concurrent.futures.Future = concurrent.futures.Future()
+
+    def _run():
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(function(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=_run, daemon=True).start()
+    return future
+
+
 class BinaryCacheIndex:
     """
     The BinaryCacheIndex tracks what specs are available on (usually remote)
@@ -182,6 +253,15 @@ def __init__(self, cache_root: Optional[str] = None):
         #           use the updated source if available)
         self._mirrors_for_spec: Dict[str, dict] = {}
 
+        # Specs in the cached indices of mirrors, which are decoded only when they are looked
+        # up. Cached indices that cannot be read as binary indices are decoded in full into
+        # _mirrors_for_spec instead.
+        self._mirror_indices: Dict[str, _MirrorIndex] = {}
+
+        # Index of the specs in _mirrors_for_spec by package name. It is computed lazily, and
+        # must be reset to None whenever _mirrors_for_spec changes.
+        self._specs_by_name: Optional[Dict[str, List[spack.spec.Spec]]] = None
+
     def _init_local_index_cache(self):
         if not self._index_file_cache:
             self._index_file_cache = file_cache.FileCache(self._index_cache_root)
@@ -206,6 +286,8 @@ def clear(self):
         self._specs_already_associated = set()
         self._last_fetch_times = {}
         self._mirrors_for_spec = {}
+        self._mirror_indices = {}
+        self._specs_by_name = None
 
     def _write_local_index_cache(self):
         self._init_local_index_cache()
@@ -223,6 +305,8 @@ def regenerate_spec_cache(self, clear_existing=False):
         if clear_existing:
             self._specs_already_associated = set()
             self._mirrors_for_spec = {}
+            self._mirror_indices = {}
+            self._specs_by_name = None
 
         for mirror_url in self._local_index_cache:
             cache_entry = self._local_index_cache[mirror_url]
@@ -232,7 +316,63 @@ def regenerate_spec_cache(self, clear_existing=False):
                 self._associate_built_specs_with_mirror(cached_index_path, mirror_url)
                 self._specs_already_associated.add(cached_index_hash)
 
+    @staticmethod
+    def _binary_index_key(cache_key: str) -> str:
+        return f"{os.path.splitext(cache_key)[0]}.bin"
+
+    def _remove_cached_index(self, cache_key: str) -> None:
+        self._index_file_cache.remove(cache_key)
+        self._index_file_cache.remove(self._binary_index_key(cache_key))
+
+    def _open_mirror_index(self, cache_key: str) -> Optional[_MirrorIndex]:
+        """Open the binary index of a cached index.json, writing it first if it's missing or
+        out of date. Returns None if the cached index cannot be read as a binary index, e.g.
+        because it's in an older format."""
+        cache_path = self._index_file_cache.cache_path(cache_key)
+        binary_key = self._binary_index_key(cache_key)
+        binary_path = self._index_file_cache.cache_path(binary_key)
+        db_version = str(spack_db._DB_VERSION)
+        try:
+            fingerprint = spack.database_index.Fingerprint.of(cache_path)
+            try:
+                index = spack.database_index.BinaryIndex.open(binary_path)
+                if index.fingerprint == fingerprint and index.db_version == db_version:
+                    return _MirrorIndex(index, binary_path)
+            except (OSError, spack.database_index.BinaryIndexError):
+                pass
+
+            with self._index_file_cache.read_transaction(cache_key) as f:
+                database = json.load(f)["database"]
+            if str(database["version"]) != db_version:
+                return None
+
+            self._index_file_cache.init_entry(binary_key)
+            temp_file = f"{binary_path}.{os.getpid()}.temp"
+            try:
+                with open(temp_file, "wb") as f:
+                    spack.database_index.write(f, database["installs"], db_version, fingerprint)
+                fsys.rename(temp_file, binary_path)
+            finally:
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
+            return _MirrorIndex(spack.database_index.BinaryIndex.open(binary_path), binary_path)
+        except (
+            OSError,
+            ValueError,
+            KeyError,
+            TypeError,
+            spack.database_index.BinaryIndexError,
+        ) as e:
+            tty.debug(f"Cannot use a binary index for {cache_path}: {e}")
+            return None
+
     def _associate_built_specs_with_mirror(self, cache_key, mirror_url):
+        self._index_file_cache.init_entry(cache_key)
+        mirror_index = self._open_mirror_index(cache_key)
+        if mirror_index is not None:
+            self._mirror_indices[mirror_url] = mirror_index
+            return
+
         tmpdir = tempfile.mkdtemp()
 
         try:
@@ -255,6 +395,7 @@ def _associate_built_specs_with_mirror(self, cache_key, mirror_url):
                 for s in db.query_local(installed=any)
                 if s.external or db.query_local_by_spec_hash(s.dag_hash()).in_buildcache
             ]
+            self._specs_by_name = None
 
             for indexed_spec in spec_list:
                 dag_hash = indexed_spec.dag_hash()
@@ -275,7 +416,20 @@ def _associate_built_specs_with_mirror(self, cache_key, mirror_url):
         finally:
             shutil.rmtree(tmpdir)
 
-    def get_all_built_specs(self):
+    def get_all_built_specs(self, names: Optional[Iterable[str]] = None):
+        """Returns the concrete specs available on mirrors.
+
+        Args:
+            names: if given, only specs for these packages are returned
+        """
+        if names is not None:
+            specs_by_name = self._built_specs_by_name()
+            return [
+                s
+                for name in sorted(names)
+                for s in self._with_indexed_specs(specs_by_name.get(name, ()), name)
+            ]
+
         spec_list = []
         for dag_hash in self._mirrors_for_spec:
             # in the absence of further information, all concrete specs
@@ -284,7 +438,33 @@ def get_all_built_specs(self):
             if len(self._mirrors_for_spec[dag_hash]) > 0:
                 spec_list.append(self._mirrors_for_spec[dag_hash][0]["spec"])
 
-        return spec_list
+        return self._with_indexed_specs(spec_list)
+
+    def _with_indexed_specs(
+        self, specs: Iterable[spack.spec.Spec], name: Optional[str] = None
+    ) -> List[spack.spec.Spec]:
+        """Returns the given specs, followed by the specs with other DAG hashes in the indices of
+        mirrors, of a single package if given. Only the latter are decoded."""
+        result = list(specs)
+        if not self._mirror_indices:
+            return result
+        seen = {s.dag_hash() for s in result}
+        for mirror_index in self._mirror_indices.values():
+            for dag_hash in mirror_index.hashes(name):
+                if dag_hash in seen:
+                    continue
+                seen.add(dag_hash)
+                spec = mirror_index.spec(dag_hash)
+                if spec is not None:
+                    result.append(spec)
+        return result
+
+    def _built_specs_by_name(self) -> Dict[str, List[spack.spec.Spec]]:
+        if self._specs_by_name is None:
+            self._specs_by_name = collections.defaultdict(list)
+            for spec in self.get_all_built_specs():
+                self._specs_by_name[spec.name].append(spec)
+        return self._specs_by_name
 
     def find_built_spec(self, spec, mirrors_to_check=None):
         """Look in our cache for the built spec corresponding to ``spec``.
@@ -327,9 +507,16 @@ def find_by_hash(self, find_hash, mirrors_to_check=None):
             mirrors_to_check: Optional mapping containing mirrors to check.  If
                 None, just assumes all configured mirrors.
         """
-        if find_hash not in self._mirrors_for_spec:
-            return []
-        results = self._mirrors_for_spec[find_hash]
+        results = self._mirrors_for_spec.get(find_hash, [])
+        if self._mirror_indices:
+            results = list(results)
+            found_urls = {r["mirror_url"] for r in results}
+            for mirror_url, mirror_index in self._mirror_indices.items():
+                if mirror_url in found_urls:
+                    continue
+                spec = mirror_index.spec(find_hash)
+                if spec is not None:
+                    results.append({"mirror_url": mirror_url, "spec": spec})
         if not mirrors_to_check:
             return results
         mirror_urls = mirrors_to_check.values()
@@ -341,6 +528,7 @@ def update_spec(self, spec, found_list):
         built_spec_cache
         """
         spec_dag_hash = spec.dag_hash()
+        self._specs_by_name = None
 
         if spec_dag_hash not in self._mirrors_for_spec:
             self._mirrors_for_spec[spec_dag_hash] = found_list
@@ -364,14 +552,16 @@ def update(self, with_cooldown=False):
         to confirm it is the same as what is stored locally.  Otherwise, the
         buildcache ``index.json`` and ``index.json.hash`` files are retrieved
         from each configured mirror and stored locally (both in memory and
-        on disk under ``_index_cache_root``)."""
+        on disk under ``_index_cache_root``). Indices are fetched from all
+        mirrors concurrently, and mirrors that don't respond within
+        ``config:binary_index_timeout`` seconds are reported as errors."""
         self._init_local_index_cache()
         configured_mirror_urls = [
             m.fetch_url for m in spack.mirror.MirrorCollection(binary=True).values()
         ]
         items_to_remove = []
         spec_cache_clear_needed = False
-        spec_cache_regenerate_needed = not self._mirrors_for_spec
+        spec_cache_regenerate_needed = not self._mirrors_for_spec and not self._mirror_indices
 
         # First compare the mirror urls currently present in the cache to the
         # configured mirrors.  If we have a cached index for a mirror which is
@@ -401,6 +591,9 @@ def update(self, with_cooldown=False):
         ttl = spack.config.get("config:binary_index_ttl", 600)
         now = time.time()
 
+        # Indices to be fetched, with their current cache metadata
+        mirrors_to_fetch: Dict[str, dict] = {}
+
         for cached_mirror_url in self._local_index_cache:
             cache_entry = self._local_index_cache[cached_mirror_url]
             cached_index_path = cache_entry["index_path"]
@@ -419,19 +612,7 @@ def update(self, with_cooldown=False):
                         all_methods_failed = False
                 else:
                     # May need to fetch the index and update the local caches
-                    try:
-                        needs_regen = self._fetch_and_cache_index(
-                            cached_mirror_url, cache_entry=cache_entry
-                        )
-                        self._last_fetch_times[cached_mirror_url] = (now, True)
-                        all_methods_failed = False
-                    except FetchIndexError as e:
-                        needs_regen = False
-                        fetch_errors.append(e)
-                        self._last_fetch_times[cached_mirror_url] = (now, False)
-                    # The need to regenerate implies a need to clear as well.
-                    spec_cache_clear_needed |= needs_regen
-                    spec_cache_regenerate_needed |= needs_regen
+                    mirrors_to_fetch[cached_mirror_url] = cache_entry
             else:
                 # No longer have this mirror, cached index should be removed
                 items_to_remove.append(
@@ -449,29 +630,36 @@ def update(self, with_cooldown=False):
         for item in items_to_remove:
             url = item["url"]
             cache_key = item["cache_key"]
-            self._index_file_cache.remove(cache_key)
+            self._remove_cached_index(cache_key)
+            for prefix in self._local_index_cache[url].get("shards", {}):
+                self._index_file_cache.remove(self._shard_cache_key(url, prefix))
             del self._local_index_cache[url]
 
-        # Iterate the configured mirrors now.  Any mirror urls we do not
-        # already have in our cache must be fetched, stored, and represented
-        # locally.
+        # Any mirror urls we do not already have in our cache must be fetched,
+        # stored, and represented locally.
         for mirror_url in configured_mirror_urls:
-            if mirror_url in self._local_index_cache:
-                continue
+            if mirror_url not in self._local_index_cache:
+                mirrors_to_fetch[mirror_url] = {}
 
-            # Need to fetch the index and update the local caches
-            try:
-                needs_regen = self._fetch_and_cache_index(mirror_url)
-                self._last_fetch_times[mirror_url] = (now, True)
-                all_methods_failed = False
-            except FetchIndexError as e:
-                fetch_errors.append(e)
-                needs_regen = False
+        # Fetch the indices of all mirrors concurrently, and use those that could be fetched
+        for mirror_url, result in self._fetch_indices(mirrors_to_fetch).items():
+            if isinstance(result, Exception):
+                fetch_errors.append(result)
                 self._last_fetch_times[mirror_url] = (now, False)
-            # Generally speaking, a new mirror wouldn't imply the need to
-            # clear the spec cache, so leave it as is.
-            if needs_regen:
-                spec_cache_regenerate_needed = True
+                continue
+
+            is_cached = mirror_url in self._local_index_cache
+            needs_regen = self._update_local_index_cache(
+                mirror_url, mirrors_to_fetch[mirror_url], result
+            )
+            self._last_fetch_times[mirror_url] = (now, True)
+            all_methods_failed = False
+
+            # The need to regenerate implies a need to clear as well, unless this is a new
+            # mirror: generally speaking, a new mirror wouldn't imply the need to clear the
+            # spec cache, so leave it as is.
+            spec_cache_clear_needed |= needs_regen and is_cached
+            spec_cache_regenerate_needed |= needs_regen
 
         self._write_local_index_cache()
 
@@ -499,16 +687,100 @@ def _fetch_and_cache_index(self, mirror_url, cache_entry={}):
         Returns:
             True if the local index.json was updated.
 
+        Throws:
+            FetchIndexError
+        """
+        new_entry = self._fetch_index(mirror_url, cache_entry)
+        return self._update_local_index_cache(mirror_url, cache_entry, new_entry)
+
+    def _fetch_indices(self, mirrors: Dict[str, dict]) -> Dict[str, Union[dict, Exception]]:
+        """Fetch the indices of several mirrors concurrently, waiting at most
+        ``config:binary_index_timeout`` seconds for them.
+
+        Args:
+            mirrors: old cache metadata of each mirror
+
+        Returns:
+            Either the new cache metadata or the error of each mirror, see ``_fetch_index``
+        """
+        if not mirrors:
+            return {}
+
+        timeout = spack.config.get("config:binary_index_timeout", 120) or None
+        results: Dict[str, Union[dict, Exception]] = {}
+        # Daemon threads, unlike the ones of an executor, are not joined at exit, so that a hung
+        # mirror can't keep Spack running after the timeout
+        futures = {
+            _run_in_daemon_thread(self._fetch_index, mirror_url, cache_entry): mirror_url
+            for mirror_url, cache_entry in mirrors.items()
+        }
+        done, _ = concurrent.futures.wait(futures, timeout=timeout)
+        for future, mirror_url in futures.items():
+            if future not in done:
+                results[mirror_url] = FetchIndexError(
+                    f"Timed out after {timeout} seconds fetching the index of {mirror_url}"
+                )
+                continue
+            try:
+                results[mirror_url] = future.result()
+            except FetchIndexError as e:
+                results[mirror_url] = e
+        return results
+
+    def _update_local_index_cache(self, mirror_url: str, cache_entry: dict, new_entry: dict):
+        """Record the cache metadata of a mirror returned by ``_fetch_index``, and remove the
+        cached files that are not needed anymore. Returns True if the local index.json was
+        updated."""
+        if new_entry is cache_entry:
+            return False
+
+        self._local_index_cache[mirror_url] = new_entry
+
+        # clean up the old cache_key if necessary
+        old_cache_key = cache_entry.get("index_path", None)
+        if old_cache_key and old_cache_key != new_entry["index_path"]:
+            self._remove_cached_index(old_cache_key)
+        for prefix in cache_entry.get("shards", {}).keys() - new_entry.get("shards", {}).keys():
+            self._index_file_cache.remove(self._shard_cache_key(mirror_url, prefix))
+
+        # We fetched an index and updated the local index cache, we should
+        # regenerate the spec cache as a result.
+        return True
+
+    def _fetch_index(self, mirror_url: str, cache_entry: dict) -> dict:
+        """Fetch a buildcache index file from a remote mirror and store it in the file cache,
+        without modifying the local index cache, so that the indices of several mirrors can be
+        fetched concurrently.
+
+        Args:
+            mirror_url: Base url of mirror
+            cache_entry: Old cache metadata with keys ``index_hash``, ``index_path``, ``etag``
+
+        Returns:
+            The new cache metadata, which is ``cache_entry`` itself if the cached index is up
+            to date.
+
         Throws:
             FetchIndexError
         """
         # TODO: get rid of this request, handle 404 better
         scheme = urllib.parse.urlparse(mirror_url).scheme
 
+        # Prefer the sharded index, of which only the shards that changed are fetched
+        if scheme != "oci":
+            try:
+                new_entry = self._fetch_sharded_index(mirror_url, cache_entry)
+            except FetchIndexError as e:
+                # e.g. a shard removed by an update since the list of shards was fetched
+                tty.debug(f"Cannot fetch the sharded index of {mirror_url}, using index.json: {e}")
+                new_entry = None
+            if new_entry is not None:
+                return new_entry
+
         if scheme != "oci" and not web_util.url_exists(
             url_util.join(mirror_url, BUILD_CACHE_RELATIVE_PATH, "index.json")
         ):
-            return False
+            return cache_entry
 
         if scheme == "oci":
             # TODO: Actually etag and OCI are not mutually exclusive...
@@ -524,29 +796,147 @@ def _fetch_and_cache_index(self, mirror_url, cache_entry={}):
 
         # Nothing to do
         if result.fresh:
-            return False
+            return cache_entry
 
         # Persist new index.json
-        url_hash = compute_hash(mirror_url)
-        cache_key = "{}_{}.json".format(url_hash[:10], result.hash[:10])
+        cache_key = self._store_index(mirror_url, result.hash, result.data)
+        return {"index_hash": result.hash, "index_path": cache_key, "etag": result.etag}
+
+    def _store_index(self, mirror_url: str, index_hash: str, data: str) -> str:
+        """Store the content of an index.json file in the file cache, and return its key"""
+        cache_key = f"{compute_hash(mirror_url)[:10]}_{index_hash[:10]}.json"
+        self._index_file_cache.init_entry(cache_key)
+        with self._index_file_cache.write_transaction(cache_key) as (old, new):
+            new.write(data)
+        return cache_key
+
+    @staticmethod
+    def _shard_cache_key(mirror_url: str, prefix: str) -> str:
+        return f"{compute_hash(mirror_url)[:10]}_shards/{prefix}.json"
+
+    def _read_cached_shard(
+        self, mirror_url: str, prefix: str, shard_digest: str
+    ) -> Optional[Dict[str, dict]]:
+        """Returns the install records of a cached shard, or None if the shard is not cached"""
+        cache_key = self._shard_cache_key(mirror_url, prefix)
+        self._index_file_cache.init_entry(cache_key)
+        # Shards are checked against their digest, so a shard cached by a fetch that timed out
+        # can be used, even if it's not recorded in the cache metadata
+        if not os.path.exists(self._index_file_cache.cache_path(cache_key)):
+            return None
+        try:
+            with self._index_file_cache.read_transaction(cache_key) as f:
+                data = f.read().encode("utf-8")
+            return buildcache_index.load_shard(data, shard_digest)
+        except (OSError, ValueError, buildcache_index.ShardedIndexError) as e:
+            tty.debug(f"Cannot read cached shard {prefix} of {mirror_url}: {e}")
+            return None
+
+    def _store_shard(self, mirror_url: str, prefix: str, data: bytes) -> None:
+        cache_key = self._shard_cache_key(mirror_url, prefix)
         self._index_file_cache.init_entry(cache_key)
         with self._index_file_cache.write_transaction(cache_key) as (old, new):
-            new.write(result.data)
+            new.write(data.decode("utf-8"))
+
+    def _fetch_sharded_index(self, mirror_url: str, cache_entry: dict) -> Optional[dict]:
+        """Fetch the shards of the index of a remote mirror that changed since they were cached,
+        and store the index merged from all the shards in the file cache.
+
+        Args:
+            mirror_url: Base url of mirror
+            cache_entry: Old cache metadata with keys ``index_hash``, ``index_path``, ``shards``
+
+        Returns:
+            None if the mirror has no sharded index, otherwise the new cache metadata, as in
+            ``_fetch_index``.
+
+        Throws:
+            FetchIndexError
+        """
+        fetcher = ShardedIndexFetcher(mirror_url)
+        result = fetcher.fetch_manifest()
+        if result is None:
+            return None
+        manifest_hash, manifest = result
+
+        # Nothing to do
+        if cache_entry.get("index_hash") == manifest_hash and "shards" in cache_entry:
+            return cache_entry
+
+        shards: Dict[str, Dict[str, dict]] = {}
+        missing: Dict[str, str] = {}
+        for prefix, shard_digest in manifest.prefixes.items():
+            records = self._read_cached_shard(mirror_url, prefix, shard_digest)
+            if records is None:
+                missing[prefix] = shard_digest
+            else:
+                shards[prefix] = records
+
+        # Each shard takes a round trip, so clients without most of the shards download
+        # index.json instead, and split it into the shards they cache
+        if len(missing) > 1 and len(missing) > len(manifest.prefixes) // 2:
+            return self._fetch_index_of_shards(mirror_url, cache_entry, manifest)
 
-        self._local_index_cache[mirror_url] = {
-            "index_hash": result.hash,
+        for prefix, data in _fetch_shards(fetcher, missing).items():
+            try:
+                shards[prefix] = buildcache_index.load_shard(data, missing[prefix])
+            except buildcache_index.ShardedIndexError as e:
+                raise FetchIndexError(f"Index shard {prefix} of {mirror_url} is invalid", e)
+            self._store_shard(mirror_url, prefix, data)
+
+        # Persist the merged index.json
+        cache_key = f"{compute_hash(mirror_url)[:10]}_{manifest_hash[:10]}.json"
+        self._index_file_cache.init_entry(cache_key)
+        with self._index_file_cache.write_transaction(cache_key) as (old, new):
+            json.dump(buildcache_index.merge(shards.values(), manifest.database_version), new)
+
+        return {
+            "index_hash": manifest_hash,
             "index_path": cache_key,
-            "etag": result.etag,
+            "etag": None,
+            "shards": manifest.prefixes,
         }
 
-        # clean up the old cache_key if necessary
-        old_cache_key = cache_entry.get("index_path", None)
-        if old_cache_key:
-            self._index_file_cache.remove(old_cache_key)
+    def _fetch_index_of_shards(
+        self, mirror_url: str, cache_entry: dict, manifest: buildcache_index.Manifest
+    ) -> dict:
+        """Fetch the index.json file of a mirror with a sharded index, and cache the shards it
+        splits into that match the list of shards, so that the next update fetches only the
+        shards that changed. Returns the new cache metadata, as in ``_fetch_index``.
 
-        # We fetched an index and updated the local index cache, we should
-        # regenerate the spec cache as a result.
-        return True
+        Throws:
+            FetchIndexError
+        """
+        fetcher = DefaultIndexFetcher(mirror_url, local_hash=cache_entry.get("index_hash"))
+        result = fetcher.conditional_fetch()
+        if result.fresh:
+            index_hash, cache_key = cache_entry["index_hash"], cache_entry["index_path"]
+            etag = cache_entry.get("etag")
+            with self._index_file_cache.read_transaction(cache_key) as f:
+                data = f.read()
+        else:
+            index_hash, etag, data = result.hash, result.etag, result.data
+            cache_key = self._store_index(mirror_url, index_hash, data)
+
+        try:
+            installs = json.loads(data)["database"]["installs"]
+        except (ValueError, KeyError, TypeError) as e:
+            raise FetchIndexError(f"Remote index of {mirror_url} is invalid", e) from e
+
+        # The shards may not match if index.json is from a different update than the list of
+        # shards, in which case they are fetched by the next update
+        for prefix, shard in buildcache_index.split(installs, manifest.database_version).items():
+            if buildcache_index.digest(shard) == manifest.prefixes.get(prefix):
+                self._store_shard(mirror_url, prefix, shard)
+
+        # The hash of index.json never matches the one of the list of shards, so the next update
+        # merges the cached shards, even if the sharded index didn't change
+        return {
+            "index_hash": index_hash,
+            "index_path": cache_key,
+            "etag": etag,
+            "shards": manifest.prefixes,
+        }
 
 
 def binary_index_location():
@@ -634,10 +1024,222 @@ def before_visit_symlinked_dir(self, root, rel_path, depth):
         return False
 
 
-def file_matches(path, regex):
-    with open(path, "rb") as f:
-        contents = f.read()
-    return bool(regex.search(contents))
+#: Magic numbers of Mach-O files, 32 and 64 bit, in both byte orders, and of universal binaries
+_MACHO_MAGIC = (b"\xfe\xed\xfa\xce", b"\xfe\xed\xfa\xcf", b"\xce\xfa\xed\xfe", b"\xcf\xfa\xed\xfe")
+_MACHO_FAT_MAGIC = b"\xca\xfe\xba\xbe"
+
+#: Number of bytes at the start of a file needed to tell whether it's a binary
+_HEADER_SIZE = 18
+
+
+def _classify_binary(header: bytes, rel_path: str) -> Optional[str]:
+    """Classifies object files by their header, like ``file --mime-type`` does. Returns
+    "binary" for executables and shared libraries, "other" for other object files, and None if
+    the file is not an object file."""
+    if header.startswith(elf.ELF_CONSTANTS.MAGIC) and len(header) >= _HEADER_SIZE:
+        byte_order = "<" if header[5] == elf.ELF_CONSTANTS.DATA2LSB else ">"
+        (e_type,) = struct.unpack_from(byte_order + "H", header, 16)
+        # Relocatable objects (ET_REL) are not relocated, whatever their name
+        if e_type in (elf.ELF_CONSTANTS.ET_EXEC, elf.ELF_CONSTANTS.ET_DYN):
+            return "binary"
+        return "other"
+
+    # The magic number of universal binaries is shared with Java class files, which have the
+    # class file version where universal binaries have their (small) number of architectures.
+    is_macho = header[:4] in _MACHO_MAGIC or (
+        header[:4] == _MACHO_FAT_MAGIC and int.from_bytes(header[4:8], "big") < 30
+    )
+    if is_macho:
+        return "binary" if sys.platform == "darwin" or not rel_path.endswith(".o") else "other"
+
+    return None
+
+
+class FileClassifier:
+    """Classifies a file for relocation from its content, which is passed in chunks. Files are
+    either binaries, text files containing any of the prefixes to be relocated, or other files.
+    Text files are those without null bytes."""
+
+    def __init__(self, rel_path: str, regex: Pattern[bytes], overlap: int):
+        """
+        Args:
+            rel_path: path of the file relative to the prefix
+            regex: regex matching the prefixes to be relocated
+            overlap: length of the longest prefix, so that matches across chunks are found
+        """
+        self.rel_path = rel_path
+        self.regex = regex
+        self.overlap = overlap
+        self.header = b""
+        self.tail = b""
+        self.size = 0
+        self.has_null = False
+        self.matches = False
+
+    def update(self, data: bytes) -> None:
+        if len(self.header) < _HEADER_SIZE:
+            self.header += data[: _HEADER_SIZE - len(self.header)]
+        self.size += len(data)
+
+        # Once a null byte is found, this is not a text file, so there's no need to look for
+        # prefixes anymore
+        if self.has_null or not data:
+            return
+        if b"\0" in data:
+            self.has_null = True
+        elif not self.matches:
+            chunk = self.tail + data
+            self.matches = bool(self.regex.search(chunk))
+            self.tail = chunk[-self.overlap :]
+
+    @property
+    def done(self) -> bool:
+        """Whether the rest of the file cannot change its classification"""
+        return self.has_null and len(self.header) >= _HEADER_SIZE
+
+    def kind(self) -> str:
+        """Returns "binary", "text" or "other". Text files are classified as "other" if they
+        don't contain any of the prefixes."""
+        binary = _classify_binary(self.header, self.rel_path)
+        if binary:
+            return binary
+        if self.size > 0 and not self.has_null and self.matches:
+            return "text"
+        return "other"
+
+
+class _ClassifyingReader:
+    """Passes the content read from a file to a classifier"""
+
+    def __init__(self, f: BinaryIO, classifier: FileClassifier):
+        self.f = f
+        self.classifier = classifier
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.f.read(size)
+        self.classifier.update(data)
+        return data
+
+
+class BuildManifest:
+    """Collects which files of an install prefix need to be relocated, and how. Files can be
+    classified while they are added to a tarball of the prefix, so that they are read only
+    once.
+
+    Classifications are cached in the misc cache by path, and are reused for files with the
+    same inode, mtime and size, when the prefixes to be relocated are the same.
+    """
+
+    def __init__(self, spec: Spec):
+        self.root = str(spec.prefix)
+
+        # Collect a list of prefixes for this package and it's dependencies, Spack will
+        # look for them to decide if text file needs to be relocated or not
+        prefixes = [d.prefix for d in spec.traverse(root=True, deptype="all") if not d.external]
+        prefixes.append(spack.hooks.sbang.sbang_install_path())
+        prefixes.append(str(spack.store.STORE.layout.root))
+
+        # Create a giant regex that matches all prefixes
+        self.regex = utf8_paths_to_single_binary_regex(prefixes)
+        self.overlap = max(len(p.encode("utf-8")) for p in prefixes)
+
+        self.data: Dict[str, Any] = {
+            "text_to_relocate": [],
+            "binary_to_relocate": [],
+            "link_to_relocate": [],
+            "other": [],
+            "binary_to_relocate_fullpath": [],
+            "hardlinks_deduped": True,
+        }
+        self._pending: List[Tuple[str, List[int], FileClassifier]] = []
+        self._cache_key = f"buildcache/manifest/{spack.util.hash.b32_hash(self.root)}.json"
+        self._cache_id = spack.util.hash.b32_hash(self.regex.pattern.decode("utf-8"))
+        self._cache: Dict[str, List[Any]] = self._read_cache()
+        self._new_cache: Dict[str, List[Any]] = {}
+
+    def _read_cache(self) -> Dict[str, List[Any]]:
+        try:
+            if not spack.caches.MISC_CACHE.init_entry(self._cache_key):
+                return {}
+            with spack.caches.MISC_CACHE.read_transaction(self._cache_key) as f:
+                data = json.load(f)
+            return data["files"] if data["id"] == self._cache_id else {}
+        except (OSError, ValueError, KeyError, TypeError, spack.error.SpackError) as e:
+            tty.debug(f"Cannot read the cached manifest of {self.root}: {e}")
+            return {}
+
+    def _write_cache(self) -> None:
+        if self._new_cache == self._cache:
+            return
+        try:
+            spack.caches.MISC_CACHE.init_entry(self._cache_key)
+            with spack.caches.MISC_CACHE.write_transaction(self._cache_key) as (_, f):
+                json.dump({"id": self._cache_id, "files": self._new_cache}, f)
+        except (OSError, spack.error.SpackError) as e:
+            tty.debug(f"Cannot cache the manifest of {self.root}: {e}")
+
+    @staticmethod
+    def _excluded(rel_path: str) -> bool:
+        # Skip docs (man) and metadata (.spack), like BuildManifestVisitor
+        return any(part in (".spack", "man") for part in pathlib.PurePath(rel_path).parts[:-1])
+
+    def _add(self, rel_path: str, kind: str) -> None:
+        abs_path = os.path.join(self.root, rel_path)
+        if kind == "binary":
+            self.data["binary_to_relocate"].append(rel_path)
+            self.data["binary_to_relocate_fullpath"].append(abs_path)
+        elif kind == "text":
+            self.data["text_to_relocate"].append(rel_path)
+        else:
+            self.data["other"].append(abs_path)
+
+    def add_symlink(self, rel_path: str, target: str) -> None:
+        """Adds a symlink, or a symlink to a directory, given its target"""
+        if self._excluded(rel_path):
+            return
+        # Obvious bugs:
+        #   1. relative links are not relocated.
+        #   2. paths are used as strings.
+        if os.path.isabs(target) and target.startswith(spack.store.STORE.layout.root):
+            self.data["link_to_relocate"].append(rel_path)
+
+    def add_file(self, rel_path: str, stat: os.stat_result, f: BinaryIO) -> BinaryIO:
+        """Adds a regular file, opened in binary mode. Returns the file object its content has
+        to be read from, if the file needs to be classified from its content. The file object
+        must be read until the end before calling ``finish``."""
+        if self._excluded(rel_path):
+            return f
+        identifier = [stat.st_ino, stat.st_mtime_ns, stat.st_size]
+        cached = self._cache.get(rel_path)
+        if cached and cached[:3] == identifier:
+            self._new_cache[rel_path] = cached
+            self._add(rel_path, cached[3])
+            return f
+        classifier = FileClassifier(rel_path, self.regex, self.overlap)
+        self._pending.append((rel_path, identifier, classifier))
+        return _ClassifyingReader(f, classifier)  # type: ignore[return-value]
+
+    def visit_file(self, rel_path: str) -> None:
+        """Adds a regular file, reading it if it cannot be classified from the cache"""
+        abs_path = os.path.join(self.root, rel_path)
+        with open(abs_path, "rb") as f:
+            reader = self.add_file(rel_path, os.fstat(f.fileno()), f)
+            if reader is f:
+                return
+            # Binary files are classified by their header, so stop at the first null byte
+            classifier = reader.classifier  # type: ignore[attr-defined]
+            while not classifier.done and reader.read(1 << 20):
+                pass
+
+    def finish(self) -> Dict[str, Any]:
+        """Classifies the files whose content was read, and returns the manifest"""
+        for rel_path, identifier, classifier in self._pending:
+            kind = classifier.kind()
+            self._new_cache[rel_path] = [*identifier, kind]
+            self._add(rel_path, kind)
+        self._pending.clear()
+        self._write_cache()
+        return self.data
 
 
 def get_buildfile_manifest(spec):
@@ -649,15 +1251,6 @@ def get_buildfile_manifest(spec):
     metadata (.spack). This can be used to find a particular kind of file
     in spack, or to generate the build metadata.
     """
-    data = {
-        "text_to_relocate": [],
-        "binary_to_relocate": [],
-        "link_to_relocate": [],
-        "other": [],
-        "binary_to_relocate_fullpath": [],
-        "hardlinks_deduped": True,
-    }
-
     # Guard against filesystem footguns of hardlinks and symlinks by using
     # a visitor to retrieve a list of files and symlinks, so we don't have
     # to worry about hardlinks of symlinked dirs and what not.
@@ -665,52 +1258,12 @@ def get_buildfile_manifest(spec):
     root = spec.prefix
     visit_directory_tree(root, visitor)
 
-    # Collect a list of prefixes for this package and it's dependencies, Spack will
-    # look for them to decide if text file needs to be relocated or not
-    prefixes = [d.prefix for d in spec.traverse(root=True, deptype="all") if not d.external]
-    prefixes.append(spack.hooks.sbang.sbang_install_path())
-    prefixes.append(str(spack.store.STORE.layout.root))
-
-    # Create a giant regex that matches all prefixes
-    regex = utf8_paths_to_single_binary_regex(prefixes)
-
-    # Symlinks.
-
-    # Obvious bugs:
-    #   1. relative links are not relocated.
-    #   2. paths are used as strings.
+    manifest = BuildManifest(spec)
     for rel_path in visitor.symlinks:
-        abs_path = os.path.join(root, rel_path)
-        link = readlink(abs_path)
-        if os.path.isabs(link) and link.startswith(spack.store.STORE.layout.root):
-            data["link_to_relocate"].append(rel_path)
-
-    # Non-symlinks.
+        manifest.add_symlink(rel_path, readlink(os.path.join(root, rel_path)))
     for rel_path in visitor.files:
-        abs_path = os.path.join(root, rel_path)
-        m_type, m_subtype = ssys.mime_type(abs_path)
-
-        if relocate.needs_binary_relocation(m_type, m_subtype):
-            # Why is this branch not part of needs_binary_relocation? :(
-            if (
-                (
-                    m_subtype in ("x-executable", "x-sharedlib", "x-pie-executable")
-                    and sys.platform != "darwin"
-                )
-                or (m_subtype in ("x-mach-binary") and sys.platform == "darwin")
-                or (not rel_path.endswith(".o"))
-            ):
-                data["binary_to_relocate"].append(rel_path)
-                data["binary_to_relocate_fullpath"].append(abs_path)
-                continue
-
-        elif relocate.needs_text_relocation(m_type, m_subtype) and file_matches(abs_path, regex):
-            data["text_to_relocate"].append(rel_path)
-            continue
-
-        data["other"].append(abs_path)
-
-    return data
+        manifest.visit_file(rel_path)
+    return manifest.finish()
 
 
 def deps_to_relocate(spec):
@@ -743,18 +1296,27 @@ def deps_to_relocate(spec):
 
 def get_buildinfo_dict(spec):
     """Create metadata for a tarball"""
-    manifest = get_buildfile_manifest(spec)
+    return {**_spec_buildinfo_dict(spec), **_manifest_buildinfo_dict(get_buildfile_manifest(spec))}
+
 
+def _spec_buildinfo_dict(spec) -> Dict[str, Any]:
+    """Metadata for a tarball that doesn't depend on the files in the prefix"""
     return {
         "sbang_install_path": spack.hooks.sbang.sbang_install_path(),
         "buildpath": spack.store.STORE.layout.root,
         "spackprefix": spack.paths.prefix,
         "relative_prefix": os.path.relpath(spec.prefix, spack.store.STORE.layout.root),
+        "hash_to_prefix": {d.dag_hash(): str(d.prefix) for d in deps_to_relocate(spec)},
+    }
+
+
+def _manifest_buildinfo_dict(manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """Metadata for a tarball about the files to be relocated"""
+    return {
         "relocate_textfiles": manifest["text_to_relocate"],
         "relocate_binaries": manifest["binary_to_relocate"],
         "relocate_links": manifest["link_to_relocate"],
         "hardlinks_deduped": manifest["hardlinks_deduped"],
-        "hash_to_prefix": {d.dag_hash(): str(d.prefix) for d in deps_to_relocate(spec)},
     }
 
 
@@ -806,8 +1368,31 @@ def sign_specfile(key: str, specfile_path: str) -> str:
     return signed_specfile_path
 
 
+#: Matches the DAG hash in the name of a spec file
+_SPECFILE_DAG_HASH = re.compile(r"-([a-z2-7]{32})\.spec\.json(?:\.sig)?$")
+
+
+def _reachable_from_buildcache(installs: Dict[str, dict]) -> Dict[str, dict]:
+    """Returns the install records of specs in the buildcache, and of their dependencies"""
+    reachable = {}
+    stack = [h for h, record in installs.items() if record.get("in_buildcache")]
+    while stack:
+        dag_hash = stack.pop()
+        if dag_hash in reachable or dag_hash not in installs:
+            continue
+        reachable[dag_hash] = installs[dag_hash]
+        stack.extend(dep["hash"] for dep in reachable[dag_hash]["spec"].get("dependencies", ()))
+    return reachable
+
+
 def _read_specs_and_push_index(
-    file_list, read_method, cache_prefix, db: BuildCacheDatabase, temp_dir, concurrency
+    file_list,
+    read_method,
+    cache_prefix,
+    db: BuildCacheDatabase,
+    temp_dir,
+    concurrency,
+    sharded_index: Optional[Tuple[buildcache_index.Manifest, Dict[str, dict]]] = None,
 ):
     """Read all the specs listed in the provided list, using thread given thread parallelism,
         generate the index, and push it to the mirror.
@@ -820,8 +1405,21 @@ def _read_specs_and_push_index(
         db: A spack database used for adding specs and then writing the index.
         temp_dir (str): Location to write index.json and hash for pushing
         concurrency (int): Number of parallel processes to use when fetching
+        sharded_index: list of shards and install records of the current sharded index of the
+            mirror. If given, only the spec files of specs that are not in it are read, and only
+            the shards that changed are pushed.
     """
+    manifest, indexed = sharded_index or (None, {})
+    indexed_in_buildcache = {h for h, record in indexed.items() if record.get("in_buildcache")}
+    listed = set()
+
     for file in file_list:
+        match = _SPECFILE_DAG_HASH.search(file)
+        if match:
+            listed.add(match.group(1))
+            if match.group(1) in indexed_in_buildcache:
+                continue
+
         contents = read_method(file)
         # Need full spec.json name or this gets confused with index.json.
         if file.endswith(".json.sig"):
@@ -835,11 +1433,56 @@ def _read_specs_and_push_index(
         db.add(fetched_spec)
         db.mark(fetched_spec, "in_buildcache", True)
 
+    # Specs whose spec file was removed are not in the buildcache anymore, but may still be
+    # dependencies of other specs. The records of the specs that were read are added, unless
+    # they would replace records of specs in the buildcache with records of dependencies.
+    installs = dict(indexed)
+    for dag_hash in indexed_in_buildcache - listed:
+        installs[dag_hash] = {**installs[dag_hash], "in_buildcache": False}
+    for dag_hash, record in db._installs_dict().items():
+        if dag_hash not in installs or record.get("in_buildcache"):
+            installs[dag_hash] = record
+    # Records of specs that are neither in the buildcache nor dependencies of specs in it are
+    # dropped, so that they don't accumulate in the index
+    installs = _reachable_from_buildcache(installs)
+
+    # Push the shards that changed, before the list of shards referring to them
+    db_version = str(spack_db._DB_VERSION)
+    shards = buildcache_index.split(installs, db_version)
+    old_prefixes = manifest.prefixes if manifest else {}
+    prefixes = {prefix: buildcache_index.digest(data) for prefix, data in shards.items()}
+    index_url = url_util.join(cache_prefix, buildcache_index.INDEX_DIRECTORY)
+
+    for prefix, data in shards.items():
+        if old_prefixes.get(prefix) == prefixes[prefix]:
+            continue
+        shard_name = buildcache_index.shard_name(prefix, prefixes[prefix])
+        shard_path = os.path.join(temp_dir, shard_name)
+        with open(shard_path, "wb") as f:
+            f.write(data)
+        web_util.push_to_url(
+            shard_path,
+            url_util.join(index_url, shard_name),
+            keep_original=False,
+            extra_args={"ContentType": "application/json"},
+        )
+
+    manifest_path = os.path.join(temp_dir, buildcache_index.MANIFEST_NAME)
+    with open(manifest_path, "wb") as f:
+        f.write(buildcache_index.dump_manifest(buildcache_index.Manifest(db_version, prefixes)))
+    web_util.push_to_url(
+        manifest_path,
+        url_util.join(index_url, buildcache_index.MANIFEST_NAME),
+        keep_original=False,
+        extra_args={"ContentType": "application/json", "CacheControl": "no-cache"},
+    )
+
     # Now generate the index, compute its hash, and push the two files to
     # the mirror.
     index_json_path = os.path.join(temp_dir, "index.json")
     with open(index_json_path, "w") as f:
-        db._write_to_file(f)
+        merged = buildcache_index.merge([installs], db_version)
+        db._write_to_file(f, installs=merged["database"]["installs"])
 
     # Read the index back in and compute its hash
     with open(index_json_path) as f:
@@ -867,6 +1510,66 @@ def _read_specs_and_push_index(
         extra_args={"ContentType": "text/plain", "CacheControl": "no-cache"},
     )
 
+    # Remove the shards that were replaced by an earlier update. The ones replaced by this update
+    # are still needed by the clients that fetched the previous list of shards.
+    referenced = {
+        buildcache_index.shard_name(prefix, shard_digest)
+        for prefix, shard_digest in itertools.chain(old_prefixes.items(), prefixes.items())
+    }
+    try:
+        names = web_util.list_url(index_url) or []
+    except Exception as e:
+        tty.debug(f"Failed to list the index shards of {index_url}: {e}")
+        names = []
+    for name in names:
+        if name in referenced or not buildcache_index.is_shard_name(name):
+            continue
+        shard_url = url_util.join(index_url, name)
+        try:
+            web_util.remove_url(shard_url)
+        except Exception as e:
+            tty.debug(f"Failed to remove the old index shard {shard_url}: {e}")
+
+
+def _fetch_shards(fetcher: "ShardedIndexFetcher", prefixes: Dict[str, str]) -> Dict[str, bytes]:
+    """Fetches shards concurrently, since each one takes a round trip, and returns the content of
+    the shard of each prefix.
+
+    Args:
+        fetcher: fetcher of the sharded index of a mirror
+        prefixes: digest of the shard of each prefix to be fetched
+
+    Throws:
+        FetchIndexError
+    """
+    futures = {
+        prefix: _run_in_daemon_thread(fetcher.fetch_shard, prefix, shard_digest)
+        for prefix, shard_digest in prefixes.items()
+    }
+    return {prefix: future.result() for prefix, future in futures.items()}
+
+
+def _fetch_sharded_index(
+    mirror_url: str,
+) -> Optional[Tuple[buildcache_index.Manifest, Dict[str, dict]]]:
+    """Returns the list of shards and the install records of the sharded index of a mirror, or
+    None if the mirror has no sharded index that can be updated."""
+    fetcher = ShardedIndexFetcher(mirror_url)
+    try:
+        result = fetcher.fetch_manifest()
+        if result is None:
+            return None
+        _, manifest = result
+        if manifest.database_version != str(spack_db._DB_VERSION):
+            return None
+        installs: Dict[str, dict] = {}
+        for prefix, data in _fetch_shards(fetcher, manifest.prefixes).items():
+            installs.update(buildcache_index.load_shard(data, manifest.prefixes[prefix]))
+    except (FetchIndexError, buildcache_index.ShardedIndexError) as e:
+        tty.warn(f"Regenerating the index of {mirror_url} from all spec files: {e}")
+        return None
+    return manifest, installs
+
 
 def _specs_from_cache_aws_cli(cache_prefix):
     """Use aws cli to sync all the specs into a local temporary directory.
@@ -980,7 +1683,9 @@ def _spec_files_from_cache(url: str):
 def _url_generate_package_index(url: str, tmpdir: str, concurrency: int = 32):
     """Create or replace the build cache index on the given mirror.  The
     buildcache index contains an entry for each binary package under the
-    cache_prefix.
+    cache_prefix. If the mirror has a sharded index, only the spec files of
+    packages that are not in it yet are read, and only the shards that changed
+    are replaced.
 
     Args:
         url: Base url of binary mirror.
@@ -990,6 +1695,7 @@ def _url_generate_package_index(url: str, tmpdir: str, concurrency: int = 32):
     Return:
         None
     """
+    sharded_index = _fetch_sharded_index(url)
     url = url_util.join(url, build_cache_relative_path())
     try:
         file_list, read_fn = _spec_files_from_cache(url)
@@ -1001,7 +1707,15 @@ def _url_generate_package_index(url: str, tmpdir: str, concurrency: int = 32):
     db = BuildCacheDatabase(tmpdir)
 
     try:
-        _read_specs_and_push_index(file_list, read_fn, url, db, db.database_directory, concurrency)
+        _read_specs_and_push_index(
+            file_list,
+            read_fn,
+            url,
+            db,
+            db.database_directory,
+            concurrency,
+            sharded_index=sharded_index,
+        )
     except Exception as e:
         raise GenerateIndexError(f"Encountered problem pushing package index to {url}: {e}") from e
 
@@ -1043,12 +1757,15 @@ def generate_key_index(key_prefix: str, tmpdir: str) -> None:
         ) from e
 
 
-def tarfile_of_spec_prefix(tar: tarfile.TarFile, prefix: str) -> None:
+def tarfile_of_spec_prefix(
+    tar: tarfile.TarFile, prefix: str, manifest: Optional[BuildManifest] = None
+) -> None:
     """Create a tarfile of an install prefix of a spec. Skips existing buildinfo file.
 
     Args:
         tar: tarfile object to add files to
-        prefix: absolute install prefix of spec"""
+        prefix: absolute install prefix of spec
+        manifest: if given, files are classified for relocation while they are added"""
     if not os.path.isabs(prefix) or not os.path.isdir(prefix):
         raise ValueError(f"prefix '{prefix}' must be an absolute path to a directory")
     stat_key = lambda stat: (stat.st_dev, stat.st_ino)
@@ -1059,6 +1776,16 @@ def tarfile_of_spec_prefix(tar: tarfile.TarFile, prefix: str) -> None:
     except OSError:
         skip = lambda entry: False
 
+    hooks: Dict[str, Any] = {}
+    if manifest is not None:
+        rel_path = lambda entry: os.path.relpath(entry.path, prefix)
+        hooks["read_file"] = lambda entry, f: manifest.add_file(
+            rel_path(entry), os.fstat(f.fileno()), f
+        )
+        hooks["visit_symlink"] = lambda entry, target: manifest.add_symlink(
+            rel_path(entry), target
+        )
+
     spack.util.archive.reproducible_tarfile_from_prefix(
         tar,
         prefix,
@@ -1066,17 +1793,30 @@ def tarfile_of_spec_prefix(tar: tarfile.TarFile, prefix: str) -> None:
         # used in runtimes like AWS lambda.
         include_parent_directories=True,
         skip=skip,
+        **hooks,
     )
 
 
-def _do_create_tarball(tarfile_path: str, binaries_dir: str, buildinfo: dict):
-    with spack.util.archive.gzip_compressed_tarfile(tarfile_path) as (
+def _do_create_tarball(
+    tarfile_path: str,
+    binaries_dir: str,
+    buildinfo: dict,
+    manifest: Optional[BuildManifest] = None,
+    jobs: int = 1,
+):
+    """Creates a tarball of a prefix, with the buildinfo file as the last entry. If a manifest
+    is passed, files are classified for relocation while they are added to the tarball, and the
+    relocation metadata is added to buildinfo. The tarball is compressed by ``jobs`` threads."""
+    with spack.util.archive.gzip_compressed_tarfile(tarfile_path, jobs=jobs) as (
         tar,
         inner_checksum,
         outer_checksum,
     ):
         # Tarball the install prefix
-        tarfile_of_spec_prefix(tar, binaries_dir)
+        tarfile_of_spec_prefix(tar, binaries_dir, manifest)
+
+        if manifest is not None:
+            buildinfo = {**buildinfo, **_manifest_buildinfo_dict(manifest.finish())}
 
         # Serialize buildinfo for the tarball
         bstring = syaml.dump(buildinfo, default_flow_style=True).encode("utf-8")
@@ -1139,11 +1879,18 @@ def _exists_in_buildcache(spec: Spec, tmpdir: str, out_url: str) -> ExistsInBuil
 
 
 def _url_upload_tarball_and_specfile(
-    spec: Spec, tmpdir: str, out_url: str, exists: ExistsInBuildcache, signing_key: Optional[str]
+    spec: Spec,
+    tmpdir: str,
+    out_url: str,
+    exists: ExistsInBuildcache,
+    signing_key: Optional[str],
+    jobs: int = 1,
 ):
     files = BuildcacheFiles(spec, tmpdir, out_url)
     tarball = files.local_tarball()
-    checksum, _ = _do_create_tarball(tarball, spec.prefix, get_buildinfo_dict(spec))
+    checksum, _ = _do_create_tarball(
+        tarball, spec.prefix, _spec_buildinfo_dict(spec), BuildManifest(spec), jobs=jobs
+    )
     spec_dict = spec.to_dict(hash=ht.dag_hash)
     spec_dict["buildcache_layout_version"] = CURRENT_BUILD_CACHE_LAYOUT_VERSION
     spec_dict["binary_cache_checksum"] = {"hash_algorithm": "sha256", "hash": checksum}
@@ -1350,6 +2097,19 @@ def fail(self) -> None:
         tty.info(f"{self.pre}Failed to push {self.pretty_spec}")
 
 
+def _compression_jobs(n_tarballs: int, executor: concurrent.futures.Executor) -> int:
+    """Returns the number of threads compressing each tarball, when tarballs are created by
+    the executor of an ``Uploader``, so that the tarballs created at the same time share the
+    available jobs"""
+    if isinstance(executor, spack.util.parallel.SequentialExecutor):
+        concurrent_tarballs = 1
+    else:
+        # Executors of unknown size are assumed to create all the tarballs at once
+        workers = getattr(executor, "_max_workers", n_tarballs)
+        concurrent_tarballs = max(1, min(n_tarballs, workers))
+    return max(1, spack.config.determine_number_of_jobs(parallel=True) // concurrent_tarballs)
+
+
 def _url_push(
     specs: List[Spec],
     out_url: str,
@@ -1393,6 +2153,7 @@ def _url_push(
     if total != len(specs):
         tty.info(f"{total} specs need to be pushed to {out_url}")
 
+    jobs = _compression_jobs(total, executor)
     upload_futures = [
         executor.submit(
             _url_upload_tarball_and_specfile,
@@ -1401,6 +2162,7 @@ def _url_push(
             out_url,
             exists[spec.dag_hash()],
             signing_key,
+            jobs,
         )
         for spec in specs_to_upload
     ]
@@ -1458,14 +2220,14 @@ def _oci_get_blob_info(image_ref: ImageReference) -> Optional[spack.oci.oci.Blob
 
 
 def _oci_push_pkg_blob(
-    image_ref: ImageReference, spec: spack.spec.Spec, tmpdir: str
+    image_ref: ImageReference, spec: spack.spec.Spec, tmpdir: str, jobs: int = 1
 ) -> Tuple[spack.oci.oci.Blob, float]:
     """Push a package blob to the registry and return the blob info and the time taken"""
     filename = os.path.join(tmpdir, f"{spec.dag_hash()}.tar.gz")
 
     # Create an oci.image.layer aka tarball of the package
     compressed_tarfile_checksum, tarfile_checksum = _do_create_tarball(
-        filename, spec.prefix, get_buildinfo_dict(spec)
+        filename, spec.prefix, _spec_buildinfo_dict(spec), BuildManifest(spec), jobs=jobs
     )
 
     blob = spack.oci.oci.Blob(
@@ -1686,8 +2448,10 @@ def _oci_push(
     blob_progress = FancyProgress(len(blobs_to_upload))
 
     # Upload blobs
+    jobs = _compression_jobs(len(blobs_to_upload), executor)
     blob_futures = [
-        executor.submit(_oci_push_pkg_blob, target_image, spec, tmpdir) for spec in blobs_to_upload
+        executor.submit(_oci_push_pkg_blob, target_image, spec, tmpdir, jobs)
+        for spec in blobs_to_upload
     ]
 
     manifests_to_upload: List[Spec] = []
@@ -1879,8 +2643,11 @@ def try_fetch(url_to_fetch):
 
 
 def _delete_staged_downloads(download_result):
-    """Clean up stages used to download tarball and specfile"""
-    download_result["tarball_stage"].destroy()
+    """Clean up stages used to download tarball and specfile, and close the tarball stream"""
+    if download_result["tarball_stage"] is not None:
+        download_result["tarball_stage"].destroy()
+    if download_result.get("tarball_stream") is not None:
+        download_result["tarball_stream"].close()
     download_result["specfile_stage"].destroy()
 
 
@@ -1920,7 +2687,9 @@ def _get_valid_spec_file(path: str, max_supported_layout: int) -> Tuple[Dict, in
     return spec_dict, layout_version
 
 
-def download_tarball(spec, unsigned: Optional[bool] = False, mirrors_for_spec=None):
+def download_tarball(
+    spec, unsigned: Optional[bool] = False, mirrors_for_spec=None, stream: bool = False
+):
     """
     Download binary tarball for given package into stage area, returning
     path to downloaded tarball if successful, None otherwise.
@@ -1932,6 +2701,11 @@ def download_tarball(spec, unsigned: Optional[bool] = False, mirrors_for_spec=No
             obtained by calling binary_distribution.get_mirrors_for_spec().
             These will be checked in order first before looking in other
             configured mirrors.
+        stream: if ``True``, tarballs in a buildcache layout that doesn't need the tarball
+            to be staged are not downloaded. A stream to the remote tarball is opened instead,
+            in the ``tarball_stream`` entry of the result, and ``tarball_stage`` is ``None``.
+            The tarball is then verified and extracted in a single pass by
+            ``extract_tarball``.
 
     Returns:
         ``None`` if the tarball could not be downloaded (maybe also verified,
@@ -2026,7 +2800,7 @@ def fetch_url_to_mirror(url):
                         local_specfile_stage.fetch()
                         local_specfile_stage.check()
                         try:
-                            _get_valid_spec_file(
+                            _, layout_version = _get_valid_spec_file(
                                 local_specfile_stage.save_filename,
                                 CURRENT_BUILD_CACHE_LAYOUT_VERSION,
                             )
@@ -2041,6 +2815,21 @@ def fetch_url_to_mirror(url):
                         continue
                     local_specfile_stage.cache_local()
 
+                if stream and layout_version >= 1:
+                    try:
+                        tarball_stream = spack.oci.opener.urlopen(
+                            urllib.request.Request(url=ref.blob_url(tarball_digest))
+                        )
+                    except Exception:
+                        continue
+                    return {
+                        "tarball_stage": None,
+                        "tarball_stream": tarball_stream,
+                        "specfile_stage": local_specfile_stage,
+                        "signature_verified": False,
+                        "signature_required": not currently_unsigned,
+                    }
+
                 with spack.oci.oci.make_stage(
                     ref.blob_url(tarball_digest), tarball_digest, keep=True
                 ) as tarball_stage:
@@ -2071,7 +2860,7 @@ def fetch_url_to_mirror(url):
                     signature_verified = False
 
                     try:
-                        _get_valid_spec_file(
+                        _, layout_version = _get_valid_spec_file(
                             local_specfile_path, CURRENT_BUILD_CACHE_LAYOUT_VERSION
                         )
                     except InvalidMetadataFile as e:
@@ -2108,6 +2897,22 @@ def fetch_url_to_mirror(url):
                         #     verify signature, checksum doesn't match) we will fail at
                         #     that point instead of trying to download more tarballs from
                         #     the remaining mirrors, looking for one we can use.
+                        if stream and layout_version >= 1:
+                            try:
+                                _, _, tarball_stream = web_util.read_from_url(spackfile_url)
+                            except web_util.SpackWebError:
+                                tarball_stream = None
+                            if tarball_stream:
+                                return {
+                                    "tarball_stage": None,
+                                    "tarball_stream": tarball_stream,
+                                    "specfile_stage": local_specfile_stage,
+                                    "signature_verified": signature_verified,
+                                    "signature_required": not currently_unsigned,
+                                }
+                            local_specfile_stage.destroy()
+                            continue
+
                         tarball_stage = try_fetch(spackfile_url)
                         if tarball_stage:
                             return {
@@ -2287,44 +3092,28 @@ def is_backup_file(file):
         # If the buildcache was not created with relativized rpaths
         # do the relocation of path in binaries
         platform = spack.platforms.by_name(spec.platform)
-        if "macho" in platform.binary_formats:
-            relocate.relocate_macho_binaries(
-                files_to_relocate,
-                old_layout_root,
-                new_layout_root,
-                prefix_to_prefix_bin,
-                rel,
-                old_prefix,
-                new_prefix,
-            )
-        elif "elf" in platform.binary_formats and not rel:
-            # The new ELF dynamic section relocation logic only handles absolute to
-            # absolute relocation.
-            relocate.new_relocate_elf_binaries(files_to_relocate, prefix_to_prefix_bin)
-        elif "elf" in platform.binary_formats and rel:
-            relocate.relocate_elf_binaries(
-                files_to_relocate,
-                old_layout_root,
-                new_layout_root,
-                prefix_to_prefix_bin,
-                rel,
-                old_prefix,
-                new_prefix,
-            )
+        binary_format = next((f for f in ("macho", "elf") if f in platform.binary_formats), None)
+        relocation = _Relocation(
+            binary_format=binary_format,
+            relative_rpaths=rel,
+            old_layout_root=old_layout_root,
+            new_layout_root=new_layout_root,
+            old_prefix=old_prefix,
+            new_prefix=new_prefix,
+            prefix_to_prefix_bin=prefix_to_prefix_bin,
+            prefix_to_prefix_text=prefix_to_prefix_text,
+        )
 
         # Relocate links to the new install prefix
         links = [os.path.join(workdir, f) for f in buildinfo.get("relocate_links", [])]
         relocate.relocate_links(links, prefix_to_prefix_bin)
 
-        # For all buildcaches
-        # relocate the install prefixes in text files including dependencies
-        relocate.relocate_text(text_names, prefix_to_prefix_text)
-
-        # relocate the install prefixes in binary files including dependencies
-        changed_files = relocate.relocate_text_bin(files_to_relocate, prefix_to_prefix_bin)
+        # Relocate the install prefixes, including those of dependencies, in binaries and text
+        # files. Binaries are relocated after their RPATHs are updated.
+        changed_files = _relocate_files_in_parallel(relocation, files_to_relocate, text_names)
 
         # Add ad-hoc signatures to patched macho files when on macOS.
-        if "macho" in platform.binary_formats and sys.platform == "darwin":
+        if binary_format == "macho" and sys.platform == "darwin":
             codesign = which("codesign")
             if not codesign:
                 return
@@ -2338,6 +3127,93 @@ def is_backup_file(file):
             relocate.relocate_text(text_names, prefix_to_prefix_text)
 
 
+class _Relocation(NamedTuple):
+    """Parameters of the relocation of a prefix, sent to the processes relocating its files"""
+
+    #: Either "elf", "macho" or None
+    binary_format: Optional[str]
+    relative_rpaths: bool
+    old_layout_root: str
+    new_layout_root: str
+    old_prefix: str
+    new_prefix: str
+    prefix_to_prefix_bin: Dict[str, str]
+    prefix_to_prefix_text: Dict[str, str]
+
+
+def _relocate_files(
+    relocation: _Relocation, binaries: List[str], text_files: List[str]
+) -> List[str]:
+    """Relocates some of the files of a prefix in the current process. Returns the binaries
+    whose content was modified.
+    """
+    if relocation.binary_format == "macho":
+        relocate.relocate_macho_binaries(
+            binaries,
+            relocation.old_layout_root,
+            relocation.new_layout_root,
+            relocation.prefix_to_prefix_bin,
+            relocation.relative_rpaths,
+            relocation.old_prefix,
+            relocation.new_prefix,
+        )
+    elif relocation.binary_format == "elf" and not relocation.relative_rpaths:
+        # The new ELF dynamic section relocation logic only handles absolute to
+        # absolute relocation.
+        relocate.new_relocate_elf_binaries(binaries, relocation.prefix_to_prefix_bin)
+    elif relocation.binary_format == "elf" and relocation.relative_rpaths:
+        relocate.relocate_elf_binaries(
+            binaries,
+            relocation.old_layout_root,
+            relocation.new_layout_root,
+            relocation.prefix_to_prefix_bin,
+            relocation.relative_rpaths,
+            relocation.old_prefix,
+            relocation.new_prefix,
+        )
+    relocate.relocate_text(text_files, relocation.prefix_to_prefix_text)
+    return relocate.relocate_text_bin(binaries, relocation.prefix_to_prefix_bin)
+
+
+def _relocate_files_in_parallel(
+    relocation: _Relocation, binaries: List[str], text_files: List[str]
+) -> List[str]:
+    """Relocates the files of a prefix in chunks, on a pool of processes. Returns the binaries
+    whose content was modified, in the same order as in input.
+
+    Errors are reported only after all the chunks are processed, in the order of the chunks,
+    so that they don't depend on the scheduling of the processes.
+    """
+    import spack.build_environment  # avoid circular import
+
+    size = RELOCATION_CHUNK_SIZE
+    chunks = list(
+        itertools.zip_longest(
+            [binaries[i : i + size] for i in range(0, len(binaries), size)],
+            [text_files[i : i + size] for i in range(0, len(text_files), size)],
+            fillvalue=[],
+        )
+    )
+    jobs = min(spack.build_environment.get_build_jobs(), len(chunks))
+    if jobs <= 1:
+        return _relocate_files(relocation, binaries, text_files)
+
+    task = spack.util.parallel.Task(_relocate_files)
+    with spack.util.parallel.make_concurrent_executor(jobs) as executor:
+        futures = [executor.submit(task, relocation, b, t) for b, t in chunks]
+        results = [future.result() for future in futures]
+
+    errors = [r for r in results if isinstance(r, spack.util.parallel.ErrorFromWorker)]
+    for error in errors:
+        tty.debug(error.stacktrace)
+    if errors:
+        raise RelocationError(
+            f"Failed to relocate {relocation.new_prefix}:\n"
+            + "\n".join(f"    {error}" for error in errors)
+        )
+    return [binary for changed_files in results for binary in changed_files]
+
+
 def _extract_inner_tarball(spec, filename, extract_to, signature_required: bool, remote_checksum):
     stagepath = os.path.dirname(filename)
     spackfile_name = tarball_name(spec, ".spack")
@@ -2435,12 +3311,31 @@ def extract_tarball(spec, download_result, force=False, timer=timer.NULL_TIMER):
     )
     bchecksum = spec_dict["binary_cache_checksum"]
 
-    filename = download_result["tarball_stage"].save_filename
+    tarball_stream = download_result.get("tarball_stream")
+    filename = None
+    if download_result["tarball_stage"] is not None:
+        filename = download_result["tarball_stage"].save_filename
     signature_verified: bool = download_result["signature_verified"]
     signature_required: bool = download_result["signature_required"]
     tmpdir = None
 
-    if layout_version == 0:
+    if tarball_stream is not None:
+        # The tarball was not staged: verify the signature, then download, checksum and
+        # extract it in a single pass.
+        if signature_required and not signature_verified:
+            shutil.rmtree(spec.prefix, ignore_errors=True)
+            _delete_staged_downloads(download_result)
+            raise UnsignedPackageException(
+                "To install unsigned packages, use the --no-check-signature option, "
+                "or configure the mirror with signed: false."
+            )
+        try:
+            _extract_tarball_stream(spec, tarball_stream, bchecksum["hash"])
+        except Exception:
+            shutil.rmtree(spec.prefix, ignore_errors=True)
+            _delete_staged_downloads(download_result)
+            raise
+    elif layout_version == 0:
         # Handle the older buildcache layout where the .spack file
         # contains a spec json, maybe an .asc file (signature),
         # and another tarball containing the actual install tree.
@@ -2478,19 +3373,20 @@ def extract_tarball(spec, download_result, force=False, timer=timer.NULL_TIMER):
             raise NoChecksumException(
                 tarfile_path, size, contents, "sha256", expected, local_checksum
             )
-    try:
-        with closing(tarfile.open(tarfile_path, "r")) as tar:
-            # Remove install prefix from tarfil to extract directly into spec.prefix
-            tar.extractall(
-                path=spec.prefix,
-                members=_tar_strip_component(tar, prefix=_ensure_common_prefix(tar)),
-            )
-    except Exception:
-        shutil.rmtree(spec.prefix, ignore_errors=True)
-        _delete_staged_downloads(download_result)
-        raise
+    if tarball_stream is None:
+        try:
+            with closing(tarfile.open(tarfile_path, "r")) as tar:
+                # Remove install prefix from tarfil to extract directly into spec.prefix
+                tar.extractall(
+                    path=spec.prefix,
+                    members=_tar_strip_component(tar, prefix=_ensure_common_prefix(tar)),
+                )
+        except Exception:
+            shutil.rmtree(spec.prefix, ignore_errors=True)
+            _delete_staged_downloads(download_result)
+            raise
 
-    os.remove(tarfile_path)
+        os.remove(tarfile_path)
     os.remove(specfile_path)
     timer.stop("extract")
 
@@ -2512,12 +3408,95 @@ def extract_tarball(spec, download_result, force=False, timer=timer.NULL_TIMER):
     finally:
         if tmpdir:
             shutil.rmtree(tmpdir, ignore_errors=True)
-        if os.path.exists(filename):
+        if filename and os.path.exists(filename):
             os.remove(filename)
         _delete_staged_downloads(download_result)
     timer.stop("relocate")
 
 
+def _extract_tarball_stream(spec, stream, expected_checksum: str) -> None:
+    """Extracts a tarball into the prefix of a spec, while it is being read from a stream, and
+    verifies its sha256 checksum.
+
+    The tarball is extracted into a temporary directory next to the prefix, and its content is
+    moved into the prefix only after the checksum is verified. This way the tarball is read
+    exactly once, and doesn't need to be staged on disk.
+    """
+    reader = spack.util.archive.ChecksumReader(stream)
+    tmpdir = tempfile.mkdtemp(
+        prefix=f".{os.path.basename(spec.prefix)}-", dir=os.path.dirname(spec.prefix)
+    )
+    try:
+        try:
+            with closing(tarfile.open(fileobj=reader, mode="r|*")) as tar:
+                tar.extractall(path=tmpdir, members=_tar_stream_members(tar))
+                pkg_prefix = _ensure_common_prefix(tar)
+            # Read the end of the stream too, e.g. trailing padding, to checksum all of it
+            reader.read_to_end()
+        except Exception as e:
+            # A corrupted tarball is best reported as a checksum failure, if the rest of the
+            # stream can still be read
+            try:
+                reader.read_to_end()
+            except Exception:
+                raise e
+            _check_stream_checksum(reader, stream, expected_checksum)
+            raise
+
+        _check_stream_checksum(reader, stream, expected_checksum)
+
+        _move_into_prefix(os.path.join(tmpdir, pkg_prefix), spec.prefix)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def _move_into_prefix(src: str, dst: str) -> None:
+    """Moves the content of directory ``src`` into directory ``dst``, merging it with the
+    directories that already exist in ``dst`` and replacing its files, as extracting a tarball
+    in place would do."""
+    for entry in os.listdir(src):
+        src_entry, dst_entry = os.path.join(src, entry), os.path.join(dst, entry)
+        if (
+            os.path.isdir(dst_entry)
+            and not os.path.islink(dst_entry)
+            and os.path.isdir(src_entry)
+            and not os.path.islink(src_entry)
+        ):
+            _move_into_prefix(src_entry, dst_entry)
+        else:
+            os.replace(src_entry, dst_entry)
+
+
+def _tar_stream_members(tar: tarfile.TarFile):
+    """Yield the members of a tarfile opened in stream mode, refusing those which would be
+    extracted outside of the destination directory. Since the members are not known upfront,
+    the common prefix is checked only after extraction.
+
+    Symbolic links may point anywhere, since absolute ones are relocated afterwards, but
+    nothing can be extracted through them: members under a symbolic link, members replacing
+    one, and hard links to one are refused."""
+    symlinks: Set[pathlib.PurePosixPath] = set()
+    for m in tar:
+        for name in (m.name, m.linkname if m.islnk() else ""):
+            path = pathlib.PurePosixPath(name)
+            if path.is_absolute() or os.path.isabs(name) or ".." in path.parts:
+                raise ValueError(f"Tarball contains file {m.name} outside of prefix")
+            if name and not symlinks.isdisjoint((path, *path.parents)):
+                raise ValueError(f"Tarball contains file {m.name} through a symbolic link")
+        if m.issym():
+            symlinks.add(pathlib.PurePosixPath(m.name))
+        yield m
+
+
+def _check_stream_checksum(reader, stream, expected: str) -> None:
+    local_checksum = reader.hexdigest()
+    if local_checksum != expected:
+        url = getattr(stream, "url", None) or "the binary package"
+        raise NoChecksumException(
+            url, reader.length, "not available", "sha256", expected, local_checksum
+        )
+
+
 def _ensure_common_prefix(tar: tarfile.TarFile) -> str:
     # Find the lowest `binary_distribution` file (hard-coded forward slash is on purpose).
     binary_distribution = min(
@@ -2590,7 +3569,8 @@ def install_root_node(
         warnings.warn("Package for spec {0} already installed.".format(spec.format()))
         return
 
-    download_result = download_tarball(spec.build_spec, unsigned)
+    # The tarball must be staged to check its sha256 before installation
+    download_result = download_tarball(spec.build_spec, unsigned, stream=sha256 is None)
     if not download_result:
         msg = 'download of binary cache file for spec "{0}" failed'
         raise RuntimeError(msg.format(spec.build_spec.format()))
@@ -2722,7 +3702,7 @@ def get_mirrors_for_spec(spec=None, mirrors_to_check=None, index_only=False):
     return results
 
 
-def update_cache_and_get_specs():
+def update_cache_and_get_specs(names: Optional[Iterable[str]] = None):
     """
     Get all concrete specs for build caches available on configured mirrors.
     Initialization of internal cache data structures is done as lazily as
@@ -2730,11 +3710,14 @@ def update_cache_and_get_specs():
     local index cache (essentially a no-op if it has been done already and
     nothing has changed on the configured mirrors.)
 
+    Args:
+        names: if given, only get specs for these packages
+
     Throws:
         FetchCacheError
     """
     BINARY_INDEX.update()
-    return BINARY_INDEX.get_all_built_specs()
+    return BINARY_INDEX.get_all_built_specs(names=names)
 
 
 def clear_spec_cache():
@@ -3065,6 +4048,46 @@ def conditional_fetch(self) -> FetchIndexResult:
         return FetchIndexResult(etag=etag, hash=computed_hash, data=result, fresh=False)
 
 
+class ShardedIndexFetcher:
+    """Fetcher for the shards of a sharded index, see ``spack.buildcache_index``"""
+
+    def __init__(self, url, urlopen=web_util.urlopen):
+        self.url = url
+        self.urlopen = urlopen
+        self.headers = {"User-Agent": web_util.SPACK_USER_AGENT}
+
+    def _url(self, name: str) -> str:
+        return url_util.join(
+            self.url, BUILD_CACHE_RELATIVE_PATH, buildcache_index.INDEX_DIRECTORY, name
+        )
+
+    def fetch_manifest(self) -> Optional[Tuple[str, buildcache_index.Manifest]]:
+        """Returns the hash and the content of the list of shards, or None if the mirror has no
+        sharded index"""
+        url = self._url(buildcache_index.MANIFEST_NAME)
+        try:
+            data = self.urlopen(urllib.request.Request(url, headers=self.headers)).read()
+        except (TimeoutError, urllib.error.URLError):
+            return None
+
+        try:
+            return compute_hash(data), buildcache_index.load_manifest(data)
+        except buildcache_index.ShardedIndexError as e:
+            raise FetchIndexError(f"Remote index {url} is invalid", e) from e
+
+    def fetch_shard(self, prefix: str, shard_digest: str) -> bytes:
+        """Returns the content of a shard, after checking its digest"""
+        url = self._url(buildcache_index.shard_name(prefix, shard_digest))
+        try:
+            data = self.urlopen(urllib.request.Request(url, headers=self.headers)).read()
+        except (TimeoutError, urllib.error.URLError) as e:
+            raise FetchIndexError(f"Could not fetch index shard {url}", e) from e
+
+        if buildcache_index.digest(data) != shard_digest:
+            raise FetchIndexError(f"Remote index shard {url} is invalid")
+        return data
+
+
 class EtagIndexFetcher:
     """Fetcher for index.json, using ETags headers as cache invalidation strategy"""
 
@@ -3248,3 +4271,7 @@ class CannotListKeys(GenerateIndexError):
 
 class PushToBuildCacheError(spack.error.SpackError):
     """Raised when unable to push objects to binary mirror"""
+
+
+class RelocationError(spack.error.SpackError):
+    """Raised when the files of a prefix installed from a buildcache cannot be relocated"""
@@ -32,6 +32,7 @@
 Skimming this module is a nice way to get acquainted with the types of
 calls you can make from within the install() function.
 """
+import contextlib
 import inspect
 import io
 import multiprocessing
@@ -138,12 +139,95 @@ def jobserver_enabled():
     return "MAKEFLAGS" in os.environ and "--jobserver" in os.environ["MAKEFLAGS"]
 
 
+class JobServer:
+    """A POSIX jobserver, in the format understood by GNU make 4.2 and later, to share a budget
+    of jobs among concurrent builds.
+
+    Each job, apart from the first one of every build, is taken from the pipe as a single byte
+    token, and written back when it's done. While the context manager is active, ``MAKEFLAGS``
+    points to the jobserver, so that build processes forward its file descriptors, and ``make``
+    is invoked without ``-j`` (see ``jobserver_enabled``).
+    """
+
+    def __init__(self, jobs: int) -> None:
+        self.jobs = jobs
+        self.read_fd: Optional[int] = None
+        self.write_fd: Optional[int] = None
+        self._makeflags: Optional[str] = None
+
+    @property
+    def makeflags(self) -> str:
+        return f"-j{self.jobs} --jobserver-auth={self.read_fd},{self.write_fd}"
+
+    def __enter__(self) -> "JobServer":
+        self.read_fd, self.write_fd = os.pipe()
+        for fd in (self.read_fd, self.write_fd):
+            os.set_inheritable(fd, True)
+        os.write(self.write_fd, b"+" * (self.jobs - 1))
+        self._makeflags = os.environ.get("MAKEFLAGS")
+        os.environ["MAKEFLAGS"] = self.makeflags
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._makeflags is None:
+            os.environ.pop("MAKEFLAGS", None)
+        else:
+            os.environ["MAKEFLAGS"] = self._makeflags
+        for fd in (self.read_fd, self.write_fd):
+            if fd is not None:
+                os.close(fd)
+        self.read_fd = self.write_fd = None
+
+
+def _use_jobserver_fds(read_fd: int, write_fd: int) -> None:
+    """Points ``MAKEFLAGS`` to the file descriptors of the jobserver in this process, which may
+    differ from the ones of the parent, e.g. when the process is spawned rather than forked, and
+    lets the processes started from here inherit them."""
+    for fd in (read_fd, write_fd):
+        os.set_inheritable(fd, True)
+    os.environ["MAKEFLAGS"] = re.sub(
+        r"(--jobserver-[^=]*=)\d+,\d+", rf"\g<1>{read_fd},{write_fd}", os.environ["MAKEFLAGS"]
+    )
+
+
+#: Share of the build jobs of each of the packages built at the same time, if any
+_BUILD_JOBS_SHARE: Optional[int] = None
+
+
+@contextlib.contextmanager
+def split_build_jobs(concurrent_builds: int):
+    """Context manager dividing ``config:build_jobs`` evenly among concurrent builds, for the
+    tools that can't share their jobs through a ``JobServer``. The share of each build is
+    returned by ``get_build_jobs``."""
+    global _BUILD_JOBS_SHARE
+    previous = _BUILD_JOBS_SHARE
+    _BUILD_JOBS_SHARE = max(
+        1, spack.config.determine_number_of_jobs(parallel=True) // concurrent_builds
+    )
+    try:
+        yield
+    finally:
+        _BUILD_JOBS_SHARE = previous
+
+
+def get_build_jobs(parallel: bool = True) -> int:
+    """Return the number of jobs of a build, which is its share of the build jobs when packages
+    are built at the same time, see ``split_build_jobs``."""
+    if parallel and _BUILD_JOBS_SHARE is not None:
+        return _BUILD_JOBS_SHARE
+    return spack.config.determine_number_of_jobs(parallel=parallel)
+
+
 def get_effective_jobs(jobs, parallel=True, supports_jobserver=False):
     """Return the number of jobs, or None if supports_jobserver and a jobserver is detected."""
-    if not parallel or jobs <= 1 or env_flag(SPACK_NO_PARALLEL_MAKE):
+    if not parallel or env_flag(SPACK_NO_PARALLEL_MAKE):
         return 1
-    if supports_jobserver and jobserver_enabled():
+    # Builds sharing the jobs of concurrent builds may get a single job, but can still use the
+    # free tokens of the jobserver, which they would ignore with -j1
+    if supports_jobserver and jobserver_enabled() and (jobs > 1 or _BUILD_JOBS_SHARE is not None):
         return None
+    if jobs <= 1:
+        return 1
     return jobs
 
 
@@ -617,7 +701,7 @@ def set_package_py_globals(pkg, context: Context = Context.BUILD):
     """
     module = ModuleChangePropagator(pkg)
 
-    jobs = spack.config.determine_number_of_jobs(parallel=pkg.parallel)
+    jobs = get_build_jobs(parallel=pkg.parallel)
     module.make_jobs = jobs
     if context == Context.BUILD:
         module.std_meson_args = spack.build_systems.meson.MesonBuilder.std_args(pkg)
@@ -1167,9 +1251,10 @@ def _setup_pkg_and_run(
     * The return value of ``function()``, which can be anything (except an exception).
       This is returned to the caller.
 
-    Note: ``jsfd1`` and ``jsfd2`` are passed solely to ensure that the child process
-    does not close these file descriptors. Some ``multiprocessing`` backends will close
-    them automatically in the child if they are not passed at process creation time.
+    Note: ``jsfd1`` and ``jsfd2`` are passed to ensure that the child process does not
+    close these file descriptors. Some ``multiprocessing`` backends will close them
+    automatically in the child if they are not passed at process creation time, and
+    may give them other numbers, so ``MAKEFLAGS`` is updated to point to them.
 
     Arguments:
         serialized_pkg: Spack package install context object (serialized form of the
@@ -1196,9 +1281,12 @@ def _setup_pkg_and_run(
         if input_multiprocess_fd is not None:
             sys.stdin = os.fdopen(input_multiprocess_fd.fd, closefd=False)
 
+        if jsfd1 is not None and jsfd2 is not None:
+            _use_jobserver_fds(jsfd1.fd, jsfd2.fd)
+
         pkg = serialized_pkg.restore()
 
-        if not kwargs.get("fake", False):
+        if not kwargs.get("fake", False) and kwargs.get("setup_environment", True):
             kwargs["unmodified_env"] = os.environ.copy()
             kwargs["env_modifications"] = setup_package(
                 pkg, dirty=kwargs.get("dirty", False), context=Context.from_string(context)
@@ -1267,6 +1355,155 @@ def _setup_pkg_and_run(
             input_multiprocess_fd.close()
 
 
+class BuildProcess:
+    """A child process running part of a Spack build, see ``start_build_process()``.
+
+    The process is started by ``start()``, and its result is collected by ``complete()``, which
+    blocks until the child is done. In between, the parent can wait on ``connection`` together
+    with the connections of other build processes, e.g. with
+    ``multiprocessing.connection.wait``, to run more builds concurrently.
+    """
+
+    def __init__(
+        self,
+        pkg: "spack.package_base.PackageBase",
+        function: Callable,
+        kwargs: Dict,
+        *,
+        forward_stdin: bool = True,
+    ) -> None:
+        """
+        Args:
+            pkg: package whose environment we should set up the child process for
+            function: function to run in the child process
+            kwargs: keyword arguments passed to the function. The build environment of the
+                package is not set up in the child if ``fake`` is true, or
+                ``setup_environment`` is false.
+            forward_stdin: whether to forward the standard input to the child, to allow
+                toggling verbosity. Only one of concurrent children should read it.
+        """
+        self.pkg = pkg
+        self.function = function
+        self.kwargs = kwargs
+        self.forward_stdin = forward_stdin
+        self.process: Optional[multiprocessing.Process] = None
+        #: Readable end of the pipe where the child sends its result
+        self.connection: Optional[multiprocessing.connection.Connection] = None
+
+    def start(self) -> None:
+        """Start the child process"""
+        read_pipe, write_pipe = multiprocessing.Pipe(duplex=False)
+        input_multiprocess_fd = None
+        jobserver_fd1 = None
+        jobserver_fd2 = None
+
+        serialized_pkg = spack.subprocess_context.PackageInstallContext(self.pkg)
+
+        try:
+            # Forward sys.stdin when appropriate, to allow toggling verbosity
+            if (
+                self.forward_stdin
+                and sys.platform != "win32"
+                and sys.stdin.isatty()
+                and hasattr(sys.stdin, "fileno")
+            ):
+                input_fd = os.dup(sys.stdin.fileno())
+                input_multiprocess_fd = MultiProcessFd(input_fd)
+            mflags = os.environ.get("MAKEFLAGS", False)
+            if mflags:
+                m = re.search(r"--jobserver-[^=]*=(\d+),(\d+)", mflags)
+                if m:
+                    # Pass duplicates, which are closed below, so that the jobserver stays
+                    # open in the parent for other build processes
+                    jobserver_fd1 = MultiProcessFd(os.dup(int(m.group(1))))
+                    jobserver_fd2 = MultiProcessFd(os.dup(int(m.group(2))))
+
+            p = multiprocessing.Process(
+                target=_setup_pkg_and_run,
+                args=(
+                    serialized_pkg,
+                    self.function,
+                    self.kwargs,
+                    write_pipe,
+                    input_multiprocess_fd,
+                    jobserver_fd1,
+                    jobserver_fd2,
+                ),
+            )
+
+            p.start()
+
+            # We close the writable end of the pipe now to be sure that p is the
+            # only process which owns a handle for it. This ensures that when p
+            # closes its handle for the writable end, read_pipe.recv() will
+            # promptly report the readable end as being ready.
+            write_pipe.close()
+
+        except InstallError as e:
+            e.pkg = self.pkg
+            raise
+
+        finally:
+            # Close the input stream, and the jobserver duplicates, in the parent process
+            for fd in (input_multiprocess_fd, jobserver_fd1, jobserver_fd2):
+                if fd is not None:
+                    fd.close()
+
+        self.process, self.connection = p, read_pipe
+
+    def complete(self):
+        """Wait for the child process to finish, and return the value returned by the function
+        run in the child. Errors in the child are raised again in the parent.
+        """
+        assert self.process is not None and self.connection is not None, "not started"
+        p = self.process
+
+        def exitcode_msg(p):
+            typ = "exit" if p.exitcode >= 0 else "signal"
+            return f"{typ} {abs(p.exitcode)}"
+
+        try:
+            child_result = self.connection.recv()
+        except EOFError:
+            p.join()
+            raise InstallError(f"The process has stopped unexpectedly ({exitcode_msg(p)})")
+        finally:
+            self.connection.close()
+
+        p.join()
+
+        # If returns a StopPhase, raise it
+        if isinstance(child_result, spack.error.StopPhase):
+            # do not print
+            raise child_result
+
+        # let the caller know which package went wrong.
+        if isinstance(child_result, InstallError):
+            child_result.pkg = self.pkg
+
+        if isinstance(child_result, ChildError):
+            # If the child process raised an error, print its output here rather
+            # than waiting until the call to SpackError.die() in main(). This
+            # allows exception handling output to be logged from within Spack.
+            # see spack.main.SpackCommand.
+            child_result.print_context()
+            raise child_result
+
+        # Fallback. Usually caught beforehand in EOFError above.
+        if p.exitcode != 0:
+            raise InstallError(f"The process failed unexpectedly ({exitcode_msg(p)})")
+
+        return child_result
+
+    def terminate(self) -> None:
+        """Terminate the child process, if it is still running"""
+        if self.process is not None and self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        if self.connection is not None:
+            self.connection.close()
+
+
 def start_build_process(pkg, function, kwargs):
     """Create a child process to do part of a spack build.
 
@@ -1306,89 +1543,9 @@ def child_fun():
     For more information on `multiprocessing` child process creation
     mechanisms, see https://docs.python.org/3/library/multiprocessing.html#contexts-and-start-methods
     """
-    read_pipe, write_pipe = multiprocessing.Pipe(duplex=False)
-    input_multiprocess_fd = None
-    jobserver_fd1 = None
-    jobserver_fd2 = None
-
-    serialized_pkg = spack.subprocess_context.PackageInstallContext(pkg)
-
-    try:
-        # Forward sys.stdin when appropriate, to allow toggling verbosity
-        if sys.platform != "win32" and sys.stdin.isatty() and hasattr(sys.stdin, "fileno"):
-            input_fd = os.dup(sys.stdin.fileno())
-            input_multiprocess_fd = MultiProcessFd(input_fd)
-        mflags = os.environ.get("MAKEFLAGS", False)
-        if mflags:
-            m = re.search(r"--jobserver-[^=]*=(\d),(\d)", mflags)
-            if m:
-                jobserver_fd1 = MultiProcessFd(int(m.group(1)))
-                jobserver_fd2 = MultiProcessFd(int(m.group(2)))
-
-        p = multiprocessing.Process(
-            target=_setup_pkg_and_run,
-            args=(
-                serialized_pkg,
-                function,
-                kwargs,
-                write_pipe,
-                input_multiprocess_fd,
-                jobserver_fd1,
-                jobserver_fd2,
-            ),
-        )
-
-        p.start()
-
-        # We close the writable end of the pipe now to be sure that p is the
-        # only process which owns a handle for it. This ensures that when p
-        # closes its handle for the writable end, read_pipe.recv() will
-        # promptly report the readable end as being ready.
-        write_pipe.close()
-
-    except InstallError as e:
-        e.pkg = pkg
-        raise
-
-    finally:
-        # Close the input stream in the parent process
-        if input_multiprocess_fd is not None:
-            input_multiprocess_fd.close()
-
-    def exitcode_msg(p):
-        typ = "exit" if p.exitcode >= 0 else "signal"
-        return f"{typ} {abs(p.exitcode)}"
-
-    try:
-        child_result = read_pipe.recv()
-    except EOFError:
-        p.join()
-        raise InstallError(f"The process has stopped unexpectedly ({exitcode_msg(p)})")
-
-    p.join()
-
-    # If returns a StopPhase, raise it
-    if isinstance(child_result, spack.error.StopPhase):
-        # do not print
-        raise child_result
-
-    # let the caller know which package went wrong.
-    if isinstance(child_result, InstallError):
-        child_result.pkg = pkg
-
-    if isinstance(child_result, ChildError):
-        # If the child process raised an error, print its output here rather
-        # than waiting until the call to SpackError.die() in main(). This
-        # allows exception handling output to be logged from within Spack.
-        # see spack.main.SpackCommand.
-        child_result.print_context()
-        raise child_result
-
-    # Fallback. Usually caught beforehand in EOFError above.
-    if p.exitcode != 0:
-        raise InstallError(f"The process failed unexpectedly ({exitcode_msg(p)})")
-
-    return child_result
+    process = BuildProcess(pkg, function, kwargs)
+    process.start()
+    return process.complete()
 
 
 CONTEXT_BASES = (spack.package_base.PackageBase, spack.build_systems._checks.BaseBuilder)
@@ -0,0 +1,153 @@
+# Copyright 2013-2024 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Sharded layout of the index of a buildcache.
+
+The ``index.json`` file of a buildcache has the install records of every spec in it, so that
+clients have to download all of it whenever a single spec is added, and the index can only be
+regenerated by reading every spec file in the buildcache. The sharded index splits the records
+by the first characters of their DAG hash::
+
+    build_cache/index/shards.json
+    build_cache/index/<prefix>-<digest>.json
+
+where ``shards.json`` maps each prefix to the SHA-256 digest of its shard::
+
+    {"shards": {"version": 1, "database_version": "7", "prefixes": {"<prefix>": "<digest>"}}}
+
+Each shard has the same format as ``index.json``, with only the records whose DAG hash starts
+with its prefix. Records are sorted, and don't have reference counts, so that a shard changes
+only when one of its own records changes. The digest is part of the name of a shard, so shards
+are never modified in place: a new shard is uploaded before the ``shards.json`` referring to it.
+The shards replaced by an update are removed only by the next one, so that clients that fetched
+the previous ``shards.json`` can still fetch its shards.
+
+Clients that would have to fetch most of the shards, e.g. because they have none of them cached,
+download ``index.json`` instead, and split it into the shards they cache.
+"""
+import hashlib
+import json
+import re
+from typing import Any, Dict, Iterable, NamedTuple
+
+from spack.error import SpackError
+
+#: Version of the sharded layout. Bump this when the format of shards changes.
+SHARDS_VERSION = 1
+
+#: Number of characters of the DAG hash identifying a shard. Each shard takes a round trip to be
+#: fetched, so there are at most 32 of them.
+PREFIX_LENGTH = 1
+
+#: Directory of the sharded index, relative to the build_cache directory
+INDEX_DIRECTORY = "index"
+
+#: Name of the file listing the shards
+MANIFEST_NAME = "shards.json"
+
+
+class Manifest(NamedTuple):
+    """Content of ``shards.json``"""
+
+    #: Version of the database format of the records
+    database_version: str
+    #: Digest of the shard of each prefix
+    prefixes: Dict[str, str]
+
+
+def digest(data: bytes) -> str:
+    """Returns the digest identifying the content of a shard"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def shard_prefix(dag_hash: str) -> str:
+    """Returns the prefix of the shard containing the record of a DAG hash"""
+    return dag_hash[:PREFIX_LENGTH]
+
+
+def shard_name(prefix: str, shard_digest: str) -> str:
+    """Returns the file name of a shard"""
+    return f"{prefix}-{shard_digest}.json"
+
+
+def is_shard_name(name: str) -> bool:
+    """Returns True if a file name is the name of a shard"""
+    # Shards of any prefix length, so that the ones of a layout with longer prefixes are removed
+    return re.fullmatch(r"[0-9a-z]+-[0-9a-f]{64}\.json", name) is not None
+
+
+def split(installs: Dict[str, Dict[str, Any]], database_version: str) -> Dict[str, bytes]:
+    """Splits the install records of an index into shards. Returns the content of the shard of
+    each prefix."""
+    by_prefix: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for dag_hash in sorted(installs):
+        record = {k: v for k, v in installs[dag_hash].items() if k != "ref_count"}
+        by_prefix.setdefault(shard_prefix(dag_hash), {})[dag_hash] = record
+    return {
+        prefix: _dumps({"database": {"version": database_version, "installs": records}})
+        for prefix, records in by_prefix.items()
+    }
+
+
+def dump_manifest(manifest: Manifest) -> bytes:
+    """Returns the content of ``shards.json``"""
+    return _dumps(
+        {
+            "shards": {
+                "version": SHARDS_VERSION,
+                "database_version": manifest.database_version,
+                "prefixes": dict(sorted(manifest.prefixes.items())),
+            }
+        }
+    )
+
+
+def load_manifest(data: bytes) -> Manifest:
+    """Parses the content of ``shards.json``"""
+    try:
+        metadata = json.loads(data)["shards"]
+        if metadata["version"] != SHARDS_VERSION:
+            raise ShardedIndexError(
+                f"unsupported version {metadata['version']} of the list of shards"
+            )
+        return Manifest(str(metadata["database_version"]), dict(metadata["prefixes"]))
+    except (ValueError, KeyError, TypeError) as e:
+        raise ShardedIndexError(f"invalid list of shards: {e}") from e
+
+
+def load_shard(data: bytes, expected_digest: str) -> Dict[str, Dict[str, Any]]:
+    """Parses the content of a shard, and returns its install records"""
+    if digest(data) != expected_digest:
+        raise ShardedIndexError(f"the digest of shard {expected_digest} doesn't match")
+    try:
+        return json.loads(data)["database"]["installs"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise ShardedIndexError(f"invalid shard {expected_digest}: {e}") from e
+
+
+def merge(shards: Iterable[Dict[str, Dict[str, Any]]], database_version: str) -> Dict[str, Any]:
+    """Merges the install records of shards into the content of an ``index.json`` file, with
+    the reference counts of the records computed from their dependents."""
+    installs: Dict[str, Dict[str, Any]] = {}
+    for records in shards:
+        installs.update(records)
+
+    ref_counts = dict.fromkeys(installs, 0)
+    for record in installs.values():
+        for dependency in record["spec"].get("dependencies", ()):
+            if dependency["hash"] in ref_counts:
+                ref_counts[dependency["hash"]] += 1
+
+    for dag_hash, record in installs.items():
+        record["ref_count"] = ref_counts[dag_hash]
+
+    return {"database": {"version": database_version, "installs": installs}}
+
+
+def _dumps(data: Dict[str, Any]) -> bytes:
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+class ShardedIndexError(SpackError):
+    """Raised when the sharded index of a buildcache cannot be read"""
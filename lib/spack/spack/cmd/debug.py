@@ -3,12 +3,16 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
+import argparse
 import os
 import platform
 import re
+import subprocess
 import sys
+import time
 from datetime import datetime
 from glob import glob
+from typing import List, NamedTuple
 
 import llnl.util.tty as tty
 from llnl.util.filesystem import working_dir
@@ -31,6 +35,24 @@ def setup_parser(subparser):
     sp.add_parser("create-db-tarball", help="create a tarball of Spack's installation metadata")
     sp.add_parser("report", help="print information useful for bug reports")
 
+    startup = sp.add_parser("startup", help="report the time spent importing modules on startup")
+    startup.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        default=10.0,
+        help="omit modules imported in less than this many milliseconds (default: 10)",
+    )
+    startup.add_argument(
+        "--depth", type=int, default=None, help="maximum depth of the tree of imports"
+    )
+    startup.add_argument(
+        "spack_args",
+        nargs=argparse.REMAINDER,
+        help="arguments of the spack invocation to measure, after '--' if they start with an "
+        "option (default: --version)",
+    )
+
 
 def _debug_tarball_suffix():
     now = datetime.now()
@@ -95,6 +117,79 @@ def report(args):
     print("* **Platform:**", architecture)
 
 
+class ImportTime(NamedTuple):
+    """Time spent importing a module, as reported by ``python -X importtime``"""
+
+    #: Name of the module
+    name: str
+    #: Time in microseconds spent importing the module itself
+    self_us: int
+    #: Time in microseconds spent importing the module, including the modules it imports
+    cumulative_us: int
+    #: Modules imported by this module
+    children: List["ImportTime"]
+
+
+def parse_import_times(output: str) -> List[ImportTime]:
+    """Parses the output of ``python -X importtime``, and returns the tree of imports.
+
+    Modules are listed after the modules they import, indented by two more spaces.
+    """
+    pending: List[ImportTime] = []
+    levels: List[int] = []
+    for line in output.splitlines():
+        match = re.match(r"import time:\s*(\d+) \|\s*(\d+) \|( +)(\S+)", line)
+        if not match:
+            continue
+        level = len(match.group(3)) // 2
+        children = []
+        while levels and levels[-1] > level:
+            levels.pop()
+            children.append(pending.pop())
+        children.reverse()
+        pending.append(
+            ImportTime(match.group(4), int(match.group(1)), int(match.group(2)), children)
+        )
+        levels.append(level)
+    return pending
+
+
+def _print_import_times(
+    imports: List[ImportTime], threshold_us: float, max_depth, depth: int = 0
+) -> None:
+    for entry in sorted(imports, key=lambda x: x.cumulative_us, reverse=True):
+        if entry.cumulative_us < threshold_us:
+            break
+        print(
+            f"{entry.cumulative_us / 1000:>10.1f} {entry.self_us / 1000:>8.1f}  "
+            f"{'  ' * depth}{entry.name}"
+        )
+        if max_depth is None or depth + 1 < max_depth:
+            _print_import_times(entry.children, threshold_us, max_depth, depth + 1)
+
+
+def startup(args):
+    # Options of the spack invocation need to be separated by '--'
+    spack_args = args.spack_args
+    if spack_args and spack_args[0] == "--":
+        spack_args = spack_args[1:]
+    spack_args = spack_args or ["--version"]
+    command = [sys.executable, "-X", "importtime", spack.paths.spack_script, *spack_args]
+
+    start = time.perf_counter()
+    result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+
+    imports = parse_import_times(result.stderr)
+    total_us = sum(x.cumulative_us for x in imports)
+    print(f"spack {' '.join(spack_args)}: {elapsed:.3f}s, {total_us / 1e6:.3f}s importing modules")
+    print(f"{'cumul [ms]':>10} {'self [ms]':>8}  module")
+    _print_import_times(imports, args.threshold * 1000, args.depth)
+
+    if result.returncode != 0:
+        tty.warn(f"spack {' '.join(spack_args)} exited with code {result.returncode}")
+
+
 def debug(parser, args):
-    action = {"create-db-tarball": create_db_tarball, "report": report}
+    action = {"create-db-tarball": create_db_tarball, "report": report, "startup": startup}
     action[args.debug_command](args)
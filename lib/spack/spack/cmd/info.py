@@ -14,6 +14,7 @@
 import spack.deptypes as dt
 import spack.fetch_strategy as fs
 import spack.install_test
+import spack.metadata_index
 import spack.repo
 import spack.spec
 import spack.variant
@@ -216,8 +217,8 @@ def print_tags(pkg, args):
 
     color.cprint("")
     color.cprint(section_title("Tags: "))
-    if hasattr(pkg, "tags"):
-        tags = sorted(pkg.tags)
+    tags = sorted(getattr(pkg, "tags", []))
+    if tags:
         colify(tags, indent=4)
     else:
         color.cprint("    None")
@@ -414,6 +415,8 @@ def print_versions(pkg, args):
         preferred = preferred_version(pkg)
 
         def get_url(version):
+            if isinstance(pkg, spack.metadata_index.PackageMetadata):
+                return pkg.version_urls[str(version)]
             try:
                 return fs.for_package_version(pkg, version)
             except spack.fetch_strategy.InvalidArgsError:
@@ -454,7 +457,10 @@ def print_virtuals(pkg, args):
     color.cprint(section_title("Virtual Packages: "))
     if pkg.provided:
         for when, specs in reversed(sorted(pkg.provided.items())):
-            line = "    %s provides %s" % (when.cformat(), ", ".join(s.cformat() for s in specs))
+            line = "    %s provides %s" % (
+                when.cformat(),
+                ", ".join(s.cformat() for s in sorted(specs)),
+            )
             print(line)
 
     else:
@@ -479,10 +485,25 @@ def print_licenses(pkg, args):
             color.cprint(line)
 
 
+def _package(spec, args):
+    """Returns the package to output information on. Unless some of the sections to output need
+    the package class, this is its metadata in the index, so that no package code is imported."""
+    if not (args.all or args.detectable or args.phases or args.tests):
+        metadata = spack.repo.PATH.metadata_index.get(spec.name)
+        if (
+            metadata is not None
+            and spec.namespace in (None, metadata.namespace)
+            and metadata.version_urls is not None
+        ):
+            return metadata
+
+    pkg_cls = spack.repo.PATH.get_pkg_class(spec.fullname)
+    return pkg_cls(spec)
+
+
 def info(parser, args):
     spec = spack.spec.Spec(args.package)
-    pkg_cls = spack.repo.PATH.get_pkg_class(spec.fullname)
-    pkg = pkg_cls(spec)
+    pkg = _package(spec, args)
 
     # Output core package information
     header = section_title("{0}:   ").format(pkg.build_system_class) + pkg.name
@@ -490,8 +511,9 @@ def info(parser, args):
 
     color.cprint("")
     color.cprint(section_title("Description:"))
-    if pkg.__doc__:
-        color.cprint(color.cescape(pkg.format_doc(indent=4)))
+    doc = pkg.format_doc(indent=4)
+    if doc:
+        color.cprint(color.cescape(doc))
     else:
         color.cprint("    None")
 
@@ -84,7 +84,7 @@ def setup_parser(subparser):
         default=None,
         help="phase to stop after when installing (default None)",
     )
-    arguments.add_common_arguments(subparser, ["jobs"])
+    arguments.add_common_arguments(subparser, ["jobs", "concurrent_packages"])
     subparser.add_argument(
         "--overwrite",
         action="store_true",
@@ -329,6 +329,11 @@ def install(parser, args):
 
     arguments.sanitize_reporter_options(args)
 
+    # Reporters collect information on one package at a time
+    if args.log_format is not None and spack.config.get("config:concurrent_packages", 1) > 1:
+        tty.warn("Building one package at a time, since a report was requested")
+        spack.config.set("config:concurrent_packages", 1, scope="command_line")
+
     def reporter_factory(specs):
         if args.log_format is None:
             return lang.nullcontext()
@@ -117,9 +117,9 @@ def match(p, f):
                 if f.match(p):
                     return True
 
-                pkg_cls = spack.repo.PATH.get_pkg_class(p)
-                if pkg_cls.__doc__:
-                    return f.match(pkg_cls.__doc__)
+                metadata = spack.repo.PATH.metadata_index.get(p)
+                if metadata and metadata.doc:
+                    return f.match(metadata.doc)
                 return False
 
         else:
@@ -169,7 +169,7 @@ def get_dependencies(pkg):
 @formatter
 def version_json(pkg_names, out):
     """Print all packages with their latest versions."""
-    pkg_classes = [spack.repo.PATH.get_pkg_class(name) for name in pkg_names]
+    pkg_classes = [spack.repo.PATH.metadata_index[name] for name in pkg_names]
 
     out.write("[\n")
 
@@ -211,7 +211,7 @@ def html(pkg_names, out):
     """
 
     # Read in all packages
-    pkg_classes = [spack.repo.PATH.get_pkg_class(name) for name in pkg_names]
+    pkg_classes = [spack.repo.PATH.metadata_index[name] for name in pkg_names]
 
     # Start at 2 because the title of the page from Sphinx is id1.
     span_id = 2
@@ -86,6 +86,20 @@ def setup_parser(subparser):
     subparser.add_argument(
         "--stats", action="store_true", default=False, help="print out statistics from clingo"
     )
+    subparser.add_argument(
+        "--profile-setup",
+        action="store_true",
+        default=False,
+        help="print out where time is spent setting up the solve, and which facts are emitted",
+    )
+    subparser.add_argument(
+        "--no-cache",
+        action=spack.cmd.common.arguments.ConfigSetAction,
+        dest="concretizer:concretization_cache:enable",
+        const=False,
+        default=None,
+        help="do not use the concretization cache, and always run the solver",
+    )
     subparser.add_argument("specs", nargs=argparse.REMAINDER, help="specs of packages")
 
     spack.cmd.common.arguments.add_concretizer_args(subparser)
@@ -185,6 +199,7 @@ def solve(parser, args):
             stats=args.stats,
             setup_only=setup_only,
             allow_deprecated=allow_deprecated,
+            profile_setup=args.profile_setup,
         )
         if not setup_only:
             _process_result(result, show, required_format, kwargs)
@@ -196,6 +211,7 @@ def solve(parser, args):
                 timers=args.timers,
                 stats=args.stats,
                 allow_deprecated=allow_deprecated,
+                profile_setup=args.profile_setup,
             )
         ):
             if "solutions" in show:
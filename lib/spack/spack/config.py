@@ -32,9 +32,14 @@
 import contextlib
 import copy
 import functools
+import hashlib
+import json
 import os
+import pickle
 import re
 import sys
+import time
+import warnings
 from typing import Any, Callable, Dict, Generator, List, Optional, Tuple, Union
 
 from llnl.util import filesystem, lang, tty
@@ -331,9 +336,14 @@ class InternalConfigScope(ConfigScope):
     This is for spack internal use so that command-line options and
     config file settings are accessed the same way, and Spack can easily
     override settings from files.
+
+    Data is validated, unless ``trusted`` is True, as for the hardcoded
+    defaults, which are known to be valid and are loaded in every process.
     """
 
-    def __init__(self, name: str, data: Optional[YamlConfigDict] = None) -> None:
+    def __init__(
+        self, name: str, data: Optional[YamlConfigDict] = None, *, trusted: bool = False
+    ) -> None:
         super().__init__(name)
         self.sections = syaml.syaml_dict()
 
@@ -341,7 +351,8 @@ def __init__(self, name: str, data: Optional[YamlConfigDict] = None) -> None:
             data = InternalConfigScope._process_dict_keyname_overrides(data)
             for section in data:
                 dsec = data[section]
-                validate({section: dsec}, SECTION_SCHEMAS[section])
+                if not trusted:
+                    validate({section: dsec}, SECTION_SCHEMAS[section])
                 self.sections[section] = _mark_internal(syaml.syaml_dict({section: dsec}), name)
 
     def get_section(self, section: str) -> Optional[YamlConfigDict]:
@@ -796,6 +807,9 @@ def _add_command_line_scopes(
     cfg: Union[Configuration, lang.Singleton], command_line_scopes: List[str]
 ) -> None:
     """Add additional scopes from the --config-scope argument, either envs or dirs."""
+    if not command_line_scopes:
+        return
+
     import spack.environment.environment as env  # circular import
 
     for i, path in enumerate(command_line_scopes):
@@ -827,8 +841,9 @@ def create() -> Configuration:
     """
     cfg = Configuration()
 
-    # first do the builtin, hardcoded defaults
-    builtin = InternalConfigScope("_builtin", CONFIG_DEFAULTS)
+    # first do the builtin, hardcoded defaults. They're not validated, to avoid importing
+    # jsonschema when all the configuration files are cached.
+    builtin = InternalConfigScope("_builtin", CONFIG_DEFAULTS, trusted=True)
     cfg.push_scope(builtin)
 
     # Builtin paths to configuration files in Spack
@@ -1092,27 +1107,178 @@ def validate(
     return data
 
 
+#: Version of the format of cached configuration files. Bump this when the types used to
+#: represent YAML data change.
+CONFIG_CACHE_VERSION = 2
+
+#: Files modified less than this many seconds ago are not cached, since a further modification
+#: within the timestamp resolution of the filesystem might not change their stat
+CONFIG_CACHE_MIN_AGE = 2.0
+
+#: Errors raised when reading a cached file that was truncated, or written in another format
+_UNREADABLE_CACHE_ERRORS = (
+    OSError,
+    EOFError,
+    AttributeError,
+    ImportError,
+    TypeError,
+    ValueError,
+    pickle.UnpicklingError,
+)
+
+#: Digests of the schemas of cached files, by id of the schema
+_SCHEMA_DIGESTS: Dict[int, Tuple[YamlConfigDict, str]] = {}
+
+
+def _schema_digest(schema: YamlConfigDict) -> str:
+    """Returns a digest of a schema, so that cached files are validated again if it changes."""
+    entry = _SCHEMA_DIGESTS.get(id(schema))
+    if entry is None or entry[0] is not schema:
+        content = json.dumps(schema, sort_keys=True, default=str).encode()
+        entry = _SCHEMA_DIGESTS[id(schema)] = (schema, hashlib.sha256(content).hexdigest())
+    return entry[1]
+
+
+def _config_cache_file(path: str) -> str:
+    """Returns the path of the cache of a configuration file.
+
+    The location of the misc cache is itself configurable, so the cache of configuration files
+    is always in the default misc cache.
+    """
+    digest = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()
+    return os.path.join(spack.paths.default_misc_cache_path, "config", f"{digest}.pickle")
+
+
+def _stat_key(sinfo: os.stat_result) -> Tuple[int, int, int, int]:
+    return sinfo.st_mtime_ns, sinfo.st_ctime_ns, sinfo.st_size, sinfo.st_ino
+
+
+def _read_cached_config(
+    path: str, sinfo: os.stat_result, schema: Optional[YamlConfigDict]
+) -> Optional[Tuple[Optional[YamlConfigDict], List[Warning]]]:
+    """Returns the validated data of a configuration file and the warnings emitted by its
+    validation, as cached by a previous read. Returns None if the file was not cached, or if it
+    changed since it was cached."""
+    try:
+        with open(_config_cache_file(path), "rb") as f:
+            version, cached_path, stat_key, digest, data, messages = pickle.load(f)
+    except _UNREADABLE_CACHE_ERRORS:
+        return None
+
+    if (
+        version != CONFIG_CACHE_VERSION
+        or cached_path != os.path.abspath(path)
+        or stat_key != _stat_key(sinfo)
+    ):
+        return None
+
+    if data:
+        schema = schema or _ALL_SCHEMAS.get(next(iter(data)))
+        if schema is None or digest != _schema_digest(schema):
+            return None
+
+    return data, messages
+
+
+def _write_cached_config(
+    path: str,
+    sinfo: os.stat_result,
+    schema: Optional[YamlConfigDict],
+    data: Optional[YamlConfigDict],
+    messages: List[Warning],
+) -> None:
+    """Caches the validated data of a configuration file. Errors are ignored, since the file
+    can always be read again."""
+    if time.time() - sinfo.st_mtime < CONFIG_CACHE_MIN_AGE:
+        return
+
+    digest = _schema_digest(schema) if schema is not None else None
+    entry = (CONFIG_CACHE_VERSION, os.path.abspath(path), _stat_key(sinfo), digest, data, messages)
+    cache_file = _config_cache_file(path)
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(tmp_file, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except (OSError, AttributeError, TypeError, pickle.PicklingError) as e:
+        tty.debug(f"Cannot cache config file {path}: {e}")
+        with contextlib.suppress(OSError):
+            os.remove(tmp_file)
+        return
+
+    _prune_cached_configs(os.path.dirname(cache_file))
+
+
+def _prune_cached_configs(cache_dir: str) -> None:
+    """Removes the cached configuration files that were written in another format, or whose
+    file doesn't exist anymore. This is done only when a file is cached, which is rare."""
+    try:
+        entries = [e.path for e in os.scandir(cache_dir) if e.name.endswith(".pickle")]
+    except OSError:
+        return
+
+    for entry in entries:
+        try:
+            with open(entry, "rb") as f:
+                version, cached_path, *_ = pickle.load(f)
+            stale = version != CONFIG_CACHE_VERSION or not os.path.exists(cached_path)
+        except FileNotFoundError:
+            continue
+        except _UNREADABLE_CACHE_ERRORS:
+            stale = True
+
+        if stale:
+            with contextlib.suppress(OSError):
+                os.remove(entry)
+
+
 def read_config_file(
     path: str, schema: Optional[YamlConfigDict] = None
 ) -> Optional[YamlConfigDict]:
     """Read a YAML configuration file.
 
     User can provide a schema for validation. If no schema is provided,
-    we will infer the schema from the top-level key."""
+    we will infer the schema from the top-level key.
+
+    Parsed and validated files are cached in the default misc cache, so that
+    a file that didn't change since it was last read costs a single stat."""
     # Dev: Inferring schema and allowing it to be provided directly allows us
     # to preserve flexibility in calling convention (don't need to provide
     # schema when it's not necessary) while allowing us to validate against a
     # known schema when the top-level key could be incorrect.
     try:
-        with open(path) as f:
-            tty.debug(f"Reading config from file {path}")
-            data = syaml.load_config(f)
-
-        if data:
-            if schema is None:
-                key = next(iter(data))
-                schema = _ALL_SCHEMAS[key]
-            validate(data, schema)
+        sinfo = os.stat(path)
+        cached = _read_cached_config(path, sinfo, schema)
+        if cached is not None:
+            tty.debug(f"Reading config from cache of file {path}")
+            data, messages = cached
+        else:
+            with open(path) as f:
+                tty.debug(f"Reading config from file {path}")
+                data = syaml.load_config(f)
+
+            messages = []
+            if data:
+                if schema is None:
+                    key = next(iter(data))
+                    schema = _ALL_SCHEMAS[key]
+
+                # Record warnings about deprecated options, to emit them also for cached files.
+                # Any other warning is emitted as usual, and not cached.
+                with warnings.catch_warnings(record=True) as caught:
+                    warnings.simplefilter("always", spack.schema.DeprecatedPropertyWarning)
+                    validate(data, schema)
+                for w in caught:
+                    if issubclass(w.category, spack.schema.DeprecatedPropertyWarning):
+                        messages.append(w.message)
+                    else:
+                        warnings.warn_explicit(w.message, w.category, w.filename, w.lineno)
+
+            _write_cached_config(path, sinfo, schema, data, messages)
+
+        for message in messages:
+            warnings.warn(message)
 
         return data
 
@@ -18,8 +18,12 @@
 provides a cache and a sanity checking mechanism for what is in the
 filesystem.
 """
+import bisect
+import collections
+import collections.abc
 import contextlib
 import datetime
+import functools
 import os
 import pathlib
 import socket
@@ -29,13 +33,17 @@
 from typing import (
     Any,
     Callable,
+    Collection,
     Container,
     Dict,
     Generator,
     Iterable,
+    Iterator,
     List,
+    MutableMapping,
     NamedTuple,
     Optional,
+    Sequence,
     Set,
     Tuple,
     Type,
@@ -54,6 +62,8 @@
 import llnl.util.lang
 import llnl.util.tty as tty
 
+import spack.database_index
+import spack.database_journal
 import spack.deptypes as dt
 import spack.hash_types as ht
 import spack.spec
@@ -107,6 +117,13 @@
 #: ensure a failed install is properly tracked).
 _DEFAULT_PKG_LOCK_TIMEOUT = None
 
+#: The journal of a database is compacted into its index when it grows larger than this
+#: fraction of the size of the index...
+_JOURNAL_COMPACTION_RATIO = 0.5
+
+#: ...and than this number of bytes
+_JOURNAL_COMPACTION_MIN_SIZE = 1024 * 1024
+
 #: Types of dependencies tracked by the database
 #: We store by DAG hash, so we track the dependencies that the DAG hash includes.
 _TRACKED_DEPENDENCIES = ht.dag_hash.depflag
@@ -160,6 +177,20 @@ def converter(self, spec_like, *args, **kwargs):
     return converter
 
 
+def _invalidates_query_index(function):
+    """Decorator for Database methods that modify install records. The secondary indexes
+    used in queries are rebuilt on the next query."""
+
+    @functools.wraps(function)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return function(self, *args, **kwargs)
+        finally:
+            self._query_index = None
+
+    return wrapper
+
+
 class InstallStatus(str):
     pass
 
@@ -279,6 +310,246 @@ def from_dict(cls, spec, dictionary):
         return InstallRecord(spec, **d)
 
 
+class LazyInstallRecords(collections.abc.MutableMapping):
+    """Install records of a database, read from a binary index. Each record is decoded,
+    together with its dependencies, the first time it is accessed.
+    """
+
+    def __init__(
+        self,
+        index: spack.database_index.BinaryIndex,
+        spec_reader: Type["spack.spec.SpecfileReaderBase"],
+        path: str,
+        upstream_dbs: Sequence["Database"] = (),
+    ) -> None:
+        """
+        Args:
+            index: binary index the records are read from
+            spec_reader: reader of the specs in the records
+            path: path of the binary index, for error messages
+            upstream_dbs: databases where dependencies not in the index are looked up
+        """
+        self.index = index
+        self._spec_reader = spec_reader
+        self._path = path
+        self._upstream_dbs = upstream_dbs
+        self._decoded: Dict[str, InstallRecord] = {}
+        # Records removed from, or added to, those in the binary index
+        self._removed: Set[str] = set()
+        self._added: Dict[str, None] = {}
+
+    def _in_index(self, key: str) -> bool:
+        return key not in self._removed and self.index.find(key) >= 0
+
+    def __contains__(self, key) -> bool:
+        return key in self._decoded or self._in_index(key)
+
+    def __getitem__(self, key: str) -> InstallRecord:
+        try:
+            return self._decoded[key]
+        except KeyError:
+            pass
+
+        i = -1 if key in self._removed else self.index.find(key)
+        if i < 0:
+            raise KeyError(key)
+
+        try:
+            rec = self.index.record(i)
+            spec = self._spec_reader.from_node_dict(rec["spec"])
+            record = InstallRecord.from_dict(spec, rec)
+            edges = self.index.edges(i)
+        except Exception as e:
+            raise CorruptDatabaseError(
+                f"Invalid record in Spack database: hash: {key}, cause: "
+                f"{type(e).__name__}: {e}",
+                self._path,
+            ) from e
+
+        for edge in edges:
+            # Same lookup order as for the JSON index: local records first, then upstreams
+            child = self.get(edge.dag_hash)
+            for db in self._upstream_dbs:
+                if child:
+                    break
+                child = db._data.get(edge.dag_hash)
+            if not child:
+                tty.warn(
+                    f"Missing dependency not in database: "
+                    f"{spec.cformat('{name}{/hash:7}')} needs {edge.name}-{edge.dag_hash[:7]}"
+                )
+                continue
+            spec._add_dependency(child.spec, depflag=edge.depflag, virtuals=edge.virtuals)
+
+        spec._mark_root_concrete()
+        self._decoded[key] = record
+        return record
+
+    def __setitem__(self, key: str, record: InstallRecord) -> None:
+        self._decoded[key] = record
+        if self.index.find(key) < 0:
+            self._added[key] = None
+        self._removed.discard(key)
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self:
+            raise KeyError(key)
+        self._decoded.pop(key, None)
+        if key in self._added:
+            del self._added[key]
+        else:
+            self._removed.add(key)
+
+    def __iter__(self) -> Iterator[str]:
+        # Accessing records while iterating decodes them, so don't iterate over _decoded
+        for key in self.index.hashes():
+            if key not in self._removed:
+                yield key
+        yield from list(self._added)
+
+    def __len__(self) -> int:
+        return len(self.index) - len(self._removed) + len(self._added)
+
+    def summaries(self) -> Iterator[Tuple[str, spack.database_index.RecordSummary]]:
+        """Yields the attributes used to select records in queries. Records that have not been
+        decoded are summarized from the binary index, without decoding them.
+        """
+        for i, key in enumerate(self.index.hashes()):
+            if key in self._removed:
+                continue
+            record = self._decoded.get(key)
+            yield key, _summary(record) if record else self.index.summary(i)
+        for key in list(self._added):
+            yield key, _summary(self._decoded[key])
+
+    def to_dicts(self, include_fields=DEFAULT_INSTALL_RECORD_FIELDS) -> Dict[str, dict]:
+        """Returns the install records in the same form as in the JSON index. Records that
+        have not been decoded are taken from the binary index as they are.
+        """
+        result = {}
+        for key in list(self):
+            if key in self._decoded:
+                result[key] = self._decoded[key].to_dict(include_fields=include_fields)
+            else:
+                result[key] = self.index.install_record_dict(self.index.find(key))
+        return result
+
+
+def _summary(record: InstallRecord) -> spack.database_index.RecordSummary:
+    return spack.database_index.RecordSummary(
+        name=record.spec.name,
+        namespace=record.spec.namespace,
+        installed=record.installed,
+        explicit=record.explicit,
+        deprecated=bool(record.deprecated_for),
+        installation_time=record.installation_time,
+        external=record.spec.external,
+        in_buildcache=record.in_buildcache,
+    )
+
+
+def _timestamp(date: Optional[datetime.datetime]) -> Optional[float]:
+    if date is None:
+        return None
+    try:
+        return date.timestamp()
+    except (OverflowError, ValueError, OSError):
+        # Dates too far in the past or in the future don't restrict the selection
+        return None
+
+
+class QueryIndex:
+    """Secondary indexes on the install records of a database, used to select the candidates
+    of a query before comparing specs.
+
+    The indexes are built from the attributes of the records at a given time, and must be
+    rebuilt when records are added, removed, or modified.
+    """
+
+    def __init__(
+        self, summaries: Iterable[Tuple[str, spack.database_index.RecordSummary]]
+    ) -> None:
+        #: Position of each record, to return candidates in a stable order
+        self.order: Dict[str, int] = {}
+        self.by_name: Dict[str, List[str]] = collections.defaultdict(list)
+        self.by_namespace: Dict[Optional[str], Set[str]] = collections.defaultdict(set)
+        self.by_status: Dict[str, Set[str]] = {
+            InstallStatuses.INSTALLED: set(),
+            InstallStatuses.DEPRECATED: set(),
+            InstallStatuses.MISSING: set(),
+        }
+        self.by_explicit: Dict[bool, Set[str]] = {True: set(), False: set()}
+        by_time = []
+
+        for i, (key, summary) in enumerate(summaries):
+            self.order[key] = i
+            self.by_name[summary.name].append(key)
+            self.by_namespace[summary.namespace].add(key)
+            if summary.installed:
+                self.by_status[InstallStatuses.INSTALLED].add(key)
+            elif summary.deprecated:
+                self.by_status[InstallStatuses.DEPRECATED].add(key)
+            else:
+                self.by_status[InstallStatuses.MISSING].add(key)
+            self.by_explicit[bool(summary.explicit)].add(key)
+            by_time.append((summary.installation_time, key))
+
+        by_time.sort()
+        self._times = [t for t, _ in by_time]
+        self._by_time = [key for _, key in by_time]
+
+    def candidates(
+        self,
+        *,
+        name: Optional[str] = None,
+        namespace: Optional[str] = None,
+        installed: Union[bool, InstallStatus, List[InstallStatus]] = True,
+        explicit: Optional[bool] = None,
+        start_date: Optional[datetime.datetime] = None,
+        end_date: Optional[datetime.datetime] = None,
+    ) -> List[str]:
+        """Returns the keys of the records which may match a query, in the order the records
+        were indexed. Records are selected by:
+
+        Args:
+            name: exact name of the spec
+            namespace: namespace of the spec. Records without a namespace are also selected.
+            installed: install status, with the same semantics as in ``Database.query``
+            explicit: whether the spec was installed explicitly. None selects both.
+            start_date: records installed at or after this date
+            end_date: records installed at or before this date
+        """
+        selections: List[Collection[str]] = []
+        if name is not None:
+            selections.append(self.by_name.get(name, []))
+
+        if namespace is not None:
+            selections.append(
+                self.by_namespace.get(namespace, set()) | self.by_namespace.get(None, set())
+            )
+
+        statuses = set(InstallStatuses.canonicalize(installed))
+        if len(statuses) < len(self.by_status):
+            selections.append(set().union(*(self.by_status[x] for x in statuses)))
+
+        if explicit is not None:
+            selections.append(self.by_explicit[bool(explicit)])
+
+        start, end = _timestamp(start_date), _timestamp(end_date)
+        if start is not None or end is not None:
+            lo = bisect.bisect_left(self._times, start) if start is not None else 0
+            hi = bisect.bisect_right(self._times, end) if end is not None else None
+            selections.append(set(self._by_time[lo:hi]))
+
+        if not selections:
+            return list(self.order)
+
+        smallest, *others = sorted(selections, key=len)
+        result = [key for key in smallest if all(key in other for other in others)]
+        result.sort(key=self.order.__getitem__)
+        return result
+
+
 class ForbiddenLockError(SpackError):
     """Raised when an upstream DB attempts to acquire a lock"""
 
@@ -571,6 +842,8 @@ def __init__(
         is_upstream: bool = False,
         lock_cfg: LockConfiguration = DEFAULT_LOCK_CFG,
         layout: Optional[DirectoryLayout] = None,
+        binary_index: bool = False,
+        journal: bool = False,
     ) -> None:
         """Database for Spack installations.
 
@@ -590,6 +863,11 @@ def __init__(
             is_upstream: whether this repository is an upstream.
             lock_cfg: configuration for the locks to be used by this repository.
                 Relevant only if the repository is not an upstream.
+            binary_index: whether to also write a binary index, which is read lazily.
+                An up-to-date binary index is used, if present, regardless of this option.
+            journal: whether to append the changes made by write transactions to a journal,
+                instead of rewriting the index every time. An up-to-date journal is replayed,
+                if present, regardless of this option.
         """
         self.root = root
         self.database_directory = os.path.join(self.root, _DB_DIRNAME)
@@ -597,6 +875,8 @@ def __init__(
 
         # Set up layout of database files within the db dir
         self._index_path = os.path.join(self.database_directory, "index.json")
+        self._binary_index_path = os.path.join(self.database_directory, "index.bin")
+        self._journal_path = os.path.join(self.database_directory, "journal")
         self._verifier_path = os.path.join(self.database_directory, "index_verifier")
         self._lock_path = os.path.join(self.database_directory, "lock")
 
@@ -605,6 +885,8 @@ def __init__(
             fs.mkdirp(self.database_directory)
 
         self.is_upstream = is_upstream
+        self.binary_index = binary_index
+        self.journal = journal
         self.last_seen_verifier = ""
         # Failed write transactions (interrupted by exceptions) will alert
         # _write. When that happens, we set this flag to indicate that
@@ -629,7 +911,17 @@ def __init__(
                 desc="database",
                 enable=lock_cfg.enable,
             )
-        self._data: Dict[str, InstallRecord] = {}
+        self._data: MutableMapping[str, InstallRecord] = {}
+        # Secondary indexes on self._data, built when needed by queries
+        self._query_index: Optional[QueryIndex] = None
+
+        # Keys of the records changed since the last write to disk
+        self._changed: Set[str] = set()
+        # Fingerprint and digest of the index that was read, and offset in the journal up to
+        # which changes were replayed. If the offset is None, the next write rewrites the index.
+        self._index_fingerprint: Optional[spack.database_index.Fingerprint] = None
+        self._index_digest: Optional[str] = None
+        self._journal_offset: Optional[int] = None
 
         # For every installed spec we keep track of its install prefix, so that
         # we can answer the simple query whether a given path is already taken
@@ -649,16 +941,23 @@ def read_transaction(self):
         """Get a read lock context manager for use in a `with` block."""
         return self._read_transaction_impl(self.lock, acquire=self._read)
 
-    def _write_to_file(self, stream):
+    def _installs_dict(self) -> Dict[str, dict]:
+        """Returns a map from DAG hashes to install records, as stored in the JSON index"""
+        if isinstance(self._data, LazyInstallRecords):
+            return self._data.to_dicts(include_fields=self.record_fields)
+        return dict(
+            (k, v.to_dict(include_fields=self.record_fields)) for k, v in self._data.items()
+        )
+
+    def _write_to_file(self, stream, installs: Optional[Dict[str, dict]] = None):
         """Write out the database in JSON format to the stream passed
         as argument.
 
         This function does not do any locking or transactions.
         """
         # map from per-spec hash code to installation record.
-        installs = dict(
-            (k, v.to_dict(include_fields=self.record_fields)) for k, v in self._data.items()
-        )
+        if installs is None:
+            installs = self._installs_dict()
 
         # database includes installation list and version.
 
@@ -876,7 +1175,151 @@ def invalid_record(hash_key, error):
 
         self._data = data
         self._installed_prefixes = installed_prefixes
+        self._query_index = None
+        if version != _DB_VERSION:
+            # Write the index in the new format as soon as possible
+            self._journal_offset = None
 
+    def _read_from_binary_index(self) -> bool:
+        """Fill database from the binary index, if it is up-to-date with the JSON index.
+        Records are decoded lazily. Return True if the binary index was used.
+
+        Does not do any locking.
+        """
+        if self.record_fields != DEFAULT_INSTALL_RECORD_FIELDS:
+            return False
+
+        try:
+            index = spack.database_index.BinaryIndex.open(self._binary_index_path)
+            current = spack.database_index.Fingerprint.of(self._index_path)
+        except FileNotFoundError:
+            return False
+        except (OSError, spack.database_index.BinaryIndexError) as e:
+            tty.debug(f"Cannot read the binary database index: {e}")
+            return False
+
+        if index.fingerprint != current or vn.Version(index.db_version) != _DB_VERSION:
+            return False
+
+        self._data = LazyInstallRecords(
+            index, reader(_DB_VERSION), self._binary_index_path, self.upstream_dbs
+        )
+        self._installed_prefixes = index.installed_prefixes()
+        self._query_index = None
+        return True
+
+    def _read_index(self) -> None:
+        """Fill database from its index, preferring the binary index if up-to-date, then
+        replay the journal. If the index didn't change since it was last read, only the new
+        entries of the journal are replayed.
+        """
+        fingerprint = spack.database_index.Fingerprint.of(self._index_path)
+        if fingerprint == self._index_fingerprint and self._journal_offset is not None:
+            if self._replay_journal(self._journal_offset):
+                return
+
+        self._changed.clear()
+        self._index_fingerprint = fingerprint
+        self._index_digest = None
+        self._journal_offset = 0
+        if not self._read_from_binary_index():
+            self._read_from_file(self._index_path)
+
+        replayed = False
+        if os.path.exists(self._journal_path):
+            self._index_digest = spack.database_journal.digest(self._index_path)
+            replayed = self._replay_journal(0)
+        if not replayed and self._journal_offset == 0:
+            self._journal_offset = None
+
+    def _replay_journal(self, offset: int) -> bool:
+        """Apply the changes in the journal to the records in memory, starting at a given
+        offset. Return False if there is no journal for the index that was read.
+
+        Does not do any locking.
+        """
+        if self._index_digest is None:
+            return False
+
+        try:
+            result = spack.database_journal.read(self._journal_path, self._index_digest, offset)
+        except spack.database_journal.JournalError as e:
+            raise CorruptDatabaseError("error reading database journal:", str(e)) from e
+
+        if result is None:
+            return False
+
+        entries, offset = result
+        spec_reader = reader(_DB_VERSION)
+        for entry in entries:
+            self._apply_journal_entry(spec_reader, entry)
+        if entries:
+            self._query_index = None
+        if self._journal_offset is not None:
+            self._journal_offset = offset
+        return True
+
+    def _apply_journal_entry(
+        self,
+        spec_reader: Type["spack.spec.SpecfileReaderBase"],
+        entry: spack.database_journal.Entry,
+    ) -> None:
+        """Apply the changes of a single write transaction to the records in memory."""
+        for key in entry.remove:
+            rec = self._data.get(key)
+            if rec is None:
+                continue
+            del self._data[key]
+            if not rec.spec.external and rec.installed and rec.path:
+                self._installed_prefixes.discard(rec.path)
+            rec.spec.detach(deptype=_TRACKED_DEPENDENCIES)
+
+        new_keys = []
+        for key, rec_dict in entry.upsert.items():
+            try:
+                if key in self._data:
+                    # Other specs may share the node, so update the record in place
+                    rec = self._data[key]
+                    updated = InstallRecord.from_dict(rec.spec, rec_dict)
+                    if not rec.spec.external and rec.installed and rec.path:
+                        self._installed_prefixes.discard(rec.path)
+                    rec.__dict__.update(updated.__dict__)
+                else:
+                    spec = self._read_spec_from_dict(spec_reader, key, entry.upsert)
+                    rec = InstallRecord.from_dict(spec, rec_dict)
+                    self._data[key] = rec
+                    new_keys.append(key)
+            except Exception as e:
+                raise CorruptDatabaseError(
+                    f"Invalid record in Spack database journal: hash: {key}, cause: "
+                    f"{type(e).__name__}: {e}",
+                    self._journal_path,
+                ) from e
+
+            if not rec.spec.external and rec.installed and rec.path:
+                self._installed_prefixes.add(rec.path)
+
+        for key in new_keys:
+            self._assign_dependencies(spec_reader, key, entry.upsert, self._data)
+        for key in new_keys:
+            self._data[key].spec._mark_root_concrete()
+
+    def _write_binary_index(self, installs: Dict[str, dict]) -> None:
+        """Write the binary index, derived from the JSON index just written. Failures are
+        not fatal, since the JSON index is the authoritative source.
+        """
+        temp_file = self._binary_index_path + (".%s.%s.temp" % (_getfqdn(), os.getpid()))
+        try:
+            fingerprint = spack.database_index.Fingerprint.of(self._index_path)
+            with open(temp_file, "wb") as f:
+                spack.database_index.write(f, installs, str(_DB_VERSION), fingerprint)
+            fs.rename(temp_file, self._binary_index_path)
+        except OSError as e:
+            tty.debug(f"Cannot write the binary database index: {e}")
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+    @_invalidates_query_index
     def reindex(self):
         """Build database index from scratch based on a directory layout.
 
@@ -890,13 +1333,15 @@ def reindex(self):
         def _read_suppress_error():
             try:
                 if os.path.isfile(self._index_path):
-                    self._read_from_file(self._index_path)
+                    self._read_index()
             except CorruptDatabaseError as e:
                 tty.warn(f"Reindexing corrupt database, error was: {e}")
                 self._data = {}
                 self._installed_prefixes = set()
 
         with lk.WriteTransaction(self.lock, acquire=_read_suppress_error, release=self._write):
+            # The index is rewritten from scratch
+            self._journal_offset = None
             old_installed_prefixes, self._installed_prefixes = self._installed_prefixes, set()
             old_data, self._data = self._data, {}
             try:
@@ -907,7 +1352,7 @@ def _read_suppress_error():
                 self._installed_prefixes = old_installed_prefixes
                 raise
 
-    def _reindex(self, old_data: Dict[str, InstallRecord]):
+    def _reindex(self, old_data: MutableMapping[str, InstallRecord]):
         # Specs on the file system are the source of truth for record.spec. The old database values
         # if available are the source of truth for the rest of the record.
         assert self.layout, "Database layout must be set to reindex"
@@ -1049,21 +1494,39 @@ def _write(self, type, value, traceback):
             # the Database is now in an inconsistent state: we should
             # restore it in the next transaction
             self._state_is_inconsistent = True
+            self._changed.clear()
+            self._journal_offset = None
+            return
+
+        if self.journal and self._journal_offset is not None and not self._journal_is_full():
+            self._append_to_journal()
             return
 
         temp_file = self._index_path + (".%s.%s.temp" % (_getfqdn(), os.getpid()))
 
         # Write a temporary database file them move it into place
         try:
+            installs = self._installs_dict()
             with open(temp_file, "w") as f:
-                self._write_to_file(f)
+                self._write_to_file(f, installs=installs)
             fs.rename(temp_file, self._index_path)
+            self._changed.clear()
+            self._index_fingerprint = spack.database_index.Fingerprint.of(self._index_path)
 
-            if _use_uuid:
-                with open(self._verifier_path, "w") as f:
-                    new_verifier = str(uuid.uuid4())
-                    f.write(new_verifier)
-                    self.last_seen_verifier = new_verifier
+            if self.binary_index:
+                self._write_binary_index(installs)
+
+            if self.journal:
+                self._index_digest = spack.database_journal.digest(self._index_path)
+                self._journal_offset = spack.database_journal.create(
+                    self._journal_path, self._index_digest
+                )
+            else:
+                self._journal_offset = None
+                if os.path.exists(self._journal_path):
+                    os.remove(self._journal_path)
+
+            self._write_verifier()
         except BaseException as e:
             tty.debug(e)
             # Clean up temp file if something goes wrong.
@@ -1071,6 +1534,48 @@ def _write(self, type, value, traceback):
                 os.remove(temp_file)
             raise
 
+    def _write_verifier(self) -> None:
+        if _use_uuid:
+            with open(self._verifier_path, "w") as f:
+                new_verifier = str(uuid.uuid4())
+                f.write(new_verifier)
+                self.last_seen_verifier = new_verifier
+
+    def _journal_is_full(self) -> bool:
+        """Whether the journal is large enough to be compacted into the index"""
+        try:
+            journal_size = os.path.getsize(self._journal_path)
+            index_size = os.path.getsize(self._index_path)
+        except OSError:
+            return True
+        limit = max(_JOURNAL_COMPACTION_MIN_SIZE, index_size * _JOURNAL_COMPACTION_RATIO)
+        return journal_size > limit
+
+    def _append_to_journal(self) -> None:
+        """Append the records changed by the current write transaction to the journal."""
+        assert self._journal_offset is not None
+        if not self._changed:
+            return
+
+        upsert, remove = {}, []
+        for key in sorted(self._changed):
+            if key in self._data:
+                upsert[key] = self._data[key].to_dict(include_fields=self.record_fields)
+            else:
+                remove.append(key)
+        self._changed.clear()
+
+        entry = spack.database_journal.Entry(upsert=upsert, remove=remove)
+        try:
+            self._journal_offset = spack.database_journal.append(
+                self._journal_path, self._journal_offset, entry
+            )
+        except BaseException:
+            # The journal may have been partially written: rewrite the index next time
+            self._journal_offset = None
+            raise
+        self._write_verifier()
+
     def _read(self):
         """Re-read Database from the data in the set location. This does no locking."""
         if os.path.isfile(self._index_path):
@@ -1084,14 +1589,15 @@ def _read(self):
             if (current_verifier != self.last_seen_verifier) or (current_verifier == ""):
                 self.last_seen_verifier = current_verifier
                 # Read from file if a database exists
-                self._read_from_file(self._index_path)
+                self._read_index()
             elif self._state_is_inconsistent:
-                self._read_from_file(self._index_path)
+                self._read_index()
                 self._state_is_inconsistent = False
             return
         elif self.is_upstream:
             tty.warn("upstream not found: {0}".format(self._index_path))
 
+    @_invalidates_query_index
     def _add(
         self,
         spec: "spack.spec.Spec",
@@ -1185,6 +1691,7 @@ def _add(
                 new_spec._add_dependency(record.spec, depflag=dep.depflag, virtuals=dep.virtuals)
                 if not upstream:
                     record.ref_count += 1
+                    self._changed.add(dkey)
 
             # Mark concrete once everything is built, and preserve the original hashes of concrete
             # specs.
@@ -1198,6 +1705,7 @@ def _add(
             self._data[key].installation_time = _now()
 
         self._data[key].explicit = explicit
+        self._changed.add(key)
 
     @_autospec
     def add(self, spec: "spack.spec.Spec", *, explicit: bool = False, allow_missing=False) -> None:
@@ -1238,6 +1746,7 @@ def _decrement_ref_count(self, spec: "spack.spec.Spec") -> None:
 
         rec = self._data[key]
         rec.ref_count -= 1
+        self._changed.add(key)
 
         if rec.ref_count == 0 and not rec.installed:
             del self._data[key]
@@ -1253,11 +1762,14 @@ def _increment_ref_count(self, spec: "spack.spec.Spec") -> None:
 
         rec = self._data[key]
         rec.ref_count += 1
+        self._changed.add(key)
 
+    @_invalidates_query_index
     def _remove(self, spec: "spack.spec.Spec") -> "spack.spec.Spec":
         """Non-locking version of remove(); does real work."""
         key = self._get_matching_spec_key(spec)
         rec = self._data[key]
+        self._changed.add(key)
 
         # This install prefix is now free for other specs to use, even if the
         # spec is only marked uninstalled.
@@ -1318,6 +1830,7 @@ def specs_deprecated_by(self, spec: "spack.spec.Spec") -> List["spack.spec.Spec"
                 rec.spec for rec in self._data.values() if rec.deprecated_for == spec.dag_hash()
             ]
 
+    @_invalidates_query_index
     def _deprecate(self, spec: "spack.spec.Spec", deprecator: "spack.spec.Spec") -> None:
         spec_key = self._get_matching_spec_key(spec)
         spec_rec = self._data[spec_key]
@@ -1334,6 +1847,7 @@ def _deprecate(self, spec: "spack.spec.Spec", deprecator: "spack.spec.Spec") ->
         spec_rec.deprecated_for = deprecator_key
         spec_rec.installed = False
         self._data[spec_key] = spec_rec
+        self._changed.add(spec_key)
 
     @_autospec
     def mark(self, spec: "spack.spec.Spec", key, value) -> None:
@@ -1341,9 +1855,12 @@ def mark(self, spec: "spack.spec.Spec", key, value) -> None:
         with self.write_transaction():
             return self._mark(spec, key, value)
 
+    @_invalidates_query_index
     def _mark(self, spec: "spack.spec.Spec", key, value) -> None:
-        record = self._data[self._get_matching_spec_key(spec)]
+        spec_key = self._get_matching_spec_key(spec)
+        record = self._data[spec_key]
         setattr(record, key, value)
+        self._changed.add(spec_key)
 
     @_autospec
     def deprecate(self, spec: "spack.spec.Spec", deprecator: "spack.spec.Spec") -> None:
@@ -1407,11 +1924,8 @@ def _get_by_hash_local(self, dag_hash, default=None, installed=any):
 
         # check if hash is a prefix of some installed (or previously
         # installed) spec.
-        matches = [
-            record.spec
-            for h, record in self._data.items()
-            if h.startswith(dag_hash) and record.install_type_matches(installed)
-        ]
+        records = [self._data[h] for h in self._data if h.startswith(dag_hash)]
+        matches = [record.spec for record in records if record.install_type_matches(installed)]
         if matches:
             return matches
 
@@ -1478,6 +1992,16 @@ def get_by_hash(self, dag_hash, default=None, installed=any):
 
         return default
 
+    def _get_query_index(self) -> QueryIndex:
+        """Returns the secondary indexes on the install records, building them if needed"""
+        if self._query_index is None:
+            if isinstance(self._data, LazyInstallRecords):
+                summaries = self._data.summaries()
+            else:
+                summaries = ((key, _summary(rec)) for key, rec in self._data.items())
+            self._query_index = QueryIndex(summaries)
+        return self._query_index
+
     def _query(
         self,
         query_spec: Optional[Union[str, "spack.spec.Spec"]] = None,
@@ -1492,46 +2016,59 @@ def _query(
         origin: Optional[str] = None,
     ) -> List["spack.spec.Spec"]:
 
-        # Restrict the set of records over which we iterate first
-        matching_hashes = self._data
-        if hashes is not None:
-            matching_hashes = {h: self._data[h] for h in hashes if h in self._data}
-
         if isinstance(query_spec, str):
             query_spec = spack.spec.Spec(query_spec)
 
+        # Restrict the set of records over which we iterate first
+        index = None
         if query_spec is not None and query_spec.concrete:
             hash_key = query_spec.dag_hash()
-            if hash_key not in matching_hashes:
-                return []
-            matching_hashes = {hash_key: matching_hashes[hash_key]}
-
-        results = []
-        start_date = start_date or datetime.datetime.min
-        end_date = end_date or datetime.datetime.max
+            restricted = hashes is None or hash_key in set(hashes)
+            candidates = [hash_key] if restricted and hash_key in self._data else []
+        elif hashes is not None:
+            candidates = [h for h in hashes if h in self._data]
+        else:
+            index = self._get_query_index()
+            candidates = index.candidates(
+                name=query_spec.name if query_spec is not None else None,
+                namespace=query_spec.namespace if query_spec is not None else None,
+                installed=installed,
+                explicit=explicit,
+                start_date=start_date,
+                end_date=end_date,
+            )
 
-        deferred = []
-        for rec in matching_hashes.values():
-            if origin and not (origin == rec.origin):
-                continue
+        start = start_date or datetime.datetime.min
+        end = end_date or datetime.datetime.max
 
-            if not rec.install_type_matches(installed):
-                continue
+        def _records(keys: Iterable[str]) -> Iterator[InstallRecord]:
+            for key in keys:
+                rec = self._data[key]
+                if origin and not (origin == rec.origin):
+                    continue
 
-            if in_buildcache is not None and rec.in_buildcache != in_buildcache:
-                continue
+                if not rec.install_type_matches(installed):
+                    continue
 
-            if explicit is not None and rec.explicit != explicit:
-                continue
+                if in_buildcache is not None and rec.in_buildcache != in_buildcache:
+                    continue
 
-            if predicate_fn is not None and not predicate_fn(rec):
-                continue
+                if explicit is not None and rec.explicit != explicit:
+                    continue
 
-            if start_date or end_date:
-                inst_date = datetime.datetime.fromtimestamp(rec.installation_time)
-                if not (start_date < inst_date < end_date):
+                if predicate_fn is not None and not predicate_fn(rec):
                     continue
 
+                if start or end:
+                    inst_date = datetime.datetime.fromtimestamp(rec.installation_time)
+                    if not (start < inst_date < end):
+                        continue
+
+                yield rec
+
+        results = []
+        deferred = []
+        for rec in _records(candidates):
             if query_spec is None or query_spec.concrete:
                 results.append(rec.spec)
                 continue
@@ -1550,7 +2087,21 @@ def _query(
         # If we did fine something, the query spec can't be virtual b/c we matched an actual
         # package installation, so skip the virtual check entirely. If we *didn't* find anything,
         # check all the deferred specs *if* the query is virtual.
-        if not results and query_spec is not None and deferred and query_spec.virtual:
+        if results or query_spec is None or not query_spec.name:
+            return results
+
+        if index is not None:
+            # Candidates were selected by name, so deferred specs must be computed now
+            if not query_spec.virtual:
+                return results
+            candidates = index.candidates(
+                installed=installed, explicit=explicit, start_date=start_date, end_date=end_date
+            )
+            deferred = [
+                rec.spec for rec in _records(candidates) if rec.spec.name != query_spec.name
+            ]
+
+        if deferred and query_spec.virtual:
             results = [spec for spec in deferred if spec.satisfies(query_spec)]
 
         return results
@@ -1771,6 +2322,7 @@ def root(key, record):
                 if id(rec.spec) not in needed and rec.installed
             ]
 
+    @_invalidates_query_index
     def update_explicit(self, spec, explicit):
         """
         Update the spec's explicit state in the database.
@@ -1788,6 +2340,7 @@ def update_explicit(self, spec, explicit):
                 status = "explicit" if explicit else "implicit"
                 tty.debug(message.format(status, s=spec))
                 rec.explicit = explicit
+                self._changed.add(rec.spec.dag_hash())
 
 
 class NoUpstreamVisitor:
@@ -0,0 +1,351 @@
+# Copyright 2013-2024 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Binary format for the index of an install database.
+
+The JSON index of a database must be parsed in full, and every spec in it must be rebuilt,
+before a single query can be answered. The binary index is written alongside the JSON index,
+and can be read without decoding anything but the records that are accessed. It is made of:
+
+  1. A header, with the version of the format and of the database, and the fingerprint of
+     the JSON index it was derived from.
+  2. A table of fixed size records, sorted by DAG hash, so that records can be found with a
+     binary search. Each entry also has the attributes needed to select records in queries,
+     i.e. name, namespace, install status, installation time, and whether the record is in a
+     buildcache, for the indices of buildcaches.
+  3. A table of fixed size edges, with the dependencies of each record.
+  4. A heap with variable length data, i.e. the payload of each record as compact JSON,
+     install prefixes, names and namespaces, and the names and virtuals of dependencies.
+
+The JSON index remains the authoritative source. If it is modified by other means, e.g. by a
+Spack version which doesn't write the binary index, the fingerprint doesn't match anymore and
+the binary index is ignored.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+import spack.deptypes as dt
+import spack.hash_types as ht
+from spack.error import SpackError
+
+#: Magic bytes at the start of a binary index
+MAGIC = b"SPACKDBX"
+
+#: Version of the binary format. Bump this when the layout of the file changes.
+FORMAT_VERSION = 3
+
+#: Length of a DAG hash, in bytes
+HASH_LENGTH = 32
+
+#: magic, format version, database version, inode, size and mtime of the JSON index,
+#: number of records, number of edges, offset of the records, edges and heap
+_HEADER = struct.Struct("<8sI16sQQQIIQQQ")
+
+#: See _Record for the fields of each entry
+_RECORD = struct.Struct("<32sQIQIIIBdQI")
+
+#: DAG hash of the child, dependency flag, offset and length of "name:virtual1,virtual2,..."
+_EDGE = struct.Struct("<32sBQI")
+
+#: Flags of a record
+_INSTALLED, _EXTERNAL, _EXPLICIT, _DEPRECATED, _IN_BUILDCACHE = 1, 2, 4, 8, 16
+
+
+class _Record(NamedTuple):
+    dag_hash: bytes
+    payload_offset: int
+    payload_length: int
+    path_offset: int
+    path_length: int
+    first_edge: int
+    n_edges: int
+    flags: int
+    installation_time: float
+    #: "namespace.name" of the spec
+    label_offset: int
+    label_length: int
+
+
+class Fingerprint(NamedTuple):
+    """Identifies a version of the JSON index a binary index was derived from"""
+
+    inode: int
+    size: int
+    mtime_ns: int
+
+    @staticmethod
+    def of(path: str) -> "Fingerprint":
+        st = os.stat(path)
+        return Fingerprint(st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class RecordSummary(NamedTuple):
+    """Attributes of an install record, used to select records in queries"""
+
+    name: str
+    namespace: Optional[str]
+    installed: bool
+    explicit: bool
+    deprecated: bool
+    installation_time: float
+    external: bool
+    in_buildcache: bool
+
+
+class Edge(NamedTuple):
+    """A dependency of a record in the binary index"""
+
+    dag_hash: str
+    name: str
+    depflag: dt.DepFlag
+    virtuals: Tuple[str, ...]
+
+
+def write(
+    stream, installs: Dict[str, Dict[str, Any]], db_version: str, fingerprint: Fingerprint
+) -> None:
+    """Writes a binary index to a stream opened in binary mode.
+
+    Args:
+        stream: output stream
+        installs: install records, as in the "installs" attribute of the JSON index
+        db_version: version of the database the records are taken from
+        fingerprint: fingerprint of the JSON index containing the same records
+    """
+    heap = bytearray()
+
+    def _store(data: bytes) -> Tuple[int, int]:
+        offset = len(heap)
+        heap.extend(data)
+        return offset, len(data)
+
+    records, edges = [], []
+    for dag_hash in sorted(installs):
+        rec = dict(installs[dag_hash])
+        spec = dict(rec["spec"])
+        spec.pop(ht.dag_hash.name, None)
+        first_edge = len(edges)
+        for dep in spec.pop("dependencies", ()):
+            parameters = dep["parameters"]
+            label = f"{dep['name']}:{','.join(parameters['virtuals'])}"
+            edges.append(
+                (
+                    dep[ht.dag_hash.name].encode(),
+                    dt.canonicalize(parameters["deptypes"]),
+                    *_store(label.encode()),
+                )
+            )
+        rec["spec"] = spec
+
+        flags = 0
+        if rec.get("installed"):
+            flags |= _INSTALLED
+        if spec.get("external"):
+            flags |= _EXTERNAL
+        if rec.get("explicit"):
+            flags |= _EXPLICIT
+        if rec.get("deprecated_for"):
+            flags |= _DEPRECATED
+        if rec.get("in_buildcache"):
+            flags |= _IN_BUILDCACHE
+        path = (rec.get("path") or "").encode()
+        label = f"{spec.get('namespace') or ''}.{spec['name']}".encode()
+        payload = json.dumps(rec, separators=(",", ":")).encode()
+        records.append(
+            _Record(
+                dag_hash.encode(),
+                *_store(payload),
+                *_store(path),
+                first_edge,
+                len(edges) - first_edge,
+                flags,
+                rec.get("installation_time") or 0.0,
+                *_store(label),
+            )
+        )
+
+    records_offset = _HEADER.size
+    edges_offset = records_offset + len(records) * _RECORD.size
+    heap_offset = edges_offset + len(edges) * _EDGE.size
+    stream.write(
+        _HEADER.pack(
+            MAGIC,
+            FORMAT_VERSION,
+            db_version.encode(),
+            *fingerprint,
+            len(records),
+            len(edges),
+            records_offset,
+            edges_offset,
+            heap_offset,
+        )
+    )
+    for record in records:
+        stream.write(_RECORD.pack(*record))
+    for edge in edges:
+        stream.write(_EDGE.pack(*edge))
+    stream.write(heap)
+
+
+class BinaryIndex:
+    """Read-only view of a binary index. Nothing is decoded until it is accessed."""
+
+    def __init__(self, buffer) -> None:
+        self._buffer = buffer
+        try:
+            header = _HEADER.unpack_from(buffer, 0)
+        except struct.error as e:
+            raise BinaryIndexError(f"truncated header: {e}") from e
+
+        magic, version, db_version, *fingerprint, n_records, n_edges = header[:8]
+        self._records_offset, self._edges_offset, self._heap_offset = header[8:]
+        if magic != MAGIC:
+            raise BinaryIndexError("not a binary database index")
+        if version != FORMAT_VERSION:
+            raise BinaryIndexError(f"unsupported format version {version}")
+        if len(buffer) < self._heap_offset:
+            raise BinaryIndexError("truncated file")
+
+        #: Version of the database the records are taken from
+        self.db_version: str = db_version.rstrip(b"\0").decode()
+        #: Fingerprint of the JSON index this index was derived from
+        self.fingerprint = Fingerprint(*fingerprint)
+        self._n_records = n_records
+        self._n_edges = n_edges
+
+    @staticmethod
+    def open(path: str) -> "BinaryIndex":
+        """Opens a binary index. The file is mapped in memory, where possible."""
+        with open(path, "rb") as f:
+            # Files mapped in memory can't be replaced on Windows
+            if sys.platform == "win32":
+                return BinaryIndex(f.read())
+            try:
+                return BinaryIndex(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            except ValueError as e:  # the file is empty
+                raise BinaryIndexError(str(e)) from e
+
+    def __len__(self) -> int:
+        return self._n_records
+
+    def _hash_at(self, i: int) -> bytes:
+        offset = self._records_offset + i * _RECORD.size
+        return self._buffer[offset : offset + HASH_LENGTH]
+
+    def _heap(self, offset: int, length: int) -> bytes:
+        start = self._heap_offset + offset
+        return self._buffer[start : start + length]
+
+    def hashes(self) -> Iterator[str]:
+        """Iterates over the DAG hashes of the records, in sorted order"""
+        for i in range(self._n_records):
+            yield self._hash_at(i).decode()
+
+    def find(self, dag_hash: str) -> int:
+        """Returns the position of the record with the DAG hash passed as input, or -1 if
+        there is no such record.
+        """
+        key = dag_hash.encode()
+        lo, hi = 0, self._n_records
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._hash_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._n_records and self._hash_at(lo) == key:
+            return lo
+        return -1
+
+    def _record(self, i: int) -> _Record:
+        return _Record._make(
+            _RECORD.unpack_from(self._buffer, self._records_offset + i * _RECORD.size)
+        )
+
+    def record(self, i: int) -> Dict[str, Any]:
+        """Returns the install record at a given position, without dependencies, and with the
+        DAG hash in the node dict of the spec.
+        """
+        entry = self._record(i)
+        rec = json.loads(self._heap(entry.payload_offset, entry.payload_length))
+        rec["spec"][ht.dag_hash.name] = entry.dag_hash.decode()
+        return rec
+
+    def summary(self, i: int) -> RecordSummary:
+        """Returns the attributes used to select the record at a given position in queries,
+        without decoding its payload.
+        """
+        entry = self._record(i)
+        label = self._heap(entry.label_offset, entry.label_length).decode()
+        namespace, name = label.rsplit(".", 1)
+        return RecordSummary(
+            name=name,
+            namespace=namespace or None,
+            installed=bool(entry.flags & _INSTALLED),
+            explicit=bool(entry.flags & _EXPLICIT),
+            deprecated=bool(entry.flags & _DEPRECATED),
+            installation_time=entry.installation_time,
+            external=bool(entry.flags & _EXTERNAL),
+            in_buildcache=bool(entry.flags & _IN_BUILDCACHE),
+        )
+
+    def edges(self, i: int) -> List[Edge]:
+        """Returns the dependencies of the record at a given position"""
+        entry = self._record(i)
+        result = []
+        for j in range(entry.first_edge, entry.first_edge + entry.n_edges):
+            dag_hash, depflag, offset, length = _EDGE.unpack_from(
+                self._buffer, self._edges_offset + j * _EDGE.size
+            )
+            name, virtuals = self._heap(offset, length).decode().split(":", 1)
+            result.append(
+                Edge(
+                    dag_hash.decode(),
+                    name,
+                    depflag,
+                    tuple(virtuals.split(",") if virtuals else ()),
+                )
+            )
+        return result
+
+    def installed_prefixes(self) -> Set[str]:
+        """Returns the prefixes of all the installed specs that are not external"""
+        result = set()
+        for i in range(self._n_records):
+            entry = self._record(i)
+            if entry.flags & _INSTALLED and not entry.flags & _EXTERNAL:
+                result.add(self._heap(entry.path_offset, entry.path_length).decode())
+        return result
+
+    def install_record_dict(self, i: int) -> Dict[str, Any]:
+        """Returns the install record at a given position, in the same form as in the JSON
+        index.
+        """
+        rec = self.record(i)
+        dependencies = [
+            {
+                "name": edge.name,
+                ht.dag_hash.name: edge.dag_hash,
+                "parameters": {
+                    "deptypes": list(dt.flag_to_tuple(edge.depflag)),
+                    "virtuals": list(edge.virtuals),
+                },
+            }
+            for edge in self.edges(i)
+        ]
+        if dependencies:
+            rec["spec"]["dependencies"] = dependencies
+        return rec
+
+    def installs(self) -> Dict[str, Dict[str, Any]]:
+        """Returns all the install records, in the same form as in the JSON index"""
+        return {dag_hash: self.install_record_dict(i) for i, dag_hash in enumerate(self.hashes())}
+
+
+class BinaryIndexError(SpackError):
+    """Raised when a binary index cannot be read"""
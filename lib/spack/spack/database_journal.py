@@ -0,0 +1,126 @@
+# Copyright 2013-2024 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Append-only journal of the changes to an install database.
+
+Rewriting the entire index of a database at the end of each write transaction makes the cost
+of every install proportional to the size of the store. When the journal is used, a write
+transaction appends the records it modified, and the hashes of the records it removed, to the
+journal instead. The index is rewritten, and the journal emptied, only when the journal grows
+too large compared to the index.
+
+The first line of the journal is a header, with the SHA-256 digest of the index the journal
+applies to. The digest, rather than e.g. the inode and mtime of the index, is used so that
+copies of a store keep their journal, while indexes rewritten by Spack versions which don't
+know about the journal are detected.
+
+Every following line holds the changes of one write transaction::
+
+    {"upsert": {"<dag hash>": <install record>, ...}, "remove": ["<dag hash>", ...]}
+
+A line which is not terminated by a newline was interrupted while being written, and is
+ignored. The next append overwrites it.
+"""
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from llnl.util.filesystem import rename
+
+from spack.error import SpackError
+
+#: Version of the journal format. Bump this when the content of the journal changes.
+JOURNAL_VERSION = 1
+
+
+class Entry(NamedTuple):
+    """Changes made to the database by a single write transaction"""
+
+    #: Install records that were added or modified, by DAG hash
+    upsert: Dict[str, Dict[str, Any]]
+    #: DAG hashes of the install records that were removed
+    remove: List[str]
+
+
+def digest(index_path: str) -> str:
+    """Returns the digest identifying the content of an index"""
+    with open(index_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def create(path: str, index_digest: str) -> int:
+    """Creates an empty journal, applying to the index with the digest passed as input.
+    Returns the offset where the next entry is to be appended.
+    """
+    header = _line({"journal": {"version": JOURNAL_VERSION, "index": index_digest}})
+    temp_file = f"{path}.{os.getpid()}.temp"
+    try:
+        with open(temp_file, "wb") as f:
+            f.write(header)
+        rename(temp_file, path)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+    return len(header)
+
+
+def append(path: str, offset: int, entry: Entry) -> int:
+    """Appends an entry to the journal at the offset passed as input, discarding anything
+    after it. Returns the offset where the next entry is to be appended.
+    """
+    line = _line({"upsert": entry.upsert, "remove": entry.remove})
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        f.write(line)
+        f.truncate()
+    return offset + len(line)
+
+
+def read(path: str, index_digest: str, offset: int = 0) -> Optional[Tuple[List[Entry], int]]:
+    """Reads the entries of a journal, starting at a given offset.
+
+    Returns None if the journal doesn't exist, or doesn't apply to the index with the digest
+    passed as input. Otherwise, returns the entries that were read, and the offset
+    where the next entry is to be appended.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+
+    with f:
+        header = f.readline()
+        try:
+            metadata = json.loads(header)["journal"]
+            if metadata["version"] != JOURNAL_VERSION:
+                return None
+            if metadata["index"] != index_digest:
+                return None
+        except (ValueError, KeyError, TypeError):
+            return None
+
+        offset = max(offset, len(header))
+        f.seek(offset)
+        entries = []
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                data = json.loads(line)
+                entries.append(Entry(upsert=data["upsert"], remove=data["remove"]))
+            except (ValueError, KeyError, TypeError) as e:
+                raise JournalError(f"invalid entry at offset {offset} of {path}: {e}") from e
+            offset += len(line)
+
+    return entries, offset
+
+
+def _line(data: Dict[str, Any]) -> bytes:
+    return (json.dumps(data, separators=(",", ":")) + "\n").encode()
+
+
+class JournalError(SpackError):
+    """Raised when the journal of a database is corrupt"""
@@ -58,7 +58,7 @@
 from spack.util.path import substitute_path_variables
 
 #: environment variable used to indicate the active environment
-spack_env_var = "SPACK_ENV"
+spack_env_var = spack.util.environment.spack_env_var
 
 #: environment variable used to indicate the active environment view
 spack_env_view_var = "SPACK_ENV_VIEW"
@@ -1537,13 +1537,20 @@ def _concretize_together_where_possible(
         self.concretized_order = []
         self.specs_by_hash = {}
 
-        result_by_user_spec = {}
-        solver = spack.solver.asp.Solver()
-        allow_deprecated = spack.config.get("config:deprecated", False)
-        for result in solver.solve_in_rounds(
-            specs_to_concretize, tests=tests, allow_deprecated=allow_deprecated
-        ):
-            result_by_user_spec.update(result.specs_by_input)
+        clusters = [specs_to_concretize]
+        if spack.config.get("concretizer:split_clusters", False):
+            clusters = spack.solver.asp.independent_clusters(specs_to_concretize, tests=tests)
+
+        if len(clusters) > 1:
+            result_by_user_spec = self._concretize_clusters(clusters, tests=tests)
+        else:
+            result_by_user_spec = {}
+            solver = spack.solver.asp.Solver()
+            allow_deprecated = spack.config.get("config:deprecated", False)
+            for result in solver.solve_in_rounds(
+                specs_to_concretize, tests=tests, allow_deprecated=allow_deprecated
+            ):
+                result_by_user_spec.update(result.specs_by_input)
 
         result = []
         for abstract, concrete in sorted(result_by_user_spec.items()):
@@ -1554,6 +1561,54 @@ def _concretize_together_where_possible(
                 result.append((abstract, concrete))
             self._add_concrete_spec(abstract, concrete)
 
+        if len(clusters) > 1:
+            # Clusters are solved in different processes, so nodes they have in common
+            # (e.g. runtimes) are different objects. Unify them.
+            by_hash = {concrete.dag_hash(): concrete for concrete in result_by_user_spec.values()}
+            self._read_lockfile_dict(self._to_lockfile_dict())
+            if tests:
+                self._reattach_test_dependencies(by_hash)
+            result = [(abstract, self.specs_by_hash[c.dag_hash()]) for abstract, c in result]
+
+        return result
+
+    def _concretize_clusters(
+        self, clusters: List[List[spack.spec.Spec]], tests: bool = False
+    ) -> Dict[spack.spec.Spec, spack.spec.Spec]:
+        """Concretizes independent clusters of specs in parallel, each one in rounds, and
+        returns a mapping from the input specs to the corresponding concrete specs.
+        """
+        self._prepare_parallel_concretization()
+
+        start = time.time()
+        num_procs = min(len(clusters), spack.config.determine_number_of_jobs(parallel=True))
+        msg = f"Starting concretization of {len(clusters)} independent clusters"
+        if sys.platform not in ("darwin", "win32") and num_procs > 1:
+            msg += f" with {num_procs} processes"
+        tty.msg(msg)
+
+        allow_deprecated = spack.config.get("config:deprecated", False)
+        args = [(i, cluster, tests, allow_deprecated) for i, cluster in enumerate(clusters)]
+        result: Dict[spack.spec.Spec, spack.spec.Spec] = {}
+        for j, (i, concrete_specs, duration) in enumerate(
+            spack.util.parallel.imap_unordered(
+                _concretize_cluster_task,
+                args,
+                processes=num_procs,
+                debug=tty.is_debug(),
+                maxtaskperchild=1,
+            )
+        ):
+            for k, concrete in concrete_specs:
+                result[clusters[i][k]] = concrete
+            percentage = (j + 1) / len(args) * 100
+            tty.verbose(
+                f"{duration:6.1f}s [{percentage:3.0f}%] cluster of {len(clusters[i])} specs "
+                f"starting with {clusters[i][0].colored_str}"
+            )
+            sys.stdout.flush()
+
+        tty.msg(f"Environment concretized in {time.time() - start:.2f} seconds")
         return result
 
     def _concretize_together(
@@ -1604,8 +1659,6 @@ def _concretize_separately(self, tests=False):
         """Concretization strategy that concretizes separately one
         user spec after the other.
         """
-        import spack.bootstrap
-
         # keep any concretized specs whose user specs are still in the manifest
         old_concretized_user_specs = self.concretized_user_specs
         old_concretized_order = self.concretized_order
@@ -1628,20 +1681,7 @@ def _concretize_separately(self, tests=False):
                 args.append((i, str(uspec), tests))
                 i += 1
 
-        # Ensure we don't try to bootstrap clingo in parallel
-        with spack.bootstrap.ensure_bootstrap_configuration():
-            spack.bootstrap.ensure_clingo_importable_or_raise()
-
-        # Ensure all the indexes have been built or updated, since
-        # otherwise the processes in the pool may timeout on waiting
-        # for a write lock. We do this indirectly by retrieving the
-        # provider index, which should in turn trigger the update of
-        # all the indexes if there's any need for that.
-        _ = spack.repo.PATH.provider_index
-
-        # Ensure we have compilers in compilers.yaml to avoid that
-        # processes try to write the config file in parallel
-        _ = spack.compilers.all_compilers_config(spack.config.CONFIG)
+        self._prepare_parallel_concretization()
 
         # Early return if there is nothing to do
         if len(args) == 0:
@@ -1690,19 +1730,7 @@ def _concretize_separately(self, tests=False):
 
         # Re-attach information on test dependencies
         if tests:
-            # This is slow, but the information on test dependency is lost
-            # after unification or when reading from a lockfile.
-            for h in self.specs_by_hash:
-                current_spec, computed_spec = self.specs_by_hash[h], by_hash[h]
-                for node in computed_spec.traverse():
-                    test_edges = node.edges_to_dependencies(depflag=dt.TEST)
-                    for current_edge in test_edges:
-                        test_dependency = current_edge.spec
-                        if test_dependency in current_spec[node.name]:
-                            continue
-                        current_spec[node.name].add_dependency_edge(
-                            test_dependency.copy(), depflag=dt.TEST, virtuals=current_edge.virtuals
-                        )
+            self._reattach_test_dependencies(by_hash)
 
         results = [
             (abstract, self.specs_by_hash[h])
@@ -1710,6 +1738,45 @@ def _concretize_separately(self, tests=False):
         ]
         return results
 
+    def _prepare_parallel_concretization(self) -> None:
+        """Performs the operations that must not be done concurrently by the processes
+        concretizing specs in parallel.
+        """
+        import spack.bootstrap
+
+        # Ensure we don't try to bootstrap clingo in parallel
+        with spack.bootstrap.ensure_bootstrap_configuration():
+            spack.bootstrap.ensure_clingo_importable_or_raise()
+
+        # Ensure all the indexes have been built or updated, since
+        # otherwise the processes in the pool may timeout on waiting
+        # for a write lock. We do this indirectly by retrieving the
+        # provider index, which should in turn trigger the update of
+        # all the indexes if there's any need for that.
+        _ = spack.repo.PATH.provider_index
+
+        # Ensure we have compilers in compilers.yaml to avoid that
+        # processes try to write the config file in parallel
+        _ = spack.compilers.all_compilers_config(spack.config.CONFIG)
+
+    def _reattach_test_dependencies(self, by_hash: Dict[str, spack.spec.Spec]) -> None:
+        """Re-attaches test dependencies, from the specs computed by the solver, to the
+        concrete specs in the environment.
+        """
+        # This is slow, but the information on test dependency is lost
+        # after unification or when reading from a lockfile.
+        for h in self.specs_by_hash:
+            current_spec, computed_spec = self.specs_by_hash[h], by_hash[h]
+            for node in computed_spec.traverse():
+                test_edges = node.edges_to_dependencies(depflag=dt.TEST)
+                for current_edge in test_edges:
+                    test_dependency = current_edge.spec
+                    if test_dependency in current_spec[node.name]:
+                        continue
+                    current_spec[node.name].add_dependency_edge(
+                        test_dependency.copy(), depflag=dt.TEST, virtuals=current_edge.virtuals
+                    )
+
     @property
     def default_view(self):
         if not self.has_view(default_view_name):
@@ -2523,6 +2590,25 @@ def _concretize_task(packed_arguments) -> Tuple[int, Spec, float]:
         return index, spec, time.time() - start
 
 
+def _concretize_cluster_task(packed_arguments) -> Tuple[int, List[Tuple[int, Spec]], float]:
+    import spack.solver.asp
+
+    index, specs, tests, allow_deprecated = packed_arguments
+    with tty.SuppressOutput(msg_enabled=False):
+        start = time.time()
+        # Specs with an abstract hash are replaced by a copy in the solver, so look them up
+        # here and map the results back to the position of each input spec
+        specs = [spec.lookup_hash() for spec in specs]
+        position = {id(spec): i for i, spec in enumerate(specs)}
+        result = []
+        solver = spack.solver.asp.Solver()
+        for rounds in solver.solve_in_rounds(
+            specs, tests=tests, allow_deprecated=allow_deprecated
+        ):
+            result.extend((position[id(x)], y) for x, y in rounds.specs_by_input.items())
+        return index, result, time.time() - start
+
+
 def make_repo_path(root):
     """Make a RepoPath from the repo subdirectories in an environment."""
     path = spack.repo.RepoPath(cache=spack.caches.MISC_CACHE)
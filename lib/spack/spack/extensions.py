@@ -17,7 +17,6 @@
 
 import llnl.util.lang
 
-import spack.cmd
 import spack.config
 import spack.error
 import spack.util.path
@@ -230,6 +229,8 @@ class CommandNotFoundError(spack.error.SpackError):
     """
 
     def __init__(self, cmd_name):
+        import spack.cmd
+
         msg = (
             "{0} is not a recognized Spack command or extension command;"
             " check with `spack commands`.".format(cmd_name)
@@ -26,12 +26,15 @@
 
 """
 
+import concurrent.futures
+import contextlib
 import copy
 import enum
 import glob
 import heapq
 import io
 import itertools
+import multiprocessing.connection
 import os
 import shutil
 import sys
@@ -73,6 +76,9 @@
 #: were added (see https://docs.python.org/2/library/heapq.html).
 _counter = itertools.count(0)
 
+#: Maximum number of binary packages downloaded at the same time, ahead of their installation
+MAX_DOWNLOAD_THREADS = 8
+
 
 class BuildStatus(enum.Enum):
     """Different build (task) states."""
@@ -354,7 +360,10 @@ def _print_timer(pre: str, pkg_id: str, timer: timer.BaseTimer) -> None:
 
 
 def _install_from_cache(
-    pkg: "spack.package_base.PackageBase", explicit: bool, unsigned: Optional[bool] = False
+    pkg: "spack.package_base.PackageBase",
+    explicit: bool,
+    unsigned: Optional[bool] = False,
+    download_result: Optional[dict] = None,
 ) -> bool:
     """
     Install the package from binary cache
@@ -364,25 +373,51 @@ def _install_from_cache(
         explicit: ``True`` if installing the package was explicitly
             requested by the user, otherwise, ``False``
         unsigned: if ``True`` or ``False`` override the mirror signature verification defaults
+        download_result: the binary package, if it was already downloaded
 
     Return: ``True`` if the package was extract from binary cache, ``False`` otherwise
     """
     t = timer.Timer()
-    installed_from_cache = _try_install_from_binary_cache(
-        pkg, explicit, unsigned=unsigned, timer=t
-    )
+    if download_result is None:
+        installed_from_cache = _try_install_from_binary_cache(
+            pkg, explicit, unsigned=unsigned, timer=t
+        )
+    else:
+        installed_from_cache = _process_binary_cache_tarball(
+            pkg, explicit, unsigned, timer=t, download_result=download_result
+        )
     if not installed_from_cache:
         return False
     t.stop()
 
+    _finalize_install_from_cache(pkg, explicit, t)
+    return True
+
+
+def _finalize_install_from_cache(
+    pkg: "spack.package_base.PackageBase", explicit: bool, timer: timer.BaseTimer
+) -> None:
+    """Report the installation of a package extracted from a binary cache, and run the post
+    install hooks."""
     pkg_id = package_id(pkg.spec)
     tty.debug(f"Successfully extracted {pkg_id} from binary cache")
 
-    _write_timer_json(pkg, t, True)
-    _print_timer(pre=_log_prefix(pkg.name), pkg_id=pkg_id, timer=t)
+    _write_timer_json(pkg, timer, True)
+    _print_timer(pre=_log_prefix(pkg.name), pkg_id=pkg_id, timer=timer)
     _print_installed_pkg(pkg.spec.prefix)
     spack.hooks.post_install(pkg.spec, explicit)
-    return True
+
+
+def _discard_download(download: concurrent.futures.Future) -> None:
+    """Cancel the download of a binary package, or delete the files it downloaded."""
+    if download.cancel():
+        return
+    try:
+        download_result = download.result()
+    except Exception:
+        return
+    if download_result is not None:
+        binary_distribution._delete_staged_downloads(download_result)
 
 
 def _process_external_package(pkg: "spack.package_base.PackageBase", explicit: bool) -> None:
@@ -432,6 +467,7 @@ def _process_binary_cache_tarball(
     unsigned: Optional[bool],
     mirrors_for_spec: Optional[list] = None,
     timer: timer.BaseTimer = timer.NULL_TIMER,
+    download_result: Optional[dict] = None,
 ) -> bool:
     """
     Process the binary cache tarball.
@@ -443,35 +479,42 @@ def _process_binary_cache_tarball(
         mirrors_for_spec: Optional list of concrete specs and mirrors
         obtained by calling binary_distribution.get_mirrors_for_spec().
         timer: timer to keep track of binary install phases.
+        download_result: the binary package, if it was already downloaded
 
     Return:
         bool: ``True`` if the package was extracted from binary cache,
             else ``False``
     """
-    with timer.measure("fetch"):
-        download_result = binary_distribution.download_tarball(
-            pkg.spec.build_spec, unsigned, mirrors_for_spec
-        )
+    if download_result is None:
+        with timer.measure("fetch"):
+            download_result = binary_distribution.download_tarball(
+                pkg.spec.build_spec, unsigned, mirrors_for_spec, stream=True
+            )
 
-        if download_result is None:
-            return False
+            if download_result is None:
+                return False
 
     tty.msg(f"Extracting {package_id(pkg.spec)} from binary cache")
 
     with timer.measure("install"), spack.util.path.filter_padding():
         binary_distribution.extract_tarball(pkg.spec, download_result, force=False, timer=timer)
+        _register_binary_cache_install(pkg, explicit)
+        return True
 
-        if pkg.spec.spliced:  # overwrite old metadata with new
-            spack.store.STORE.layout.write_spec(
-                pkg.spec, spack.store.STORE.layout.spec_file_path(pkg.spec)
-            )
 
-        if hasattr(pkg, "_post_buildcache_install_hook"):
-            pkg._post_buildcache_install_hook()
+def _register_binary_cache_install(pkg: "spack.package_base.PackageBase", explicit: bool) -> None:
+    """Complete the installation of a package extracted from a binary cache, and add it to the
+    database."""
+    if pkg.spec.spliced:  # overwrite old metadata with new
+        spack.store.STORE.layout.write_spec(
+            pkg.spec, spack.store.STORE.layout.spec_file_path(pkg.spec)
+        )
 
-        pkg.installed_from_binary_cache = True
-        spack.store.STORE.db.add(pkg.spec, explicit=explicit)
-        return True
+    if hasattr(pkg, "_post_buildcache_install_hook"):
+        pkg._post_buildcache_install_hook()
+
+    pkg.installed_from_binary_cache = True
+    spack.store.STORE.db.add(pkg.spec, explicit=explicit)
 
 
 def _try_install_from_binary_cache(
@@ -1136,11 +1179,41 @@ def priority(self):
 class BuildTask(Task):
     """Class for representing a build task for a package."""
 
+    #: Build process running the installation, between ``launch()`` and ``complete()``
+    process: Optional["spack.build_environment.BuildProcess"] = None
+
+    #: Download of the binary package started ahead of time, if any
+    download: Optional[concurrent.futures.Future] = None
+
+    #: Timer of the installation from a binary cache, when the binary package is extracted in
+    #: the build process
+    cache_timer: Optional[timer.Timer] = None
+
     def execute(self, install_status):
         """
         Perform the installation of the requested spec and/or dependency
         represented by the build task.
         """
+        rc = self.launch(install_status)
+        if rc is None:
+            rc = self.complete()
+        return rc
+
+    def launch(
+        self, install_status: InstallStatus, concurrent: bool = False
+    ) -> Optional[ExecuteResult]:
+        """
+        Start the installation represented by the build task. Return the result if the task
+        completed without building, e.g. when installing from a binary cache, otherwise start
+        a build process and return None. In the latter case ``complete()`` must be called to
+        wait for the build.
+
+        Args:
+            install_status: the installation status for the package
+            concurrent: whether other packages are installed at the same time. If so, the build
+                process doesn't read the standard input, and a binary package downloaded ahead
+                of time is extracted in a build process too.
+        """
         install_args = self.request.install_args
         tests = install_args.get("tests")
         unsigned = install_args.get("unsigned")
@@ -1152,8 +1225,19 @@ def execute(self, install_status):
         self.status = BuildStatus.INSTALLING
 
         # Use the binary cache if requested
+        download, self.download = self.download, None
         if self.use_cache:
-            if _install_from_cache(pkg, self.explicit, unsigned):
+            if download is None:
+                installed = _install_from_cache(pkg, self.explicit, unsigned)
+            else:
+                download_result = download.result()
+                if download_result is not None and concurrent:
+                    self._launch_extraction(download_result)
+                    return None
+                installed = download_result is not None and _install_from_cache(
+                    pkg, self.explicit, unsigned, download_result
+                )
+            if installed:
                 return ExecuteResult.SUCCESS
             elif self.cache_only:
                 raise spack.error.InstallError(
@@ -1161,6 +1245,8 @@ def execute(self, install_status):
                 )
             else:
                 tty.msg(f"No binary for {pkg_id} found: installing from source")
+        elif download is not None:
+            _discard_download(download)
 
         pkg.run_tests = tests is True or tests and pkg.name in tests
 
@@ -1169,18 +1255,52 @@ def execute(self, install_status):
         if not pkg.unit_test_check():
             return ExecuteResult.FAILED
 
-        try:
-            # Create stage object now and let it be serialized for the child process. That
-            # way monkeypatch in tests works correctly.
-            pkg.stage
+        # Create stage object now and let it be serialized for the child process. That
+        # way monkeypatch in tests works correctly.
+        pkg.stage
+
+        self._setup_install_dir(pkg)
+
+        # Create a child process to do the actual installation.
+        self.process = spack.build_environment.BuildProcess(
+            pkg, build_process, install_args, forward_stdin=not concurrent
+        )
+        self.process.start()
+        return None
+
+    def _launch_extraction(self, download_result: dict) -> None:
+        """Start a build process extracting and relocating a downloaded binary package."""
+        tty.msg(f"Extracting {self.pkg_id} from binary cache")
+        self.cache_timer = timer.Timer()
+        self.cache_timer.start("install")
+        self.process = spack.build_environment.BuildProcess(
+            self.pkg,
+            extract_process,
+            {"download_result": download_result, "setup_environment": False},
+            forward_stdin=False,
+        )
+        self.process.start()
 
-            self._setup_install_dir(pkg)
+    def complete(self) -> ExecuteResult:
+        """Wait for the build process started by ``launch()``, and register the package."""
+        assert self.process is not None, f"no build process for {self.pkg_id}"
+        pkg = self.pkg
+        if self.cache_timer is not None:
+            t, self.cache_timer = self.cache_timer, None
+            try:
+                self.process.complete()
+            finally:
+                self.process = None
+            with spack.util.path.filter_padding():
+                _register_binary_cache_install(pkg, self.explicit)
+            t.stop("install")
+            t.stop()
+            _finalize_install_from_cache(pkg, self.explicit, t)
+            return ExecuteResult.SUCCESS
 
-            # Create a child process to do the actual installation.
+        try:
             # Preserve verbosity settings across installs.
-            spack.package_base.PackageBase._verbose = spack.build_environment.start_build_process(
-                pkg, build_process, install_args
-            )
+            spack.package_base.PackageBase._verbose = self.process.complete()
 
             # Note: PARENT of the build process adds the new package to
             # the database, so that we don't need to re-read from file.
@@ -1191,6 +1311,8 @@ def execute(self, install_status):
             pid = f"{self.pid}: " if tty.show_pid() else ""
             tty.debug(f"{pid}{str(e)}")
             tty.debug(f"Package stage directory: {pkg.stage.source_path}")
+        finally:
+            self.process = None
         return ExecuteResult.SUCCESS
 
 
@@ -1240,6 +1362,7 @@ def __init__(
         packages: List["spack.package_base.PackageBase"],
         *,
         cache_only: bool = False,
+        concurrent_packages: Optional[int] = None,
         dependencies_cache_only: bool = False,
         dependencies_use_cache: bool = True,
         dirty: bool = False,
@@ -1266,6 +1389,8 @@ def __init__(
     ) -> None:
         """
         Arguments:
+            concurrent_packages: Maximum number of packages built at the same time. Defaults to
+                ``config:concurrent_packages``.
             explicit: Set of package hashes to be marked as installed explicitly in the db. If
                 True, the specs from ``packages`` are marked explicit, while their dependencies are
                 not.
@@ -1348,6 +1473,17 @@ def __init__(
         # Initializing all_dependencies to empty. This will be set later in _init_queue.
         self.all_dependencies: Dict[str, Set[str]] = {}
 
+        # Maximum number of packages built at the same time
+        self.concurrent_packages: int = concurrent_packages or spack.config.get(
+            "config:concurrent_packages", 1
+        )
+
+        # Tasks whose build process is running, keyed on the package's unique id
+        self.running: Dict[str, BuildTask] = {}
+
+        # Downloads of binary packages started ahead of time, keyed on the package's unique id
+        self.prefetched: Dict[str, concurrent.futures.Future] = {}
+
     def __repr__(self) -> str:
         """Returns a formal representation of the package installer."""
         rep = f"{self.__class__.__name__}("
@@ -1755,12 +1891,150 @@ def _install_task(self, task: Task, install_status: InstallStatus) -> None:
         Args:
             task: the installation task for a package
             install_status: the installation status for the package"""
-        rc = task.execute(install_status)
+        if isinstance(task, BuildTask):
+            task.download = self.prefetched.pop(task.pkg_id, None)
+        self._handle_result(task, task.execute(install_status))
+
+    def _handle_result(self, task: Task, rc: ExecuteResult) -> None:
+        """Update the queue with the result of the execution of a task."""
         if rc == ExecuteResult.MISSING_BUILD_SPEC:
             self._requeue_with_build_spec_tasks(task)
         else:  # if rc == ExecuteResult.SUCCESS or rc == ExecuteResult.FAILED
             self._update_installed(task)
 
+    def _launch_task(self, task: Task, install_status: InstallStatus) -> None:
+        """
+        Start the installation of a task without waiting for it to be built, if other builds
+        can run at the same time. Otherwise, install it like ``_install_task``.
+
+        Args:
+            task: the installation task for a package
+            install_status: the installation status for the package
+        """
+        if not isinstance(task, BuildTask) or self.concurrent_packages < 2:
+            self._install_task(task, install_status)
+            return
+
+        task.download = self.prefetched.pop(task.pkg_id, None)
+        rc = task.launch(install_status, concurrent=True)
+        if rc is None:
+            self.running[task.pkg_id] = task
+        else:
+            self._handle_result(task, rc)
+
+    def _wait_for_builds(self, block: bool) -> List["BuildTask"]:
+        """
+        Return the running tasks whose build process has finished, and is ready to be
+        completed.
+
+        Args:
+            block: if True, wait for at least one build to finish
+        """
+        tasks = {task.process.connection: task for task in self.running.values()}
+        ready = multiprocessing.connection.wait(list(tasks), timeout=None if block else 0)
+        done = [tasks[connection] for connection in ready]
+        for task in done:
+            del self.running[task.pkg_id]
+        return done
+
+    def _complete_builds(self, tasks: List["BuildTask"], installing) -> None:
+        """
+        Complete the builds that finished, and register the packages in the database with a
+        single write transaction. An error that terminates the installation is raised only
+        after the transaction is committed, so that the packages already registered are kept.
+
+        Args:
+            tasks: the tasks whose build process has finished
+            installing: context manager handling the failure of a task
+        """
+        if not tasks:
+            return
+        error = None
+        with spack.store.STORE.db.write_transaction():
+            for i, task in enumerate(tasks):
+                try:
+                    with installing(task, InstallAction.INSTALL):
+                        self._handle_result(task, task.complete())
+                except BaseException as e:
+                    error = e
+                    # Clean up the remaining builds together with the running ones
+                    self.running.update((t.pkg_id, t) for t in tasks[i + 1 :])
+                    break
+        if error is not None:
+            raise error
+
+    def _terminate_running_builds(self) -> None:
+        """Terminate the build processes that are still running, e.g. after a failure."""
+        for pkg_id, task in self.running.items():
+            tty.debug(f"Terminating the build of {pkg_id}")
+            if task.process is not None:
+                task.process.terminate()
+            if not task.request.install_args.get("keep_prefix"):
+                task.pkg.remove_prefix()
+            self._release_lock(pkg_id)
+        self.running.clear()
+
+    @contextlib.contextmanager
+    def _prefetch_binaries(self):
+        """Context manager downloading the binary packages of all the packages that must be
+        installed from a binary cache, with a bounded pool of threads, ahead of their
+        installation. Downloads that were not used are discarded on exit."""
+        tasks = [
+            task
+            for task in self.build_tasks.values()
+            if isinstance(task, BuildTask)
+            and task.cache_only
+            and task.pkg_id not in self.installed
+            and not task.pkg.spec.external
+            and not task.pkg.spec.installed_upstream
+        ]
+        # A single package is better streamed than downloaded
+        if len(tasks) < 2 or not spack.mirror.MirrorCollection(binary=True):
+            yield
+            return
+
+        executor = concurrent.futures.ThreadPoolExecutor(min(len(tasks), MAX_DOWNLOAD_THREADS))
+        try:
+            for task in tasks:
+                spec = task.pkg.spec
+                # Search in the main thread, since it may update the cached buildcache indexes
+                matches = binary_distribution.get_mirrors_for_spec(spec, index_only=True)
+                self.prefetched[task.pkg_id] = executor.submit(
+                    binary_distribution.download_tarball,
+                    spec.build_spec,
+                    task.request.install_args.get("unsigned"),
+                    matches,
+                )
+            yield
+        finally:
+            for download in self.prefetched.values():
+                _discard_download(download)
+            self.prefetched.clear()
+            executor.shutdown()
+
+    @contextlib.contextmanager
+    def _jobserver(self):
+        """Context manager sharing the build jobs among packages built at the same time.
+
+        Builds running ``make`` share them through a jobserver, where available. Everything
+        else, including the relocation of binary packages, gets an even share of the jobs.
+        """
+        if self.concurrent_packages < 2:
+            yield
+            return
+        with contextlib.ExitStack() as stack:
+            if sys.platform != "win32" and not spack.build_environment.jobserver_enabled():
+                jobs = spack.config.determine_number_of_jobs(parallel=True)
+                stack.enter_context(spack.build_environment.JobServer(jobs))
+            stack.enter_context(spack.build_environment.split_build_jobs(self.concurrent_packages))
+            yield
+
+    def _next_is_ready(self) -> bool:
+        """Return True if the next task in the queue has no uninstalled dependencies."""
+        while self.build_pq and self.build_pq[0][1].status == BuildStatus.REMOVED:
+            heapq.heappop(self.build_pq)
+        return bool(self.build_pq) and self._next_is_pri0()
+
     def _next_is_pri0(self) -> bool:
         """
         Determine if the next task has priority 0
@@ -2028,145 +2302,22 @@ def install(self) -> None:
             enabled=sys.stdout.isatty() and tty.msg_enabled() and not tty.is_debug()
         )
 
-        while self.build_pq:
-            task = self._pop_task()
-            if task is None:
-                continue
-
-            install_args = task.request.install_args
-            keep_prefix = install_args.get("keep_prefix")
-
-            pkg, pkg_id, spec = task.pkg, task.pkg_id, task.pkg.spec
-            install_status.next_pkg(pkg)
-            install_status.set_term_title(f"Processing {pkg.name}")
-            tty.debug(f"Processing {pkg_id}: task={task}")
-            # Ensure that the current spec has NO uninstalled dependencies,
-            # which is assumed to be reflected directly in its priority.
-            #
-            # If the spec has uninstalled dependencies, then there must be
-            # a bug in the code (e.g., priority queue or uninstalled
-            # dependencies handling).  So terminate under the assumption that
-            # all subsequent tasks will have non-zero priorities or may be
-            # dependencies of this task.
-            if task.priority != 0:
-                term_status.clear()
-                tty.error(
-                    f"Detected uninstalled dependencies for {pkg_id}: " f"{task.uninstalled_deps}"
-                )
-                left = [dep_id for dep_id in task.uninstalled_deps if dep_id not in self.installed]
-                if not left:
-                    tty.warn(f"{pkg_id} does NOT actually have any uninstalled deps left")
-                dep_str = "dependencies" if task.priority > 1 else "dependency"
-
-                raise spack.error.InstallError(
-                    f"Cannot proceed with {pkg_id}: {task.priority} uninstalled "
-                    f"{dep_str}: {','.join(task.uninstalled_deps)}",
-                    pkg=pkg,
-                )
-
-            # Skip the installation if the spec is not being installed locally
-            # (i.e., if external or upstream) BUT flag it as installed since
-            # some package likely depends on it.
-            if _handle_external_and_upstream(pkg, task.explicit):
-                term_status.clear()
-                self._flag_installed(pkg, task.dependents)
-                continue
-
-            # Flag a failed spec.  Do not need an (install) prefix lock since
-            # assume using a separate (failed) prefix lock file.
-            if pkg_id in self.failed or spack.store.STORE.failure_tracker.has_failed(spec):
-                term_status.clear()
-                tty.warn(f"{pkg_id} failed to install")
-                self._update_failed(task)
-
-                if self.fail_fast:
-                    raise spack.error.InstallError(fail_fast_err, pkg=pkg)
-
-                continue
-
-            # Attempt to get a write lock.  If we can't get the lock then
-            # another process is likely (un)installing the spec or has
-            # determined the spec has already been installed (though the
-            # other process may be hung).
-            install_status.set_term_title(f"Acquiring lock for {pkg.name}")
-            term_status.add(pkg_id)
-            ltype, lock = self._ensure_locked("write", pkg)
-            if lock is None:
-                # Attempt to get a read lock instead.  If this fails then
-                # another process has a write lock so must be (un)installing
-                # the spec (or that process is hung).
-                ltype, lock = self._ensure_locked("read", pkg)
-            # Requeue the spec if we cannot get at least a read lock so we
-            # can check the status presumably established by another process
-            # -- failed, installed, or uninstalled -- on the next pass.
-            if lock is None:
-                self._requeue_task(task, install_status)
-                continue
-
-            term_status.clear()
-
-            # Take a timestamp with the overwrite argument to allow checking
-            # whether another process has already overridden the package.
-            if task.request.overwrite and task.explicit:
-                task.request.overwrite_time = time.time()
-
-            # Determine state of installation artifacts and adjust accordingly.
-            install_status.set_term_title(f"Preparing {pkg.name}")
-            self._prepare_for_install(task)
-
-            # Flag an already installed package
-            if pkg_id in self.installed:
-                # Downgrade to a read lock to preclude other processes from
-                # uninstalling the package until we're done installing its
-                # dependents.
-                ltype, lock = self._ensure_locked("read", pkg)
-                if lock is not None:
-                    self._update_installed(task)
-                    path = spack.util.path.debug_padded_filter(pkg.prefix)
-                    _print_installed_pkg(path)
-                else:
-                    # At this point we've failed to get a write or a read
-                    # lock, which means another process has taken a write
-                    # lock between our releasing the write and acquiring the
-                    # read.
-                    #
-                    # Requeue the task so we can re-check the status
-                    # established by the other process -- failed, installed,
-                    # or uninstalled -- on the next pass.
-                    self.installed.remove(pkg_id)
-                    self._requeue_task(task, install_status)
-                continue
-
-            # Having a read lock on an uninstalled pkg may mean another
-            # process completed an uninstall of the software between the
-            # time we failed to acquire the write lock and the time we
-            # took the read lock.
-            #
-            # Requeue the task so we can check the status presumably
-            # established by the other process -- failed, installed, or
-            # uninstalled -- on the next pass.
-            if ltype == "read":
-                lock.release_read()
-                self._requeue_task(task, install_status)
-                continue
-
-            # Proceed with the installation since we have an exclusive write
-            # lock on the package.
-            install_status.set_term_title(f"Installing {pkg.name}")
+        @contextlib.contextmanager
+        def installing(task: Task, action: InstallAction):
+            """Handle the failures of the installation of a task, and clean up after it."""
+            pkg, pkg_id = task.pkg, task.pkg_id
+            keep_prefix = task.request.install_args.get("keep_prefix")
             try:
-                action = self._install_action(task)
+                yield
 
-                if action == InstallAction.INSTALL:
-                    self._install_task(task, install_status)
-                elif action == InstallAction.OVERWRITE:
-                    # spack.store.STORE.db is not really a Database object, but a small
-                    # wrapper -- silence mypy
-                    OverwriteInstall(self, spack.store.STORE.db, task, install_status).install()  # type: ignore[arg-type] # noqa: E501
-
-                # If we installed then we should keep the prefix
+                # If we installed, or are still building, then we should keep the prefix
                 stop_before_phase = getattr(pkg, "stop_before_phase", None)
                 last_phase = getattr(pkg, "last_phase", None)
-                keep_prefix = keep_prefix or (stop_before_phase is None and last_phase is None)
+                keep_prefix = (
+                    keep_prefix
+                    or pkg_id in self.running
+                    or (stop_before_phase is None and last_phase is None)
+                )
 
             except KeyboardInterrupt as exc:
                 # The build has been terminated with a Ctrl-C so terminate
@@ -2188,7 +2339,7 @@ def install(self) -> None:
                 # this overrides a full method, which is ugly.
                 task.use_cache = False  # type: ignore[misc]
                 self._requeue_task(task, install_status)
-                continue
+                return
 
             except (Exception, SystemExit) as exc:
                 self._update_failed(task, True, exc)
@@ -2227,6 +2378,158 @@ def install(self) -> None:
             if pkg.spec.installed:
                 self._cleanup_task(pkg)
 
+        with self._jobserver(), self._prefetch_binaries():
+            try:
+                while self.build_pq or self.running:
+                    if self.running:
+                        # Wait for a build to finish, unless another one can be started
+                        block = (
+                            len(self.running) >= self.concurrent_packages
+                            or not self._next_is_ready()
+                        )
+                        finished = self._wait_for_builds(block)
+                        self._complete_builds(finished, installing)
+                        if block or finished:
+                            continue
+
+                    task = self._pop_task()
+                    if task is None:
+                        continue
+
+                    pkg, pkg_id, spec = task.pkg, task.pkg_id, task.pkg.spec
+                    install_status.next_pkg(pkg)
+                    install_status.set_term_title(f"Processing {pkg.name}")
+                    tty.debug(f"Processing {pkg_id}: task={task}")
+                    # Ensure that the current spec has NO uninstalled dependencies,
+                    # which is assumed to be reflected directly in its priority.
+                    #
+                    # If the spec has uninstalled dependencies, then there must be
+                    # a bug in the code (e.g., priority queue or uninstalled
+                    # dependencies handling).  So terminate under the assumption that
+                    # all subsequent tasks will have non-zero priorities or may be
+                    # dependencies of this task.
+                    if task.priority != 0:
+                        term_status.clear()
+                        tty.error(
+                            f"Detected uninstalled dependencies for {pkg_id}: "
+                            f"{task.uninstalled_deps}"
+                        )
+                        left = [
+                            dep_id
+                            for dep_id in task.uninstalled_deps
+                            if dep_id not in self.installed
+                        ]
+                        if not left:
+                            tty.warn(f"{pkg_id} does NOT actually have any uninstalled deps left")
+                        dep_str = "dependencies" if task.priority > 1 else "dependency"
+
+                        raise spack.error.InstallError(
+                            f"Cannot proceed with {pkg_id}: {task.priority} uninstalled "
+                            f"{dep_str}: {','.join(task.uninstalled_deps)}",
+                            pkg=pkg,
+                        )
+
+                    # Skip the installation if the spec is not being installed locally
+                    # (i.e., if external or upstream) BUT flag it as installed since
+                    # some package likely depends on it.
+                    if _handle_external_and_upstream(pkg, task.explicit):
+                        term_status.clear()
+                        self._flag_installed(pkg, task.dependents)
+                        continue
+
+                    # Flag a failed spec.  Do not need an (install) prefix lock since
+                    # assume using a separate (failed) prefix lock file.
+                    if pkg_id in self.failed or spack.store.STORE.failure_tracker.has_failed(spec):
+                        term_status.clear()
+                        tty.warn(f"{pkg_id} failed to install")
+                        self._update_failed(task)
+
+                        if self.fail_fast:
+                            raise spack.error.InstallError(fail_fast_err, pkg=pkg)
+
+                        continue
+
+                    # Attempt to get a write lock.  If we can't get the lock then
+                    # another process is likely (un)installing the spec or has
+                    # determined the spec has already been installed (though the
+                    # other process may be hung).
+                    install_status.set_term_title(f"Acquiring lock for {pkg.name}")
+                    term_status.add(pkg_id)
+                    ltype, lock = self._ensure_locked("write", pkg)
+                    if lock is None:
+                        # Attempt to get a read lock instead.  If this fails then
+                        # another process has a write lock so must be (un)installing
+                        # the spec (or that process is hung).
+                        ltype, lock = self._ensure_locked("read", pkg)
+                    # Requeue the spec if we cannot get at least a read lock so we
+                    # can check the status presumably established by another process
+                    # -- failed, installed, or uninstalled -- on the next pass.
+                    if lock is None:
+                        self._requeue_task(task, install_status)
+                        continue
+
+                    term_status.clear()
+
+                    # Take a timestamp with the overwrite argument to allow checking
+                    # whether another process has already overridden the package.
+                    if task.request.overwrite and task.explicit:
+                        task.request.overwrite_time = time.time()
+
+                    # Determine state of installation artifacts and adjust accordingly.
+                    install_status.set_term_title(f"Preparing {pkg.name}")
+                    self._prepare_for_install(task)
+
+                    # Flag an already installed package
+                    if pkg_id in self.installed:
+                        # Downgrade to a read lock to preclude other processes from
+                        # uninstalling the package until we're done installing its
+                        # dependents.
+                        ltype, lock = self._ensure_locked("read", pkg)
+                        if lock is not None:
+                            self._update_installed(task)
+                            path = spack.util.path.debug_padded_filter(pkg.prefix)
+                            _print_installed_pkg(path)
+                        else:
+                            # At this point we've failed to get a write or a read
+                            # lock, which means another process has taken a write
+                            # lock between our releasing the write and acquiring the
+                            # read.
+                            #
+                            # Requeue the task so we can re-check the status
+                            # established by the other process -- failed, installed,
+                            # or uninstalled -- on the next pass.
+                            self.installed.remove(pkg_id)
+                            self._requeue_task(task, install_status)
+                        continue
+
+                    # Having a read lock on an uninstalled pkg may mean another
+                    # process completed an uninstall of the software between the
+                    # time we failed to acquire the write lock and the time we
+                    # took the read lock.
+                    #
+                    # Requeue the task so we can check the status presumably
+                    # established by the other process -- failed, installed, or
+                    # uninstalled -- on the next pass.
+                    if ltype == "read":
+                        lock.release_read()
+                        self._requeue_task(task, install_status)
+                        continue
+
+                    # Proceed with the installation since we have an exclusive write
+                    # lock on the package.
+                    install_status.set_term_title(f"Installing {pkg.name}")
+                    action = self._install_action(task)
+                    with installing(task, action):
+                        if action == InstallAction.INSTALL:
+                            self._launch_task(task, install_status)
+                        elif action == InstallAction.OVERWRITE:
+                            # spack.store.STORE.db is not really a Database object, but a small
+                            # wrapper -- silence mypy
+                            OverwriteInstall(self, spack.store.STORE.db, task, install_status).install()  # type: ignore[arg-type] # noqa: E501
+            finally:
+                # Terminate the builds still running if the installation was interrupted
+                self._terminate_running_builds()
+
         # Cleanup, which includes releasing all of the read locks
         self._cleanup_all_tasks()
 
@@ -2469,6 +2772,17 @@ def _real_install(self) -> None:
         log(pkg)
 
 
+def extract_process(pkg: "spack.package_base.PackageBase", kwargs: dict) -> None:
+    """Extract and relocate a binary package in a child process.
+
+    Args:
+        pkg: the package being installed
+        kwargs: the ``download_result`` of the binary package
+    """
+    with spack.util.path.filter_padding():
+        binary_distribution.extract_tarball(pkg.spec, kwargs["download_result"], force=False)
+
+
 def build_process(pkg: "spack.package_base.PackageBase", install_args: dict) -> bool:
     """Perform the installation/build of the package.
 
@@ -7,10 +7,12 @@
 
 In a normal Spack installation, this is invoked from the bin/spack script
 after the system path is set up.
+
+Heavy subsystems like configuration, environments, repositories, specs and
+the store are imported by the functions that need them, so that trivial
+invocations, e.g. ``spack --version``, don't pay for their import time.
 """
 import argparse
-
-# import spack.modules.common
 import inspect
 import io
 import operator
@@ -26,8 +28,6 @@
 import warnings
 from typing import List, Tuple
 
-import archspec.cpu
-
 import llnl.util.lang
 import llnl.util.tty as tty
 import llnl.util.tty.colify
@@ -35,19 +35,8 @@
 from llnl.util.tty.log import log_output
 
 import spack
-import spack.cmd
-import spack.config
-import spack.environment as ev
 import spack.error
-import spack.modules
 import spack.paths
-import spack.platforms
-import spack.repo
-import spack.spec
-import spack.store
-import spack.util.debug
-import spack.util.environment
-import spack.util.lock
 from spack.error import SpackError
 
 #: names of profile statistics
@@ -105,12 +94,16 @@
 
 def add_all_commands(parser):
     """Add all spack subcommands to the parser."""
+    import spack.cmd
+
     for cmd in spack.cmd.all_commands():
         parser.add_command(cmd)
 
 
 def index_commands():
     """create an index of commands by section for this help level"""
+    import spack.cmd
+
     index = {}
     for command in spack.cmd.all_commands():
         cmd_module = spack.cmd.get_module(command)
@@ -160,6 +153,8 @@ def format_help_sections(self, level):
         Args:
             level (str): 'short' or 'long' (more commands shown for long)
         """
+        import spack.cmd
+
         if level not in levels:
             raise ValueError("level must be one of: %s" % levels)
 
@@ -287,6 +282,9 @@ def add_parser(name, **kwargs):
 
     def add_command(self, cmd_name):
         """Add one subcommand to this parser."""
+        import spack.cmd
+        import spack.config
+
         # lazily initialize any subparsers
         if not hasattr(self, "subparsers"):
             # remove the dummy "command" argument.
@@ -511,6 +509,8 @@ def send_warning_to_tty(message, *args):
 
 def setup_main_options(args):
     """Configure spack globals based on the basic options."""
+    import spack.config
+
     # Assign a custom function to show warnings
     warnings.showwarning = send_warning_to_tty
 
@@ -527,6 +527,9 @@ def setup_main_options(args):
         spack.error.SHOW_BACKTRACE = True
 
     if args.debug:
+        import spack.util.debug
+        import spack.util.environment
+
         spack.util.debug.register_interrupt_handler()
         spack.config.set("config:debug", True, scope="command_line")
         spack.util.environment.TRACING_ENABLED = True
@@ -537,10 +540,13 @@ def setup_main_options(args):
     # override lock configuration if passed on command line
     if args.locks is not None:
         if args.locks is False:
+            import spack.util.lock
+
             spack.util.lock.check_lock_safety(spack.paths.prefix)
         spack.config.set("config:locks", args.locks, scope="command_line")
 
     if args.mock:
+        import spack.repo
         import spack.util.spack_yaml as syaml
 
         key = syaml.syaml_str("repos")
@@ -568,6 +574,46 @@ def setup_main_options(args):
         color.set_color_when(args.color)
 
 
+def setup_configuration(args):
+    """Set up configuration from the command line options, and activate the
+    environment specified on the command line or in the shell, if any.
+
+    Returns the error raised by a malformed environment, so that it can be
+    delayed until the command is known.
+    """
+    import spack.config
+
+    # make spack.config aware of any command line configuration scopes
+    if args.config_scopes:
+        spack.config.COMMAND_LINE_SCOPES = args.config_scopes
+
+    # ensure options on spack command come before everything
+    setup_main_options(args)
+
+    # activate an environment if one was specified on the command line. Environments are slow
+    # to import, so they're imported only if an environment may be active.
+    import spack.util.environment
+
+    active = os.environ.get(spack.util.environment.spack_env_var)
+    if args.no_env or not (args.env or args.env_dir or active):
+        return None
+
+    import spack.cmd
+    import spack.environment as ev
+
+    try:
+        env = spack.cmd.find_environment(args)
+        if env:
+            ev.activate(env, args.use_env_repo)
+    except spack.config.ConfigFormatError as e:
+        # print the context but delay this exception so that commands like
+        # `spack config edit` can still work with a bad environment.
+        e.print_context()
+        return e
+
+    return None
+
+
 def allows_unknown_args(command):
     """Implements really simple argument injection for unknown arguments.
 
@@ -729,6 +775,11 @@ def _compatible_sys_types():
     """Return a list of all the platform-os-target tuples compatible
     with the current host.
     """
+    import archspec.cpu
+
+    import spack.platforms
+    import spack.spec
+
     host_platform = spack.platforms.host()
     host_os = str(host_platform.operating_system("default_os"))
     host_target = archspec.cpu.host()
@@ -751,7 +802,12 @@ def print_setup_info(*info):
     This is in ``main.py`` to make it fast; the setup scripts need to
     invoke spack in login scripts, and it needs to be quick.
     """
+    import archspec.cpu
+
+    import spack.config
     import spack.modules.common
+    import spack.spec
+    import spack.store
 
     shell = "csh" if "csh" in info else "sh"
 
@@ -827,6 +883,9 @@ def resolve_alias(cmd_name: str, cmd: List[str]) -> Tuple[str, List[str]]:
     Returns:
         new command name and arguments.
     """
+    import spack.cmd
+    import spack.config
+
     all_commands = spack.cmd.all_commands()
     aliases = spack.config.get("config:aliases")
 
@@ -910,25 +969,7 @@ def _main(argv=None):
     # Make spack load / env activate work on macOS
     restore_macos_dyld_vars()
 
-    # make spack.config aware of any command line configuration scopes
-    if args.config_scopes:
-        spack.config.COMMAND_LINE_SCOPES = args.config_scopes
-
-    # ensure options on spack command come before everything
-    setup_main_options(args)
-
-    # activate an environment if one was specified on the command line
-    env_format_error = None
-    if not args.no_env:
-        try:
-            env = spack.cmd.find_environment(args)
-            if env:
-                ev.activate(env, args.use_env_repo)
-        except spack.config.ConfigFormatError as e:
-            # print the context but delay this exception so that commands like
-            # `spack config edit` can still work with a bad environment.
-            e.print_context()
-            env_format_error = e
+    env_format_error = setup_configuration(args)
 
     # ------------------------------------------------------------------------
     # Things that require configuration should go below here
@@ -1017,23 +1058,30 @@ def main(argv=None):
         e.die()  # gracefully die on any SpackErrors
 
     except KeyboardInterrupt:
-        if spack.config.get("config:debug") or spack.error.SHOW_BACKTRACE:
+        if _show_backtrace():
             raise
         sys.stderr.write("\n")
         tty.error("Keyboard interrupt.")
         return signal.SIGINT.value
 
     except SystemExit as e:
-        if spack.config.get("config:debug") or spack.error.SHOW_BACKTRACE:
+        if _show_backtrace():
             traceback.print_exc()
         return e.code
 
     except Exception as e:
-        if spack.config.get("config:debug") or spack.error.SHOW_BACKTRACE:
+        if _show_backtrace():
             raise
         tty.error(e)
         return 3
 
 
+def _show_backtrace():
+    """Whether errors reaching the top level are shown with their backtrace."""
+    import spack.config
+
+    return spack.config.get("config:debug") or spack.error.SHOW_BACKTRACE
+
+
 class SpackCommandError(Exception):
     """Raised when SpackCommand execution fails."""
@@ -0,0 +1,391 @@
+# Copyright 2013-2024 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Index of the metadata of the packages in a repository.
+
+Reading the metadata of a package, e.g. its versions or its dependencies, requires importing its
+``package.py`` file and running its directives, which is slow when done for every package in
+a repository. The metadata index stores the attributes declared by directives in a serialized
+form, with the conditions and the constraints of directives as spec strings, so that it can be
+read without executing any package code. It's updated like the other indexes of a repository,
+i.e. only the packages that were modified since the index was written are imported again.
+"""
+import collections.abc
+import io
+import re
+import textwrap
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import llnl.util.tty as tty
+
+import spack.deptypes as dt
+import spack.error
+import spack.util.spack_json as sjson
+import spack.version
+
+#: Version of the format of the index. Bump this when the attributes of packages change.
+FORMAT_VERSION = 2
+
+
+def format_doc(doc: Optional[str], indent: int = 0) -> str:
+    """Wrap the docstring of a package at 72 characters"""
+    if not doc:
+        return ""
+
+    lines = textwrap.wrap(re.sub(r"\s+", " ", doc), 72)
+    results = io.StringIO()
+    for line in lines:
+        results.write((" " * indent) + line + "\n")
+    return results.getvalue()
+
+
+def _json_value(value: Any) -> Any:
+    """Values of variants can be of any type, but are compared as strings in specs"""
+    return value if isinstance(value, (bool, int, float)) else str(value)
+
+
+def _version_urls(pkg_cls) -> Optional[Dict[str, str]]:
+    """Returns the description of the fetch strategy of each version of a package, as shown by
+    ``spack info``, or None if it cannot be determined for some versions."""
+    import spack.fetch_strategy
+    import spack.spec
+
+    if not pkg_cls.has_code:
+        return {}
+
+    urls = {}
+    versions = list(pkg_cls.versions)
+    try:
+        pkg = pkg_cls(spack.spec.Spec(pkg_cls.name))
+        for v in versions:
+            try:
+                urls[str(v)] = str(spack.fetch_strategy.for_package_version(pkg, v))
+            except spack.fetch_strategy.InvalidArgsError:
+                urls[str(v)] = "No URL"
+    except spack.error.SpackError as e:
+        tty.debug(f"Cannot determine the URLs of the versions of {pkg_cls.name}: {e}")
+        return None
+
+    # Some packages change their versions when instantiated
+    if list(pkg_cls.versions) != versions:
+        return None
+    return urls
+
+
+def _package_metadata(pkg_cls) -> Dict[str, Any]:
+    """Returns the serialized metadata of a package class"""
+    versions = {
+        str(v): {
+            key: value for key, value in info.items() if isinstance(value, (str, bool, int, float))
+        }
+        for v, info in pkg_cls.versions.items()
+    }
+
+    variants = []
+    for when, variants_by_name in pkg_cls.variant_items():
+        for name, variant in variants_by_name.items():
+            values = None
+            if variant.values is not None:
+                # Values may be given as a set, so sort them for the index to be reproducible
+                values = sorted((_json_value(x) for x in variant.values), key=str)
+            variants.append(
+                {
+                    "when": str(when),
+                    "name": name,
+                    "default": _json_value(variant.default),
+                    "description": variant.description,
+                    "values": values,
+                    "multi": variant.multi,
+                    "sticky": variant.sticky,
+                    "precedence": variant.precedence,
+                }
+            )
+
+    dependencies = [
+        {
+            "when": str(when),
+            "name": name,
+            "spec": str(dependency.spec),
+            "depflag": dependency.depflag,
+            "patches": [
+                patch.sha256 for patches in dependency.patches.values() for patch in patches
+            ],
+        }
+        for when, dependencies_by_name in pkg_cls.dependencies.items()
+        for name, dependency in dependencies_by_name.items()
+    ]
+
+    provides = [
+        {
+            "when": str(when),
+            "names": sorted({v.name for v in virtuals}),
+            "virtuals": sorted(str(v) for v in virtuals),
+        }
+        for when, virtuals in pkg_cls.provided.items()
+    ]
+    conflicts = [
+        {"when": str(when), "spec": str(spec), "msg": msg}
+        for when, conflicts in pkg_cls.conflicts.items()
+        for spec, msg in conflicts
+    ]
+    patches = [
+        {"when": str(when), "sha256": [patch.sha256 for patch in patches]}
+        for when, patches in pkg_cls.patches.items()
+    ]
+    licenses = [{"when": str(when), "license": name} for when, name in pkg_cls.licenses.items()]
+
+    # Directives may be called in a loop over a set, so sort them for the index to be
+    # reproducible. Variants and licenses are kept in the order of their definitions instead,
+    # which is the order in which they take effect.
+    return {
+        "namespace": pkg_cls.namespace,
+        "doc": pkg_cls.__doc__,
+        "homepage": pkg_cls.homepage,
+        "build_system_class": pkg_cls.build_system_class,
+        "has_code": pkg_cls.has_code,
+        "maintainers": list(pkg_cls.maintainers),
+        "tags": list(getattr(pkg_cls, "tags", [])),
+        "licenses": licenses,
+        "versions": versions,
+        "version_urls": _version_urls(pkg_cls),
+        "variants": variants,
+        "dependencies": sorted(dependencies, key=lambda x: (x["name"], x["when"])),
+        "provides": sorted(provides, key=lambda x: x["when"]),
+        "conflicts": sorted(conflicts, key=lambda x: (x["when"], x["spec"], x["msg"] or "")),
+        "patches": sorted(patches, key=lambda x: x["when"]),
+    }
+
+
+class PackageMetadata:
+    """Metadata of a package, read from the index. It has the same interface as package classes
+    for the attributes that don't need to execute package code."""
+
+    def __init__(self, name: str, data: Dict[str, Any]) -> None:
+        self.name = name
+        self._data = data
+        self._versions: Optional[Dict[spack.version.StandardVersion, Dict[str, Any]]] = None
+        self._variants: "Optional[List[Tuple[spack.spec.Spec, spack.variant.Variant]]]" = None
+
+    @property
+    def namespace(self) -> str:
+        return self._data["namespace"]
+
+    @property
+    def fullname(self) -> str:
+        return f"{self.namespace}.{self.name}"
+
+    @property
+    def doc(self) -> Optional[str]:
+        """Docstring of the package class"""
+        return self._data["doc"]
+
+    @property
+    def homepage(self) -> Optional[str]:
+        return self._data["homepage"]
+
+    @property
+    def build_system_class(self) -> str:
+        return self._data["build_system_class"]
+
+    @property
+    def has_code(self) -> bool:
+        return self._data["has_code"]
+
+    @property
+    def maintainers(self) -> List[str]:
+        return self._data["maintainers"]
+
+    @property
+    def tags(self) -> List[str]:
+        return self._data["tags"]
+
+    @property
+    def versions(self) -> Dict[spack.version.StandardVersion, Dict[str, Any]]:
+        """Versions of the package, mapped to the attributes of the version directive that are
+        strings, numbers or booleans."""
+        if self._versions is None:
+            self._versions = {
+                spack.version.Version(v): info for v, info in self._data["versions"].items()
+            }
+        return self._versions
+
+    @property
+    def licenses(self) -> Dict[str, str]:
+        """License identifiers, keyed on the condition under which they apply"""
+        return {x["when"]: x["license"] for x in self._data["licenses"]}
+
+    @property
+    def version_urls(self) -> Optional[Dict[str, str]]:
+        """Description of the fetch strategy of each version, or None if it couldn't be
+        determined when the index was written"""
+        return self._data["version_urls"]
+
+    @property
+    def variants(self) -> List[Dict[str, Any]]:
+        """Definitions of variants in order of definition, without the ones that are always
+        overridden, with the keys ``when``, ``name``, ``default``, ``description``, ``values``,
+        ``multi``, ``sticky`` and ``precedence``"""
+        return self._data["variants"]
+
+    @property
+    def dependencies(self) -> List[Dict[str, Any]]:
+        """Dependencies, with the keys ``when``, ``name``, ``spec``, ``depflag`` and the
+        ``patches`` applied to them"""
+        return self._data["dependencies"]
+
+    @property
+    def provided(self) -> "Dict[spack.spec.Spec, Set[spack.spec.Spec]]":
+        """Provided virtuals, keyed on the condition under which they are provided"""
+        import spack.spec
+
+        return {
+            spack.spec.Spec(x["when"]): {spack.spec.Spec(v) for v in x["virtuals"]}
+            for x in self._data["provides"]
+        }
+
+    @property
+    def conflicts(self) -> List[Dict[str, Any]]:
+        """Conflicts, with the keys ``when``, ``spec`` and ``msg``"""
+        return self._data["conflicts"]
+
+    @property
+    def patches(self) -> List[Dict[str, Any]]:
+        """Patches, with the keys ``when`` and ``sha256``"""
+        return self._data["patches"]
+
+    def format_doc(self, **kwargs) -> str:
+        """Wrap doc string at 72 characters and format nicely"""
+        return format_doc(self.doc, kwargs.get("indent", 0))
+
+    def dependencies_of_type(self, deptypes: dt.DepFlag) -> Set[str]:
+        """Get names of dependencies that can possibly have these deptypes."""
+        return {d["name"] for d in self.dependencies if deptypes & d["depflag"]}
+
+    def provided_virtual_names(self) -> List[str]:
+        """Return sorted list of names of virtuals that can be provided by this package."""
+        return sorted({name for p in self._data["provides"] for name in p["names"]})
+
+    def _variant_definitions(self) -> "List[Tuple[spack.spec.Spec, spack.variant.Variant]]":
+        import spack.spec
+        import spack.variant
+
+        if self._variants is None:
+            self._variants = [
+                (
+                    spack.spec.Spec(x["when"]),
+                    spack.variant.Variant(
+                        x["name"],
+                        default=x["default"],
+                        description=x["description"],
+                        values="*" if x["values"] is None else x["values"],
+                        multi=x["multi"],
+                        sticky=x["sticky"],
+                        precedence=x["precedence"],
+                    ),
+                )
+                for x in self.variants
+            ]
+        return self._variants
+
+    def variant_names(self) -> List[str]:
+        return sorted({x["name"] for x in self.variants})
+
+    def variant_definitions(
+        self, name: str
+    ) -> "List[Tuple[spack.spec.Spec, spack.variant.Variant]]":
+        """List of (when_spec, Variant) for all the definitions of a variant, by precedence."""
+        definitions = [(when, v) for when, v in self._variant_definitions() if v.name == name]
+        return sorted(definitions, key=lambda x: x[1].precedence)
+
+    def variant_items(
+        self,
+    ) -> "Iterator[Tuple[spack.spec.Spec, Dict[str, spack.variant.Variant]]]":
+        """Iterate over the variant definitions grouped by their when spec, as the variant_items
+        method of package classes."""
+        by_when: Dict[str, Tuple[spack.spec.Spec, Dict[str, spack.variant.Variant]]] = {}
+        for when, variant in self._variant_definitions():
+            by_when.setdefault(str(when), (when, {}))[1][variant.name] = variant
+        return iter(by_when.values())
+
+
+class MetadataIndex(collections.abc.Mapping):
+    """Maps package names to their metadata."""
+
+    def __init__(self, repository) -> None:
+        self.repository = repository
+        # The metadata of each package is stored as a JSON string, and decoded only when the
+        # package is looked up: commands need the metadata of few packages, and reading the
+        # index is much faster when the metadata of all the packages is not decoded.
+        self._packages: Dict[str, str] = {}
+
+    def __getitem__(self, name: str) -> PackageMetadata:
+        return PackageMetadata(name, sjson.load(self._packages[name]))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._packages)
+
+    def __len__(self) -> int:
+        return len(self._packages)
+
+    def to_json(self, stream) -> None:
+        sjson.dump(
+            {"metadata_index": {"version": FORMAT_VERSION, "packages": self._packages}}, stream
+        )
+
+    @staticmethod
+    def from_json(stream, repository) -> "MetadataIndex":
+        data = sjson.load(stream)
+
+        if not isinstance(data, dict) or "metadata_index" not in data:
+            raise MetadataIndexError("MetadataIndex data does not start with 'metadata_index'")
+
+        version = data["metadata_index"].get("version")
+        if version != FORMAT_VERSION:
+            raise MetadataIndexError(f"unsupported version {version} of the MetadataIndex")
+
+        index = MetadataIndex(repository=repository)
+        index._packages = data["metadata_index"]["packages"]
+        return index
+
+    def copy(self) -> "MetadataIndex":
+        """Return a copy of this index."""
+        clone = MetadataIndex(repository=self.repository)
+        clone._packages = dict(self._packages)
+        return clone
+
+    def merge(self, other: "MetadataIndex") -> None:
+        """Merge another metadata index into this one. Packages in the other index take
+        precedence.
+
+        Args:
+            other: metadata index to be merged
+        """
+        self._packages.update(other._packages)
+
+    def update_package(self, pkg_name: str) -> None:
+        """Updates the metadata of a package, or removes it if the package doesn't exist
+        anymore.
+
+        Args:
+            pkg_name: name of the package to be updated
+        """
+        if not self.repository.exists(pkg_name):
+            self._packages.pop(pkg_name, None)
+            return
+        self._packages[pkg_name] = sjson.dump(
+            _package_metadata(self.repository.get_pkg_class(pkg_name))
+        )
+
+    def remove_packages(self, pkg_names: Set[str]) -> None:
+        """Removes packages from the index.
+
+        Args:
+            pkg_names: names of the packages to be removed
+        """
+        for pkg_name in pkg_names:
+            self._packages.pop(pkg_name, None)
+
+
+class MetadataIndexError(spack.error.SpackError):
+    """Raised when there is a problem with a MetadataIndex."""
@@ -41,10 +41,8 @@
 import llnl.util.tty as tty
 from llnl.util.lang import dedupe, memoized
 
-import spack.build_environment
 import spack.config
 import spack.deptypes as dt
-import spack.environment
 import spack.error
 import spack.paths
 import spack.projections as proj
@@ -52,7 +50,6 @@
 import spack.spec
 import spack.store
 import spack.tengine as tengine
-import spack.user_environment
 import spack.util.environment
 import spack.util.file_permissions as fp
 import spack.util.path
@@ -622,6 +619,11 @@ def modification_needs_formatting(self, modification):
     @memoized
     def environment_modifications(self):
         """List of environment modifications to be processed."""
+        # Imported here, since they're slow to import and not needed to compute module roots
+        import spack.build_environment
+        import spack.environment
+        import spack.user_environment
+
         # Modifications guessed by inspecting the spec prefix
         prefix_inspections = syaml.syaml_dict()
         spack.config.merge_yaml(
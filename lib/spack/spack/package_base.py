@@ -16,11 +16,8 @@
 import glob
 import hashlib
 import importlib
-import io
 import os
-import re
 import sys
-import textwrap
 import time
 import traceback
 import typing
@@ -42,6 +39,7 @@
 import spack.error
 import spack.fetch_strategy as fs
 import spack.hooks
+import spack.metadata_index
 import spack.mirror
 import spack.multimethod
 import spack.patch
@@ -2225,17 +2223,7 @@ def do_clean(self):
     @classmethod
     def format_doc(cls, **kwargs):
         """Wrap doc string at 72 characters and format nicely"""
-        indent = kwargs.get("indent", 0)
-
-        if not cls.__doc__:
-            return ""
-
-        doc = re.sub(r"\s+", " ", cls.__doc__)
-        lines = textwrap.wrap(doc, 72)
-        results = io.StringIO()
-        for line in lines:
-            results.write((" " * indent) + line + "\n")
-        return results.getvalue()
+        return spack.metadata_index.format_doc(cls.__doc__, kwargs.get("indent", 0))
 
     @property
     def all_urls(self) -> List[str]:
@@ -8,7 +8,7 @@
 import os.path
 import pathlib
 import sys
-from typing import Any, Dict, Optional, Tuple, Type, Union
+from typing import Any, Dict, Optional, Set, Tuple, Type, Union
 
 import llnl.util.filesystem
 from llnl.url import allowed_archive
@@ -511,11 +511,26 @@ def update_package(self, pkg_fullname: str) -> None:
             pkg_fullname: package to update.
         """
         # remove this package from any patch entries that reference it.
+        self.remove_packages({pkg_fullname})
+
+        # update the index with per-package patch indexes
+        pkg_cls = self.repository.get_pkg_class(pkg_fullname)
+        partial_index = self._index_patches(pkg_cls, self.repository)
+        for sha256, package_to_patch in partial_index.items():
+            p2p = self.index.setdefault(sha256, {})
+            p2p.update(package_to_patch)
+
+    def remove_packages(self, pkg_fullnames: Set[str]) -> None:
+        """Remove the patches owned by packages from the cache, in a single pass.
+
+        Args:
+            pkg_fullnames: fully qualified names of the packages
+        """
         empty = []
         for sha256, package_to_patch in self.index.items():
             remove = []
             for fullname, patch_dict in package_to_patch.items():
-                if patch_dict["owner"] == pkg_fullname:
+                if patch_dict["owner"] in pkg_fullnames:
                     remove.append(fullname)
 
             for fullname in remove:
@@ -528,13 +543,6 @@ def update_package(self, pkg_fullname: str) -> None:
         for sha256 in empty:
             del self.index[sha256]
 
-        # update the index with per-package patch indexes
-        pkg_cls = self.repository.get_pkg_class(pkg_fullname)
-        partial_index = self._index_patches(pkg_cls, self.repository)
-        for sha256, package_to_patch in partial_index.items():
-            p2p = self.index.setdefault(sha256, {})
-            p2p.update(package_to_patch)
-
     def update(self, other: "PatchCache") -> None:
         """Update this cache with the contents of another.
 
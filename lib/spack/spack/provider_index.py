@@ -196,11 +196,19 @@ def merge(self, other):
 
     def remove_provider(self, pkg_name):
         """Remove a provider from the ProviderIndex."""
+        self.remove_providers({pkg_name})
+
+    def remove_providers(self, pkg_names: Set[str]) -> None:
+        """Remove several providers from the ProviderIndex, in a single pass.
+
+        Args:
+            pkg_names: fully qualified names of the providers
+        """
         empty_pkg_dict = []
         for pkg, pkg_dict in self.providers.items():
             empty_pset = []
             for provided, pset in pkg_dict.items():
-                same_name = set(p for p in pset if p.fullname == pkg_name)
+                same_name = set(p for p in pset if p.fullname in pkg_names)
                 pset.difference_update(same_name)
 
                 if not pset:
@@ -324,6 +324,9 @@ def _set_elf_rpaths_and_interpreter(
 ) -> Optional[str]:
     """Replace the original RPATH of the target with the paths passed as arguments.
 
+    The target is modified in-process when possible, and with ``patchelf`` otherwise. Either
+    way, the paths are set in a DT_RPATH entry, also when the target had a DT_RUNPATH entry.
+
     Args:
         target: target executable. Must be an ELF object.
         rpaths: paths to be set in the RPATH
@@ -335,6 +338,17 @@ def _set_elf_rpaths_and_interpreter(
     # Join the paths using ':' as a separator
     rpaths_str = ":".join(rpaths)
 
+    try:
+        elf.set_rpath_and_pt_interp(
+            target,
+            rpath=rpaths_str.encode("utf-8"),
+            pt_interp=interpreter.encode("utf-8") if interpreter else None,
+            force_rpath=True,
+        )
+        return None
+    except (elf.ElfCStringUpdatesFailed, elf.ElfParsingError):
+        pass
+
     try:
         # TODO: error handling is not great here?
         # TODO: revisit the use of --force-rpath as it might be conditional
@@ -473,6 +487,18 @@ def new_relocate_elf_binaries(binaries, prefix_to_prefix):
         try:
             elf.substitute_rpath_and_pt_interp_in_place_or_raise(path, prefix_to_prefix)
         except elf.ElfCStringUpdatesFailed as e:
+            # The new strings are longer, so they are moved to a new segment of the file. Like
+            # the patchelf fallback, this sets a DT_RPATH entry.
+            try:
+                elf.set_rpath_and_pt_interp(
+                    path,
+                    rpath=e.rpath.new_value if e.rpath else None,
+                    pt_interp=e.pt_interp.new_value if e.pt_interp else None,
+                    force_rpath=True,
+                )
+                continue
+            except elf.ElfCStringUpdatesFailed:
+                pass
             # Fall back to `patchelf --set-rpath ... --set-interpreter ...`
             rpaths = e.rpath.new_value.decode("utf-8").split(":") if e.rpath else []
             interpreter = e.pt_interp.new_value.decode("utf-8") if e.pt_interp else None
@@ -610,7 +636,8 @@ def relocate_text(files, prefixes):
 def relocate_text_bin(binaries, prefixes):
     """Replace null terminated path strings hard-coded into binaries.
 
-    The new install prefix must be shorter than the original one.
+    The new install prefix must be shorter than the original one. Large binaries are mapped
+    in memory one chunk at a time, rather than being read in full.
 
     Args:
         binaries (list): binaries to be relocated
@@ -6,9 +6,11 @@
 """This module contains pure-Python classes and functions for replacing
 paths inside text files and binaries."""
 
+import mmap
+import os
 import re
 from collections import OrderedDict
-from typing import Dict, Union
+from typing import Dict, Iterator, Match, Optional, Union
 
 import spack.error
 
@@ -48,6 +50,14 @@ def filter_identity_mappings(prefix_to_prefix):
     return OrderedDict((k, v) for (k, v) in prefix_to_prefix.items() if k != v)
 
 
+def _size_of(f) -> Optional[int]:
+    """Returns the size of the file underlying a file object, or None if there is no such file"""
+    try:
+        return os.fstat(f.fileno()).st_size
+    except OSError:  # e.g. in-memory streams
+        return None
+
+
 class PrefixReplacer:
     """Base class for applying a prefix to prefix map
     to a list of binaries or text files.
@@ -134,6 +144,14 @@ def _apply_to_file(self, f):
 
 
 class BinaryFilePrefixReplacer(PrefixReplacer):
+    #: Files at least this large are mapped in memory one chunk at a time, instead of being
+    #: read in full
+    mmap_threshold = 64 * 1024 * 1024
+
+    #: Size of the chunks of large files, rounded down to a multiple of the allocation
+    #: granularity of memory maps
+    chunk_size = 16 * 1024 * 1024
+
     def __init__(self, prefix_to_prefix, suffix_safety_size=7):
         """
         prefix_to_prefix (OrderedDict): OrderedDictionary where the keys are
@@ -205,58 +223,91 @@ def _apply_to_file(self, f):
         """
         assert f.tell() == 0
 
-        # We *could* read binary data in chunks to avoid loading all in memory,
-        # but it's nasty to deal with matches across boundaries, so let's stick to
-        # something simple.
-
         modified = True
 
-        for match in self.regex.finditer(f.read()):
-            # The matching prefix (old) and its replacement (new)
-            old = match.group(1)
-            new = self.prefix_to_prefix[old]
-
-            # Did we find a trailing null within a N + 1 bytes window after the prefix?
-            null_terminated = match.end(0) > match.end(1)
-
-            # Suffix string length, excluding the null byte
-            # Only makes sense if null_terminated
-            suffix_strlen = match.end(0) - match.end(1) - 1
-
-            # How many bytes are we shrinking our string?
-            bytes_shorter = len(old) - len(new)
-
-            # We can't make strings larger.
-            if bytes_shorter < 0:
-                raise CannotGrowString(old, new)
-
-            # If we don't know whether this is a null terminated C-string (we're looking
-            # only N + 1 bytes ahead), or if it is and we have a common suffix, we can
-            # simply pad with leading dir separators.
-            elif (
-                not null_terminated
-                or suffix_strlen >= self.suffix_safety_size  # == is enough, but let's be defensive
-                or old[-self.suffix_safety_size + suffix_strlen :]
-                == new[-self.suffix_safety_size + suffix_strlen :]
-            ):
-                replacement = b"/" * bytes_shorter + new
-
-            # If it *was* null terminated, all that matters is that we can leave N bytes
-            # of old suffix in place. Note that > is required since we also insert an
-            # additional null terminator.
-            elif bytes_shorter > self.suffix_safety_size:
-                replacement = new + match.group(2)  # includes the trailing null
-
-            # Otherwise... we can't :(
-            else:
-                raise CannotShrinkCString(old, new, match.group()[:-1])
+        size = _size_of(f)
+        if size is not None and size >= self.mmap_threshold:
+            # Large files are mapped in memory one chunk at a time, so that memory usage
+            # doesn't depend on their size.
+            for _ in self._apply_to_mapped_file(f, size):
+                modified = True
+            return modified
 
+        for match in self.regex.finditer(f.read()):
             f.seek(match.start())
-            f.write(replacement)
+            f.write(self._replacement_for(match))
             modified = True
 
         return modified
 
+    def _replacement_for(self, match: Match) -> bytes:
+        """Returns the bytes to be written at the start of a match of the prefix regex"""
+        # The matching prefix (old) and its replacement (new)
+        old = match.group(1)
+        new = self.prefix_to_prefix[old]
+
+        # Did we find a trailing null within a N + 1 bytes window after the prefix?
+        null_terminated = match.end(0) > match.end(1)
+
+        # Suffix string length, excluding the null byte
+        # Only makes sense if null_terminated
+        suffix_strlen = match.end(0) - match.end(1) - 1
+
+        # How many bytes are we shrinking our string?
+        bytes_shorter = len(old) - len(new)
+
+        # We can't make strings larger.
+        if bytes_shorter < 0:
+            raise CannotGrowString(old, new)
+
+        # If we don't know whether this is a null terminated C-string (we're looking
+        # only N + 1 bytes ahead), or if it is and we have a common suffix, we can
+        # simply pad with leading dir separators.
+        elif (
+            not null_terminated
+            or suffix_strlen >= self.suffix_safety_size  # == is enough, but let's be defensive
+            or old[-self.suffix_safety_size + suffix_strlen :]
+            == new[-self.suffix_safety_size + suffix_strlen :]
+        ):
+            return b"/" * bytes_shorter + new
+
+        # If it *was* null terminated, all that matters is that we can leave N bytes
+        # of old suffix in place. Note that > is required since we also insert an
+        # additional null terminator.
+        elif bytes_shorter > self.suffix_safety_size:
+            return new + match.group(2)  # includes the trailing null
+
+        # Otherwise... we can't :(
+        else:
+            raise CannotShrinkCString(old, new, match.group()[:-1])
+
+    def _apply_to_mapped_file(self, f, size: int) -> Iterator[int]:
+        """Applies the replacements to a file, mapping in memory one chunk at a time.
+        Yields the offset of each replacement.
+
+        A match must start within a chunk, but may end in the next one: the mapping of each
+        chunk overlaps with the next one by the maximum length of a match, and matches that
+        start in the overlap are left to the next chunk. The regex is run with the same
+        starting position as it would be on the entire file, so the same matches are found.
+        """
+        granularity = mmap.ALLOCATIONGRANULARITY
+        chunk_size = max(granularity, self.chunk_size // granularity * granularity)
+        overlap = max(len(p) for p in self.prefix_to_prefix) + self.suffix_safety_size + 1
+
+        # Offset in the file where the regex resumes scanning
+        position = 0
+        for start in range(0, size, chunk_size):
+            end = start + chunk_size
+            length = min(end + overlap, size) - start
+            with mmap.mmap(f.fileno(), length, offset=start, access=mmap.ACCESS_WRITE) as m:
+                for match in self.regex.finditer(m, max(position - start, 0)):
+                    if start + match.start() >= end:
+                        break
+                    replacement = self._replacement_for(match)
+                    m[match.start() : match.start() + len(replacement)] = replacement
+                    position = start + match.end()
+                    yield start + match.start()
+
 
 class BinaryStringReplacementError(spack.error.SpackError):
     def __init__(self, file_path, old_len, new_len):
@@ -9,13 +9,17 @@
 import difflib
 import errno
 import functools
+import glob
+import hashlib
 import importlib
 import importlib.machinery
 import importlib.util
 import inspect
 import itertools
+import multiprocessing
 import os
 import os.path
+import platform
 import random
 import re
 import shutil
@@ -26,7 +30,7 @@
 import types
 import uuid
 import warnings
-from typing import Any, Dict, Generator, List, Optional, Set, Tuple, Type, Union
+from typing import Any, Dict, Generator, List, Optional, Sequence, Set, Tuple, Type, Union
 
 import llnl.path
 import llnl.util.filesystem as fs
@@ -37,14 +41,20 @@
 import spack.caches
 import spack.config
 import spack.error
+import spack.metadata_index
 import spack.patch
+import spack.paths
 import spack.provider_index
 import spack.repo
 import spack.spec
 import spack.tag
+import spack.util.cpus
+import spack.util.executable
 import spack.util.git
 import spack.util.naming as nm
+import spack.util.parallel
 import spack.util.path
+import spack.util.spack_json as sjson
 import spack.util.spack_yaml as syaml
 
 #: Package modules are imported as spack.pkg.<repo-namespace>.<pkg-name>
@@ -374,6 +384,43 @@ def __getattr__(self, name):
         return getattr(self, name)
 
 
+#: Version of the format of the snapshots of package checkers
+PACKAGE_SNAPSHOT_VERSION = 1
+
+
+def _changed_packages(paths: Sequence[str], prefix: str) -> Set[str]:
+    """Returns the names of the packages containing a list of paths reported by git. Untracked
+    directories are reported as a single path ending with a slash.
+
+    Args:
+        paths: paths relative to the root of the git work tree
+        prefix: path of the packages directory relative to the root of the git work tree
+    """
+    names = {p[len(prefix) :].split("/", 1)[0] for p in paths if p.startswith(prefix)}
+    names.discard("")
+    return names
+
+
+def _parse_git_status(output: str) -> Tuple[str, List[str]]:
+    """Parses the output of ``git status --porcelain=v2 --branch -z``, and returns the commit
+    of HEAD together with the paths that differ from it."""
+    commit, paths = "", []
+    fields = iter(output.split("\0"))
+    for field in fields:
+        if field.startswith("# branch.oid "):
+            commit = field[len("# branch.oid ") :]
+        elif field.startswith("1 "):
+            paths.append(field.split(" ", 8)[-1])
+        elif field.startswith("2 "):
+            # Renames and copies are followed by the original path
+            paths.extend((field.split(" ", 9)[-1], next(fields, "")))
+        elif field.startswith("u "):
+            paths.append(field.split(" ", 10)[-1])
+        elif field.startswith("? "):
+            paths.append(field[2:])
+    return commit, paths
+
+
 class FastPackageChecker(collections.abc.Mapping):
     """Cache that maps package names to the stats obtained on the
     'package.py' files associated with them.
@@ -381,15 +428,33 @@ class FastPackageChecker(collections.abc.Mapping):
     For each repository a cache is maintained at class level, and shared among
     all instances referring to it. Update of the global cache is done lazily
     during instance initialization.
+
+    With the ``git`` change detection, the stats are also persisted in a snapshot in
+    the misc cache, together with the commit of the git work tree containing the
+    repository. When a new process starts, ``git status`` and ``git diff`` report which
+    packages changed since the snapshot was taken, and only those are stat'ed again.
+    Repositories that are not in a git work tree fall back to stat'ing every package.
     """
 
     #: Global cache, reused by every instance
     _paths_cache: Dict[str, Dict[str, os.stat_result]] = {}
 
-    def __init__(self, packages_path):
+    def __init__(
+        self,
+        packages_path: str,
+        namespace: Optional[str] = None,
+        *,
+        cache: Optional["spack.caches.FileCacheType"] = None,
+        change_detection: str = "stat",
+    ) -> None:
         # The path of the repository managed by this instance
         self.packages_path = packages_path
 
+        #: Snapshots are stored in this cache, when changes are detected with git
+        self.namespace = namespace
+        self.cache = cache
+        self.change_detection = change_detection
+
         # If the cache we need is not there yet, then build it appropriately
         if packages_path not in self._paths_cache:
             self._paths_cache[packages_path] = self._create_new_cache()
@@ -403,6 +468,22 @@ def invalidate(self):
         self._packages_to_stats = self._paths_cache[self.packages_path]
 
     def _create_new_cache(self) -> Dict[str, os.stat_result]:
+        """Create a new cache for packages in a repo, either from a snapshot updated with
+        the changes reported by git, or by stat'ing every package."""
+        if self.change_detection == "git" and self.cache is not None and self.namespace:
+            try:
+                return self._create_from_snapshot()
+            except (
+                spack.util.executable.ProcessError,
+                OSError,
+                KeyError,
+                TypeError,
+                ValueError,
+            ) as e:
+                tty.debug(f"Cannot detect changes in {self.packages_path} with git: {e}")
+        return self._stat_all_packages()
+
+    def _stat_all_packages(self) -> Dict[str, os.stat_result]:
         """Create a new cache for packages in a repo.
 
         The implementation here should try to minimize filesystem
@@ -414,42 +495,152 @@ def _create_new_cache(self) -> Dict[str, os.stat_result]:
         # package name and its stat info
         cache: Dict[str, os.stat_result] = {}
         for pkg_name in os.listdir(self.packages_path):
-            # Skip non-directories in the package root.
-            pkg_dir = os.path.join(self.packages_path, pkg_name)
-
-            # Warn about invalid names that look like packages.
-            if not nm.valid_module_name(pkg_name):
-                if not pkg_name.startswith(".") and pkg_name != "repo.yaml":
-                    tty.warn(
-                        'Skipping package at {0}. "{1}" is not '
-                        "a valid Spack module name.".format(pkg_dir, pkg_name)
-                    )
-                continue
+            sinfo = self._stat_package(pkg_name)
+            if sinfo is not None:
+                cache[pkg_name] = sinfo
+        return cache
+
+    def _stat_package(self, pkg_name: str) -> Optional[os.stat_result]:
+        """Returns the stat info of the package.py file of a package, or None if the
+        directory doesn't contain a valid package."""
+        # Skip non-directories in the package root.
+        pkg_dir = os.path.join(self.packages_path, pkg_name)
+
+        # Warn about invalid names that look like packages.
+        if not nm.valid_module_name(pkg_name):
+            if not pkg_name.startswith(".") and pkg_name != "repo.yaml":
+                tty.warn(
+                    'Skipping package at {0}. "{1}" is not '
+                    "a valid Spack module name.".format(pkg_dir, pkg_name)
+                )
+            return None
+
+        # Construct the file name from the directory
+        pkg_file = os.path.join(self.packages_path, pkg_name, package_file_name)
+
+        # Use stat here to avoid lots of calls to the filesystem.
+        try:
+            sinfo = os.stat(pkg_file)
+        except OSError as e:
+            if e.errno in (errno.ENOENT, errno.ENOTDIR):
+                # No package.py file here.
+                return None
+            elif e.errno == errno.EACCES:
+                tty.warn("Can't read package file %s." % pkg_file)
+                return None
+            raise e
+
+        # If it's not a file, skip it.
+        if stat.S_ISDIR(sinfo.st_mode):
+            return None
 
-            # Construct the file name from the directory
-            pkg_file = os.path.join(self.packages_path, pkg_name, package_file_name)
+        return sinfo
 
-            # Use stat here to avoid lots of calls to the filesystem.
+    def _snapshot_key(self) -> str:
+        return f"package_checker/{self.namespace}.json"
+
+    def _read_snapshot(self) -> Optional[Dict[str, Any]]:
+        """Returns the snapshot of this repository, or None if it doesn't exist or refers to
+        a different directory."""
+        key = self._snapshot_key()
+        if not self.cache.init_entry(key):
+            return None
+
+        with self.cache.read_transaction(key) as f:
             try:
-                sinfo = os.stat(pkg_file)
-            except OSError as e:
-                if e.errno == errno.ENOENT:
-                    # No package.py file here.
-                    continue
-                elif e.errno == errno.EACCES:
-                    tty.warn("Can't read package file %s." % pkg_file)
-                    continue
-                raise e
+                snapshot = sjson.load(f)
+            except ValueError:
+                return None
+
+        if (
+            not isinstance(snapshot, dict)
+            or snapshot.get("version") != PACKAGE_SNAPSHOT_VERSION
+            or snapshot.get("packages_path") != self.packages_path
+        ):
+            return None
+        return snapshot
 
-            # If it's not a file, skip it.
-            if stat.S_ISDIR(sinfo.st_mode):
-                continue
+    def _create_from_snapshot(self) -> Dict[str, os.stat_result]:
+        """Create a new cache for packages in a repo from its last snapshot, and stat only the
+        packages that were modified since then, according to git.
 
-            # If it is a file, then save the stats under the
-            # appropriate key
-            cache[pkg_name] = sinfo
+        Packages are considered modified if they are dirty in the work tree, were dirty when
+        the snapshot was taken, or changed between the commit of the snapshot and HEAD.
+        """
+        git = spack.util.git.git()
+        if git is None:
+            return self._stat_all_packages()
+
+        snapshot = self._read_snapshot()
+        with working_dir(self.packages_path):
+            if snapshot is None:
+                prefix = git("rev-parse", "--show-prefix", output=str, error=os.devnull).strip()
+            else:
+                prefix = snapshot["prefix"]
+
+            commit, paths = _parse_git_status(
+                git(
+                    "status",
+                    "--porcelain=v2",
+                    "--branch",
+                    # Unlike "all", this mode can use core.untrackedCache
+                    "--untracked-files=normal",
+                    "-z",
+                    "--",
+                    ".",
+                    output=str,
+                    error=os.devnull,
+                )
+            )
+            dirty = _changed_packages(paths, prefix)
 
-        return cache
+            if snapshot is None:
+                packages = self._stat_all_packages()
+            else:
+                packages = {
+                    name: os.stat_result(values[:-1], {"st_mtime": values[-1]})
+                    for name, values in snapshot["packages"].items()
+                }
+                modified = dirty | set(snapshot["dirty"])
+                if commit != snapshot["commit"]:
+                    diff = git(
+                        "diff",
+                        "--name-only",
+                        "-z",
+                        snapshot["commit"],
+                        commit,
+                        "--",
+                        ".",
+                        output=str,
+                        error=os.devnull,
+                    )
+                    modified |= _changed_packages(diff.split("\0"), prefix)
+                elif not modified:
+                    return packages
+
+                for pkg_name in modified:
+                    sinfo = self._stat_package(pkg_name)
+                    if sinfo is None:
+                        packages.pop(pkg_name, None)
+                    else:
+                        packages[pkg_name] = sinfo
+
+        with self.cache.write_transaction(self._snapshot_key()) as (old, new):
+            sjson.dump(
+                {
+                    "version": PACKAGE_SNAPSHOT_VERSION,
+                    "packages_path": self.packages_path,
+                    "prefix": prefix,
+                    "commit": commit,
+                    "dirty": sorted(dirty),
+                    "packages": {
+                        name: [*sinfo[:10], sinfo.st_mtime] for name, sinfo in packages.items()
+                    },
+                },
+                new,
+            )
+
+        return packages
 
     def last_mtime(self):
         return max(sinfo.st_mtime for sinfo in self._packages_to_stats.values())
@@ -509,6 +700,19 @@ def update(self, pkg_fullname):
     def write(self, stream):
         """Write the index to a file object."""
 
+    def merge(self, pkg_fullnames, partial_index):
+        """Update the index in memory with information about several packages, computed by
+        ``update`` on an empty index in another process.
+
+        The default implementation ignores the partial index, and updates each package again.
+
+        Args:
+            pkg_fullnames (list): fully qualified names of the packages in the partial index
+            partial_index: index with information only about these packages
+        """
+        for pkg_fullname in pkg_fullnames:
+            self.update(pkg_fullname)
+
 
 class TagIndexer(Indexer):
     """Lifecycle methods for a TagIndex on a Repo."""
@@ -525,6 +729,10 @@ def update(self, pkg_fullname):
     def write(self, stream):
         self.index.to_json(stream)
 
+    def merge(self, pkg_fullnames, partial_index):
+        self.index.remove_packages({x.split(".")[-1] for x in pkg_fullnames})
+        self.index.merge(partial_index)
+
 
 class ProviderIndexer(Indexer):
     """Lifecycle methods for virtual package providers."""
@@ -548,6 +756,10 @@ def update(self, pkg_fullname):
     def write(self, stream):
         self.index.to_json(stream)
 
+    def merge(self, pkg_fullnames, partial_index):
+        self.index.remove_providers(set(pkg_fullnames))
+        self.index.merge(partial_index)
+
 
 class PatchIndexer(Indexer):
     """Lifecycle methods for patch cache."""
@@ -571,6 +783,88 @@ def write(self, stream):
     def update(self, pkg_fullname):
         self.index.update_package(pkg_fullname)
 
+    def merge(self, pkg_fullnames, partial_index):
+        self.index.remove_packages(set(pkg_fullnames))
+        self.index.update(partial_index)
+
+
+def _library_files() -> List[str]:
+    """Returns the files of Spack's library defining attributes that packages inherit, e.g. the
+    variants of build systems, which are stored in the metadata index."""
+    return [
+        os.path.join(spack.paths.module_path, "package_base.py"),
+        os.path.join(spack.paths.module_path, "directives.py"),
+        *glob.glob(os.path.join(spack.paths.build_systems_path, "*.py")),
+    ]
+
+
+def _library_fingerprint() -> str:
+    """Returns a digest of the version of Spack and the stats of the files of its library that
+    affect the metadata of packages, so that they are indexed again when Spack is updated."""
+    items = [spack.spack_version]
+    for path in sorted(_library_files()):
+        try:
+            sinfo = os.stat(path)
+        except OSError:
+            continue
+        items.append(f"{path}:{sinfo.st_mtime_ns}:{sinfo.st_size}")
+    return hashlib.sha256("\n".join(items).encode()).hexdigest()[:10]
+
+
+def metadata_index_name() -> str:
+    """Returns the name of the index of package metadata. It contains the version of its format,
+    so that caches written in another format are regenerated rather than read, a fingerprint of
+    the library of Spack, since packages inherit attributes from build systems, and the host
+    platform, since some packages declare different versions on different hosts (e.g. ``cuda``),
+    and the cache may be shared by hosts of different platforms.
+    """
+    system, machine = platform.system().lower(), platform.machine().lower()
+    fingerprint = _library_fingerprint()
+    return f"metadata-v{spack.metadata_index.FORMAT_VERSION}-{system}-{machine}-{fingerprint}"
+
+
+class MetadataIndexer(Indexer):
+    """Lifecycle methods for the index of package metadata."""
+
+    def _create(self):
+        return spack.metadata_index.MetadataIndex(repository=self.repository)
+
+    def read(self, stream):
+        self.index = spack.metadata_index.MetadataIndex.from_json(stream, self.repository)
+
+    def update(self, pkg_fullname):
+        self.index.update_package(pkg_fullname.split(".")[-1])
+
+    def write(self, stream):
+        self.index.to_json(stream)
+
+    def merge(self, pkg_fullnames, partial_index):
+        self.index.remove_packages({x.split(".")[-1] for x in pkg_fullnames})
+        self.index.merge(partial_index)
+
+
+def _index_packages(
+    indexer_types: Dict[str, Type[Indexer]], repository: "Repo", pkg_names: Dict[str, List[str]]
+) -> Dict[str, Any]:
+    """Indexes packages in a worker process, starting from empty indexes.
+
+    Args:
+        indexer_types: type of the indexer of each index
+        repository: repository of the packages
+        pkg_names: fully qualified names of the packages to be indexed, for each index
+
+    Returns:
+        The partial index with information about the packages, for each index
+    """
+    result = {}
+    for name, indexer_type in indexer_types.items():
+        indexer = indexer_type(repository)
+        indexer.create()
+        for pkg_fullname in pkg_names[name]:
+            indexer.update(pkg_fullname)
+        result[name] = indexer.index
+    return result
+
 
 class RepoIndex:
     """Container class that manages a set of Indexers for a Repo.
@@ -628,15 +922,85 @@ def _build_all_indexes(self):
         because the main bottleneck here is loading all the packages.  It
         can take tens of seconds to regenerate sequentially, and we'd
         rather only pay that cost once rather than on several
-        invocations."""
+        invocations. When many packages need an update, they are loaded
+        and indexed in parallel."""
+        needs_update = {
+            name: self.checker.modified_since(self.cache.mtime(self._cache_filename(name)))
+            for name in self.indexers
+        }
+        partial_indexes = self._index_in_parallel(needs_update)
         for name, indexer in self.indexers.items():
-            self.indexes[name] = self._build_index(name, indexer)
+            self.indexes[name] = self._build_index(name, indexer, partial_indexes.get(name, []))
+
+    def _cache_filename(self, name: str) -> str:
+        # Filename of the index cache (we assume they're all json)
+        return f"{name}/{self.namespace}-index.json"
+
+    def _index_in_parallel(
+        self, needs_update: Dict[str, List[str]]
+    ) -> Dict[str, List[Tuple[List[str], Any]]]:
+        """Index the packages that need an update in a pool of processes.
+
+        Args:
+            needs_update: names of the packages that need an update, for each index
+
+        Returns:
+            For each index, the partial indexes computed by the workers, together with the
+            fully qualified names of the packages in each of them. Packages of workers that
+            failed are not in the result.
+        """
+        # Repositories don't depend on configuration, so this scales with the number of CPUs
+        jobs = spack.util.cpus.cpus_available()
+        n_packages = len(set().union(*needs_update.values()))
+        if jobs < 2 or n_packages < 2 * jobs or multiprocessing.get_start_method() != "fork":
+            return {}
+
+        repository = next(iter(self.indexers.values())).repository
+        indexer_types = {
+            name: type(self.indexers[name])
+            for name, pkg_names in needs_update.items()
+            if pkg_names
+        }
+        # Several chunks per process, so that a slow package doesn't keep other processes idle
+        n_chunks = min(4 * jobs, n_packages)
+        chunks = [
+            {
+                name: [f"{self.namespace}.{x}" for x in needs_update[name][i::n_chunks]]
+                for name in indexer_types
+            }
+            for i in range(n_chunks)
+        ]
 
-    def _build_index(self, name: str, indexer: Indexer):
-        """Determine which packages need an update, and update indexes."""
+        tty.debug(f"Indexing {n_packages} packages of {self.namespace} with {jobs} processes")
+        result: Dict[str, List[Tuple[List[str], Any]]] = collections.defaultdict(list)
+        task = spack.util.parallel.Task(_index_packages)
+        with spack.util.parallel.make_concurrent_executor(jobs) as executor:
+            futures = [
+                (chunk, executor.submit(task, indexer_types, repository, chunk))
+                for chunk in chunks
+            ]
+            for chunk, future in futures:
+                partial_indexes = future.result()
+                if isinstance(partial_indexes, spack.util.parallel.ErrorFromWorker):
+                    # These packages are indexed again in this process, to report the error
+                    tty.debug(partial_indexes.stacktrace)
+                    continue
+                for name, partial_index in partial_indexes.items():
+                    result[name].append((chunk[name], partial_index))
+        return result
 
-        # Filename of the provider index cache (we assume they're all json)
-        cache_filename = f"{name}/{self.namespace}-index.json"
+    def _build_index(
+        self, name: str, indexer: Indexer, partial_indexes: Sequence[Tuple[List[str], Any]] = ()
+    ):
+        """Determine which packages need an update, and update indexes.
+
+        Args:
+            name: name of the index
+            indexer: indexer of the index
+            partial_indexes: partial indexes already computed, with the fully qualified names of
+                their packages
+        """
+        cache_filename = self._cache_filename(name)
 
         # Compute which packages needs to be updated in the cache
         index_mtime = self.cache.mtime(cache_filename)
@@ -659,8 +1023,15 @@ def _build_index(self, name: str, indexer: Indexer):
                 if new_index_mtime != index_mtime:
                     needs_update = self.checker.modified_since(new_index_mtime)
 
+                # Packages indexed already are still up to date, even if not needed anymore
+                indexed = set()
+                for pkg_fullnames, partial_index in partial_indexes:
+                    indexer.merge(pkg_fullnames, partial_index)
+                    indexed.update(pkg_fullnames)
+
                 for pkg_name in needs_update:
-                    indexer.update(f"{self.namespace}.{pkg_name}")
+                    if f"{self.namespace}.{pkg_name}" not in indexed:
+                        indexer.update(f"{self.namespace}.{pkg_name}")
 
                 indexer.write(new)
 
@@ -678,6 +1049,7 @@ class RepoPath:
         repos: list Repo objects or paths to put in this RepoPath
         cache: file cache associated with this repository
         overrides: dict mapping package name to class attribute overrides for that package
+        change_detection: how modified packages are detected, either ``"stat"`` or ``"git"``
     """
 
     def __init__(
@@ -685,19 +1057,23 @@ def __init__(
         *repos: Union[str, "Repo"],
         cache: Optional["spack.caches.FileCacheType"],
         overrides: Optional[Dict[str, Any]] = None,
+        change_detection: str = "stat",
     ) -> None:
         self.repos: List[Repo] = []
         self.by_namespace = nm.NamespaceTrie()
         self._provider_index: Optional[spack.provider_index.ProviderIndex] = None
         self._patch_index: Optional[spack.patch.PatchCache] = None
         self._tag_index: Optional[spack.tag.TagIndex] = None
+        self._metadata_index: Optional[spack.metadata_index.MetadataIndex] = None
 
         # Add each repo to this path.
         for repo in repos:
             try:
                 if isinstance(repo, str):
                     assert cache is not None, "cache must hold a value, when repo is a string"
-                    repo = Repo(repo, cache=cache, overrides=overrides)
+                    repo = Repo(
+                        repo, cache=cache, overrides=overrides, change_detection=change_detection
+                    )
                 repo.finder(self)
                 self.put_last(repo)
             except RepoError as e:
@@ -805,6 +1181,15 @@ def tag_index(self) -> spack.tag.TagIndex:
                 self._tag_index.merge(repo.tag_index)
         return self._tag_index
 
+    @property
+    def metadata_index(self) -> spack.metadata_index.MetadataIndex:
+        """Merged MetadataIndex from all Repos in the RepoPath."""
+        if self._metadata_index is None:
+            self._metadata_index = spack.metadata_index.MetadataIndex(repository=self)
+            for repo in reversed(self.repos):
+                self._metadata_index.merge(repo.metadata_index)
+        return self._metadata_index
+
     @property
     def patch_index(self) -> spack.patch.PatchCache:
         """Merged PatchIndex from all Repos in the RepoPath."""
@@ -967,6 +1352,7 @@ def __init__(
         *,
         cache: "spack.caches.FileCacheType",
         overrides: Optional[Dict[str, Any]] = None,
+        change_detection: str = "stat",
     ) -> None:
         """Instantiate a package repository from a filesystem path.
 
@@ -974,6 +1360,8 @@ def __init__(
             root: the root directory of the repository
             cache: file cache associated with this repository
             overrides: dict mapping package name to class attribute overrides for that package
+            change_detection: how modified packages are detected, either ``"stat"`` or
+                ``"git"``
         """
         # Root directory, containing _repo.yaml and package dirs
         # Allow roots to by spack-relative by starting with '$spack'
@@ -1017,6 +1405,9 @@ def check(condition, msg):
         # Class attribute overrides by package name
         self.overrides = overrides or {}
 
+        # How the package checker detects modified packages
+        self.change_detection = change_detection
+
         # Optional reference to a RepoPath to influence module import from spack.pkg
         self._finder: Optional[RepoPath] = None
 
@@ -1025,6 +1416,8 @@ def check(condition, msg):
 
         # Indexes for this repository, computed lazily
         self._repo_index: Optional[RepoIndex] = None
+        self._metadata_repo_index: Optional[RepoIndex] = None
+        self._metadata_index_name = ""
         self._cache = cache
 
     def finder(self, value: RepoPath) -> None:
@@ -1163,6 +1556,21 @@ def patch_index(self) -> spack.patch.PatchCache:
         """Index of patches and packages they're defined on."""
         return self.index["patches"]
 
+    @property
+    def metadata_index(self) -> spack.metadata_index.MetadataIndex:
+        """Index of the metadata of packages, which can be read without importing them."""
+        # The metadata index is large and needed only by a few commands, so it's built and
+        # checked for updates separately from the other indexes
+        if self._metadata_repo_index is None:
+            self._metadata_index_name = metadata_index_name()
+            self._metadata_repo_index = RepoIndex(
+                self._pkg_checker, self.namespace, cache=self._cache
+            )
+            self._metadata_repo_index.add_indexer(
+                self._metadata_index_name, MetadataIndexer(self)
+            )
+        return self._metadata_repo_index[self._metadata_index_name]
+
     @autospec
     def providers_for(self, vpkg_spec: "spack.spec.Spec") -> List["spack.spec.Spec"]:
         providers = self.provider_index.providers_for(vpkg_spec)
@@ -1197,7 +1605,12 @@ def filename_for_package_name(self, pkg_name: str) -> str:
     @property
     def _pkg_checker(self) -> FastPackageChecker:
         if self._fast_package_checker is None:
-            self._fast_package_checker = FastPackageChecker(self.packages_path)
+            self._fast_package_checker = FastPackageChecker(
+                self.packages_path,
+                self.namespace,
+                cache=self._cache,
+                change_detection=self.change_detection,
+            )
         return self._fast_package_checker
 
     def all_package_names(self, include_virtuals: bool = False) -> List[str]:
@@ -1335,15 +1748,15 @@ def __contains__(self, pkg_name: str) -> bool:
         return self.exists(pkg_name)
 
     @staticmethod
-    def unmarshal(root, cache, overrides):
+    def unmarshal(root, cache, overrides, change_detection):
         """Helper method to unmarshal keyword arguments"""
-        return Repo(root, cache=cache, overrides=overrides)
+        return Repo(root, cache=cache, overrides=overrides, change_detection=change_detection)
 
     def marshal(self):
         cache = self._cache
         if isinstance(cache, llnl.util.lang.Singleton):
             cache = cache.instance
-        return self.root, cache, self.overrides
+        return self.root, cache, self.overrides, self.change_detection
 
     def __reduce__(self):
         return Repo.unmarshal, self.marshal()
@@ -1461,7 +1874,12 @@ def create(
             continue
         overrides[pkg_name] = value
 
-    return RepoPath(*repo_dirs, cache=spack.caches.MISC_CACHE, overrides=overrides)
+    return RepoPath(
+        *repo_dirs,
+        cache=spack.caches.MISC_CACHE,
+        overrides=overrides,
+        change_detection=configuration.get("config:package_change_detection", "stat"),
+    )
 
 
 #: Singleton repo path instance
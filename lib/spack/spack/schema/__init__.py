@@ -16,6 +16,10 @@ class DeprecationMessage(typing.NamedTuple):
     error: bool
 
 
+class DeprecatedPropertyWarning(UserWarning):
+    """Warning about a deprecated property found when validating configuration"""
+
+
 # jsonschema is imported lazily as it is heavy to import
 # and increases the start-up time
 def _make_validator():
@@ -61,7 +65,7 @@ def _deprecated_properties(validator, deprecated, instance, schema):
             if deprecations[name].error:
                 errors.append(msg)
             else:
-                warnings.warn(msg)
+                warnings.warn(msg, DeprecatedPropertyWarning)
 
         if errors:
             yield jsonschema.ValidationError("\n".join(errors))
@@ -55,6 +55,7 @@
             "unify": {
                 "oneOf": [{"type": "boolean"}, {"type": "string", "enum": ["when_possible"]}]
             },
+            "split_clusters": {"type": "boolean"},
             "splice": {
                 "type": "object",
                 "additionalProperties": False,
@@ -82,6 +83,24 @@
                 },
             },
             "os_compatible": {"type": "object", "additionalProperties": {"type": "array"}},
+            "solver": {
+                "type": "object",
+                "additionalProperties": False,
+                "properties": {
+                    "threads": {"type": "integer", "minimum": 1},
+                    "portfolio": {"type": "string"},
+                },
+            },
+            "concretization_cache": {
+                "type": "object",
+                "additionalProperties": False,
+                "properties": {
+                    "enable": {"type": "boolean"},
+                    "path": {"type": "string"},
+                    "entry_limit": {"type": "integer", "minimum": 0},
+                    "size_limit": {"type": "integer", "minimum": 0},
+                },
+            },
         },
     }
 }
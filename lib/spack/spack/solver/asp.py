@@ -2,6 +2,7 @@
 # Spack Project Developers. See the top-level COPYRIGHT file for details.
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import atexit
 import collections
 import collections.abc
 import copy
@@ -16,6 +17,7 @@
 import types
 import typing
 import warnings
+import weakref
 from contextlib import contextmanager
 from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple, Type, Union
 
@@ -51,6 +53,7 @@
 from spack.config import get_mark_from_yaml_data
 from spack.error import SpecSyntaxError
 
+from . import concretization_cache
 from .core import (
     AspFunction,
     NodeArgument,
@@ -62,8 +65,12 @@
     fn,
     parse_files,
     parse_term,
+    program_builder,
+    symbol_parts,
+    symbol_str,
 )
-from .counter import FullDuplicatesCounter, MinimalDuplicatesCounter, NoDuplicatesCounter
+from .counter import Counter, FullDuplicatesCounter, MinimalDuplicatesCounter, NoDuplicatesCounter
+from .profiler import NullSetupProfiler, SetupProfiler, fact_family
 from .version_order import concretization_version_order
 
 GitOrStandardVersion = Union[spack.version.GitVersion, spack.version.StandardVersion]
@@ -81,25 +88,91 @@
 #:     stats (bool): Whether to output Clingo's internal solver statistics.
 #:     out: Optional output stream for the generated ASP program.
 #:     setup_only (bool): if True, stop after setup and don't solve (default False).
+#:     profile_setup (bool): Print out where time is spent in setup, and which facts
+#:         are emitted (default False).
 OutputConfiguration = collections.namedtuple(
-    "OutputConfiguration", ["timers", "stats", "out", "setup_only"]
+    "OutputConfiguration",
+    ["timers", "stats", "out", "setup_only", "profile_setup"],
+    defaults=[False],
 )
 
 #: Default output configuration for a solve
 DEFAULT_OUTPUT_CONFIGURATION = OutputConfiguration(
-    timers=False, stats=False, out=None, setup_only=False
+    timers=False, stats=False, out=None, setup_only=False, profile_setup=False
 )
 
 
+#: Default portfolio of solver configurations for parallel solves
+DEFAULT_PORTFOLIO = os.path.join(os.path.dirname(__file__), "portfolio.txt")
+
+
+def solver_threads() -> int:
+    """Returns the number of threads used by the solver, according to the configuration"""
+    return max(1, spack.config.CONFIG.get("concretizer:solver:threads", 1))
+
+
+def solver_portfolio() -> str:
+    """Returns the path to the portfolio of solver configurations used for parallel solves"""
+    path = spack.config.CONFIG.get("concretizer:solver:portfolio")
+    if not path:
+        return DEFAULT_PORTFOLIO
+    return spack.util.path.canonicalize_path(path)
+
+
+def portfolio_names(path: str) -> List[str]:
+    """Returns the names of the configurations in a portfolio file, in order"""
+    names = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            match = re.match(r"^\s*\[([^\]]+)\]", line)
+            if match:
+                names.append(match.group(1))
+    return names
+
+
 def default_clingo_control():
     """Return a control object with the default settings used in Spack"""
     control = clingo().Control()
+    threads = solver_threads()
+    if threads > 1:
+        # Each thread uses a different configuration, and the first one proving
+        # optimality ends the search for all the others
+        control.configuration.configuration = solver_portfolio()
+        control.configuration.solve.parallel_mode = f"{threads},compete"
+        # Needed to get statistics for each thread
+        control.configuration.stats = "2"
+        return control
+
     control.configuration.configuration = "tweety"
     control.configuration.solver.heuristic = "Domain"
     control.configuration.solver.opt_strategy = "usc,one"
     return control
 
 
+def record_portfolio_timers(timer: spack.util.timer.BaseTimer, statistics, names: List[str]):
+    """Records the CPU time spent by each configuration of a parallel solve in a timer.
+
+    Args:
+        timer: timer where CPU times are recorded
+        statistics: statistics of the parallel solve
+        names: names of the configurations in the portfolio
+    """
+    try:
+        threads = statistics["solving"]["solver"]
+        winner = int(statistics["summary"]["winner"])
+    except (KeyError, TypeError):
+        return
+
+    if not names:
+        names = ["solver"]
+
+    for idx, thread_stats in enumerate(threads):
+        label = f"{names[idx % len(names)]}[{idx}]"
+        if idx == winner:
+            label += "*"
+        timer.record(label, thread_stats["extra"]["cpu_time"])
+
+
 class Provenance(enum.IntEnum):
     """Enumeration of the possible provenances of a version."""
 
@@ -282,7 +355,7 @@ def remove_node(spec: spack.spec.Spec, facts: List[AspFunction]) -> List[AspFunc
     return list(filter(lambda x: x.args[0] not in ("node", "virtual_node"), facts))
 
 
-def _create_counter(specs: List[spack.spec.Spec], tests: bool):
+def _create_counter(specs: List[spack.spec.Spec], tests: bool) -> Counter:
     strategy = spack.config.CONFIG.get("concretizer:duplicates:strategy", "none")
     if strategy == "full":
         return FullDuplicatesCounter(specs, tests=tests)
@@ -291,6 +364,48 @@ def _create_counter(specs: List[spack.spec.Spec], tests: bool):
     return NoDuplicatesCounter(specs, tests=tests)
 
 
+def independent_clusters(
+    specs: List[spack.spec.Spec], tests: bool = False
+) -> List[List[spack.spec.Spec]]:
+    """Partitions specs into clusters, so that specs in different clusters have no possible
+    dependency in common, and can be concretized independently of each other.
+
+    Runtime packages can be a dependency of any spec, so they are not taken into account.
+
+    Args:
+        specs: specs to be partitioned
+        tests: if True, account for test dependencies
+    """
+    runtimes = _create_counter([], tests=tests).possible_dependencies()
+    possible_by_name: Dict[str, Set[str]] = {}
+
+    # Union-find on the indices of the input specs
+    parent = list(range(len(specs)))
+
+    def _find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    owner: Dict[str, int] = {}
+    for idx, spec in enumerate(specs):
+        # Specs given by hash have no name until they are looked up
+        spec = spec.lookup_hash()
+        if spec.name not in possible_by_name:
+            counter = _create_counter([spack.spec.Spec(spec.name)], tests=tests)
+            possible_by_name[spec.name] = counter.possible_dependencies() - runtimes
+        # Nodes constrained in the input, or already concrete, may not be possible dependencies
+        names = possible_by_name[spec.name] | {x.name for x in spec.traverse() if x.name}
+        for name in names:
+            parent[_find(owner.setdefault(name, idx))] = _find(idx)
+
+    clusters: Dict[int, List[spack.spec.Spec]] = collections.defaultdict(list)
+    for idx, spec in enumerate(specs):
+        clusters[_find(idx)].append(spec)
+    return list(clusters.values())
+
+
 def all_libcs() -> Set[spack.spec.Spec]:
     """Return a set of all libc specs targeted by any configured compiler. If none, fall back to
     libc determined from the current Python process if dynamically linked."""
@@ -819,8 +934,8 @@ def solve(self, setup, specs, reuse=None, output=None, control=None, allow_depre
         output = output or DEFAULT_OUTPUT_CONFIGURATION
         timer = spack.util.timer.Timer()
 
-        # Initialize the control object for the solver
-        self.control = control or default_clingo_control()
+        # The control object for the solver is initialized only if we need to solve
+        self.control = None
 
         # ensure core deps are present on Windows
         # needs to modify active config scope, so cannot be run within
@@ -830,91 +945,120 @@ def solve(self, setup, specs, reuse=None, output=None, control=None, allow_depre
             spack.bootstrap.core.ensure_winsdk_external_or_raise()
 
         timer.start("setup")
+        if output.profile_setup:
+            setup.profiler = SetupProfiler()
         asp_problem = setup.setup(specs, reuse=reuse, allow_deprecated=allow_deprecated)
         if output.out is not None:
             output.out.write(asp_problem)
+        if output.profile_setup:
+            setup.profiler.write_tty()
         if output.setup_only:
             return Result(specs), None, None
         timer.stop("setup")
 
-        timer.start("load")
-        # Add the problem instance
-        self.control.add("base", [], asp_problem)
-        # Load the file itself
         parent_dir = os.path.dirname(__file__)
-        self.control.load(os.path.join(parent_dir, "concretize.lp"))
-        self.control.load(os.path.join(parent_dir, "heuristic.lp"))
-        self.control.load(os.path.join(parent_dir, "display.lp"))
+        lp_files = [
+            os.path.join(parent_dir, "concretize.lp"),
+            os.path.join(parent_dir, "heuristic.lp"),
+            os.path.join(parent_dir, "display.lp"),
+        ]
         if not setup.concretize_everything:
-            self.control.load(os.path.join(parent_dir, "when_possible.lp"))
+            lp_files.append(os.path.join(parent_dir, "when_possible.lp"))
 
         # Binary compatibility is based on libc on Linux, and on the os tag elsewhere
         if using_libc_compatibility():
-            self.control.load(os.path.join(parent_dir, "libc_compatibility.lp"))
+            lp_files.append(os.path.join(parent_dir, "libc_compatibility.lp"))
         else:
-            self.control.load(os.path.join(parent_dir, "os_compatibility.lp"))
-
-        timer.stop("load")
-
-        # Grounding is the first step in the solve -- it turns our facts
-        # and first-order logic rules into propositional logic.
-        timer.start("ground")
-        self.control.ground([("base", [])])
-        timer.stop("ground")
-
-        # With a grounded program, we can run the solve.
-        models = []  # stable models if things go well
-        cores = []  # unsatisfiable cores if they do not
+            lp_files.append(os.path.join(parent_dir, "os_compatibility.lp"))
 
-        def on_model(model):
-            models.append((model.cost, model.symbols(shown=True, terms=True)))
-
-        solve_kwargs = {
-            "assumptions": setup.assumptions,
-            "on_model": on_model,
-            "on_core": cores.append,
-        }
-
-        if clingo_cffi():
-            solve_kwargs["on_unsat"] = cores.append
+        # A custom control object may change the answer, so we don't cache those solves
+        cache = concretization_cache.create(spack.config.CONFIG) if control is None else None
+        cache_key, cached = None, None
+        if cache is not None:
+            timer.start("cache")
+            cache_key = _concretization_cache_key(asp_problem, lp_files)
+            cached = cache.fetch(cache_key)
+            timer.stop("cache")
 
-        timer.start("solve")
-        solve_result = self.control.solve(**solve_kwargs)
-        timer.stop("solve")
-
-        # once done, construct the solve result
         result = Result(specs)
-        result.satisfiable = solve_result.satisfiable
-
-        if result.satisfiable:
-            # get the best model
-            builder = SpecBuilder(specs, hash_lookup=setup.reusable_and_possible)
-            min_cost, best_model = min(models)
-
-            # first check for errors
-            error_handler = ErrorHandler(best_model, specs)
-            error_handler.raise_if_errors()
-
-            # build specs from spec attributes in the model
-            spec_attrs = [(name, tuple(rest)) for name, *rest in extract_args(best_model, "attr")]
-            answers = builder.build_specs(spec_attrs)
-
-            # add best spec to the results
-            result.answers.append((list(min_cost), 0, answers))
-
-            # get optimization criteria
-            criteria_args = extract_args(best_model, "opt_criterion")
-            result.criteria = build_criteria_names(min_cost, criteria_args)
-
-            # record the number of models the solver considered
-            result.nmodels = len(models)
+        statistics = {}
+        if cached is not None:
+            tty.debug(f"[CONCRETIZATION CACHE] reusing the solution in entry {cache_key}")
+            result.satisfiable = True
+            best_model = [parse_term(x) for x in cached["model"]]
+            self._add_best_model_to_result(
+                result, setup, specs, cached["cost"], best_model, nmodels=cached["nmodels"]
+            )
+        else:
+            # Initialize the control object for the solver
+            self.control = control or default_clingo_control()
+
+            timer.start("load")
+            # Add the problem instance
+            self.control.add("base", [], asp_problem)
+            # Add the rules. These are parsed only once per process.
+            with program_builder(self.control) as builder:
+                for lp_file in lp_files:
+                    for statement in parsed_logic_program(lp_file):
+                        builder.add(statement)
+            timer.stop("load")
+
+            # Grounding is the first step in the solve -- it turns our facts
+            # and first-order logic rules into propositional logic.
+            timer.start("ground")
+            self.control.ground([("base", [])])
+            timer.stop("ground")
+
+            # With a grounded program, we can run the solve.
+            models = []  # stable models if things go well
+            cores = []  # unsatisfiable cores if they do not
+
+            def on_model(model):
+                models.append((model.cost, model.symbols(shown=True, terms=True)))
+
+            solve_kwargs = {
+                "assumptions": setup.assumptions,
+                "on_model": on_model,
+                "on_core": cores.append,
+            }
 
-            # record the possible dependencies in the solve
-            result.possible_dependencies = setup.pkgs
+            if clingo_cffi():
+                solve_kwargs["on_unsat"] = cores.append
+
+            timer.start("solve")
+            solve_result = self.control.solve(**solve_kwargs)
+            timer.stop("solve")
+
+            if control is None and solver_threads() > 1:
+                names = portfolio_names(solver_portfolio())
+                record_portfolio_timers(timer, self.control.statistics, names)
+
+            # once done, construct the solve result
+            result.satisfiable = solve_result.satisfiable
+            statistics = self.control.statistics
+
+            if result.satisfiable:
+                # get the best model
+                min_cost, best_model = min(models)
+                if cache is not None:
+                    # Unsatisfiable solves are not cached, since reporting errors needs the
+                    # control object. Store before building specs, so that models with
+                    # errors are cached too.
+                    cache.store(
+                        cache_key,
+                        {
+                            "cost": list(min_cost),
+                            "nmodels": len(models),
+                            "model": [str(sym) for sym in best_model],
+                        },
+                    )
+                self._add_best_model_to_result(
+                    result, setup, specs, min_cost, best_model, nmodels=len(models)
+                )
 
-        elif cores:
-            result.control = self.control
-            result.cores.extend(cores)
+            elif cores:
+                result.control = self.control
+                result.cores.extend(cores)
 
         if output.timers:
             timer.write_tty()
@@ -922,7 +1066,12 @@ def on_model(model):
 
         if output.stats:
             print("Statistics:")
-            pprint.pprint(self.control.statistics)
+            if cached is not None:
+                print(
+                    f"  the solution was reused from entry {cache_key} of the concretization cache"
+                )
+            else:
+                pprint.pprint(statistics)
 
         result.raise_if_unsat()
 
@@ -934,7 +1083,83 @@ def on_model(model):
                 f"https://github.com/spack/spack/issues\n\t{unsolved_str}"
             )
 
-        return result, timer, self.control.statistics
+        return result, timer, statistics
+
+    @staticmethod
+    def _add_best_model_to_result(result, setup, specs, min_cost, best_model, *, nmodels):
+        """Builds concrete specs from the best model of a solve, and adds them to the result"""
+        builder = SpecBuilder(specs, hash_lookup=setup.reusable_and_possible)
+
+        # first check for errors
+        error_handler = ErrorHandler(best_model, specs)
+        error_handler.raise_if_errors()
+
+        # build specs from spec attributes in the model
+        spec_attrs = [(name, tuple(rest)) for name, *rest in extract_args(best_model, "attr")]
+        answers = builder.build_specs(spec_attrs)
+
+        # add best spec to the results
+        result.answers.append((list(min_cost), 0, answers))
+
+        # get optimization criteria
+        criteria_args = extract_args(best_model, "opt_criterion")
+        result.criteria = build_criteria_names(min_cost, criteria_args)
+
+        # record the number of models the solver considered
+        result.nmodels = nmodels
+
+        # record the possible dependencies in the solve
+        result.possible_dependencies = setup.pkgs
+
+
+#: Statements of the logic programs parsed in this process, keyed by file path
+_PARSED_LOGIC_PROGRAMS: Dict[str, tuple] = {}
+
+# Release clingo objects before the interpreter tears down the clingo module
+atexit.register(lambda: _PARSED_LOGIC_PROGRAMS.clear())
+
+
+def parsed_logic_program(path: str) -> tuple:
+    """Returns the statements of the logic program in a file.
+
+    Files with rules are static for the lifetime of a process, so they are parsed only once,
+    and the same statements are added to the control object of each solve.
+    """
+    if path not in _PARSED_LOGIC_PROGRAMS:
+        statements: List[typing.Any] = []
+        parse_files([path], statements.append)
+        _PARSED_LOGIC_PROGRAMS[path] = tuple(statements)
+    return _PARSED_LOGIC_PROGRAMS[path]
+
+
+@llnl.util.lang.memoized
+def _logic_program_text(path: str) -> str:
+    """Returns the text of the logic program in a file, read once per process"""
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def _concretization_cache_key(asp_problem: str, lp_files: List[str]) -> str:
+    """Returns the key of the concretization cache entry for a solve.
+
+    The key accounts for the problem instance, the rules loaded to solve it, the settings of the
+    solver, the configuration used to turn the best model into specs, and the version of Spack.
+    """
+    parts = [spack.spack_version, asp_problem]
+    parts.extend(_logic_program_text(lp_file) for lp_file in lp_files)
+    parts.append(_solver_settings())
+    parts.append(repr(spack.config.CONFIG.get("concretizer:splice:explicit", [])))
+    return concretization_cache.digest(parts)
+
+
+def _solver_settings() -> str:
+    """Returns the settings of the solver that can change which of the optimal models is found.
+    Parallel solves use the configurations of a portfolio, whose content is part of them."""
+    threads = solver_threads()
+    if threads == 1:
+        return "threads=1"
+    with open(solver_portfolio(), encoding="utf-8") as f:
+        return f"threads={threads}\n{f.read()}"
 
 
 class ConcreteSpecsByHash(collections.abc.Mapping):
@@ -1163,6 +1388,15 @@ def __init__(self, tests: bool = False):
         # list of unique libc specs targeted by compilers (or an educated guess if no compiler)
         self.libcs: List[spack.spec.Spec] = []
 
+        # Profiler for the setup phase
+        self.profiler: NullSetupProfiler = NullSetupProfiler()
+
+        # If not None, package classes looked up while recording directive rules
+        self._pkg_class_lookups: Optional[Dict[str, weakref.ReferenceType]] = None
+
+        # Input specs, and counter of possible nodes, of the last call to node_counter()
+        self._node_counter: Optional[Tuple[List[spack.spec.Spec], Counter]] = None
+
     def pkg_version_rules(self, pkg):
         """Output declared versions of a package.
 
@@ -1318,20 +1552,8 @@ def pkg_rules(self, pkg, tests):
         self.pkg_version_rules(pkg)
         self.gen.newline()
 
-        # languages
-        self.package_languages(pkg)
-
-        # variants
-        self.variant_rules(pkg)
-
-        # conflicts
-        self.conflict_rules(pkg)
-
-        # virtuals
-        self.package_provider_rules(pkg)
-
-        # dependencies
-        self.package_dependencies_rules(pkg)
+        # languages, variants, conflicts, virtuals and dependencies
+        self.directive_rules(pkg)
 
         # virtual preferences
         self.virtual_preferences(
@@ -1345,6 +1567,117 @@ def pkg_rules(self, pkg, tests):
         self.trigger_rules()
         self.effect_rules()
 
+    def directive_rules(self, pkg):
+        """Output the rules derived from the directives of a package, i.e. languages, variants,
+        conflicts, virtuals and dependencies.
+
+        These rules don't depend on configuration, so they are recorded the first time they
+        are generated in a process, and replayed in later solves with the ids shifted.
+        """
+        # Recorded rules must not refer to triggers, or effects, generated before them
+        self.trigger_rules()
+        self.effect_rules()
+
+        start = next(self._id_counter)
+        # Use the cache of this very class, not the one inherited from a base class
+        cache = vars(pkg).get(_DIRECTIVE_RULES_ATTR)
+        if cache is None:
+            cache = {}
+            setattr(pkg, _DIRECTIVE_RULES_ATTR, cache)
+
+        provided = frozenset(pkg.provided_virtual_names()) & self.possible_virtuals
+        tests = self.tests is True or (bool(self.tests) and pkg.name in self.tests)
+        key = (provided, tests, frozenset(self.explicitly_required_namespaces.items()))
+        fingerprint = _directives_fingerprint(pkg)
+
+        rules = cache.get(key)
+        if rules is not None and self._can_replay(rules, fingerprint):
+            self.profiler.replayed(pkg.name)
+        else:
+            rules = self._record_directive_rules(pkg, start, fingerprint)
+            cache[key] = rules
+        self._replay_directive_rules(rules, start)
+
+    def _can_replay(self, rules: "DirectiveRules", fingerprint: tuple) -> bool:
+        """Whether the directives, and the packages looked up while recording the rules, are
+        still the same.
+        """
+        if len(rules.directives) != len(fingerprint) or not all(
+            x is y for x, y in zip(rules.directives, fingerprint)
+        ):
+            return False
+
+        try:
+            return all(ref() is self.pkg_class(name) for name, ref in rules.pkg_classes.items())
+        except spack.repo.UnknownEntityError:
+            return False
+
+    def _record_directive_rules(self, pkg, start: int, fingerprint: tuple) -> "DirectiveRules":
+        saved = (
+            self.gen,
+            self._id_counter,
+            self.version_constraints,
+            self.target_constraints,
+            self.compiler_version_constraints,
+            self.variant_values_from_specs,
+            self.variant_ids_by_def_id,
+        )
+        recorder = _RecordingBuilder(start)
+        self.gen = recorder
+        self._id_counter = map(_RecordedId, itertools.count(start))
+        self.version_constraints = set()
+        self.target_constraints = set()
+        self.compiler_version_constraints = set()
+        self.variant_values_from_specs = set()
+        self.variant_ids_by_def_id = {}
+        self._pkg_class_lookups = {}
+        try:
+            self.package_languages(pkg)
+            self.variant_rules(pkg)
+            self.conflict_rules(pkg)
+            self.package_provider_rules(pkg)
+            self.package_dependencies_rules(pkg)
+            self.trigger_rules()
+            self.effect_rules()
+
+            return DirectiveRules(
+                directives=fingerprint,
+                segments=recorder.segments(),
+                nids=next(self._id_counter) - start,
+                fact_counts=recorder.fact_counts,
+                pkg_classes=self._pkg_class_lookups,
+                version_constraints=self.version_constraints,
+                target_constraints=self.target_constraints,
+                compiler_version_constraints=self.compiler_version_constraints,
+                variant_values_from_specs=self.variant_values_from_specs,
+                variant_ids_by_def_id={
+                    def_id: vid - start for def_id, vid in self.variant_ids_by_def_id.items()
+                },
+            )
+        finally:
+            (
+                self.gen,
+                self._id_counter,
+                self.version_constraints,
+                self.target_constraints,
+                self.compiler_version_constraints,
+                self.variant_values_from_specs,
+                self.variant_ids_by_def_id,
+            ) = saved
+            self._pkg_class_lookups = None
+
+    def _replay_directive_rules(self, rules: "DirectiveRules", start: int) -> None:
+        self.gen.append(rules.text(start))
+        self._id_counter = itertools.count(start + rules.nids)
+        if self.gen.fact_counts is not None:
+            self.gen.fact_counts.update(rules.fact_counts)
+        self.version_constraints.update(rules.version_constraints)
+        self.target_constraints.update(rules.target_constraints)
+        self.compiler_version_constraints.update(rules.compiler_version_constraints)
+        self.variant_values_from_specs.update(rules.variant_values_from_specs)
+        for def_id, vid in rules.variant_ids_by_def_id.items():
+            self.variant_ids_by_def_id[def_id] = vid + start
+
     def trigger_rules(self):
         """Flushes all the trigger rules collected so far, and clears the cache."""
         if not self._trigger_cache:
@@ -1421,7 +1754,7 @@ def define_variant(
         elif isinstance(values, vt.DisjointSetsOfValues):
             union = set()
             for sid, s in enumerate(values.sets):
-                for value in s:
+                for value in sorted(s):
                     pkg_fact(fn.variant_value_from_disjoint_sets(vid, value, sid))
                 union.update(s)
             values = union
@@ -1601,7 +1934,7 @@ def package_provider_rules(self, pkg):
             self.gen.fact(fn.pkg_fact(pkg.name, fn.possible_provider(vpkg_name)))
 
         for when, provided in pkg.provided.items():
-            for vpkg in provided:
+            for vpkg in sorted(provided):
                 if vpkg.name not in self.possible_virtuals:
                     continue
 
@@ -1617,7 +1950,7 @@ def package_provider_rules(self, pkg):
                 when, required_name=pkg.name, msg="Virtuals are provided together"
             )
             for set_id, virtuals_together in enumerate(sets_of_virtuals):
-                for name in virtuals_together:
+                for name in sorted(virtuals_together):
                     self.gen.fact(
                         fn.pkg_fact(pkg.name, fn.provided_together(condition_id, set_id, name))
                     )
@@ -1625,7 +1958,9 @@ def package_provider_rules(self, pkg):
 
     def package_dependencies_rules(self, pkg):
         """Translate 'depends_on' directives into ASP logic."""
-        for cond, deps_by_name in sorted(pkg.dependencies.items()):
+        # Sort conditions by their string, since the ordering of specs with dependencies
+        # depends on hashes, which are different in each process
+        for cond, deps_by_name in sorted(pkg.dependencies.items(), key=lambda x: str(x[0])):
             for _, dep in sorted(deps_by_name.items()):
                 depflag = dep.depflag
                 # Skip test dependencies if they're not requested
@@ -2504,9 +2839,12 @@ def define_variant_values(self):
 
         """
         # Tell the concretizer about possible values from specs seen in spec_clauses().
-        # We might want to order these facts by pkg and name if we are debugging.
-        for pkg_name, variant_def_id, value in self.variant_values_from_specs:
-            vid = self.variant_ids_by_def_id[variant_def_id]
+        # Order them by package and variant id, so that the problem is the same in each process.
+        values = sorted(
+            (pkg_name, self.variant_ids_by_def_id[variant_def_id], str(value), value)
+            for pkg_name, variant_def_id, value in self.variant_values_from_specs
+        )
+        for pkg_name, vid, _, value in values:
             self.gen.fact(fn.pkg_fact(pkg_name, fn.variant_possible_value(vid, value)))
 
     def register_concrete_spec(self, spec, possible):
@@ -2574,9 +2912,8 @@ def setup(
             reuse: list of concrete specs that can be reused
             allow_deprecated: if True adds deprecated versions into the solve
         """
-        check_packages_exist(specs)
-
-        node_counter = _create_counter(specs, tests=self.tests)
+        self.profiler.phase("possible dependencies")
+        node_counter = self.node_counter(specs)
         self.possible_virtuals = node_counter.possible_virtuals()
         self.pkgs = node_counter.possible_dependencies()
         self.libcs = sorted(all_libcs())  # type: ignore[type-var]
@@ -2593,7 +2930,7 @@ def setup(
             if node.namespace is not None:
                 self.explicitly_required_namespaces[node.name] = node.namespace
 
-        self.gen = ProblemInstanceBuilder()
+        self.gen = ProblemInstanceBuilder(fact_counts=self.profiler.fact_counts)
         compiler_parser = CompilerParser(configuration=spack.config.CONFIG).with_input_specs(specs)
 
         if using_libc_compatibility():
@@ -2618,6 +2955,7 @@ def setup(
             )
         specs = tuple(specs)  # ensure compatible types to add
 
+        self.profiler.phase("reusable specs")
         self.gen.h1("Reusable concrete specs")
         self.define_concrete_input_specs(specs, self.pkgs)
         if reuse:
@@ -2637,6 +2975,7 @@ def setup(
             self.gen.fact(fn.flag_type(flag))
         self.gen.newline()
 
+        self.profiler.phase("general constraints")
         self.gen.h1("General Constraints")
         self.config_compatible_os()
         self.compiler_facts()
@@ -2646,11 +2985,13 @@ def setup(
         self.os_defaults(specs + dev_specs)
         self.target_defaults(specs + dev_specs)
 
+        self.profiler.phase("providers and externals")
         self.virtual_providers()
         self.provider_defaults()
         self.provider_requirements()
         self.external_packages()
 
+        self.profiler.phase("package versions")
         # TODO: make a config option for this undocumented feature
         checksummed = "SPACK_CONCRETIZER_REQUIRE_CHECKSUM" in os.environ
         self.define_package_versions_and_validate_preferences(
@@ -2669,13 +3010,16 @@ def setup(
             allow_deprecated=allow_deprecated, require_checksum=checksummed
         )
 
+        self.profiler.phase("package rules")
         self.gen.h1("Package Constraints")
         for pkg in sorted(self.pkgs):
-            self.gen.h2("Package rules: %s" % pkg)
-            self.pkg_rules(pkg, tests=self.tests)
-            self.gen.h2("Package preferences: %s" % pkg)
-            self.preferred_variants(pkg)
+            with self.profiler.package(pkg):
+                self.gen.h2("Package rules: %s" % pkg)
+                self.pkg_rules(pkg, tests=self.tests)
+                self.gen.h2("Package preferences: %s" % pkg)
+                self.preferred_variants(pkg)
 
+        self.profiler.phase("input specs")
         self.gen.h1("Special variants")
         self.define_auto_variant("dev_path", multi=False)
         self.define_auto_variant("patches", multi=True)
@@ -2690,6 +3034,7 @@ def setup(
         self.gen.h1("Spec Constraints")
         self.literal_specs(specs)
 
+        self.profiler.phase("constraints from specs")
         self.gen.h1("Variant Values defined in specs")
         self.define_variant_values()
 
@@ -2707,11 +3052,31 @@ def setup(
         self.gen.h1("Target Constraints")
         self.define_target_constraints()
 
+        self.profiler.phase("internal errors")
         self.gen.h1("Internal errors")
         self.internal_errors()
+        self.profiler.stop()
 
         return self.gen.value()
 
+    def node_counter(self, specs: List[spack.spec.Spec]) -> Counter:
+        """Returns the counter of possible nodes for the input specs.
+
+        The counter of the last list of specs is kept, so that possible dependencies can be
+        computed before setup (e.g. to prune reusable specs) without computing them twice.
+        """
+        if self._node_counter is not None:
+            cached_specs, counter = self._node_counter
+            if len(cached_specs) == len(specs) and all(
+                x is y for x, y in zip(cached_specs, specs)
+            ):
+                return counter
+
+        check_packages_exist(specs)
+        counter = _create_counter(specs, tests=self.tests)
+        self._node_counter = (list(specs), counter)
+        return counter
+
     def internal_errors(self):
         parent_dir = os.path.dirname(__file__)
 
@@ -2728,7 +3093,8 @@ def visit(node):
                                 self.gen.asp_problem.append(f"{{ {symbol} }}.\n")
 
         path = os.path.join(parent_dir, "concretize.lp")
-        parse_files([path], visit)
+        for statement in parsed_logic_program(path):
+            visit(statement)
 
     def define_runtime_constraints(self):
         """Define the constraints to be imposed on the runtimes"""
@@ -2882,7 +3248,10 @@ def pkg_class(self, pkg_name: str) -> typing.Type["spack.package_base.PackageBas
         if pkg_name in self.explicitly_required_namespaces:
             namespace = self.explicitly_required_namespaces[pkg_name]
             request = f"{namespace}.{pkg_name}"
-        return spack.repo.PATH.get_pkg_class(request)
+        result = spack.repo.PATH.get_pkg_class(request)
+        if self._pkg_class_lookups is not None:
+            self._pkg_class_lookups[pkg_name] = weakref.ref(result)
+        return result
 
 
 class _Head:
@@ -2929,12 +3298,17 @@ class ProblemInstanceBuilder:
     The problem instance can be added directly to the "control" structure of clingo.
     """
 
-    def __init__(self):
-        self.asp_problem = []
+    def __init__(self, fact_counts: Optional[collections.Counter] = None):
+        self.asp_problem: List = []
+        #: If not None, number of facts added to the problem, by family
+        self.fact_counts = fact_counts
 
     def fact(self, atom: AspFunction) -> None:
-        symbol = atom.symbol() if hasattr(atom, "symbol") else atom
-        self.asp_problem.append(f"{str(symbol)}.\n")
+        if self.fact_counts is not None:
+            self.fact_counts[fact_family(atom)] += 1
+        # Render the text directly, since creating a clingo symbol just to print it is slow
+        text = symbol_str(atom) if isinstance(atom, AspFunction) else str(atom)
+        self.asp_problem.append(f"{text}.\n")
 
     def append(self, rule: str) -> None:
         self.asp_problem.append(rule)
@@ -2963,6 +3337,105 @@ def value(self) -> str:
         return "".join(self.asp_problem)
 
 
+class _RecordedId(int):
+    """Id of a condition, or of a variant, created while recording rules"""
+
+
+class _RecordingBuilder(ProblemInstanceBuilder):
+    """Records facts and rules, keeping track of which integers in them are ids created while
+    recording. The result can be replayed later, with ids starting from a different value.
+    """
+
+    def __init__(self, start: int):
+        super().__init__(fact_counts=collections.Counter())
+        self.start = start
+
+    def fact(self, atom: AspFunction) -> None:
+        self.fact_counts[fact_family(atom)] += 1
+        if not isinstance(atom, AspFunction):
+            self.asp_problem.append(f"{atom}.\n")
+            return
+
+        parts: List = []
+        symbol_parts(atom, parts)
+        for part in parts:
+            if isinstance(part, _RecordedId):
+                self.asp_problem.append(int(part) - self.start)
+            elif isinstance(part, int):
+                self.asp_problem.append(str(int(part)))
+            else:
+                self.asp_problem.append(part)
+        self.asp_problem.append(".\n")
+
+    def segments(self) -> List[Union[str, int]]:
+        """Returns the recorded text, as strings interleaved with ids relative to the start"""
+        result: List[Union[str, int]] = []
+        for key, group in itertools.groupby(self.asp_problem, key=lambda x: isinstance(x, str)):
+            if key:
+                result.append("".join(group))
+            else:
+                result.extend(group)
+        return result
+
+
+#: Directives of a package that are translated into rules by ``SpackSolverSetup.directive_rules``
+RULES_DIRECTIVES = (
+    "languages",
+    "variants",
+    "conflicts",
+    "provided",
+    "provided_together",
+    "dependencies",
+)
+
+
+def _directives_fingerprint(pkg) -> tuple:
+    """Returns the objects making up the directives of a package that are translated into
+    rules, down to two levels of nesting. Fingerprints are compared by identity, to detect
+    directives that are replaced or modified in place (e.g. in tests).
+    """
+    result: List = []
+    for name in RULES_DIRECTIVES:
+        directive = getattr(pkg, name)
+        result.append(directive)
+        for key, value in directive.items():
+            result.extend((key, value))
+            if isinstance(value, dict):
+                result.extend(itertools.chain.from_iterable(value.items()))
+            elif isinstance(value, (list, set, tuple)):
+                result.extend(value)
+    return tuple(result)
+
+
+class DirectiveRules(NamedTuple):
+    """Facts and side effects of the directives of a package, recorded for replay"""
+
+    #: Objects the rules were derived from, see ``_directives_fingerprint``
+    directives: tuple
+    #: Text of the rules, as strings interleaved with ids relative to the first id
+    segments: List[Union[str, int]]
+    #: Number of ids used by the rules
+    nids: int
+    #: Number of facts in the rules, by family
+    fact_counts: collections.Counter
+    #: Package classes looked up while recording, that must not change for a replay
+    pkg_classes: Dict[str, "weakref.ReferenceType"]
+    version_constraints: Set
+    target_constraints: Set
+    compiler_version_constraints: Set
+    variant_values_from_specs: Set
+    #: Relative variant ids, by id of the variant definition
+    variant_ids_by_def_id: Dict[int, int]
+
+    def text(self, start: int) -> str:
+        return "".join(x if isinstance(x, str) else str(x + start) for x in self.segments)
+
+
+#: Attribute of package classes where their recorded directive rules are stored, so that the
+#: cache goes away together with the class (e.g. when a repository is swapped out in tests)
+_DIRECTIVE_RULES_ATTR = "_solver_directive_rules"
+
+
 def parse_spec_from_yaml_string(string: str) -> "spack.spec.Spec":
     """Parse a spec from YAML and add file/line info to errors, if it's available.
 
@@ -3454,7 +3927,7 @@ def consume_facts(self):
             self._setup.gen.append(rule)
 
         self._setup.gen.h2("Runtimes: conditions")
-        for runtime_pkg in spack.repo.PATH.packages_with_tags("runtime"):
+        for runtime_pkg in sorted(spack.repo.PATH.packages_with_tags("runtime")):
             self._setup.gen.fact(fn.runtime(runtime_pkg))
             self._setup.gen.fact(fn.possible_in_link_run(runtime_pkg))
             self._setup.gen.newline()
@@ -3462,7 +3935,7 @@ def consume_facts(self):
             # on the available compilers)
             self._setup.pkg_version_rules(runtime_pkg)
 
-        for imposed_spec, when_spec in self.runtime_conditions:
+        for imposed_spec, when_spec in sorted(self.runtime_conditions, key=str):
             msg = f"{when_spec} requires {imposed_spec} at runtime"
             _ = self._setup.condition(when_spec, imposed_spec=imposed_spec, msg=msg)
 
@@ -3932,14 +4405,16 @@ class SpecFilter:
 
     def __init__(
         self,
-        factory: Callable[[], List[spack.spec.Spec]],
+        factory: Callable[..., List[spack.spec.Spec]],
         is_usable: Callable[[spack.spec.Spec], bool],
         include: List[str],
         exclude: List[str],
     ) -> None:
         """
         Args:
-            factory: factory to produce a list of specs
+            factory: factory to produce a list of specs. To select only specs for some
+                packages, it must accept a ``names`` keyword argument with the set of
+                package names, and return only specs for those packages.
             is_usable: predicate that takes a spec in input and returns False if the spec
                 should not be considered for this filter, True otherwise.
             include: if present, a "good" spec must match at least one entry in the list
@@ -3962,8 +4437,14 @@ def is_selected(self, s: spack.spec.Spec) -> bool:
 
         return True
 
-    def selected_specs(self) -> List[spack.spec.Spec]:
-        return [s for s in self.factory() if self.is_selected(s)]
+    def selected_specs(self, names: Optional[Set[str]] = None) -> List[spack.spec.Spec]:
+        """Returns the selected specs.
+
+        Args:
+            names: if given, only specs for these packages are considered
+        """
+        candidates = self.factory() if names is None else self.factory(names=names)
+        return [s for s in candidates if self.is_selected(s)]
 
     @staticmethod
     def from_store(configuration, include, exclude) -> "SpecFilter":
@@ -3983,15 +4464,24 @@ def from_buildcache(configuration, include, exclude) -> "SpecFilter":
         )
 
 
-def _specs_from_store(configuration):
+def _specs_from_store(configuration, names: Optional[Set[str]] = None):
     store = spack.store.create(configuration)
     with store.db.read_transaction():
-        return store.db.query(installed=True)
+        if names is None:
+            return store.db.query(installed=True)
+        # Query each name, so that the query index skips the records of other packages. Queries
+        # for a virtual also match its providers, which are queried by their own name if needed.
+        return [
+            spec
+            for name in sorted(names)
+            for spec in store.db.query(name, installed=True)
+            if spec.name == name
+        ]
 
 
-def _specs_from_mirror():
+def _specs_from_mirror(names: Optional[Set[str]] = None):
     try:
-        return spack.binary_distribution.update_cache_and_get_specs()
+        return spack.binary_distribution.update_cache_and_get_specs(names=names)
     except (spack.binary_distribution.FetchCacheError, IndexError):
         # this is raised when no mirrors had indices.
         # TODO: update mirror configuration so it can indicate that the
@@ -4053,13 +4543,22 @@ def __init__(self, configuration: spack.config.Configuration) -> None:
                         )
                     )
 
-    def reusable_specs(self, specs: List[spack.spec.Spec]) -> List[spack.spec.Spec]:
+    def reusable_specs(
+        self, specs: List[spack.spec.Spec], possible: Optional[Set[str]] = None
+    ) -> List[spack.spec.Spec]:
+        """Returns the specs that can be reused when concretizing the input specs.
+
+        Args:
+            specs: input specs
+            possible: if given, names of the packages that can appear in the solution. Specs
+                for other packages are discarded before any filtering.
+        """
         if self.reuse_strategy == ReuseStrategy.NONE:
             return []
 
         result = []
         for reuse_source in self.reuse_sources:
-            result.extend(reuse_source.selected_specs())
+            result.extend(reuse_source.selected_specs(names=possible))
 
         # If we only want to reuse dependencies, remove the root specs
         if self.reuse_strategy == ReuseStrategy.DEPENDENCIES:
@@ -4091,6 +4590,13 @@ def _check_input_and_extract_concrete_specs(specs):
                 spack.spec.Spec.ensure_valid_variants(s)
         return reusable
 
+    def _reusable_specs(
+        self, setup: SpackSolverSetup, specs: List[spack.spec.Spec]
+    ) -> List[spack.spec.Spec]:
+        # Only packages that can be in the solution are worth considering for reuse
+        possible = setup.node_counter(specs).possible_dependencies()
+        return self.selector.reusable_specs(specs, possible=possible)
+
     def solve(
         self,
         specs,
@@ -4100,6 +4606,7 @@ def solve(
         tests=False,
         setup_only=False,
         allow_deprecated=False,
+        profile_setup=False,
     ):
         """
         Arguments:
@@ -4112,20 +4619,31 @@ def solve(
             packages (defaults to False: do not concretize test dependencies).
           setup_only (bool): if True, stop after setup and don't solve (default False).
           allow_deprecated (bool): allow deprecated version in the solve
+          profile_setup (bool): Print out where time is spent in setup, and which facts
+            are emitted.
         """
         # Check upfront that the variants are admissible
         specs = [s.lookup_hash() for s in specs]
         reusable_specs = self._check_input_and_extract_concrete_specs(specs)
-        reusable_specs.extend(self.selector.reusable_specs(specs))
         setup = SpackSolverSetup(tests=tests)
-        output = OutputConfiguration(timers=timers, stats=stats, out=out, setup_only=setup_only)
+        reusable_specs.extend(self._reusable_specs(setup, specs))
+        output = OutputConfiguration(
+            timers=timers, stats=stats, out=out, setup_only=setup_only, profile_setup=profile_setup
+        )
         result, _, _ = self.driver.solve(
             setup, specs, reuse=reusable_specs, output=output, allow_deprecated=allow_deprecated
         )
         return result
 
     def solve_in_rounds(
-        self, specs, out=None, timers=False, stats=False, tests=False, allow_deprecated=False
+        self,
+        specs,
+        out=None,
+        timers=False,
+        stats=False,
+        tests=False,
+        allow_deprecated=False,
+        profile_setup=False,
     ):
         """Solve for a stable model of specs in multiple rounds.
 
@@ -4142,17 +4660,20 @@ def solve_in_rounds(
             stats (bool): print internal statistics if set to True
             tests (bool): add test dependencies to the solve
             allow_deprecated (bool): allow deprecated version in the solve
+            profile_setup (bool): print where time is spent in setup if set to True
         """
         specs = [s.lookup_hash() for s in specs]
         reusable_specs = self._check_input_and_extract_concrete_specs(specs)
-        reusable_specs.extend(self.selector.reusable_specs(specs))
         setup = SpackSolverSetup(tests=tests)
+        reusable_specs.extend(self._reusable_specs(setup, specs))
 
         # Tell clingo that we don't have to solve all the inputs at once
         setup.concretize_everything = False
 
         input_specs = specs
-        output = OutputConfiguration(timers=timers, stats=stats, out=out, setup_only=False)
+        output = OutputConfiguration(
+            timers=timers, stats=stats, out=out, setup_only=False, profile_setup=profile_setup
+        )
         while True:
             result, _, _ = self.driver.solve(
                 setup,
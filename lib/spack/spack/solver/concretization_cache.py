@@ -0,0 +1,175 @@
+# Copyright 2013-2024 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""On-disk cache of solver answers.
+
+Entries are keyed on a digest of the complete input given to clingo, so a hit means that
+the very same logic program was already solved, and its best model can be reused without
+grounding and solving again. The cache is bounded both in number of entries and in size,
+and least recently used entries are evicted first.
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import llnl.util.tty as tty
+from llnl.util.filesystem import mkdirp
+
+import spack.caches
+import spack.config
+import spack.util.path
+
+#: Version of the format of the entries. Bump this when the content of an entry changes.
+CACHE_FORMAT_VERSION = 1
+
+#: Suffix of the files storing cache entries
+_ENTRY_SUFFIX = ".json.gz"
+
+
+def default_cache_location() -> str:
+    """Default location of the concretization cache, within the misc cache"""
+    return os.path.join(spack.caches.misc_cache_location(), "concretization")
+
+
+def digest(parts: Iterable[str]) -> str:
+    """Returns the key of a cache entry, given the strings that make up the solver input"""
+    hasher = hashlib.sha256()
+    hasher.update(str(CACHE_FORMAT_VERSION).encode())
+    for part in parts:
+        # Separate parts, so that moving text from one to another changes the digest
+        hasher.update(b"\0")
+        hasher.update(part.encode())
+    return hasher.hexdigest()
+
+
+class ConcretizationCache:
+    """Stores the best model of a solve, keyed on a digest of the solver input."""
+
+    def __init__(self, root: str, *, entry_limit: int = 1000, size_limit: int = 300_000_000):
+        """
+        Args:
+            root: directory where entries are stored
+            entry_limit: maximum number of entries in the cache. If 0, there is no limit.
+            size_limit: maximum total size in bytes of the entries. If 0, there is no limit.
+        """
+        self.root = root
+        self.entry_limit = entry_limit
+        self.size_limit = size_limit
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}{_ENTRY_SUFFIX}")
+
+    def fetch(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns the entry associated with a key, or None if there is no such entry.
+
+        Reading an entry marks it as the most recently used.
+        """
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError) as e:
+            tty.debug(f"[CONCRETIZATION CACHE] discarding corrupt entry {path}: {e}")
+            self._remove(path)
+            return None
+
+        if data.get("version") != CACHE_FORMAT_VERSION:
+            return None
+
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return data
+
+    def store(self, key: str, data: Dict[str, Any]) -> None:
+        """Stores an entry in the cache, then evicts least recently used entries if the cache
+        exceeds its limits. Failures are reported, but never raised, since the cache is an
+        optimization.
+        """
+        data = dict(data, version=CACHE_FORMAT_VERSION)
+        try:
+            mkdirp(self.root)
+            # Write to a temporary file and rename it, so concurrent readers
+            # never see partially written entries
+            fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f, gzip.GzipFile(fileobj=f, mode="wb") as gz:
+                    gz.write(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+                os.replace(tmp, self._path(key))
+            except BaseException:
+                self._remove(tmp)
+                raise
+        except OSError as e:
+            tty.debug(f"[CONCRETIZATION CACHE] cannot store entry {key}: {e}")
+            return
+
+        self.cleanup()
+
+    def entries(self) -> List[Tuple[float, int, str]]:
+        """Returns a list of (access time, size, path) for all the entries in the cache, sorted
+        from the least recently used to the most recently used.
+        """
+        result = []
+        try:
+            with os.scandir(self.root) as it:
+                for entry in it:
+                    if not entry.name.endswith(_ENTRY_SUFFIX):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    result.append((st.st_mtime, st.st_size, entry.path))
+        except OSError:
+            return []
+        result.sort()
+        return result
+
+    def cleanup(self) -> None:
+        """Evicts least recently used entries, until the cache is within its limits."""
+        entries = self.entries()
+        total_size = sum(size for _, size, _ in entries)
+        nentries = len(entries)
+        for _, size, path in entries:
+            too_many = self.entry_limit and nentries > self.entry_limit
+            too_large = self.size_limit and total_size > self.size_limit
+            if not (too_many or too_large):
+                break
+            self._remove(path)
+            nentries -= 1
+            total_size -= size
+
+    def clear(self) -> None:
+        """Removes all the entries in the cache"""
+        for _, _, path in self.entries():
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def create(configuration: spack.config.Configuration) -> Optional[ConcretizationCache]:
+    """Returns the concretization cache described by the configuration, or None if the cache
+    is disabled.
+    """
+    cache_config = configuration.get("concretizer:concretization_cache", {}) or {}
+    if not cache_config.get("enable", False):
+        return None
+
+    root = cache_config.get("path") or default_cache_location()
+    return ConcretizationCache(
+        spack.util.path.canonicalize_path(root),
+        entry_limit=int(cache_config.get("entry_limit", 1000)),
+        size_limit=int(cache_config.get("size_limit", 300_000_000)),
+    )
@@ -6,7 +6,7 @@
 import importlib
 import pathlib
 from types import ModuleType
-from typing import Any, Callable, NamedTuple, Optional, Tuple, Union
+from typing import Any, Callable, List, NamedTuple, Optional, Tuple, Union
 
 from llnl.util import lang
 
@@ -103,6 +103,43 @@ def __repr__(self) -> str:
         return str(self)
 
 
+def _escape(string: str) -> str:
+    """Escape a string in the same way clingo does when printing string symbols"""
+    return string.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def symbol_parts(term: Any, parts: List[Any]) -> None:
+    """Append to a list the parts of the string that clingo prints for the symbol of a term.
+
+    Integers are appended as they are, and must be converted to strings by the caller. All
+    the other parts are strings. This mirrors ``AspFunction._argify``, without the cost of
+    creating clingo symbols.
+    """
+    if isinstance(term, bool):
+        parts.append(f'"{term}"')
+    elif isinstance(term, int):
+        parts.append(term)
+    elif isinstance(term, AspFunction):
+        if not term.args:
+            parts.append(term.name)
+            return
+        parts.append(f"{term.name}(")
+        for idx, arg in enumerate(term.args):
+            if idx:
+                parts.append(",")
+            symbol_parts(arg, parts)
+        parts.append(")")
+    else:
+        parts.append(f'"{_escape(str(term))}"')
+
+
+def symbol_str(term: Any) -> str:
+    """Return the string clingo prints for the symbol of a term, without creating the symbol"""
+    parts: List[Any] = []
+    symbol_parts(term, parts)
+    return "".join(str(int(x)) if isinstance(x, int) else x for x in parts)
+
+
 class _AspFunctionBuilder:
     def __getattr__(self, name):
         return AspFunction(name)
@@ -223,6 +260,17 @@ def parse_term(*args, **kwargs):
         return clingo().parse_term(*args, **kwargs)
 
 
+def program_builder(control):
+    """Wrapper around clingo ProgramBuilder, that dispatches the function according
+    to clingo API version.
+    """
+    clingo()
+    try:
+        return importlib.import_module("clingo.ast").ProgramBuilder(control)
+    except (ImportError, AttributeError):
+        return control.builder()
+
+
 class NodeArgument(NamedTuple):
     """Represents a node in the DAG"""
 
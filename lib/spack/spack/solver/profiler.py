@@ -0,0 +1,117 @@
+# Copyright 2013-2024 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Profiling of the setup phase of the concretizer.
+
+The profiler records the time spent in each phase of ``SpackSolverSetup.setup``, the time
+spent emitting the rules of each package, and the number of facts emitted for each family
+of facts, so that regressions in the setup phase are easy to spot.
+"""
+import collections
+import contextlib
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .core import AspFunction
+
+
+def fact_family(atom) -> str:
+    """Returns the family of a fact, i.e. the name of its predicate.
+
+    Facts wrapped in ``pkg_fact`` are grouped by the name of the inner function, since that is
+    what distinguishes them.
+    """
+    if not isinstance(atom, AspFunction):
+        return str(atom).split("(", 1)[0]
+
+    if atom.name == "pkg_fact" and len(atom.args) > 1 and isinstance(atom.args[1], AspFunction):
+        return f"pkg_fact({atom.args[1].name})"
+
+    return atom.name
+
+
+class NullSetupProfiler:
+    """Profiler that records nothing. Used when profiling is not requested."""
+
+    #: Number of facts emitted, by family. None if facts are not counted.
+    fact_counts: Optional[collections.Counter] = None
+
+    def phase(self, name: str) -> None:
+        """Ends the current phase of the setup, if any, and starts a new one"""
+
+    def stop(self) -> None:
+        """Ends the current phase of the setup"""
+
+    def package(self, name: str):
+        """Context manager measuring the time spent on the rules of a package"""
+        return contextlib.nullcontext()
+
+    def replayed(self, name: str) -> None:
+        """Records that the directive rules of a package were replayed from the cache"""
+
+    def write_tty(self, out=None, top: int = 20) -> None:
+        """Writes a human readable report, by default to standard output"""
+
+
+class SetupProfiler(NullSetupProfiler):
+    """Records where time is spent, and which facts are emitted, during setup."""
+
+    def __init__(self, now=time.perf_counter):
+        self._now = now
+        self.fact_counts = collections.Counter()
+        self.phases: List[Tuple[str, float]] = []
+        self.package_times: Dict[str, float] = collections.defaultdict(float)
+        self.replayed_packages: List[str] = []
+        self._current: Optional[Tuple[str, float]] = None
+
+    def phase(self, name: str) -> None:
+        self.stop()
+        self._current = (name, self._now())
+
+    def stop(self) -> None:
+        if self._current is None:
+            return
+        name, start = self._current
+        self.phases.append((name, self._now() - start))
+        self._current = None
+
+    @contextlib.contextmanager
+    def package(self, name: str):
+        start = self._now()
+        try:
+            yield
+        finally:
+            self.package_times[name] += self._now() - start
+
+    def replayed(self, name: str) -> None:
+        self.replayed_packages.append(name)
+
+    def write_tty(self, out=None, top: int = 20) -> None:
+        out = out or sys.stdout
+        self.stop()
+
+        def _table(rows, fmt):
+            width = max((len(name) for name, _ in rows), default=0)
+            for name, value in rows:
+                out.write(f"    {name:<{width}}  {fmt(value)}\n")
+
+        total = sum(seconds for _, seconds in self.phases)
+        out.write(f"Setup phases (total {total:.3f}s):\n")
+        _table(self.phases, lambda x: f"{x:.3f}s")
+
+        packages = sorted(self.package_times.items(), key=lambda x: x[1], reverse=True)
+        out.write(
+            f"\nSlowest packages ({min(top, len(packages))} of {len(packages)}, "
+            f"{len(self.replayed_packages)} replayed from the cache):\n"
+        )
+        _table(packages[:top], lambda x: f"{x:.3f}s")
+
+        families = self.fact_counts.most_common()
+        out.write(
+            f"\nFacts by family ({min(top, len(families))} of {len(families)}, "
+            f"total {sum(self.fact_counts.values())}):\n"
+        )
+        _table(families[:top], str)
+        out.write("\n")
@@ -157,6 +157,9 @@ class Store:
             truncated to this length
         upstreams: optional list of upstream databases
         lock_cfg: lock configuration for the database
+        db_binary_index: whether the database also writes a binary index, which is read lazily
+        db_journal: whether the database appends changes to a journal, instead of rewriting
+            its index on every write
     """
 
     def __init__(
@@ -167,6 +170,8 @@ def __init__(
         hash_length: Optional[int] = None,
         upstreams: Optional[List[spack.database.Database]] = None,
         lock_cfg: spack.database.LockConfiguration = spack.database.NO_LOCK,
+        db_binary_index: bool = False,
+        db_journal: bool = False,
     ) -> None:
         self.root = root
         self.unpadded_root = unpadded_root or root
@@ -174,11 +179,18 @@ def __init__(
         self.hash_length = hash_length
         self.upstreams = upstreams
         self.lock_cfg = lock_cfg
+        self.db_binary_index = db_binary_index
+        self.db_journal = db_journal
         self.layout = spack.directory_layout.DirectoryLayout(
             root, projections=projections, hash_length=hash_length
         )
         self.db = spack.database.Database(
-            root, upstream_dbs=upstreams, lock_cfg=lock_cfg, layout=self.layout
+            root,
+            upstream_dbs=upstreams,
+            lock_cfg=lock_cfg,
+            layout=self.layout,
+            binary_index=db_binary_index,
+            journal=db_journal,
         )
 
         timeout_format_str = (
@@ -205,6 +217,8 @@ def __reduce__(self):
             self.hash_length,
             self.upstreams,
             self.lock_cfg,
+            self.db_binary_index,
+            self.db_journal,
         )
 
 
@@ -232,6 +246,8 @@ def create(configuration: ConfigurationType) -> Store:
         hash_length=hash_length,
         upstreams=upstreams,
         lock_cfg=spack.database.lock_configuration(configuration),
+        db_binary_index=configuration.get("config:db_binary_index", False),
+        db_journal=configuration.get("config:db_journal", False),
     )
 
 
@@ -120,15 +120,23 @@ def update_package(self, pkg_name):
         pkg_cls = self.repository.get_pkg_class(pkg_name)
 
         # Remove the package from the list of packages, if present
-        for pkg_list in self._tag_dict.values():
-            if pkg_name in pkg_list:
-                pkg_list.remove(pkg_name)
+        self.remove_packages({pkg_name})
 
         # Add it again under the appropriate tags
         for tag in getattr(pkg_cls, "tags", []):
             tag = tag.lower()
             self._tag_dict[tag].append(pkg_cls.name)
 
+    def remove_packages(self, pkg_names):
+        """Removes packages from the tag index, in a single pass.
+
+        Args:
+            pkg_names (set): names of the packages to be removed from the index
+        """
+        for tag, pkg_list in self._tag_dict.items():
+            if any(name in pkg_names for name in pkg_list):
+                self._tag_dict[tag] = [name for name in pkg_list if name not in pkg_names]
+
 
 class TagIndexError(spack.error.SpackError):
     """Raised when there is a problem with a TagIndex."""
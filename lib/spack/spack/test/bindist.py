@@ -2,9 +2,11 @@
 # Spack Project Developers. See the top-level COPYRIGHT file for details.
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import concurrent.futures
 import filecmp
 import glob
 import gzip
+import hashlib
 import io
 import json
 import os
@@ -13,6 +15,8 @@
 import shutil
 import sys
 import tarfile
+import threading
+import types
 import urllib.error
 import urllib.request
 import urllib.response
@@ -26,6 +30,7 @@
 from llnl.util.symlink import readlink
 
 import spack.binary_distribution as bindist
+import spack.buildcache_index as buildcache_index
 import spack.caches
 import spack.compilers
 import spack.config
@@ -37,7 +42,9 @@
 import spack.spec
 import spack.stage
 import spack.store
+import spack.util.file_cache
 import spack.util.gpg
+import spack.util.parallel
 import spack.util.spack_yaml as syaml
 import spack.util.url as url_util
 import spack.util.web as web_util
@@ -446,6 +453,179 @@ def test_generate_index_missing(monkeypatch, tmpdir, mutable_config):
         assert "libelf" not in cache_list
 
 
+def test_update_sharded_index(monkeypatch, tmp_path, mutable_config, install_mockery, mock_fetch):
+    """Tests that updating the index reads only new spec files and replaces only the shards
+    that changed, and that clients fetch only the shards that changed."""
+    mirror_dir = tmp_path / "mirror_dir"
+    spack.config.set("mirrors", {"test": url_util.path_to_file_url(str(mirror_dir))})
+    index_dir = mirror_dir / bindist.BUILD_CACHE_RELATIVE_PATH / "index"
+    libdwarf = Spec("libdwarf").concretized()
+    libelf_prefix = buildcache_index.shard_prefix(libdwarf["libelf"].dag_hash())
+    libdwarf_prefix = buildcache_index.shard_prefix(libdwarf.dag_hash())
+    install_cmd("--no-cache", libdwarf.name)
+
+    def shards():
+        return {name for name in os.listdir(index_dir) if name != "shards.json"}
+
+    def prefixes():
+        return {name.split("-")[0] for name in shards()}
+
+    buildcache_cmd("push", "-u", "--only=dependencies", str(mirror_dir), libdwarf.name)
+    buildcache_cmd("update-index", str(mirror_dir))
+    libelf_shards = shards()
+    assert [name.split("-")[0] for name in libelf_shards] == [libelf_prefix]
+
+    client = bindist.BinaryCacheIndex(str(tmp_path / "indices"))
+    client.update()
+    assert [s.name for s in client.get_all_built_specs()] == ["libelf"]
+
+    # Count spec files and shards that are read
+    read_specs, fetched_shards = [], []
+    from_json, fetch_shard = Spec.from_json, bindist.ShardedIndexFetcher.fetch_shard
+
+    def _from_json(data):
+        spec = from_json(data)
+        read_specs.append(spec.name)
+        return spec
+
+    def _fetch_shard(self, prefix, shard_digest):
+        fetched_shards.append(prefix)
+        return fetch_shard(self, prefix, shard_digest)
+
+    monkeypatch.setattr(Spec, "from_json", _from_json)
+    monkeypatch.setattr(bindist.ShardedIndexFetcher, "fetch_shard", _fetch_shard)
+
+    buildcache_cmd("push", "-u", "--only=package", str(mirror_dir), libdwarf.name)
+    buildcache_cmd("update-index", str(mirror_dir))
+
+    # Only the new spec file is read, and the shard of libelf, if libdwarf is in the same
+    # shard, is replaced but kept for the clients that fetched the previous list of shards
+    assert read_specs == ["libdwarf"]
+    assert prefixes() >= {libelf_prefix, libdwarf_prefix}
+    assert libelf_shards <= shards()
+
+    # The client fetches only the shard of libdwarf
+    fetched_shards.clear()
+    with spack.config.override("config:binary_index_ttl", 0):
+        client.update()
+    assert fetched_shards == [libdwarf_prefix]
+    assert sorted(s.name for s in client.get_all_built_specs()) == ["libdwarf", "libelf"]
+
+    # The replaced shard is removed by the next update
+    buildcache_cmd("update-index", str(mirror_dir))
+    assert prefixes() == {libelf_prefix, libdwarf_prefix}
+    assert (libelf_shards <= shards()) == (libelf_prefix != libdwarf_prefix)
+
+    # Clients fall back to index.json when shards can't be fetched
+    def _fetch_shard_fails(self, prefix, shard_digest):
+        raise bindist.FetchIndexError(f"Could not fetch index shard {prefix}")
+
+    monkeypatch.setattr(bindist.ShardedIndexFetcher, "fetch_shard", _fetch_shard_fails)
+    other_client = bindist.BinaryCacheIndex(str(tmp_path / "other_indices"))
+    other_client.update()
+    assert sorted(s.name for s in other_client.get_all_built_specs()) == ["libdwarf", "libelf"]
+
+
+def test_sharded_index_cold_client_fetches_index_json(
+    monkeypatch, tmp_path, mutable_config, install_mockery, mock_fetch
+):
+    """Tests that clients without the shards cached download index.json instead of fetching most
+    shards one by one, and cache the shards it splits into."""
+    # One shard per spec
+    monkeypatch.setattr(buildcache_index, "PREFIX_LENGTH", 32)
+    mirror_dir = tmp_path / "mirror_dir"
+    spack.config.set("mirrors", {"test": url_util.path_to_file_url(str(mirror_dir))})
+    install_cmd("--no-cache", "libdwarf")
+    buildcache_cmd("push", "-u", str(mirror_dir), "libdwarf")
+    buildcache_cmd("update-index", str(mirror_dir))
+
+    fetched_shards = []
+    fetch_shard = bindist.ShardedIndexFetcher.fetch_shard
+
+    def _fetch_shard(self, prefix, shard_digest):
+        fetched_shards.append(prefix)
+        return fetch_shard(self, prefix, shard_digest)
+
+    monkeypatch.setattr(bindist.ShardedIndexFetcher, "fetch_shard", _fetch_shard)
+
+    client = bindist.BinaryCacheIndex(str(tmp_path / "indices"))
+    client.update()
+    assert fetched_shards == []
+    assert sorted(s.name for s in client.get_all_built_specs()) == ["libdwarf", "libelf"]
+
+    # The shards split from index.json are used by the next update
+    with spack.config.override("config:binary_index_ttl", 0):
+        client.update()
+    assert fetched_shards == []
+    assert sorted(s.name for s in client.get_all_built_specs()) == ["libdwarf", "libelf"]
+
+
+def test_update_index_drops_specs_removed_from_buildcache(
+    tmp_path, mutable_config, install_mockery, mock_fetch
+):
+    """Tests that specs whose spec file was removed are dropped from the index, unless they are
+    dependencies of specs that are still in the buildcache."""
+    mirror_dir = tmp_path / "mirror_dir"
+    build_cache = mirror_dir / bindist.BUILD_CACHE_RELATIVE_PATH
+    libdwarf = Spec("libdwarf").concretized()
+    install_cmd("--no-cache", libdwarf.name)
+    buildcache_cmd("push", "-u", str(mirror_dir), libdwarf.name)
+    buildcache_cmd("update-index", str(mirror_dir))
+
+    def indexed_hashes():
+        manifest = buildcache_index.load_manifest(
+            (build_cache / "index" / "shards.json").read_bytes()
+        )
+        shards = [
+            buildcache_index.load_shard(
+                (build_cache / "index" / buildcache_index.shard_name(prefix, digest)).read_bytes(),
+                digest,
+            )
+            for prefix, digest in manifest.prefixes.items()
+        ]
+        index_json = json.loads((build_cache / "index.json").read_text())
+        hashes = set(buildcache_index.merge(shards, "7")["database"]["installs"])
+        assert hashes == set(index_json["database"]["installs"])
+        return hashes
+
+    assert indexed_hashes() == {libdwarf.dag_hash(), libdwarf["libelf"].dag_hash()}
+
+    # Remove the spec file of the leaf spec
+    for specfile in build_cache.glob(f"*{libdwarf.dag_hash()}.spec.json*"):
+        specfile.unlink()
+    buildcache_cmd("update-index", str(mirror_dir))
+    assert indexed_hashes() == {libdwarf["libelf"].dag_hash()}
+
+
+def test_sharded_index_round_trip():
+    installs = {
+        "aaaa": {"spec": {"name": "a", "dependencies": [{"name": "b", "hash": "bbbb"}]}},
+        "abbb": {"spec": {"name": "c"}, "ref_count": 3},
+        "bbbb": {"spec": {"name": "b"}, "in_buildcache": True},
+    }
+    shards = buildcache_index.split(installs, "7")
+    assert set(shards) == {"a", "b"}
+
+    manifest = buildcache_index.Manifest(
+        "7", {prefix: buildcache_index.digest(data) for prefix, data in shards.items()}
+    )
+    assert buildcache_index.load_manifest(buildcache_index.dump_manifest(manifest)) == manifest
+
+    records = [buildcache_index.load_shard(shards[p], d) for p, d in manifest.prefixes.items()]
+    index = buildcache_index.merge(records, "7")["database"]
+    assert index["version"] == "7"
+    assert {h: r["ref_count"] for h, r in index["installs"].items()} == {
+        "aaaa": 0,
+        "abbb": 0,
+        "bbbb": 1,
+    }
+
+    with pytest.raises(buildcache_index.ShardedIndexError, match="digest"):
+        buildcache_index.load_shard(shards["a"], manifest.prefixes["b"])
+    with pytest.raises(buildcache_index.ShardedIndexError, match="unsupported version"):
+        buildcache_index.load_manifest(b'{"shards": {"version": 2}}')
+
+
 def test_generate_key_index_failure(monkeypatch, tmp_path):
     def list_url(url, recursive=False):
         if "fails-listing" in url:
@@ -615,6 +795,38 @@ def test_FetchCacheError_pretty_printing_single():
     assert str_e.rstrip() == str_e
 
 
+def test_update_uses_indices_of_mirrors_that_respond(mutable_config, tmp_path, monkeypatch, capfd):
+    """Tests that the indices of mirrors are fetched concurrently, and that a slow mirror is
+    reported without discarding the indices of the other mirrors, nor waiting for it."""
+    spack.config.set("mirrors", {"fast": "file:///fast", "slow": "file:///slow"})
+    spack.config.set("config:binary_index_timeout", 1)
+    fast_fetched, release_slow = threading.Event(), threading.Event()
+
+    def _fetch_index(self, mirror_url, cache_entry):
+        # Threads fetching indices must not keep Spack running at exit
+        assert threading.current_thread().daemon
+        if mirror_url == "file:///slow":
+            # Mirrors are fetched concurrently: the slow mirror waits for the fast one
+            assert fast_fetched.wait(10)
+            release_slow.wait(10)
+        else:
+            fast_fetched.set()
+        return {"index_hash": mirror_url, "index_path": "index.json", "etag": None}
+
+    monkeypatch.setattr(bindist.BinaryCacheIndex, "_fetch_index", _fetch_index)
+    monkeypatch.setattr(
+        bindist.BinaryCacheIndex, "regenerate_spec_cache", lambda *args, **kwargs: None
+    )
+    index = bindist.BinaryCacheIndex(str(tmp_path))
+    try:
+        index.update()
+    finally:
+        release_slow.set()
+
+    assert list(index._local_index_cache) == ["file:///fast"]
+    assert "Timed out after 1 seconds fetching the index of file:///slow" in capfd.readouterr().err
+
+
 def test_build_manifest_visitor(tmpdir):
     dir = "directory"
     file = os.path.join("directory", "file")
@@ -671,6 +883,112 @@ def test_text_relocate_if_needed(install_mockery, temporary_store, mock_fetch, m
     assert join_path("bin", "secretexe") not in manifest["text_to_relocate"]
 
 
+@pytest.mark.parametrize(
+    "chunks,rel_path,expected",
+    [
+        # ELF executables and shared libraries, but not object files
+        ([b"\x7fELF\x02\x01\x01" + b"\0" * 9 + b"\x02\x00"], "bin/app", "binary"),
+        ([b"\x7fELF\x02\x01\x01" + b"\0" * 9 + b"\x03\x00"], "lib/libfoo.so", "binary"),
+        ([b"\x7fELF\x02\x01\x01" + b"\0" * 9 + b"\x01\x00"], "lib/foo.o", "other"),
+        # ELF files are classified by their type, not by their suffix
+        ([b"\x7fELF\x02\x01\x01" + b"\0" * 9 + b"\x03\x00"], "lib/foo.o", "binary"),
+        ([b"\x7fELF\x02\x01\x01" + b"\0" * 9 + b"\x02\x00"], "bin/app.o", "binary"),
+        ([b"\x7fELF\x02\x02\x01" + b"\0" * 9 + b"\x00\x03"], "lib/libfoo.so", "binary"),
+        # Mach-O binaries and universal binaries
+        ([b"\xcf\xfa\xed\xfe" + b"\0" * 28], "lib/libfoo.dylib", "binary"),
+        ([b"\xca\xfe\xba\xbe\x00\x00\x00\x02" + b"\0" * 24], "bin/app", "binary"),
+        # Java class files have the same magic number as universal binaries
+        ([b"\xca\xfe\xba\xbe\x00\x00\x00\x34" + b"\0" * 24], "Foo.class", "other"),
+        # Text files are relocated only if they contain a prefix
+        ([b"#!/my/prefix/bin/python\n"], "bin/script", "text"),
+        ([b"#!/usr/bin/env python\n"], "bin/script", "other"),
+        ([b"prefix = /my/pre", b"fix/share\n"], "share/config", "text"),
+        ([b"\0/my/prefix/bin"], "share/data", "other"),
+        ([b"/my/prefix/bin", b"\0"], "share/data", "other"),
+        ([], "share/empty", "other"),
+    ],
+)
+def test_file_classifier(chunks, rel_path, expected):
+    regex = bindist.utf8_paths_to_single_binary_regex(["/my/prefix"])
+    classifier = bindist.FileClassifier(rel_path, regex, overlap=len("/my/prefix"))
+    for chunk in chunks:
+        classifier.update(chunk)
+    assert classifier.kind() == expected
+
+
+def test_manifest_while_creating_tarball(
+    install_mockery, temporary_store, mock_fetch, tmp_path, monkeypatch
+):
+    """Tests that files are classified while the tarball is created, and that classifications
+    are cached for files that didn't change"""
+    install_cmd("needs-text-relocation")
+    spec = temporary_store.db.query_one("needs-text-relocation")
+    monkeypatch.setattr(
+        spack.caches, "MISC_CACHE", spack.util.file_cache.FileCache(str(tmp_path / "cache"))
+    )
+
+    tarball = str(tmp_path / "prefix.tar.gz")
+    bindist._do_create_tarball(tarball, spec.prefix, {}, bindist.BuildManifest(spec))
+    with tarfile.open(tarball) as tar:
+        name = bindist.buildinfo_file_name(spec.prefix).lstrip("/")
+        buildinfo = syaml.load(tar.extractfile(name))
+
+    assert join_path("bin", "exe") in buildinfo["relocate_textfiles"]
+    assert join_path("bin", "otherexe") not in buildinfo["relocate_textfiles"]
+
+    # The second time, files are not read to be classified
+    def _fail(*args, **kwargs):
+        raise AssertionError("file classified again")
+
+    monkeypatch.setattr(bindist.FileClassifier, "update", _fail)
+    manifest = get_buildfile_manifest(spec)
+    assert sorted(manifest["text_to_relocate"]) == sorted(buildinfo["relocate_textfiles"])
+    assert sorted(manifest["binary_to_relocate"]) == sorted(buildinfo["relocate_binaries"])
+
+
+def test_manifest_stops_reading_binary_files(
+    install_mockery, temporary_store, mock_fetch, tmp_path, monkeypatch
+):
+    """Tests that files are read only until they are known not to be text files"""
+    install_cmd("needs-text-relocation")
+    spec = temporary_store.db.query_one("needs-text-relocation")
+    monkeypatch.setattr(
+        spack.caches, "MISC_CACHE", spack.util.file_cache.FileCache(str(tmp_path / "cache"))
+    )
+    with open(join_path(spec.prefix, "bin", "data"), "wb") as f:
+        f.write(b"\0" * (4 << 20))
+
+    read = []
+    update = bindist.FileClassifier.update
+
+    def _update(self, data):
+        read.append(len(data))
+        update(self, data)
+
+    monkeypatch.setattr(bindist.FileClassifier, "update", _update)
+    manifest = bindist.BuildManifest(spec)
+    manifest.visit_file(join_path("bin", "data"))
+    assert sum(read) == 1 << 20
+    assert manifest.finish()["other"] == [join_path(spec.prefix, "bin", "data")]
+
+
+@pytest.mark.parametrize(
+    "n_tarballs,workers,expected", [(1, 4, 8), (3, 4, 2), (16, 4, 2), (16, 16, 1), (16, 2, 4)]
+)
+def test_compression_jobs_are_shared_by_tarballs(n_tarballs, workers, expected, monkeypatch):
+    """Tests that tarballs created concurrently don't use more compression threads than jobs"""
+    monkeypatch.setattr(spack.config, "determine_number_of_jobs", lambda parallel: 8)
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        assert bindist._compression_jobs(n_tarballs, executor) == expected
+
+
+def test_sequential_uploads_use_all_compression_jobs(monkeypatch):
+    """Tests that tarballs created one at a time use all the jobs to compress"""
+    monkeypatch.setattr(spack.config, "determine_number_of_jobs", lambda parallel: 8)
+    executor = spack.util.parallel.SequentialExecutor()
+    assert bindist._compression_jobs(16, executor) == 8
+
+
 def test_etag_fetching_304():
     # Test conditional fetch with etags. If the remote hasn't modified the file
     # it returns 304, which is an HTTPError in urllib-land. That should be
@@ -1213,3 +1531,248 @@ def test_download_tarball_with_unsupported_layout_fails(tmp_path, mutable_config
 
     # And there should be a warning about an unsupported layout version.
     assert f"Layout version {layout_version} is too new" in capsys.readouterr().err
+
+
+def test_built_specs_by_name(tmp_path, mock_packages, config):
+    """Tests that built specs can be selected by package name, and that the index by name is
+    kept up to date when specs are added.
+    """
+    index = bindist.BinaryCacheIndex(str(tmp_path))
+    libelf, libdwarf = Spec("libelf").concretized(), Spec("libdwarf").concretized()
+    index.update_spec(libelf, [{"mirror_url": "file:///a", "spec": libelf}])
+
+    assert index.get_all_built_specs(names={"libelf", "zlib"}) == [libelf]
+    assert index.get_all_built_specs(names={"libdwarf"}) == []
+
+    index.update_spec(libdwarf, [{"mirror_url": "file:///a", "spec": libdwarf}])
+    assert index.get_all_built_specs(names={"libdwarf"}) == [libdwarf]
+    assert index.get_all_built_specs(names={"libelf", "libdwarf"}) == [libdwarf, libelf]
+
+
+def test_specs_are_decoded_lazily_from_mirror_index(tmp_path, mock_packages, config):
+    """Tests that the specs in the cached index of a mirror are decoded only when looked up,
+    and that only those in the buildcache are reported."""
+    libdwarf = Spec("libdwarf").concretized()
+    db = bindist.BuildCacheDatabase(str(tmp_path / "db"))
+    db.add(libdwarf)
+    db.mark(libdwarf, "in_buildcache", True)
+
+    index = bindist.BinaryCacheIndex(str(tmp_path / "cache"))
+    index._init_local_index_cache()
+    index._index_file_cache.init_entry("mirror_index.json")
+    with index._index_file_cache.write_transaction("mirror_index.json") as (old, new):
+        db._write_to_file(new)
+    index._local_index_cache["file:///a"] = {
+        "index_hash": "a",
+        "index_path": "mirror_index.json",
+        "etag": None,
+    }
+    index._write_local_index_cache()
+    index.regenerate_spec_cache()
+
+    assert not index._mirrors_for_spec
+    records = index._mirror_indices["file:///a"]._records
+    assert not records._decoded
+
+    # libelf is in the index only as a dependency of libdwarf
+    assert index.get_all_built_specs(names={"libelf"}) == []
+    assert index.find_built_spec(libdwarf["libelf"]) == []
+
+    [found] = index.find_built_spec(libdwarf)
+    assert found["mirror_url"] == "file:///a"
+    assert found["spec"].dag_hash() == libdwarf.dag_hash()
+    assert set(records._decoded) == {libdwarf.dag_hash(), libdwarf["libelf"].dag_hash()}
+    assert index.get_all_built_specs(names={"libdwarf"}) == [found["spec"]]
+
+    # The binary index is written once, and reused while the cached index doesn't change
+    binary_index = tmp_path / "cache" / "mirror_index.bin"
+    mtime = binary_index.stat().st_mtime_ns
+    other = bindist.BinaryCacheIndex(str(tmp_path / "cache"))
+    other.regenerate_spec_cache()
+    assert [s.dag_hash() for s in other.get_all_built_specs()] == [libdwarf.dag_hash()]
+    assert binary_index.stat().st_mtime_ns == mtime
+
+
+@pytest.mark.usefixtures("install_mockery", "mock_fetch")
+def test_install_streams_tarball(mutable_temporary_mirror, monkeypatch):
+    """Tests that tarballs are checksummed and extracted while being downloaded, without being
+    staged first."""
+    spec = Spec("trivial-install-test-package").concretized()
+    install_cmd("--no-cache", spec.name)
+    buildcache_cmd("push", "-u", mutable_temporary_mirror, spec.name)
+    uninstall_cmd("-y", f"/{spec.dag_hash()}")
+
+    fetched = []
+    try_fetch = bindist.try_fetch
+    monkeypatch.setattr(bindist, "try_fetch", lambda url: fetched.append(url) or try_fetch(url))
+
+    install_cmd("--cache-only", "--no-check-signature", spec.name)
+
+    assert spack.store.STORE.db.query_local_by_spec_hash(spec.dag_hash()).installed
+    assert os.path.exists(os.path.join(spec.prefix, ".spack", "binary_distribution"))
+    assert fetched and not any(url.endswith(".spack") for url in fetched)
+    assert os.listdir(os.path.dirname(spec.prefix)) == [os.path.basename(spec.prefix)]
+
+
+@pytest.mark.usefixtures("install_mockery", "mock_fetch")
+@pytest.mark.parametrize(
+    "corrupt",
+    [lambda data: data + b"\0" * 512, lambda data: data[:-100]],
+    ids=["trailing-data", "truncated"],
+)
+def test_streamed_tarball_with_wrong_checksum(corrupt, mutable_temporary_mirror):
+    """Tests that nothing is installed when a streamed tarball doesn't match its checksum, both
+    when it can be extracted and when it can't."""
+    spec = Spec("trivial-install-test-package").concretized()
+    install_cmd("--no-cache", spec.name)
+    buildcache_cmd("push", "-u", mutable_temporary_mirror, spec.name)
+    uninstall_cmd("-y", f"/{spec.dag_hash()}")
+
+    tarball = pathlib.Path(
+        mutable_temporary_mirror,
+        bindist.build_cache_relative_path(),
+        bindist.tarball_path_name(spec, ".spack"),
+    )
+    tarball.write_bytes(corrupt(tarball.read_bytes()))
+
+    with pytest.raises(bindist.NoChecksumException):
+        bindist.install_root_node(spec, unsigned=True)
+
+    assert not os.path.exists(spec.prefix)
+    assert not os.listdir(os.path.dirname(spec.prefix))
+
+
+def _tarball_stream(tmp_path, add_members):
+    """Returns a stream of a tarball of a package prefix, with the members added by a function
+    taking the tarfile and the path of a file to add, and the checksum of the tarball."""
+    regular_file = tmp_path / "file"
+    regular_file.write_text("content")
+    data = io.BytesIO()
+    with tarfile.open(fileobj=data, mode="w:gz") as tar:
+        tar.add(tmp_path, "pkg", recursive=False)
+        tar.add(regular_file, "pkg/.spack/binary_distribution")
+        add_members(tar, regular_file)
+    return io.BytesIO(data.getvalue()), hashlib.sha256(data.getvalue()).hexdigest()
+
+
+def _add_link(tar, name, target, type=tarfile.SYMTYPE):
+    info = tarfile.TarInfo(name)
+    info.type, info.linkname = type, target
+    tar.addfile(info)
+
+
+@pytest.mark.parametrize(
+    "add_members",
+    [
+        # A file under a symlinked directory
+        lambda tar, f, outside: (
+            _add_link(tar, "pkg/link", outside),
+            tar.add(f, "pkg/link/pwned"),
+        ),
+        # A file replacing a symlink
+        lambda tar, f, outside: (
+            _add_link(tar, "pkg/link", f"{outside}/pwned"),
+            tar.add(f, "pkg/./link"),
+        ),
+        # A hard link to a symlink
+        lambda tar, f, outside: (
+            _add_link(tar, "pkg/link", f"{outside}/pwned"),
+            _add_link(tar, "pkg/hardlink", "pkg/link", type=tarfile.LNKTYPE),
+        ),
+    ],
+    ids=["under-symlink", "replacing-symlink", "hardlink-to-symlink"],
+)
+def test_streamed_tarball_cannot_write_through_symlinks(add_members, tmp_path):
+    """Tests that streamed tarballs can't write outside of the prefix through symlinks."""
+    outside, prefix = tmp_path / "outside", tmp_path / "store" / "prefix"
+    outside.mkdir()
+    prefix.mkdir(parents=True)
+    (outside / "pwned").write_text("original")
+
+    def _add_members(tar, regular_file):
+        add_members(tar, regular_file, str(outside))
+
+    stream, checksum = _tarball_stream(tmp_path, _add_members)
+    with pytest.raises(ValueError, match="through a symbolic link"):
+        bindist._extract_tarball_stream(
+            types.SimpleNamespace(prefix=str(prefix)), stream, checksum
+        )
+
+    assert os.listdir(outside) == ["pwned"]
+    assert (outside / "pwned").read_text() == "original"
+    assert not os.listdir(prefix)
+    assert os.listdir(prefix.parent) == ["prefix"]
+
+
+def test_streamed_tarball_into_non_empty_prefix(tmp_path):
+    """Tests that a streamed tarball is merged with the directories existing in the prefix."""
+    prefix = tmp_path / "store" / "prefix"
+    (prefix / ".spack").mkdir(parents=True)
+    (prefix / ".spack" / "existing").write_text("existing")
+
+    def _add_members(tar, regular_file):
+        tar.add(regular_file, "pkg/bin/exe")
+        _add_link(tar, "pkg/bin/link", "exe")
+
+    stream, checksum = _tarball_stream(tmp_path, _add_members)
+    bindist._extract_tarball_stream(types.SimpleNamespace(prefix=str(prefix)), stream, checksum)
+
+    assert sorted(os.listdir(prefix / ".spack")) == ["binary_distribution", "existing"]
+    assert (prefix / "bin" / "exe").read_text() == "content"
+    assert os.readlink(prefix / "bin" / "link") == "exe"
+
+
+def _relocation(binary_format=None, old_prefix="/old/prefix", new_prefix="/new"):
+    return bindist._Relocation(
+        binary_format=binary_format,
+        relative_rpaths=False,
+        old_layout_root="/old",
+        new_layout_root="/new",
+        old_prefix=old_prefix,
+        new_prefix=new_prefix,
+        prefix_to_prefix_bin={old_prefix: new_prefix},
+        prefix_to_prefix_text={old_prefix: new_prefix},
+    )
+
+
+def test_relocate_files_in_parallel(tmp_path, monkeypatch):
+    """Tests that files are relocated in chunks on a pool of processes, and that the binaries
+    that were modified are returned in order."""
+    monkeypatch.setattr(bindist, "RELOCATION_CHUNK_SIZE", 2)
+    monkeypatch.setattr(spack.config, "determine_number_of_jobs", lambda parallel: 2)
+
+    binaries, text_files = [], []
+    for i in range(5):
+        binary = tmp_path / f"binary-{i}"
+        binary.write_bytes(b"\0/old/prefix/lib/libfoo.so\0")
+        binaries.append(str(binary))
+    for i in range(3):
+        text_file = tmp_path / f"text-{i}"
+        text_file.write_text("#!/old/prefix/bin/python\n")
+        text_files.append(str(text_file))
+
+    assert bindist._relocate_files_in_parallel(_relocation(), binaries, text_files) == binaries
+    for binary in binaries:
+        assert Path(binary).read_bytes() == b"\0////////new/lib/libfoo.so\0"
+    for text_file in text_files:
+        assert Path(text_file).read_text() == "#!/new/bin/python\n"
+
+
+def test_relocate_files_in_parallel_errors(tmp_path, monkeypatch):
+    """Tests that the errors of all the chunks are reported, in the order of the chunks"""
+    monkeypatch.setattr(bindist, "RELOCATION_CHUNK_SIZE", 1)
+    monkeypatch.setattr(spack.config, "determine_number_of_jobs", lambda parallel: 2)
+
+    binaries = []
+    for i in range(3):
+        binary = tmp_path / f"binary-{i}"
+        binary.write_bytes(b"/old/prefix-%d/lib\0" % i if i else b"no prefix\0")
+        binaries.append(str(binary))
+
+    relocation = _relocation(old_prefix="/old/prefix", new_prefix="/old/pre")
+    with pytest.raises(bindist.RelocationError) as e:
+        bindist._relocate_files_in_parallel(relocation, binaries, [])
+
+    message = str(e.value)
+    assert message.count("Cannot replace") == 2
+    assert message.index("prefix-1") < message.index("prefix-2")
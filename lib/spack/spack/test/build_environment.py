@@ -602,6 +602,56 @@ def test_build_jobs_defaults():
     )
 
 
+@pytest.mark.not_on_windows("no jobserver on Windows")
+def test_jobserver(monkeypatch):
+    """Tests that the jobserver holds one token less than the number of jobs, and that
+    build processes detect it through MAKEFLAGS.
+    """
+    monkeypatch.setenv("MAKEFLAGS", "-k")
+    with spack.build_environment.JobServer(4) as jobserver:
+        assert spack.build_environment.jobserver_enabled()
+        assert os.environ["MAKEFLAGS"] == jobserver.makeflags
+        assert os.get_inheritable(jobserver.read_fd)
+        os.set_blocking(jobserver.read_fd, False)
+        assert os.read(jobserver.read_fd, 10) == b"+++"
+    assert os.environ["MAKEFLAGS"] == "-k"
+    assert jobserver.read_fd is None
+
+
+@pytest.mark.not_on_windows("no jobserver on Windows")
+def test_build_process_uses_its_jobserver_fds(monkeypatch):
+    """Tests that MAKEFLAGS points to the file descriptors of the jobserver in build processes,
+    which may differ from those of the parent when processes are spawned."""
+    monkeypatch.setenv("MAKEFLAGS", "-j4 --jobserver-auth=100,101 -k")
+    read_fd, write_fd = os.pipe()
+    try:
+        spack.build_environment._use_jobserver_fds(read_fd, write_fd)
+        assert os.environ["MAKEFLAGS"] == f"-j4 --jobserver-auth={read_fd},{write_fd} -k"
+        assert os.get_inheritable(read_fd) and os.get_inheritable(write_fd)
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
+
+
+@pytest.mark.parametrize("scope", ["command_line", "defaults"])
+def test_split_build_jobs(scope):
+    """Tests that build jobs are divided among concurrent builds, even when set on the command
+    line, and restored afterwards, without changing the configuration.
+    """
+    with spack.config.use_configuration(
+        spack.config.InternalConfigScope("defaults", {"config": {"build_jobs": 16}}),
+        spack.config.InternalConfigScope("command_line"),
+    ):
+        spack.config.set("config:build_jobs", 8, scope=scope)
+        jobs = spack.config.determine_number_of_jobs(parallel=True)
+        assert spack.build_environment.get_build_jobs() == jobs
+        with spack.build_environment.split_build_jobs(3):
+            assert spack.build_environment.get_build_jobs() == max(1, jobs // 3)
+            assert spack.build_environment.get_build_jobs(parallel=False) == 1
+            assert spack.config.determine_number_of_jobs(parallel=True) == jobs
+        assert spack.build_environment.get_build_jobs() == jobs
+
+
 class TestModuleMonkeyPatcher:
     def test_getting_attributes(self, default_mock_concretization):
         s = default_mock_concretization("libelf")
@@ -10,6 +10,7 @@
 import pytest
 
 import spack
+import spack.cmd.debug
 import spack.platforms
 import spack.spec
 from spack.main import SpackCommand
@@ -59,3 +60,25 @@ def test_report():
     assert spack.get_version() in out
     assert platform.python_version() in out
     assert str(architecture) in out
+
+
+def test_parse_import_times():
+    output = """\
+import time: self [us] | cumulative | imported package
+import time:       100 |        100 |     spack.b
+import time:        50 |         50 |     spack.c
+import time:        10 |        160 |   spack.a
+import time:        20 |        180 | spack.main
+import time:         5 |          5 | json
+"""
+    main, json = spack.cmd.debug.parse_import_times(output)
+    assert (main.name, main.self_us, main.cumulative_us) == ("spack.main", 20, 180)
+    assert [x.name for x in main.children] == ["spack.a"]
+    assert [x.name for x in main.children[0].children] == ["spack.b", "spack.c"]
+    assert json.name == "json" and not json.children
+
+
+def test_startup():
+    out = debug("startup", "--threshold", "0", "--depth", "1")
+    assert "spack --version:" in out
+    assert "spack.main" in out
@@ -8,6 +8,7 @@
 import pytest
 
 import spack.cmd.info
+import spack.repo
 from spack.main import SpackCommand
 
 info = SpackCommand("info")
@@ -98,3 +99,31 @@ def test_info_fields(pkg_query, extra_args, parser, print_buffer):
 
     for text in expected_fields:
         assert any(x for x in print_buffer if text in x)
+
+
+@pytest.mark.parametrize(
+    "pkg_query",
+    ["mpich", "multivalue-variant", "variant-values-override", "licenses-1", "url-only-override"],
+)
+@pytest.mark.parametrize("extra_args", [[], ["--variants-by-name", "--virtuals", "--tags"]])
+def test_info_from_metadata_index(
+    pkg_query, extra_args, mock_packages, parser, capsys, monkeypatch
+):
+    """Tests that the information read from the metadata index is the same as that read from
+    package classes, without importing the package."""
+    args = parser.parse_args(extra_args + [pkg_query])
+    get_pkg_class = spack.repo.PATH.get_pkg_class
+
+    def _get_pkg_class(*args, **kwargs):
+        raise AssertionError("package class imported")
+
+    monkeypatch.setattr(spack.repo.PATH, "get_pkg_class", _get_pkg_class)
+    spack.cmd.info.info(parser, args)
+    from_index = capsys.readouterr().out
+
+    monkeypatch.setattr(spack.repo.PATH, "get_pkg_class", get_pkg_class)
+    monkeypatch.setattr(
+        spack.cmd.info, "_package", lambda spec, args: get_pkg_class(spec.name)(spec)
+    )
+    spack.cmd.info.info(parser, args)
+    assert from_index == capsys.readouterr().out
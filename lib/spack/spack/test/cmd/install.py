@@ -66,6 +66,18 @@ def test_install_package_and_dependency(
     assert 'errors="0"' in content
 
 
+def test_install_concurrent_packages_with_report(
+    tmpdir, mock_packages, mock_archive, mock_fetch, install_mockery, mutable_config
+):
+    """Tests that packages are built one at a time when a report is requested"""
+    with tmpdir.as_cwd():
+        out = install("-p", "2", "--log-format=junit", "--log-file=test", "libdwarf")
+
+    assert "Building one package at a time" in out
+    assert spack.config.get("config:concurrent_packages") == 1
+    assert 'tests="2"' in tmpdir.join("test.xml").read()
+
+
 @pytest.mark.disable_clean_stage_check
 def test_install_runtests_notests(monkeypatch, mock_packages, install_mockery):
     def check(pkg):
@@ -18,6 +18,7 @@
 import spack.compilers
 import spack.concretize
 import spack.config
+import spack.database
 import spack.deptypes as dt
 import spack.detection
 import spack.error
@@ -2445,7 +2446,7 @@ def test_exclude_specs_from_reuse(self, monkeypatch):
         # Prepare a mock mirror that returns an old version of dyninst
         request_str = "callpath ^mpich"
         reused = Spec(f"{request_str} ^dyninst@8.1.1").concretized()
-        monkeypatch.setattr(spack.solver.asp, "_specs_from_mirror", lambda: [reused])
+        monkeypatch.setattr(spack.solver.asp, "_specs_from_mirror", lambda names=None: [reused])
 
         # Exclude dyninst from reuse, so we expect that the old version is not taken into account
         with spack.config.override(
@@ -3082,3 +3083,155 @@ def test_reuse_prefers_standard_over_git_versions(
         test_spec = spack.spec.Spec("git-ref-package@2").concretized()
         assert git_spec.dag_hash() != test_spec.dag_hash()
         assert standard_spec.dag_hash() == test_spec.dag_hash()
+
+
+def test_logic_program_is_parsed_once_per_process(mutable_config, mock_packages, monkeypatch):
+    """Tests that the static rules of the concretizer are parsed only once, and reused
+    across solves.
+    """
+    # Solve twice for real, instead of fetching the second solution from the cache
+    mutable_config.set("concretizer:concretization_cache:enable", False)
+    monkeypatch.setattr(spack.solver.asp, "_PARSED_LOGIC_PROGRAMS", {})
+    parsed_files, loaded_programs = [], []
+    original_parse_files = spack.solver.asp.parse_files
+    original_parsed_logic_program = spack.solver.asp.parsed_logic_program
+
+    def _parse_files(files, callback):
+        parsed_files.extend(files)
+        return original_parse_files(files, callback)
+
+    def _parsed_logic_program(path):
+        result = original_parsed_logic_program(path)
+        loaded_programs.append((path, result))
+        return result
+
+    monkeypatch.setattr(spack.solver.asp, "parse_files", _parse_files)
+    monkeypatch.setattr(spack.solver.asp, "parsed_logic_program", _parsed_logic_program)
+
+    first = spack.spec.Spec("mpileaks").concretized()
+    assert any(x.endswith("concretize.lp") for x in parsed_files)
+    assert len(parsed_files) == len(set(parsed_files))
+    cached_programs = dict(spack.solver.asp._PARSED_LOGIC_PROGRAMS)
+
+    parsed_files.clear()
+    loaded_programs.clear()
+    second = spack.spec.Spec("mpileaks").concretized()
+
+    # The second solve adds the same statements, without parsing any file again
+    assert first.dag_hash() == second.dag_hash()
+    assert not parsed_files
+    assert any(path.endswith("concretize.lp") for path, _ in loaded_programs)
+    assert all(cached_programs[path] is statements for path, statements in loaded_programs)
+
+
+def test_parallel_solve_with_portfolio(mutable_config, mock_packages):
+    """Tests that a solve using multiple threads, each with a different configuration from
+    the portfolio, gives an optimal solution, and reports the CPU time of each configuration.
+    """
+    sequential = spack.solver.asp.Solver().solve([Spec("mpileaks")])
+    mutable_config.set("concretizer:solver", {"threads": 2})
+
+    control = spack.solver.asp.default_clingo_control()
+    assert len(control.configuration.solver) >= 2
+
+    solver = spack.solver.asp.Solver()
+    setup = spack.solver.asp.SpackSolverSetup()
+    parallel, timer, _ = solver.driver.solve(setup, [Spec("mpileaks")], reuse=[])
+
+    assert min(parallel.answers)[0] == min(sequential.answers)[0]
+    assert parallel.specs[0].satisfies("mpileaks")
+
+    names = spack.solver.asp.portfolio_names(spack.solver.asp.DEFAULT_PORTFOLIO)
+    thread_phases = [p for p in timer.phases if p.startswith(tuple(names))]
+    assert len(thread_phases) == 2
+    assert sum(p.endswith("*") for p in thread_phases) == 1
+
+
+@pytest.mark.parametrize(
+    "atom",
+    [
+        spack.solver.asp.fn.version_declared("pkg-a", "1.0", 0, "package_py"),
+        spack.solver.asp.fn.pkg_fact("pkg-a", spack.solver.asp.fn.condition(-3)),
+        spack.solver.asp.fn.attr("variant_value", "pkg-a", "foo", True),
+        spack.solver.asp.fn.msg('quotes " and \\ backslashes\nand newlines'),
+        spack.solver.asp.fn.optimize_for_reuse(),
+        spack.solver.asp.fn.variant_type(1, vt.VariantType.MULTI.value),
+    ],
+)
+def test_facts_are_rendered_like_clingo(atom):
+    """Tests that facts are rendered to the same text clingo would print for their symbol"""
+    assert spack.solver.core.symbol_str(atom) == str(atom.symbol())
+
+
+def test_directive_rules_are_replayed(mutable_config, mock_packages):
+    """Tests that the rules derived from directives are replayed in later setups, and that the
+    problem is exactly the same as the one generated the first time.
+    """
+    setups, problems = [], []
+    for _ in range(2):
+        setup = spack.solver.asp.SpackSolverSetup()
+        setup.profiler = spack.solver.asp.SetupProfiler()
+        problems.append(setup.setup([Spec("mpileaks")], reuse=[]))
+        setups.append(setup)
+
+    assert sorted(setups[1].profiler.replayed_packages) == sorted(setups[1].pkgs)
+    assert problems[0] == problems[1]
+    assert setups[0].profiler.fact_counts == setups[1].profiler.fact_counts
+
+
+def test_directive_rules_depend_on_test_dependencies(mutable_config, mock_packages):
+    """Tests that the directive rules of a package are not reused when the inclusion of test
+    dependencies changes.
+    """
+    msg = "pkg-a depends on test-dependency"
+    without_tests = spack.solver.asp.SpackSolverSetup()
+    assert msg not in without_tests.setup([Spec("pkg-a")], reuse=[])
+
+    with_tests = spack.solver.asp.SpackSolverSetup(tests=("pkg-a",))
+    assert msg in with_tests.setup([Spec("pkg-a")], reuse=[])
+
+
+def test_profile_setup(mutable_config, mock_packages, capsys):
+    """Tests that profiling the setup reports phases, packages and families of facts"""
+    spack.solver.asp.Solver().solve([Spec("mpileaks")], setup_only=True, profile_setup=True)
+    out = capsys.readouterr().out
+    assert "Setup phases" in out
+    assert "package rules" in out
+    assert "mpileaks" in out
+    assert "pkg_fact(version_declared)" in out
+
+
+@pytest.mark.usefixtures("mutable_database", "mock_store")
+def test_reusable_specs_are_pruned_by_possible_dependencies(mutable_config, monkeypatch):
+    """Tests that only specs for packages that can be in the solution are selected for reuse"""
+    monkeypatch.setattr(spack.solver.asp, "_has_runtime_dependencies", lambda x: True)
+    mutable_config.set("concretizer:reuse", {"from": [{"type": "local"}]})
+    selector = spack.solver.asp.ReusableSpecsSelector(mutable_config)
+
+    all_specs = selector.reusable_specs(["libdwarf"])
+    possible = spack.solver.asp.SpackSolverSetup().node_counter([Spec("libdwarf")])
+    pruned = selector.reusable_specs(["libdwarf"], possible=possible.possible_dependencies())
+
+    assert pruned and len(pruned) < len(all_specs)
+    assert all(s.name in ("libdwarf", "libelf") for s in pruned)
+    assert {s.dag_hash() for s in pruned} == {
+        s.dag_hash() for s in all_specs if s.name in ("libdwarf", "libelf")
+    }
+
+
+@pytest.mark.usefixtures("mutable_database", "mock_store")
+def test_reusable_specs_from_store_are_queried_by_name(mutable_config, monkeypatch):
+    """Tests that the records of packages that can't be in the solution are not read from the
+    store, when selecting specs for reuse."""
+    names = []
+    query = spack.database.Database.query
+
+    def _query(self, query_spec=None, **kwargs):
+        names.append(query_spec)
+        return query(self, query_spec, **kwargs)
+
+    monkeypatch.setattr(spack.database.Database, "query", _query)
+    specs = spack.solver.asp._specs_from_store(mutable_config, names={"libdwarf", "mpi"})
+
+    assert names == ["libdwarf", "mpi"]
+    assert specs and all(s.name == "libdwarf" for s in specs)
@@ -8,6 +8,7 @@
 import io
 import os
 import tempfile
+import warnings
 from datetime import date
 
 import pytest
@@ -1504,6 +1505,82 @@ def test_config_file_read_invalid_yaml(tmpdir, mutable_empty_config):
         spack.config.read_config_file(filename)
 
 
+def test_config_file_read_from_cache(tmp_path, monkeypatch):
+    """Test that unchanged configuration files are read from the cache, and
+    that warnings about deprecated options are emitted also for cached files."""
+    monkeypatch.setattr(spack.paths, "default_misc_cache_path", str(tmp_path / "cache"))
+    filename = tmp_path / "config.yaml"
+
+    def _write(content):
+        filename.write_text(content)
+        mtime = os.path.getmtime(filename) - 10
+        os.utime(filename, (mtime, mtime))
+
+    parsed = []
+    load_config = syaml.load_config
+
+    def _load_config(stream):
+        parsed.append(stream.name)
+        return load_config(stream)
+
+    monkeypatch.setattr(syaml, "load_config", _load_config)
+
+    _write("config:\n  debug: true\n  concretizer: clingo\n")
+    for _ in range(2):
+        with pytest.warns(UserWarning, match="config:concretizer config option is ignored"):
+            data = spack.config.read_config_file(str(filename))
+        assert data["config"]["debug"] is True
+    assert len(parsed) == 1
+
+    _write("config:\n  debug: false\n")
+    assert spack.config.read_config_file(str(filename))["config"]["debug"] is False
+    assert len(parsed) == 2
+
+
+def test_config_file_cache_records_only_config_warnings(tmp_path, monkeypatch):
+    """Test that warnings unrelated to configuration, emitted while a file is validated, are
+    not emitted again when the file is read from the cache."""
+    monkeypatch.setattr(spack.paths, "default_misc_cache_path", str(tmp_path / "cache"))
+    filename = tmp_path / "config.yaml"
+    filename.write_text("config:\n  concretizer: clingo\n")
+    mtime = os.path.getmtime(filename) - 10
+    os.utime(filename, (mtime, mtime))
+
+    validate = spack.config.validate
+
+    def _validate(*args, **kwargs):
+        warnings.warn("unrelated warning", DeprecationWarning)
+        return validate(*args, **kwargs)
+
+    monkeypatch.setattr(spack.config, "validate", _validate)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        spack.config.read_config_file(str(filename))
+        spack.config.read_config_file(str(filename))
+
+    messages = [str(w.message) for w in caught]
+    assert messages.count("unrelated warning") == 1
+    assert len([m for m in messages if "config:concretizer" in m]) == 2
+
+
+def test_config_file_cache_is_pruned(tmp_path, monkeypatch):
+    """Test that cached files are removed when their configuration file doesn't exist anymore,
+    once another file is cached."""
+    monkeypatch.setattr(spack.paths, "default_misc_cache_path", str(tmp_path / "cache"))
+    monkeypatch.setattr(spack.config, "CONFIG_CACHE_MIN_AGE", -1)
+    first, second = tmp_path / "first.yaml", tmp_path / "second.yaml"
+    for filename in (first, second):
+        filename.write_text("config:\n  debug: true\n")
+
+    spack.config.read_config_file(str(first))
+    assert os.path.exists(spack.config._config_cache_file(str(first)))
+
+    first.unlink()
+    spack.config.read_config_file(str(second))
+    assert not os.path.exists(spack.config._config_cache_file(str(first)))
+    assert os.path.exists(spack.config._config_cache_file(str(second)))
+
+
 @pytest.mark.parametrize(
     "path,it_should_work,expected_parsed",
     [
@@ -47,6 +47,7 @@
 import spack.platforms
 import spack.repo
 import spack.solver.asp
+import spack.solver.concretization_cache
 import spack.spec
 import spack.stage
 import spack.store
@@ -783,6 +784,21 @@ def monkeypatch_session():
         yield monkeypatch
 
 
+@pytest.fixture(scope="session", autouse=True)
+def isolate_user_caches(tmpdir_factory, monkeypatch_session):
+    """Redirects the caches that are written in the user's home directory by default, even
+    with the mock configuration, to a temporary directory."""
+    cache_root = tmpdir_factory.mktemp("user_cache")
+    # The cache of parsed configuration files
+    monkeypatch_session.setattr(spack.paths, "default_misc_cache_path", str(cache_root))
+    # The concretization cache, which is enabled by default, unless its path is configured
+    monkeypatch_session.setattr(
+        spack.solver.concretization_cache,
+        "default_cache_location",
+        lambda: str(cache_root.join("concretization")),
+    )
+
+
 @pytest.fixture(scope="session", autouse=True)
 def mock_wsdk_externals(monkeypatch_session):
     """Skip check for required external packages on Windows during testing
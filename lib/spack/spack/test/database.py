@@ -7,6 +7,7 @@
 import functools
 import json
 import os
+import pathlib
 import re
 import shutil
 import sys
@@ -28,6 +29,7 @@
 from llnl.util.tty.colify import colify
 
 import spack.database
+import spack.database_index
 import spack.deptypes as dt
 import spack.package_base
 import spack.repo
@@ -1198,3 +1200,227 @@ def test_query_with_predicate_fn(database):
 
     specs = database.query(predicate_fn=lambda x: not spack.repo.PATH.exists(x.spec.name))
     assert not specs
+
+
+def _write_binary_index(database):
+    """Writes both the JSON and the binary index of a database"""
+    database.binary_index = True
+    with database.write_transaction():
+        pass
+    return json.loads(pathlib.Path(database._index_path).read_text())["database"]["installs"]
+
+
+def test_binary_index_round_trip(mutable_database):
+    """Tests that the binary index contains the same records as the JSON index"""
+    installs = _write_binary_index(mutable_database)
+    index = spack.database_index.BinaryIndex.open(mutable_database._binary_index_path)
+    assert len(index) == len(installs)
+    assert list(index.hashes()) == sorted(installs)
+    assert index.installs() == installs
+    assert index.find("a" * 32) == -1
+
+
+def test_binary_index_is_read_lazily(mutable_database):
+    """Tests that only the records that are accessed, and their dependencies, are decoded"""
+    _write_binary_index(mutable_database)
+    expected = {s.dag_hash(): s for s in mutable_database.query(installed=any)}
+    mpileaks = mutable_database.query_one("mpileaks ^mpich")
+
+    db = spack.database.Database(mutable_database.root, layout=mutable_database.layout)
+    with db.read_transaction():
+        assert isinstance(db._data, spack.database.LazyInstallRecords)
+        assert db._installed_prefixes == mutable_database._installed_prefixes
+        assert not db._data._decoded
+
+        spec = db.get_by_hash(mpileaks.dag_hash())[0]
+        assert spec == mpileaks
+        assert set(db._data._decoded) == {s.dag_hash() for s in mpileaks.traverse()}
+        # Nodes are shared among records
+        callpath = spec.dependencies("callpath")[0]
+        assert callpath is db._data[callpath.dag_hash()].spec
+
+    assert {s.dag_hash(): s for s in db.query(installed=any)} == expected
+
+
+def test_binary_index_remove_and_add(mutable_database):
+    """Tests that a database read from a binary index can be modified"""
+    _write_binary_index(mutable_database)
+    db = spack.database.Database(
+        mutable_database.root, layout=mutable_database.layout, binary_index=True
+    )
+    with db.read_transaction():
+        assert isinstance(db._data, spack.database.LazyInstallRecords)
+    _check_remove_and_add_package(db, "mpileaks ^mpich")
+
+
+def test_stale_binary_index_is_ignored(mutable_database):
+    """Tests that the binary index is not used, if the JSON index was modified afterwards"""
+    _write_binary_index(mutable_database)
+    mutable_database.binary_index = False
+    mutable_database.remove("mpileaks ^mpich")
+
+    db = spack.database.Database(mutable_database.root, layout=mutable_database.layout)
+    with db.read_transaction():
+        assert not isinstance(db._data, spack.database.LazyInstallRecords)
+    assert not db.query("mpileaks ^mpich")
+
+
+@pytest.mark.parametrize(
+    "query,kwargs",
+    [
+        (None, {}),
+        ("mpileaks", {}),
+        ("mpileaks", {"installed": any}),
+        ("builtin.mock.mpileaks", {}),
+        ("nonexistent.mpileaks", {}),
+        ("mpi", {}),
+        ("mpileaks ^mpich", {"explicit": True}),
+        (None, {"explicit": False, "installed": [spack.database.InstallStatuses.MISSING]}),
+        ("callpath", {"start_date": datetime.datetime.now() - datetime.timedelta(days=1)}),
+        (None, {"end_date": datetime.datetime.now() - datetime.timedelta(days=1)}),
+        (None, {"start_date": datetime.datetime.min, "end_date": datetime.datetime.max}),
+    ],
+)
+def test_query_index_gives_the_same_results_as_a_scan(query, kwargs, database):
+    """Tests that prefiltering with the secondary indexes doesn't change the result of queries"""
+    all_hashes = database.all_hashes()
+    # Passing a list of hashes skips the secondary indexes
+    expected = database.query_local(query, hashes=all_hashes, **kwargs)
+    assert sorted(database.query_local(query, **kwargs)) == sorted(expected)
+
+
+def test_query_index_avoids_comparing_other_packages(database, monkeypatch):
+    """Tests that only records with the same name as the query spec are compared"""
+    compared = []
+    satisfies = spack.spec.Spec.satisfies
+
+    def _satisfies(self, other, deps=True):
+        compared.append(self.name)
+        return satisfies(self, other, deps=deps)
+
+    monkeypatch.setattr(spack.spec.Spec, "satisfies", _satisfies)
+    assert len(database.query_local("mpileaks")) == 3
+    assert set(compared) == {"mpileaks"}
+
+
+def test_query_index_is_rebuilt_after_changes(mutable_database):
+    """Tests that the secondary indexes are invalidated when records are modified"""
+    assert len(mutable_database.query_local("mpileaks", explicit=True)) == 3
+    index = mutable_database._get_query_index()
+    assert mutable_database._get_query_index() is index
+
+    spec = mutable_database.query_one("mpileaks ^mpich")
+    mutable_database.update_explicit(spec, False)
+    assert len(mutable_database.query_local("mpileaks", explicit=True)) == 2
+
+    mutable_database.remove(spec)
+    assert len(mutable_database.query_local("mpileaks", installed=any)) == 2
+    assert mutable_database._get_query_index() is not index
+
+
+def test_query_index_from_binary_index(mutable_database):
+    """Tests that secondary indexes are built without decoding records from the binary index"""
+    _write_binary_index(mutable_database)
+    expected = mutable_database.query_local("mpileaks")
+
+    db = spack.database.Database(mutable_database.root, layout=mutable_database.layout)
+    with db.read_transaction():
+        assert sorted(db.query_local("mpileaks")) == sorted(expected)
+        assert {x.spec.name for x in db._data._decoded.values()} <= {
+            s.name for x in expected for s in x.traverse()
+        }
+
+
+def _enable_journal(database):
+    """Rewrites the index of a database, and starts a journal for later changes"""
+    database.journal = True
+    with database.write_transaction():
+        pass
+    return spack.database_index.Fingerprint.of(database._index_path)
+
+
+def _journal_lines(database):
+    return pathlib.Path(database._journal_path).read_bytes().splitlines()
+
+
+def test_journal_is_appended_instead_of_rewriting_the_index(mutable_database):
+    """Tests that changes are appended to the journal, and replayed by other instances"""
+    fingerprint = _enable_journal(mutable_database)
+    assert len(_journal_lines(mutable_database)) == 1
+
+    _check_remove_and_add_package(mutable_database, "mpileaks ^mpich")
+    mutable_database.update_explicit(mutable_database.query_one("mpileaks ^zmpi"), False)
+    assert spack.database_index.Fingerprint.of(mutable_database._index_path) == fingerprint
+    assert len(_journal_lines(mutable_database)) == 4
+
+    db = spack.database.Database(mutable_database.root, layout=mutable_database.layout)
+    assert db.query(installed=any) == mutable_database.query(installed=any)
+    assert db.query(explicit=True) == mutable_database.query(explicit=True)
+    _check_db_sanity(db)
+    db._check_ref_counts()
+
+
+def test_journal_is_replayed_incrementally(mutable_database, monkeypatch):
+    """Tests that an instance which already read the index only replays new journal entries"""
+    _enable_journal(mutable_database)
+    db = spack.database.Database(mutable_database.root, layout=mutable_database.layout)
+    assert len(db.query("mpileaks")) == 3
+
+    def _fail(*args, **kwargs):
+        raise AssertionError("the index should not be read again")
+
+    monkeypatch.setattr(db, "_read_from_file", _fail)
+    mutable_database.remove("mpileaks ^mpich")
+    assert len(db.query("mpileaks")) == 2
+    assert len(db.query("mpileaks", installed=any)) == 2
+    db._check_ref_counts()
+
+
+def test_journal_is_compacted(mutable_database, monkeypatch):
+    """Tests that the index is rewritten, and the journal emptied, when the journal is full"""
+    fingerprint = _enable_journal(mutable_database)
+    header_size = os.path.getsize(mutable_database._journal_path)
+    monkeypatch.setattr(spack.database, "_JOURNAL_COMPACTION_MIN_SIZE", header_size)
+    monkeypatch.setattr(spack.database, "_JOURNAL_COMPACTION_RATIO", 0)
+
+    # The first change is appended, since the journal is empty, the second one compacts it
+    mutable_database.remove("mpileaks ^mpich")
+    assert spack.database_index.Fingerprint.of(mutable_database._index_path) == fingerprint
+    mutable_database.remove("mpileaks ^zmpi")
+    assert spack.database_index.Fingerprint.of(mutable_database._index_path) != fingerprint
+    assert len(_journal_lines(mutable_database)) == 1
+
+    db = spack.database.Database(mutable_database.root, layout=mutable_database.layout)
+    assert len(db.query("mpileaks")) == 1
+
+
+def test_stale_journal_is_ignored(mutable_database):
+    """Tests that the journal is not replayed, if the index was rewritten afterwards"""
+    _enable_journal(mutable_database)
+    spec = mutable_database.remove("mpileaks ^mpich")
+    journal = pathlib.Path(mutable_database._journal_path).read_bytes()
+
+    # A write without the journal rewrites the index and removes the journal
+    mutable_database.journal = False
+    mutable_database.add(spec)
+    assert not os.path.exists(mutable_database._journal_path)
+
+    # Restore the old journal, as if the index was written by a Spack without journals
+    pathlib.Path(mutable_database._journal_path).write_bytes(journal)
+    db = spack.database.Database(mutable_database.root, layout=mutable_database.layout)
+    assert len(db.query("mpileaks")) == 3
+
+
+def test_torn_journal_entry_is_ignored(mutable_database):
+    """Tests that an incomplete entry at the end of the journal is ignored, and overwritten"""
+    _enable_journal(mutable_database)
+    mutable_database.remove("mpileaks ^mpich")
+    with open(mutable_database._journal_path, "ab") as f:
+        f.write(b'{"upsert":{},"remove":["')
+
+    db = spack.database.Database(mutable_database.root, layout=mutable_database.layout)
+    assert len(db.query("mpileaks")) == 2
+
+    mutable_database.remove("mpileaks ^zmpi")
+    assert len(_journal_lines(mutable_database)) == 3
+    assert len(db.query("mpileaks")) == 1
@@ -906,3 +906,59 @@ def test_only_roots_are_explicitly_installed(tmp_path, mock_packages, config, te
     assert callpath in temporary_store.db.query(explicit=False)
     env.install_specs([mpileaks], fake=True)
     assert temporary_store.db.query(explicit=True) == [mpileaks]
+
+
+def test_independent_clusters(mock_packages, config):
+    """Tests that specs sharing possible dependencies are put in the same cluster"""
+    specs = [spack.spec.Spec(x) for x in ("mpileaks", "pkg-a", "libelf", "zlib", "pkg-b")]
+    clusters = spack.solver.asp.independent_clusters(specs)
+    assert sorted(sorted(str(x) for x in c) for c in clusters) == [
+        ["libelf", "mpileaks"],
+        ["pkg-a", "pkg-b"],
+        ["zlib"],
+    ]
+
+
+@pytest.mark.parametrize("tests", [False, True])
+def test_split_clusters_gives_the_same_result(tests, tmp_path, mock_packages, mutable_config):
+    """Tests that concretizing independent clusters in parallel gives the same environment
+    as concretizing all the roots together, when possible.
+    """
+    roots = ("mpileaks+opt", "mpileaks~opt", "zlib", "pkg-a", "libelf")
+
+    def _concretize(path, split):
+        mutable_config.set("concretizer:split_clusters", split)
+        env = ev.create_in_dir(path)
+        env.unify = "when_possible"
+        for root in roots:
+            env.add(root)
+        result = env.concretize(tests=tests)
+        assert len(result) == len(roots)
+        for abstract, concrete in result:
+            assert concrete.satisfies(abstract)
+            assert concrete is env.specs_by_hash[concrete.dag_hash()]
+        return env
+
+    expected = _concretize(tmp_path / "together", False)
+    computed = _concretize(tmp_path / "split", True)
+    assert expected.concretized_user_specs == computed.concretized_user_specs
+    assert expected.concretized_order == computed.concretized_order
+
+
+def test_split_clusters_with_roots_given_by_hash(
+    tmp_path, mock_packages, mutable_config, temporary_store
+):
+    """Tests that roots given by hash are mapped back to the input spec after being solved
+    in a separate cluster, even though the solver replaces them with a copy.
+    """
+    installed = spack.spec.Spec("libelf").concretized()
+    temporary_store.db.add(installed)
+
+    mutable_config.set("concretizer:split_clusters", True)
+    env = ev.create_in_dir(tmp_path)
+    env.unify = "when_possible"
+    for root in (f"/{installed.dag_hash()}", "zlib", "pkg-a"):
+        env.add(root)
+    result = dict(env.concretize())
+    assert len(result) == 3
+    assert result[spack.spec.Spec(f"/{installed.dag_hash()}")].dag_hash() == installed.dag_hash()
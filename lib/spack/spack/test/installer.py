@@ -17,6 +17,8 @@
 import llnl.util.tty as tty
 
 import spack.binary_distribution
+import spack.build_environment
+import spack.config
 import spack.database
 import spack.deptypes as dt
 import spack.error
@@ -182,7 +184,7 @@ def test_process_external_package_module(install_mockery, monkeypatch, capfd):
 def test_process_binary_cache_tarball_tar(install_mockery, monkeypatch, capfd):
     """Tests of _process_binary_cache_tarball with a tar file."""
 
-    def _spec(spec, unsigned=False, mirrors_for_spec=None):
+    def _spec(spec, unsigned=False, mirrors_for_spec=None, stream=False):
         return spec
 
     # Skip binary distribution functionality since assume tested elsewhere
@@ -1025,6 +1027,51 @@ def test_install_fail_multi(install_mockery, mock_fetch, monkeypatch):
     assert not any(pkg_id.startswith("pkg-a-") for pkg_id in installer.installed)
 
 
+def test_install_concurrent_packages(install_mockery, mock_fetch, monkeypatch):
+    """Test that independent packages are built at the same time."""
+    installer = create_installer(["mpileaks"], {"fake": True, "concurrent_packages": 4})
+    running = []
+    wait_for_builds = inst.PackageInstaller._wait_for_builds
+
+    def _wait_for_builds(self, block):
+        running.append(len(self.running))
+        return wait_for_builds(self, block)
+
+    monkeypatch.setattr(inst.PackageInstaller, "_wait_for_builds", _wait_for_builds)
+    installer.install()
+
+    assert max(running) > 1
+    assert not installer.running
+    spec = installer.build_requests[0].pkg.spec
+    assert all(s.installed for s in spec.traverse())
+    assert {inst.package_id(s) for s in spec.traverse()} <= installer.installed
+
+
+def test_install_concurrent_packages_share_jobs(install_mockery, mutable_config):
+    """Test that packages built at the same time, and the relocation of binary packages
+    extracted meanwhile, get a share of the build jobs.
+    """
+    spack.config.set("config:build_jobs", 8, scope="command_line")
+    installer = create_installer(["pkg-c"], {"concurrent_packages": 4})
+
+    with installer._jobserver():
+        assert spack.build_environment.get_build_jobs() == 2
+    assert spack.build_environment.get_build_jobs() == 8
+
+
+@pytest.mark.disable_clean_stage_check
+def test_install_concurrent_packages_failure(install_mockery, mock_fetch):
+    """Test that a failed build doesn't stop the ones running at the same time."""
+    installer = create_installer(["build-error", "pkg-c"], {"concurrent_packages": 2})
+
+    with pytest.raises(spack.error.InstallError, match="Installation request failed"):
+        installer.install()
+
+    assert not installer.running
+    assert any(pkg_id.startswith("pkg-c-") for pkg_id in installer.installed)
+    assert any(pkg_id.startswith("build-error-") for pkg_id in installer.failed)
+
+
 def test_install_fail_fast_on_detect(install_mockery, monkeypatch, capsys):
     """Test fail_fast install when an install failure is detected."""
     b, c = spack.spec.Spec("pkg-b").concretized(), spack.spec.Spec("pkg-c").concretized()
@@ -1343,3 +1390,58 @@ def test_print_install_test_log_failures(
     spack.installer.print_install_test_log(pkg)
     out = capfd.readouterr()[0]
     assert "See test results at" in out
+
+
+@pytest.mark.not_on_windows("lacking windows support for binary installs")
+@pytest.mark.parametrize("concurrent_packages", [1, 2])
+def test_install_cache_only_prefetches_binaries(
+    install_mockery,
+    mock_fetch,
+    mutable_temporary_mirror,
+    monkeypatch,
+    tmp_path,
+    concurrent_packages,
+):
+    """Test that the binaries of a cache-only install are downloaded ahead of time, and that they
+    are extracted in build processes when packages are installed concurrently."""
+    spec = spack.spec.Spec("libdwarf").concretized()
+    PackageInstaller([spec.package]).install()
+    SpackCommand("buildcache")(
+        "push", "--unsigned", "--update-index", mutable_temporary_mirror, str(spec)
+    )
+    SpackCommand("uninstall")("-ay")
+
+    downloaded = []
+    download_tarball = spack.binary_distribution.download_tarball
+
+    def _download_tarball(spec, *args, **kwargs):
+        downloaded.append(spec.name)
+        return download_tarball(spec, *args, **kwargs)
+
+    extract_tarball = spack.binary_distribution.extract_tarball
+
+    def _extract_tarball(spec, *args, **kwargs):
+        with open(tmp_path / "extracted", "a") as f:
+            f.write(f"{spec.name} {os.getpid()}\n")
+        return extract_tarball(spec, *args, **kwargs)
+
+    monkeypatch.setattr(inst.binary_distribution, "download_tarball", _download_tarball)
+    monkeypatch.setattr(inst.binary_distribution, "extract_tarball", _extract_tarball)
+    # Packages must not be searched and downloaded one at a time
+    monkeypatch.setattr(inst, "_try_install_from_binary_cache", _noop)
+
+    installer = PackageInstaller(
+        [spec.package],
+        package_cache_only=True,
+        dependencies_cache_only=True,
+        unsigned=True,
+        concurrent_packages=concurrent_packages,
+    )
+    installer.install()
+
+    assert sorted(downloaded) == ["libdwarf", "libelf"]
+    assert all(s.installed for s in spec.traverse())
+    assert not installer.prefetched
+
+    pids = {line.split()[1] for line in (tmp_path / "extracted").read_text().splitlines()}
+    assert (str(os.getpid()) not in pids) == (concurrent_packages > 1)
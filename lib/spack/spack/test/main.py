@@ -9,6 +9,7 @@
 import llnl.util.filesystem as fs
 
 import spack
+import spack.main
 import spack.paths
 import spack.util.executable as exe
 import spack.util.git
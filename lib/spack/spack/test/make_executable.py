@@ -12,6 +12,7 @@
 
 import pytest
 
+import spack.build_environment
 from spack.build_environment import MakeExecutable
 from spack.util.environment import path_put_first
 
@@ -109,6 +110,19 @@ def test_make_jobserver(monkeypatch):
     assert make(output=str).strip() == ""
     assert make(parallel=False, output=str).strip() == "-j1"
 
+    # Without a share of the jobs of concurrent builds, a single job means -j1
+    make = MakeExecutable("make", 1)
+    assert make(output=str).strip() == "-j1"
+
+
+def test_make_jobserver_share_of_one_job(monkeypatch):
+    """Tests that builds getting a single job among concurrent builds use the jobserver"""
+    monkeypatch.setenv("MAKEFLAGS", "--jobserver-auth=X,Y")
+    monkeypatch.setattr(spack.build_environment, "_BUILD_JOBS_SHARE", 1)
+    make = MakeExecutable("make", 1)
+    assert make(output=str).strip() == ""
+    assert make(parallel=False, output=str).strip() == "-j1"
+
 
 def test_make_jobserver_not_supported(monkeypatch):
     make = MakeExecutable("make", 8, supports_jobserver=False)
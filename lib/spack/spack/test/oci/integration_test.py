@@ -301,11 +301,11 @@ def test_best_effort_upload(mutable_database: spack.database.Database, monkeypat
     _push_blob = spack.binary_distribution._oci_push_pkg_blob
     _push_manifest = spack.binary_distribution._oci_put_manifest
 
-    def push_blob(image_ref, spec, tmpdir):
+    def push_blob(image_ref, spec, tmpdir, jobs=1):
         # fail to upload the blob of mpich
         if spec.name == "mpich":
             raise Exception("Blob Server Error")
-        return _push_blob(image_ref, spec, tmpdir)
+        return _push_blob(image_ref, spec, tmpdir, jobs)
 
     def put_manifest(base_images, checksums, image_ref, tmpdir, extra_config, annotations, *specs):
         # fail to upload the manifest of libdwarf
@@ -13,6 +13,7 @@
 import spack.relocate
 import spack.relocate_text as relocate_text
 import spack.repo
+import spack.util.elf as elf
 import spack.util.executable
 
 pytestmark = pytest.mark.not_on_windows("Tests fail on Windows")
@@ -27,9 +28,7 @@ def skip_unless_linux(f):
 
 def rpaths_for(new_binary):
     """Return the RPATHs or RUNPATHs of a binary."""
-    patchelf = spack.util.executable.which("patchelf")
-    output = patchelf("--print-rpath", str(new_binary), output=str)
-    return output.strip()
+    return ":".join(elf.get_rpaths(str(new_binary)) or [])
 
 
 def text_in_bin(text, binary):
@@ -158,7 +157,7 @@ def test_normalize_relative_paths(start_path, relative_paths, expected):
     assert normalized == expected
 
 
-@pytest.mark.requires_executables("patchelf", "file", "gcc")
+@pytest.mark.requires_executables("file", "gcc")
 @skip_unless_linux
 def test_relocate_text_bin(binary_with_rpaths, prefix_like):
     prefix = "/usr/" + prefix_like
@@ -175,7 +174,7 @@ def test_relocate_text_bin(binary_with_rpaths, prefix_like):
     assert "%s/lib:%s/lib64" % (new_prefix, new_prefix) in rpaths_for(executable)
 
 
-@pytest.mark.requires_executables("patchelf", "file", "gcc")
+@pytest.mark.requires_executables("file", "gcc")
 @skip_unless_linux
 def test_relocate_elf_binaries_absolute_paths(binary_with_rpaths, copy_binary, prefix_tmpdir):
     # Create an executable, set some RPATHs, copy it to another location
@@ -197,7 +196,7 @@ def test_relocate_elf_binaries_absolute_paths(binary_with_rpaths, copy_binary, p
     assert "/foo/lib:/usr/lib64" in rpaths_for(new_binary)
 
 
-@pytest.mark.requires_executables("patchelf", "file", "gcc")
+@pytest.mark.requires_executables("file", "gcc")
 @skip_unless_linux
 def test_relocate_elf_binaries_relative_paths(binary_with_rpaths, copy_binary):
     # Create an executable, set some RPATHs, copy it to another location
@@ -218,7 +217,7 @@ def test_relocate_elf_binaries_relative_paths(binary_with_rpaths, copy_binary):
     assert "/foo/lib:/foo/lib64:/opt/local/lib" in rpaths_for(new_binary)
 
 
-@pytest.mark.requires_executables("patchelf", "file", "gcc")
+@pytest.mark.requires_executables("file", "gcc")
 @skip_unless_linux
 def test_make_elf_binaries_relative(binary_with_rpaths, copy_binary, prefix_tmpdir):
     orig_binary = binary_with_rpaths(
@@ -238,7 +237,7 @@ def test_make_elf_binaries_relative(binary_with_rpaths, copy_binary, prefix_tmpd
     assert "$ORIGIN/lib:$ORIGIN/lib64:/opt/local/lib" in rpaths_for(new_binary)
 
 
-@pytest.mark.requires_executables("patchelf", "file", "gcc")
+@pytest.mark.requires_executables("file", "gcc")
 @skip_unless_linux
 def test_relocate_text_bin_with_message(binary_with_rpaths, copy_binary, prefix_tmpdir):
     orig_binary = binary_with_rpaths(
@@ -267,6 +266,63 @@ def test_relocate_text_bin_with_message(binary_with_rpaths, copy_binary, prefix_
     assert text_in_bin(str(new_binary.dirpath()), new_binary)
 
 
+@pytest.mark.requires_executables("gcc")
+@skip_unless_linux
+def test_relocate_elf_binaries_to_longer_prefix(binary_with_rpaths, copy_binary, monkeypatch):
+    """Tests that rpaths and interpreters that grow are relocated without patchelf"""
+    monkeypatch.setattr(spack.relocate, "_patchelf", lambda: None)
+    orig_binary = binary_with_rpaths(
+        rpaths=["/short/lib", "/usr/lib64"], dynamic_linker="/short/lib/ld.so"
+    )
+    new_binary = copy_binary(orig_binary)
+
+    new_prefix = "/a/much/longer/prefix/than/before"
+    spack.relocate.new_relocate_elf_binaries([str(new_binary)], {"/short": new_prefix})
+
+    assert rpaths_for(new_binary) == f"{new_prefix}/lib:/usr/lib64"
+    assert elf.get_interpreter(str(new_binary)) == f"{new_prefix}/lib/ld.so"
+
+
+@pytest.mark.requires_executables("gcc")
+@skip_unless_linux
+@pytest.mark.parametrize("new_prefix,is_runpath", [("/b", True), ("/a/much/longer/prefix", False)])
+def test_relocate_elf_binaries_rpath_tag(tmp_path, new_prefix, is_runpath, monkeypatch):
+    """Tests that rpaths substituted in place keep their tag, and that rpaths that grow are set
+    in a DT_RPATH entry, as patchelf --force-rpath does"""
+    monkeypatch.setattr(spack.relocate, "_patchelf", lambda: None)
+    (tmp_path / "main.c").write_text("int main(){return 0;}")
+    executable = str(tmp_path / "main")
+    spack.util.executable.which("gcc")(
+        "-Wl,--enable-new-dtags", "-Wl,-rpath,/a/lib", str(tmp_path / "main.c"), "-o", executable
+    )
+
+    def dynamic_section():
+        with open(executable, "rb") as f:
+            return elf.parse_elf(f, dynamic_section=True)
+
+    assert dynamic_section().is_runpath
+    spack.relocate.new_relocate_elf_binaries([executable], {"/a": new_prefix})
+    assert dynamic_section().dt_rpath_str == f"{new_prefix}/lib".encode()
+    assert dynamic_section().is_runpath == is_runpath
+
+
+@pytest.mark.requires_executables("gcc")
+@skip_unless_linux
+def test_set_elf_rpaths_sets_rpath_tag(tmp_path, monkeypatch):
+    """Tests that setting rpaths in-process sets a DT_RPATH entry, like the patchelf fallback"""
+    monkeypatch.setattr(spack.relocate, "_patchelf", lambda: None)
+    (tmp_path / "main.c").write_text("int main(){return 0;}")
+    executable = str(tmp_path / "main")
+    spack.util.executable.which("gcc")(
+        "-Wl,--enable-new-dtags", "-Wl,-rpath,/a/lib", str(tmp_path / "main.c"), "-o", executable
+    )
+    spack.relocate._set_elf_rpaths_and_interpreter(executable, rpaths=["/a/lib"])
+    with open(executable, "rb") as f:
+        parsed = elf.parse_elf(f, dynamic_section=True)
+    assert parsed.dt_rpath_str == b"/a/lib"
+    assert not parsed.is_runpath
+
+
 def test_relocate_text_bin_raise_if_new_prefix_is_longer(tmpdir):
     short_prefix = b"/short"
     long_prefix = b"/much/longer"
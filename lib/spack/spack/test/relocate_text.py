@@ -3,6 +3,7 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 import io
+import mmap
 from collections import OrderedDict
 
 import pytest
@@ -237,3 +238,53 @@ def test_relocate_text_filters_redundant_entries():
     replacer_2 = relocate_text.TextFilePrefixReplacer.from_strings_or_bytes(mapping)
     assert not replacer_1.prefix_to_prefix
     assert not replacer_2.prefix_to_prefix
+
+
+@pytest.mark.parametrize(
+    "offset",
+    [
+        # Match entirely in the first chunk, or ending exactly at its end
+        0,
+        mmap.ALLOCATIONGRANULARITY - len(b"/old/prefix/lib/libfoo.so\0"),
+        # Prefix straddling the boundary between chunks
+        mmap.ALLOCATIONGRANULARITY - 5,
+        # Null terminator in the next chunk
+        mmap.ALLOCATIONGRANULARITY - len(b"/old/prefix/lib/libfoo.so"),
+        # Match starting in the second chunk
+        mmap.ALLOCATIONGRANULARITY,
+        2 * mmap.ALLOCATIONGRANULARITY - 1,
+    ],
+)
+def test_binary_replacement_in_chunks(tmp_path, offset):
+    """Tests that large files mapped in memory chunk by chunk are relocated as if they were
+    read in full, including when matches cross the boundary of a chunk.
+    """
+    string = b"/old/prefix/lib/libfoo.so\0"
+    data = bytearray(b"x" * (3 * mmap.ALLOCATIONGRANULARITY))
+    data[offset : offset + len(string)] = string
+    data[-len(string) :] = string
+    prefixes = OrderedDict([(b"/old/prefix", b"/new")])
+
+    expected = io.BytesIO(bytes(data))
+    relocate_text.BinaryFilePrefixReplacer(prefixes).apply_to_file(expected)
+
+    binary = tmp_path / "binary"
+    binary.write_bytes(data)
+    replacer = relocate_text.BinaryFilePrefixReplacer(prefixes)
+    replacer.mmap_threshold = 0
+    replacer.chunk_size = mmap.ALLOCATIONGRANULARITY
+    assert replacer.apply_to_filename(str(binary))
+
+    assert binary.read_bytes() == expected.getvalue()
+    assert binary.read_bytes().count(b"////////new/lib/libfoo.so\0") == 2
+
+
+def test_binary_replacement_in_chunks_errors(tmp_path):
+    """Tests that errors are raised for matches crossing the boundary of a chunk"""
+    binary = tmp_path / "binary"
+    binary.write_bytes(b"x" * (mmap.ALLOCATIONGRANULARITY - 3) + b"/short\0" + b"x" * 10)
+    replacer = relocate_text.BinaryFilePrefixReplacer(OrderedDict([(b"/short", b"/much/longer")]))
+    replacer.mmap_threshold = 0
+    replacer.chunk_size = mmap.ALLOCATIONGRANULARITY
+    with pytest.raises(relocate_text.CannotGrowString):
+        replacer.apply_to_filename(str(binary))
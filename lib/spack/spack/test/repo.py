@@ -2,15 +2,21 @@
 # Spack Project Developers. See the top-level COPYRIGHT file for details.
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import multiprocessing
 import os
 import pathlib
+import platform
 
 import pytest
 
+import llnl.util.filesystem as fs
+
+import spack.deptypes as dt
 import spack.package_base
 import spack.paths
 import spack.repo
 import spack.spec
+import spack.util.cpus
 import spack.util.file_cache
 
 
@@ -150,6 +156,182 @@ def test_repo_path_handles_package_removal(tmpdir, mock_packages):
         assert r.namespace == "builtin.mock"
 
 
+@pytest.mark.parametrize(
+    "name",
+    [
+        "mpileaks",
+        "mpich",
+        "libdwarf",
+        "patch-several-dependencies",
+        "multivalue-variant",
+        "variant-values-override",
+        "licenses-1",
+    ],
+)
+def test_metadata_index_matches_package_class(name, mock_packages):
+    """Tests that the metadata read from the index is the same as that of package classes"""
+    pkg_cls = mock_packages.get_pkg_class(name)
+    metadata = mock_packages.metadata_index[name]
+
+    assert metadata.fullname == pkg_cls.fullname
+    assert metadata.homepage == pkg_cls.homepage
+    assert metadata.format_doc(indent=2) == pkg_cls.format_doc(indent=2)
+    assert metadata.versions.keys() == pkg_cls.versions.keys()
+    assert metadata.dependencies_of_type(dt.ALL) == pkg_cls.dependencies_of_type(dt.ALL)
+    assert metadata.dependencies_of_type(dt.BUILD) == pkg_cls.dependencies_of_type(dt.BUILD)
+    assert metadata.provided_virtual_names() == pkg_cls.provided_virtual_names()
+    assert metadata.build_system_class == pkg_cls.build_system_class
+    assert metadata.provided == pkg_cls.provided
+    assert metadata.licenses == {str(when): name for when, name in pkg_cls.licenses.items()}
+    assert metadata.variant_names() == pkg_cls.variant_names()
+
+    def _variants(package, variant_name):
+        return [
+            (when, v.default, v.values is not None and set(v.values), v.multi)
+            for when, v in package.variant_definitions(variant_name)
+        ]
+
+    for variant_name in pkg_cls.variant_names():
+        assert _variants(metadata, variant_name) == _variants(pkg_cls, variant_name)
+
+
+def test_metadata_index_is_updated_incrementally(tmp_path, mock_packages, monkeypatch):
+    """Tests that only the packages modified since the metadata index was written are imported
+    to update it."""
+    builder = spack.repo.MockRepositoryBuilder(tmp_path)
+    builder.add_package("pkg-a", dependencies=[("pkg-b", "build", None)])
+    builder.add_package("pkg-b")
+    with spack.repo.use_repositories(builder.root) as repos:
+        assert repos.metadata_index["pkg-a"].dependencies_of_type(dt.BUILD) == {"pkg-b"}
+
+    builder.add_package("pkg-c")
+    index_mtime = os.path.getmtime(builder.recipe_filename("pkg-b"))
+    os.utime(builder.recipe_filename("pkg-c"), (index_mtime + 10, index_mtime + 10))
+
+    imported = []
+    get_pkg_class = spack.repo.Repo.get_pkg_class
+
+    def _get_pkg_class(self, name):
+        imported.append(name.split(".")[-1])
+        return get_pkg_class(self, name)
+
+    monkeypatch.setattr(spack.repo.Repo, "get_pkg_class", _get_pkg_class)
+    # Packages are listed again in a new process
+    monkeypatch.setattr(spack.repo.FastPackageChecker, "_paths_cache", {})
+    with spack.repo.use_repositories(builder.root) as repos:
+        assert set(repos.metadata_index) == {"pkg-a", "pkg-b", "pkg-c"}
+        assert repos.metadata_index["pkg-c"].versions
+
+    assert set(imported) == {"pkg-c"}
+
+
+def test_metadata_index_is_built_only_when_needed(tmp_path, mock_packages, monkeypatch):
+    """Tests that the metadata index is not built together with the other indexes."""
+    created = []
+    create = spack.repo.MetadataIndexer.create
+
+    def _create(self):
+        created.append(self)
+        create(self)
+
+    monkeypatch.setattr(spack.repo.MetadataIndexer, "create", _create)
+    cache = spack.util.file_cache.FileCache(str(tmp_path / "cache"))
+    repo_path = spack.repo.RepoPath(spack.paths.mock_packages_path, cache=cache)
+    with spack.repo.REPOS_FINDER.switch_repo(repo_path):
+        assert repo_path.providers_for("mpi")
+        assert repo_path.tag_index
+        assert not created
+        assert "mpich" in repo_path.metadata_index
+    assert len(created) == 1
+
+
+def test_metadata_index_is_specific_to_the_host(tmp_path, mock_packages, monkeypatch):
+    """Tests that hosts of different platforms sharing a cache don't read each other's metadata
+    index, since package classes may depend on the host."""
+    cache = spack.util.file_cache.FileCache(str(tmp_path / "cache"))
+    created = []
+    create = spack.repo.MetadataIndexer.create
+
+    def _create(self):
+        created.append(self)
+        create(self)
+
+    monkeypatch.setattr(spack.repo.MetadataIndexer, "create", _create)
+
+    for machine in ("x86_64", "aarch64", "x86_64"):
+        monkeypatch.setattr(platform, "machine", lambda machine=machine: machine)
+        repo_path = spack.repo.RepoPath(spack.paths.mock_packages_path, cache=cache)
+        with spack.repo.REPOS_FINDER.switch_repo(repo_path):
+            assert "mpich" in repo_path.metadata_index
+
+    assert len(created) == 2
+    assert len(os.listdir(tmp_path / "cache")) == 2
+
+
+def test_metadata_index_is_rebuilt_when_spack_changes(tmp_path, mock_packages, monkeypatch):
+    """Tests that the metadata index is rebuilt when the library of Spack changes, since packages
+    inherit attributes from it, e.g. the variants of build systems."""
+    library_file = tmp_path / "cmake.py"
+    library_file.write_text("# build system\n")
+    monkeypatch.setattr(spack.repo, "_library_files", lambda: [str(library_file)])
+    cache = spack.util.file_cache.FileCache(str(tmp_path / "cache"))
+
+    def _build_type_values():
+        repo_path = spack.repo.RepoPath(spack.paths.mock_packages_path, cache=cache)
+        with spack.repo.REPOS_FINDER.switch_repo(repo_path):
+            metadata = repo_path.metadata_index["cmake-client"]
+            return [set(v.values) for _, v in metadata.variant_definitions("build_type")]
+
+    assert _build_type_values() == [{"Debug", "Release", "RelWithDebInfo", "MinSizeRel"}]
+
+    # Add a value to the variant inherited from the build system
+    pkg_cls = mock_packages.get_pkg_class("cmake-client")
+    (_, variant), *_ = pkg_cls.variant_definitions("build_type")
+    monkeypatch.setattr(variant, "values", (*variant.values, "Profile"))
+    library_file.write_text("# build system with a new build type\n")
+
+    assert _build_type_values() == [
+        {"Debug", "Release", "RelWithDebInfo", "MinSizeRel", "Profile"}
+    ]
+
+
+@pytest.mark.skipif(
+    multiprocessing.get_start_method() != "fork", reason="indexes are built in parallel with fork"
+)
+def test_repo_index_built_in_parallel(tmp_path, mock_packages, monkeypatch):
+    """Tests that the indexes of a repository built in parallel are the same as those built
+    sequentially."""
+    index_in_parallel = spack.repo.RepoIndex._index_in_parallel
+    partial_indexes = []
+
+    def _index_in_parallel(self, needs_update):
+        result = index_in_parallel(self, needs_update)
+        partial_indexes.extend(result.get("tags", []))
+        return result
+
+    monkeypatch.setattr(spack.repo.RepoIndex, "_index_in_parallel", _index_in_parallel)
+
+    def _build_indexes(jobs, cache_name):
+        monkeypatch.setattr(spack.util.cpus, "cpus_available", lambda: jobs)
+        cache = spack.util.file_cache.FileCache(str(tmp_path / cache_name))
+        repo_path = spack.repo.RepoPath(spack.paths.mock_packages_path, cache=cache)
+        with spack.repo.REPOS_FINDER.switch_repo(repo_path):
+            index = repo_path.repos[0].index
+            return {
+                "providers": index["providers"],
+                "tags": {tag: sorted(names) for tag, names in index["tags"].items()},
+                "patches": index["patches"].index,
+                "metadata": repo_path.repos[0].metadata_index._packages,
+            }
+
+    sequential = _build_indexes(1, "sequential")
+    assert not partial_indexes
+
+    parallel = _build_indexes(2, "parallel")
+    assert len(partial_indexes) == 8
+    assert parallel == sequential
+
+
 def test_repo_dump_virtuals(tmpdir, mutable_mock_repo, mock_packages, ensure_debug, capsys):
     # Start with a package-less virtual
     vspec = spack.spec.Spec("something")
@@ -302,3 +484,65 @@ def test_get_repo(self, mock_test_cache):
         # foo is not there, raise
         with pytest.raises(spack.repo.UnknownNamespaceError):
             repo.get_repo("foo")
+
+
+def test_package_checker_detects_changes_with_git(tmp_path, git, monkeypatch):
+    """Tests that only the packages that git reports as changed since the last snapshot are
+    stat'ed, when changes are detected with git."""
+    builder = spack.repo.MockRepositoryBuilder(tmp_path / "repo")
+    builder.add_package("pkg-a")
+    builder.add_package("pkg-b")
+    with fs.working_dir(builder.root):
+        git("init")
+        git("config", "user.name", "Spack")
+        git("config", "user.email", "spack@spack.io")
+        git("add", ".")
+        git("commit", "-m", "initial commit")
+
+    stated = []
+    stat_package = spack.repo.FastPackageChecker._stat_package
+
+    def _stat_package(self, pkg_name):
+        stated.append(pkg_name)
+        return stat_package(self, pkg_name)
+
+    monkeypatch.setattr(spack.repo.FastPackageChecker, "_stat_package", _stat_package)
+    cache = spack.util.file_cache.FileCache(str(tmp_path / "cache"))
+
+    def _mtimes():
+        # Packages are checked again in a new process
+        monkeypatch.setattr(spack.repo.FastPackageChecker, "_paths_cache", {})
+        stated.clear()
+        checker = spack.repo.FastPackageChecker(
+            os.path.join(builder.root, "packages"),
+            builder.namespace,
+            cache=cache,
+            change_detection="git",
+        )
+        return {name: sinfo.st_mtime for name, sinfo in checker.items()}
+
+    # Every package is stat'ed without a snapshot, and none if nothing changed
+    mtimes = _mtimes()
+    assert set(mtimes) == set(stated) == {"pkg-a", "pkg-b"}
+    assert _mtimes() == mtimes and not stated
+
+    # Modified and new packages are stat'ed
+    builder.add_package("pkg-c")
+    with open(builder.recipe_filename("pkg-a"), "a") as f:
+        f.write("# modified\n")
+    os.utime(builder.recipe_filename("pkg-a"), (mtimes["pkg-a"] + 10, mtimes["pkg-a"] + 10))
+    new_mtimes = _mtimes()
+    assert set(stated) == {"pkg-a", "pkg-c"}
+    assert new_mtimes["pkg-a"] == mtimes["pkg-a"] + 10
+    assert new_mtimes["pkg-b"] == mtimes["pkg-b"]
+
+    # Packages that changed between commits are stat'ed
+    with fs.working_dir(builder.root):
+        git("add", ".")
+        git("commit", "-m", "second commit")
+    assert _mtimes() == new_mtimes and set(stated) == {"pkg-a", "pkg-c"}
+    assert _mtimes() == new_mtimes and not stated
+
+    # Removed packages are removed from the checker
+    builder.remove("pkg-b")
+    assert set(_mtimes()) == {"pkg-a", "pkg-c"} and stated == ["pkg-b"]
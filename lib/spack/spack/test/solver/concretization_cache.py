@@ -0,0 +1,159 @@
+# Copyright 2013-2024 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import os
+import shutil
+import sys
+
+import pytest
+
+import spack.config
+import spack.paths
+import spack.solver.asp
+import spack.solver.concretization_cache as cc
+import spack.spec
+import spack.util.executable
+
+pytestmark = pytest.mark.usefixtures("mutable_config", "mock_packages")
+
+
+@pytest.fixture()
+def enable_cache(mutable_config, tmp_path):
+    cache_dir = tmp_path / "concretization"
+    mutable_config.set(
+        "concretizer:concretization_cache", {"enable": True, "path": str(cache_dir)}
+    )
+    return cache_dir
+
+
+def _concretize(spec_str):
+    solver = spack.solver.asp.Solver()
+    result = solver.solve([spack.spec.Spec(spec_str)])
+    return result.specs[0]
+
+
+def test_cache_hit_does_not_run_the_solver(enable_cache, monkeypatch):
+    """Tests that a second identical solve is answered from the cache"""
+    first = _concretize("mpileaks")
+    assert len(os.listdir(enable_cache)) == 1
+
+    def _fail(*args, **kwargs):
+        raise AssertionError("the solver should not be called on a cache hit")
+
+    monkeypatch.setattr(spack.solver.asp, "default_clingo_control", _fail)
+    second = _concretize("mpileaks")
+    assert first.dag_hash() == second.dag_hash()
+    assert second.concrete
+
+
+def test_stats_of_cache_hits(enable_cache, capsys):
+    """Tests that solves answered from the cache report it, instead of empty statistics"""
+    solver = spack.solver.asp.Solver()
+    solver.solve([spack.spec.Spec("mpileaks")], stats=True)
+    assert "reused" not in capsys.readouterr().out
+
+    solver.solve([spack.spec.Spec("mpileaks")], stats=True)
+    out = capsys.readouterr().out
+    assert "reused from entry" in out
+    assert "{}" not in out
+
+
+@pytest.mark.not_on_windows("Runs spack in a subprocess through its shell script")
+def test_solver_input_does_not_depend_on_hash_seed(tmp_path):
+    """Tests that the input of the solver is the same in each process, which has its own seed
+    for the hashes of strings, since the cache would never be hit across processes otherwise.
+    """
+    # Give the subprocess its own compilers and store, so that it neither detects compilers
+    # into the site scope nor opens the default store in the source tree
+    scope = tmp_path / "scope"
+    scope.mkdir()
+    (scope / "config.yaml").write_text(
+        f"config:\n  install_tree:\n    root: {tmp_path / 'store'}\n"
+    )
+    (scope / "compilers.yaml").write_text(
+        """\
+compilers:
+- compiler:
+    spec: gcc@=10.2.1
+    operating_system: debian6
+    target: x86_64
+    modules: []
+    paths: {cc: /path/to/gcc, cxx: /path/to/g++, f77: /path/to/gfortran, fc: /path/to/gfortran}
+"""
+    )
+    python = spack.util.executable.Executable(sys.executable)
+    args = [spack.paths.spack_script, "-m", "-C", str(scope), "solve", "--show", "asp"]
+    specs = ["multivalue-variant", "netlib-lapack", "hdf5"]
+    env = {
+        "SPACK_DISABLE_LOCAL_CONFIG": "1",
+        "SPACK_USER_CACHE_PATH": str(tmp_path / "cache"),
+    }
+    problems = [
+        python(*args, *specs, output=str, extra_env={"PYTHONHASHSEED": seed, **env})
+        for seed in ("1", "2")
+    ]
+    assert problems[0] == problems[1]
+
+
+def test_cache_key_depends_on_input(enable_cache):
+    """Tests that different solver inputs are stored in different entries"""
+    assert _concretize("mpileaks").satisfies("mpileaks")
+    assert _concretize("mpileaks ^mpich").satisfies("^mpich")
+    assert len(os.listdir(enable_cache)) == 2
+
+
+def test_cache_key_depends_on_solver_settings(enable_cache, mutable_config, tmp_path):
+    """Tests that solves with different solver settings are stored in different entries"""
+    _concretize("mpileaks")
+    mutable_config.set("concretizer:solver", {"threads": 2})
+    _concretize("mpileaks")
+    assert len(os.listdir(enable_cache)) == 2
+
+    portfolio = tmp_path / "portfolio.txt"
+    shutil.copy(spack.solver.asp.DEFAULT_PORTFOLIO, portfolio)
+    mutable_config.set("concretizer:solver:portfolio", str(portfolio))
+    _concretize("mpileaks")
+    assert len(os.listdir(enable_cache)) == 2
+
+    with open(portfolio, "a") as f:
+        f.write("# modified portfolio\n")
+    _concretize("mpileaks")
+    assert len(os.listdir(enable_cache)) == 3
+
+
+def test_cache_can_be_disabled(enable_cache, mutable_config):
+    mutable_config.set("concretizer:concretization_cache:enable", False)
+    _concretize("mpileaks")
+    assert not enable_cache.exists()
+
+
+def test_lru_eviction(tmp_path):
+    cache = cc.ConcretizationCache(str(tmp_path), entry_limit=2, size_limit=0)
+    for i, key in enumerate(("a", "b", "c")):
+        cache.store(key, {"value": i})
+        # Give each entry a distinct access time
+        os.utime(cache._path(key), (i, i))
+        if key == "b":
+            # Reading an entry marks it as recently used
+            assert cache.fetch("a")["value"] == 0
+            os.utime(cache._path("a"), (10, 10))
+
+    assert cache.fetch("a") is not None
+    assert cache.fetch("b") is None
+    assert cache.fetch("c") is not None
+
+
+def test_size_limit_eviction(tmp_path):
+    cache = cc.ConcretizationCache(str(tmp_path), entry_limit=0, size_limit=1)
+    cache.store("a", {"value": 0})
+    assert cache.entries() == []
+
+
+def test_corrupt_entries_are_discarded(tmp_path):
+    cache = cc.ConcretizationCache(str(tmp_path))
+    cache.store("a", {"value": 0})
+    with open(cache._path("a"), "wb") as f:
+        f.write(b"not gzip")
+    assert cache.fetch("a") is None
+    assert cache.entries() == []
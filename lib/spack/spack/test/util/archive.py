@@ -5,13 +5,22 @@
 
 import gzip
 import hashlib
+import io
 import os
 import shutil
 import tarfile
+import zlib
 from pathlib import Path, PurePath
 
+import pytest
+
 import spack.util.crypto
-from spack.util.archive import gzip_compressed_tarfile, reproducible_tarfile_from_prefix
+from spack.util.archive import (
+    GZIP_BLOCK_SIZE,
+    ParallelGzipWriter,
+    gzip_compressed_tarfile,
+    reproducible_tarfile_from_prefix,
+)
 
 
 def test_gzip_compressed_tarball_is_reproducible(tmpdir):
@@ -155,3 +164,49 @@ def test_gzip_compressed_tarball_is_reproducible(tmpdir):
                 == spack.util.crypto.checksum_stream(hashlib.sha256, f)
                 == spack.util.crypto.checksum_stream(hashlib.sha256, g)
             )
+
+
+@pytest.mark.parametrize("size", [0, 1, 1000, 4096, 10000])
+def test_parallel_gzip_writer(size):
+    """Test that blocks compressed in parallel make a single gzip member, which doesn't depend
+    on the number of threads"""
+    data = os.urandom(size // 2) + b"spack" * (size // 10)
+    outputs = []
+    for jobs in (1, 2, 3):
+        output = io.BytesIO()
+        with ParallelGzipWriter(output, jobs=jobs, block_size=1024) as f:
+            for i in range(0, len(data), 100):
+                f.write(data[i : i + 100])
+        outputs.append(output.getvalue())
+
+    assert outputs[0] == outputs[1] == outputs[2]
+    assert gzip.decompress(outputs[0]) == data
+
+    # There is a single gzip member, with no data after it
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    assert decompressor.decompress(outputs[0]) == data
+    assert decompressor.eof and not decompressor.unused_data
+
+
+def test_gzip_compressed_tarball_does_not_depend_on_jobs(tmp_path):
+    (tmp_path / "root").mkdir()
+    # Several blocks, and a partial one
+    (tmp_path / "root" / "file").write_bytes(os.urandom(GZIP_BLOCK_SIZE) * 4 + b"end")
+
+    checksums = []
+    for jobs in (1, 4):
+        with gzip_compressed_tarfile(str(tmp_path / f"{jobs}.tar.gz"), jobs=jobs) as (
+            tar,
+            gzip_checksum,
+            tarfile_checksum,
+        ):
+            reproducible_tarfile_from_prefix(tar, str(tmp_path / "root"))
+        checksums.append((gzip_checksum.hexdigest(), tarfile_checksum.hexdigest()))
+
+    assert checksums[0] == checksums[1]
+    assert checksums[0][0] == spack.util.crypto.checksum(
+        hashlib.sha256, str(tmp_path / "4.tar.gz")
+    )
+    with tarfile.open(tmp_path / "4.tar.gz", "r:gz") as tar:
+        member = next(m for m in tar if m.isfile())
+        assert tar.extractfile(member).read() == (tmp_path / "root" / "file").read_bytes()
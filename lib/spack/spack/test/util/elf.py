@@ -202,3 +202,62 @@ def test_drop_redundant_rpath(tmpdir, binary_with_rpaths):
     new_rpaths = elf.get_rpaths(binary)
     assert set(existing_dirs).issubset(new_rpaths)
     assert set(non_existing_dirs).isdisjoint(new_rpaths)
+
+
+@pytest.mark.requires_executables("gcc")
+@skip_unless_linux
+def test_elf_set_rpath_and_pt_interp_grow(tmp_path):
+    """Tests that rpaths and interpreters longer than the original ones are moved to a new
+    segment, and that the dynamic linker can still load the result."""
+    gcc = spack.util.executable.which("gcc")
+    long_dir = tmp_path / "a" / "directory" / "with" / "a" / "much" / "longer" / "path"
+    long_dir.mkdir(parents=True)
+    (tmp_path / "foo.c").write_text("int foo(){return 42;}")
+    (tmp_path / "main.c").write_text(
+        '#include <stdio.h>\nint foo();\nint main(){printf("%d\\n", foo());}'
+    )
+
+    # Create a library and an executable with short rpaths
+    library = str(long_dir / "libfoo.so")
+    executable = str(tmp_path / "main")
+    gcc("-shared", "-fPIC", "-Wl,-rpath,/x", str(tmp_path / "foo.c"), "-o", library)
+    gcc(str(tmp_path / "main.c"), f"-L{long_dir}", "-lfoo", "-Wl,-rpath,/x", "-o", executable)
+
+    # Point the executable to the library, and to a symlink to its interpreter
+    interpreter = elf.get_interpreter(executable)
+    (long_dir / "ld.so").symlink_to(interpreter)
+    rpath = f"/nonexisting:{long_dir}".encode()
+    assert elf.set_rpath_and_pt_interp(
+        executable, rpath=rpath, pt_interp=str(long_dir / "ld.so").encode()
+    )
+    assert elf.set_rpath_and_pt_interp(library, rpath=rpath)
+
+    # Nothing to do the second time
+    assert not elf.set_rpath_and_pt_interp(executable, rpath=rpath)
+
+    assert elf.get_rpaths(executable) == ["/nonexisting", str(long_dir)]
+    assert elf.get_rpaths(library) == ["/nonexisting", str(long_dir)]
+    assert elf.get_interpreter(executable) == str(long_dir / "ld.so")
+    assert spack.util.executable.Executable(executable)(output=str).strip() == "42"
+
+    # Shrinking strings again is done in place
+    assert elf.set_rpath_and_pt_interp(executable, rpath=str(long_dir).encode())
+    assert elf.get_rpaths(executable) == [str(long_dir)]
+    assert spack.util.executable.Executable(executable)(output=str).strip() == "42"
+
+
+@pytest.mark.requires_executables("gcc")
+@skip_unless_linux
+def test_elf_set_rpath_without_rpath_fails(tmp_path):
+    """Tests that rpaths are not added to files without one"""
+    gcc = spack.util.executable.which("gcc")
+    executable = str(tmp_path / "main")
+    (tmp_path / "main.c").write_text("int main(){return 0;}")
+    gcc(str(tmp_path / "main.c"), "-o", executable)
+    assert elf.get_rpaths(executable) is None
+    before = (tmp_path / "main").read_bytes()
+
+    with pytest.raises(elf.ElfCStringUpdatesFailed):
+        elf.set_rpath_and_pt_interp(executable, rpath=b"/some/path")
+
+    assert (tmp_path / "main").read_bytes() == before
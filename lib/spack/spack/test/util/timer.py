@@ -131,6 +131,14 @@ def test_timer_write():
     }
 
 
+def test_timer_record():
+    t = timer.Timer(now=Tick().tick)
+    t.record("thread", 10.0)
+    t.record("thread", 5.0)
+    assert t.duration("thread") == 15.0
+    assert t.phases == ["thread"]
+
+
 def test_null_timer():
     # Just ensure that the interface of the noop-timer doesn't break at some point
     buffer = StringIO()
@@ -140,6 +148,7 @@ def test_null_timer():
     t.stop("first")
     with t.measure("second"):
         pass
+    t.record("third", 1.0)
     t.stop()
     assert t.duration("first") == 0.0
     assert t.duration() == 0.0
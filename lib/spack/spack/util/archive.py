@@ -2,15 +2,18 @@
 # Spack Project Developers. See the top-level COPYRIGHT file for details.
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
+import collections
+import concurrent.futures
 import errno
 import hashlib
 import io
 import os
 import pathlib
+import struct
 import tarfile
+import zlib
 from contextlib import closing, contextmanager
-from gzip import GzipFile
-from typing import Callable, Dict, Tuple
+from typing import BinaryIO, Callable, Deque, Dict, Optional, Tuple
 
 from llnl.util.symlink import readlink
 
@@ -95,11 +98,174 @@ def readline(self, size=-1):
         raise OSError(errno.EBADF, "readline() on write-only object")
 
 
+class ChecksumReader(io.BufferedIOBase):
+    """Checksum reader computes a checksum of the data read from a file, which need not be
+    seekable (e.g. the response to a web request)."""
+
+    def __init__(self, fileobj, algorithm=hashlib.sha256):
+        self.fileobj = fileobj
+        self.hasher = algorithm()
+        self.length = 0
+
+    def hexdigest(self):
+        return self.hasher.hexdigest()
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        self.hasher.update(data)
+        self.length += len(data)
+        return data
+
+    def read1(self, size=-1):
+        return self.read(size)
+
+    def read_to_end(self, blocksize: int = 1 << 20) -> None:
+        """Reads and checksums the rest of the file, discarding the data"""
+        while self.read(blocksize):
+            pass
+
+    @property
+    def closed(self):
+        return self.fileobj is None
+
+    def close(self):
+        fileobj = self.fileobj
+        if fileobj is None:
+            return
+        self.fileobj.close()
+        self.fileobj = None
+
+    def write(self, data):
+        raise OSError(errno.EBADF, "write() on read-only object")
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return False
+
+    def seekable(self):
+        return False
+
+
+#: Size of the blocks of data compressed independently by ``ParallelGzipWriter``
+GZIP_BLOCK_SIZE = 1 << 20
+
+#: Size of the deflate window, i.e. of the data preceding a block that it can refer to
+_DEFLATE_WINDOW_SIZE = 1 << 15
+
+#: Gzip header with no file name and zero mtime, as written by ``gzip --no-name``
+_GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+
+
+def _deflate_block(data: bytes, dictionary: bytes, level: int, last: bool) -> bytes:
+    """Compress a block of data to a raw deflate stream, which can be concatenated with the
+    streams of the previous and the next blocks. The dictionary is the data preceding the
+    block."""
+    if dictionary:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=dictionary)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(
+        zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH
+    )
+
+
+class ParallelGzipWriter(io.BufferedIOBase):
+    """Gzip writer compressing blocks of data in parallel threads, like ``pigz``.
+
+    Each block is compressed independently, with the end of the previous block as dictionary,
+    and flushed to a byte boundary, so that the compressed blocks can be concatenated. The result
+    is a single standard gzip member, which any gzip decompressor can read, and which doesn't
+    depend on the number of threads."""
+
+    def __init__(
+        self, fileobj, compresslevel: int = 6, jobs: int = 1, block_size: int = GZIP_BLOCK_SIZE
+    ):
+        self.fileobj = fileobj
+        self.compresslevel = compresslevel
+        self.block_size = block_size
+        self.buffer = bytearray()
+        self.dictionary = b""
+        self.crc = 0
+        self.size = 0
+        self.executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        if jobs > 1:
+            self.executor = concurrent.futures.ThreadPoolExecutor(jobs)
+        #: Blocks being compressed, in order. Bounded, to limit memory usage.
+        self.pending: Deque[concurrent.futures.Future] = collections.deque()
+        self.max_pending = 2 * jobs
+        self.fileobj.write(_GZIP_HEADER)
+
+    def write(self, data):
+        if not isinstance(data, (bytes, bytearray)):
+            data = memoryview(data).cast("B")
+        length = len(data)
+        self.crc = zlib.crc32(data, self.crc)
+        self.size += length
+        self.buffer += data
+        while len(self.buffer) >= self.block_size:
+            block = bytes(self.buffer[: self.block_size])
+            del self.buffer[: self.block_size]
+            self._compress(block, last=False)
+        return length
+
+    def _compress(self, block: bytes, last: bool) -> None:
+        if self.executor is None:
+            self.fileobj.write(_deflate_block(block, self.dictionary, self.compresslevel, last))
+        else:
+            self.pending.append(
+                self.executor.submit(
+                    _deflate_block, block, self.dictionary, self.compresslevel, last
+                )
+            )
+            while len(self.pending) > (0 if last else self.max_pending):
+                self.fileobj.write(self.pending.popleft().result())
+        self.dictionary = (self.dictionary + block)[-_DEFLATE_WINDOW_SIZE:]
+
+    @property
+    def closed(self):
+        return self.fileobj is None
+
+    def close(self):
+        if self.fileobj is None:
+            return
+        try:
+            self._compress(bytes(self.buffer), last=True)
+            self.fileobj.write(struct.pack("<LL", self.crc, self.size & 0xFFFFFFFF))
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+            # Like GzipFile, the underlying file object is not closed
+            self.fileobj = None
+            self.buffer = bytearray()
+
+    def flush(self):
+        self.fileobj.flush()
+
+    def tell(self):
+        """Position in the uncompressed data"""
+        return self.size
+
+    def readable(self):
+        return False
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+
 @contextmanager
-def gzip_compressed_tarfile(path):
+def gzip_compressed_tarfile(path, jobs: int = 1):
     """Create a reproducible, gzip compressed tarfile, and keep track of shasums of both the
     compressed and uncompressed tarfile. Reproduciblity is achived by normalizing the gzip header
-    (no file name and zero mtime).
+    (no file name and zero mtime), and by compressing in blocks of fixed size.
+
+    Args:
+        path: path of the tarfile
+        jobs: number of threads compressing the tarfile. The output doesn't depend on it.
 
     Yields a tuple of the following:
         tarfile.TarFile: tarfile object
@@ -107,15 +273,14 @@ def gzip_compressed_tarfile(path):
         ChecksumWriter: checksum of the uncompressed tarfile
     """
     # Create gzip compressed tarball of the install prefix
-    # 1) Use explicit empty filename and mtime 0 for gzip header reproducibility.
-    #    If the filename="" is dropped, Python will use fileobj.name instead.
+    # 1) The gzip header has no file name and mtime 0 for reproducibility.
     #    This should effectively mimick `gzip --no-name`.
     # 2) On AMD Ryzen 3700X and an SSD disk, we have the following on compression speed:
     # compresslevel=6 gzip default: llvm takes 4mins, roughly 2.1GB
     # compresslevel=9 python default: llvm takes 12mins, roughly 2.1GB
     # So we follow gzip.
     with open(path, "wb") as f, ChecksumWriter(f) as gzip_checksum, closing(
-        GzipFile(filename="", mode="wb", compresslevel=6, mtime=0, fileobj=gzip_checksum)
+        ParallelGzipWriter(gzip_checksum, compresslevel=6, jobs=jobs)
     ) as gzip_file, ChecksumWriter(gzip_file) as tarfile_checksum, tarfile.TarFile(
         name="", mode="w", fileobj=tarfile_checksum
     ) as tar:
@@ -137,6 +302,8 @@ def reproducible_tarfile_from_prefix(
     include_parent_directories: bool = False,
     skip: Callable[[os.DirEntry], bool] = lambda entry: False,
     path_to_name: Callable[[str], str] = default_path_to_name,
+    read_file: Callable[[os.DirEntry, BinaryIO], BinaryIO] = lambda entry, f: f,
+    visit_symlink: Callable[[os.DirEntry, str], None] = lambda entry, target: None,
 ) -> None:
     """Create a tarball from a given directory. Only adds regular files, symlinks and dirs.
     Skips devices, fifos. Preserves hardlinks. Normalizes permissions like git. Tar entries are
@@ -156,7 +323,12 @@ def reproducible_tarfile_from_prefix(
             windows path to posix format, but it can also be used to prepend a directory to each
             entry even if it does not exist on the filesystem. The default implementation drops the
             leading slash on posix and the drive letter on windows for absolute paths, and formats
-            as a posix."""
+            as a posix.
+        read_file: function that receives a DirEntry of a regular file and the file opened in
+            binary mode, and returns the file object its content is read from. Can be used to
+            inspect the content of files while they are added, without reading them twice.
+            Hardlinks are read only once.
+        visit_symlink: function that receives a DirEntry of a symlink and its target"""
 
     hardlink_to_tarinfo_name: Dict[Tuple[int, int], str] = dict()
 
@@ -197,6 +369,7 @@ def reproducible_tarfile_from_prefix(
             if entry.is_symlink():
                 file_info.type = tarfile.SYMTYPE
                 file_info.linkname = readlink(entry.path)
+                visit_symlink(entry, file_info.linkname)
                 # According to POSIX: "the value of the file mode bits returned in the
                 # st_mode field of the stat structure is unspecified." So we set it to
                 # something sensible without lstat'ing the link.
@@ -225,6 +398,6 @@ def reproducible_tarfile_from_prefix(
                 file_info.size = s.st_size
 
                 with open(entry.path, "rb") as f:
-                    tar.addfile(file_info, f)
+                    tar.addfile(file_info, read_file(entry, f))
 
         dir_stack.extend(reversed(new_dirs))  # we pop, so reverse to stay alphabetical
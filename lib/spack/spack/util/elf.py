@@ -72,9 +72,12 @@ class ELF_CONSTANTS:
     PT_LOAD = 1
     PT_DYNAMIC = 2
     PT_INTERP = 3
+    PT_PHDR = 6
+    PF_R = 4
     DT_NULL = 0
     DT_NEEDED = 1
     DT_STRTAB = 5
+    DT_STRSZ = 10
     DT_SONAME = 14
     DT_RPATH = 15
     DT_RUNPATH = 29
@@ -641,6 +644,292 @@ def substitute_rpath_and_pt_interp_in_place_or_raise(
         return False
 
 
+#: Maximum number of zero bytes added to the end of an ELF file, so that a new segment is mapped
+#: at an address compatible with its offset in the file. This is mostly needed for files with
+#: a large .bss section.
+MAX_NEW_SEGMENT_PADDING = 1 << 24
+
+
+def _align_up(value: int, alignment: int) -> int:
+    return (value + alignment - 1) // alignment * alignment
+
+
+def _dynamic_entry_offsets(f: BinaryIO, elf: ElfFile) -> Dict[int, int]:
+    """Returns the file offsets of the entries of the dynamic array, by tag. Only the offset
+    of the first entry is returned for tags that occur more than once."""
+    dynamic_array_fmt = elf.byte_order + ("qQ" if elf.is_64_bit else "lL")
+    dynamic_array_size = calcsize(dynamic_array_fmt)
+    f.seek(elf.pt_dynamic_p_offset)
+    data = read_exactly(f, elf.pt_dynamic_p_filesz, "Malformed dynamic section")
+    offsets: Dict[int, int] = {}
+    for i in range(elf.pt_dynamic_p_filesz // dynamic_array_size):
+        tag, _ = unpack_from(dynamic_array_fmt, data, i * dynamic_array_size)
+        if tag == ELF_CONSTANTS.DT_NULL:
+            break
+        offsets.setdefault(tag, elf.pt_dynamic_p_offset + i * dynamic_array_size)
+    return offsets
+
+
+def _section_headers(f: BinaryIO, elf: ElfFile) -> List[Tuple[int, SectionHeader]]:
+    """Returns the section headers of an ELF file, with their offset in the file"""
+    section_hdr_fmt = elf.byte_order + ("LLQQQQLLQQ" if elf.is_64_bit else "LLLLLLLLLL")
+    section_hdr_size = calcsize(section_hdr_fmt)
+    # Section headers are not needed to load a file, so just skip them if they can't be used
+    if elf.elf_hdr.e_shoff == 0 or elf.elf_hdr.e_shentsize != section_hdr_size:
+        return []
+    f.seek(elf.elf_hdr.e_shoff)
+    data = read_exactly(f, elf.elf_hdr.e_shnum * section_hdr_size, "Malformed section header")
+    return [
+        (
+            elf.elf_hdr.e_shoff + i * section_hdr_size,
+            SectionHeader(*unpack_from(section_hdr_fmt, data, i * section_hdr_size)),
+        )
+        for i in range(elf.elf_hdr.e_shnum)
+    ]
+
+
+def _move_c_strings_to_new_segment(
+    f: BinaryIO,
+    elf: ElfFile,
+    rpath: Optional[UpdateCStringAction],
+    pt_interp: Optional[UpdateCStringAction],
+) -> None:
+    """Writes the new values of the rpath and interpreter in a new read-only segment, appended to
+    the file, since they don't fit in place. The segment contains:
+
+    1. A copy of the program headers, with an additional PT_LOAD entry for the new segment,
+       since there is no room for it in the original program header table.
+    2. A copy of the string table of the dynamic section, with the new rpath appended.
+    3. The new interpreter.
+
+    The dynamic section, program headers and section headers are updated to point to the
+    copies. The original strings are left in place, unused.
+
+    The segment is mapped at an address that has the same distance from its file offset as
+    the first PT_LOAD segment, since old kernels compute the address of the program headers
+    in memory from their file offset.
+
+    Raises ElfCStringUpdatesFailed if the layout of the file is not supported, before anything
+    is written.
+    """
+    failed = ElfCStringUpdatesFailed(rpath, pt_interp)
+    hdr = elf.elf_hdr
+    word_size = 8 if elf.is_64_bit else 4
+    ph_fmt = elf.byte_order + ("LLQQQQQQ" if elf.is_64_bit else "LLLLLLLL")
+    ph_size = calcsize(ph_fmt)
+    ProgramHeader = ProgramHeader64 if elf.is_64_bit else ProgramHeader32
+
+    if hdr.e_phentsize != ph_size:
+        raise failed
+
+    f.seek(hdr.e_phoff)
+    data = read_exactly(f, hdr.e_phnum * ph_size, "Malformed program header")
+    program_headers = [
+        ProgramHeader(*unpack_from(ph_fmt, data, i * ph_size)) for i in range(hdr.e_phnum)
+    ]
+    loads = [i for i, ph in enumerate(program_headers) if ph.p_type == ELF_CONSTANTS.PT_LOAD]
+
+    # The new segment has to be the last one, and segments must be sorted by address.
+    vaddrs = [program_headers[i].p_vaddr for i in loads]
+    if not loads or vaddrs != sorted(vaddrs):
+        raise failed
+
+    first_load = program_headers[loads[0]]
+    alignment = max(max(program_headers[i].p_align for i in loads), word_size)
+    delta = first_load.p_vaddr - first_load.p_offset
+    if delta % alignment:
+        raise failed
+
+    # Map the new segment past the end of memory of all other segments, in a separate page
+    f.seek(0, 2)
+    file_end = f.tell()
+    memory_end = max(program_headers[i].p_vaddr + program_headers[i].p_memsz for i in loads)
+    offset = max(_align_up(file_end, word_size), _align_up(memory_end, alignment) - delta)
+    vaddr = offset + delta
+    if offset - file_end > MAX_NEW_SEGMENT_PADDING:
+        raise failed
+
+    # Layout of the new segment, starting with the program headers
+    phdrs_size = (hdr.e_phnum + 1) * ph_size
+    segment = bytearray(phdrs_size)
+
+    # File offsets and values to be written, once nothing else can fail
+    writes: List[Tuple[int, bytes]] = []
+    sections = _section_headers(f, elf)
+    section_hdr_fmt = elf.byte_order + ("LLQQQQLLQQ" if elf.is_64_bit else "LLLLLLLLLL")
+
+    def _move_section(old_offset: int, new_position: int, size: int) -> None:
+        for sh_offset, sh in sections:
+            if sh.sh_offset == old_offset and sh.sh_size > 0:
+                sh = sh._replace(
+                    sh_offset=offset + new_position, sh_addr=vaddr + new_position, sh_size=size
+                )
+                writes.append((sh_offset, struct.pack(section_hdr_fmt, *sh)))
+                return
+
+    if rpath:
+        dynamic_entries = _dynamic_entry_offsets(f, elf)
+        if ELF_CONSTANTS.DT_STRSZ not in dynamic_entries:
+            raise failed
+        dynamic_array_fmt = elf.byte_order + ("qQ" if elf.is_64_bit else "lL")
+        f.seek(dynamic_entries[ELF_CONSTANTS.DT_STRSZ])
+        _, strtab_size = unpack(
+            dynamic_array_fmt, read_exactly(f, calcsize(dynamic_array_fmt), "Malformed DT_STRSZ")
+        )
+        f.seek(elf.pt_dynamic_strtab_offset)
+        strtab = read_exactly(f, strtab_size, "Could not read string table")
+
+        strtab_position = len(segment)
+        segment.extend(strtab)
+        segment.extend(rpath.new_value + b"\x00")
+        new_strtab_size = len(segment) - strtab_position
+
+        rpath_tag = ELF_CONSTANTS.DT_RUNPATH if elf.is_runpath else ELF_CONSTANTS.DT_RPATH
+        for tag, value in (
+            (ELF_CONSTANTS.DT_STRTAB, vaddr + strtab_position),
+            (ELF_CONSTANTS.DT_STRSZ, new_strtab_size),
+            (rpath_tag, len(strtab)),
+        ):
+            writes.append((dynamic_entries[tag], struct.pack(dynamic_array_fmt, tag, value)))
+
+        _move_section(elf.pt_dynamic_strtab_offset, strtab_position, new_strtab_size)
+
+    if pt_interp:
+        interp_position = len(segment)
+        segment.extend(pt_interp.new_value + b"\x00")
+        interp_size = len(segment) - interp_position
+        for i, ph in enumerate(program_headers):
+            if ph.p_type == ELF_CONSTANTS.PT_INTERP:
+                program_headers[i] = ph._replace(
+                    p_offset=offset + interp_position,
+                    p_vaddr=vaddr + interp_position,
+                    p_paddr=vaddr + interp_position,
+                    p_filesz=interp_size,
+                    p_memsz=interp_size,
+                )
+        _move_section(elf.pt_interp_p_offset, interp_position, interp_size)
+
+    for i, ph in enumerate(program_headers):
+        if ph.p_type == ELF_CONSTANTS.PT_PHDR:
+            program_headers[i] = ph._replace(
+                p_offset=offset,
+                p_vaddr=vaddr,
+                p_paddr=vaddr,
+                p_filesz=phdrs_size,
+                p_memsz=phdrs_size,
+            )
+    program_headers.insert(
+        loads[-1] + 1,
+        ProgramHeader(
+            p_type=ELF_CONSTANTS.PT_LOAD,
+            p_flags=ELF_CONSTANTS.PF_R,
+            p_offset=offset,
+            p_vaddr=vaddr,
+            p_paddr=vaddr,
+            p_filesz=len(segment),
+            p_memsz=len(segment),
+            p_align=alignment,
+        ),
+    )
+    for i, ph in enumerate(program_headers):
+        struct.pack_into(ph_fmt, segment, i * ph_size, *ph)
+
+    elf_header_fmt = elf.byte_order + ("HHLQQQLHHHHHH" if elf.is_64_bit else "HHLLLLLHHHHHH")
+    new_hdr = hdr._replace(e_phoff=offset, e_phnum=hdr.e_phnum + 1)
+    writes.append((16, struct.pack(elf_header_fmt, *new_hdr)))
+
+    # Finally write the new segment and update all references to it
+    f.seek(file_end)
+    f.write(b"\x00" * (offset - file_end))
+    f.write(segment)
+    for position, value in writes:
+        f.seek(position)
+        f.write(value)
+
+
+def _apply_c_string_updates(
+    f: BinaryIO,
+    elf: ElfFile,
+    rpath: Optional[UpdateCStringAction],
+    pt_interp: Optional[UpdateCStringAction],
+) -> None:
+    """Updates the rpath and interpreter in place when they don't grow, and moves them to a
+    new segment otherwise."""
+    # Move strings first, since it's the only step that can fail.
+    moved_rpath = rpath if rpath and not rpath.inplace else None
+    moved_pt_interp = pt_interp if pt_interp and not pt_interp.inplace else None
+    if moved_rpath or moved_pt_interp:
+        _move_c_strings_to_new_segment(f, elf, moved_rpath, moved_pt_interp)
+
+    for action in (rpath, pt_interp):
+        if action and action.inplace:
+            action.apply(f)
+
+
+def _retag_runpath_as_rpath(f: BinaryIO, elf: ElfFile) -> None:
+    """Changes the DT_RUNPATH entry of the dynamic section into a DT_RPATH entry"""
+    dynamic_array_fmt = elf.byte_order + ("qQ" if elf.is_64_bit else "lL")
+    f.seek(elf.dt_rpath_offset)
+    _, value = unpack(
+        dynamic_array_fmt, read_exactly(f, calcsize(dynamic_array_fmt), "Malformed DT_RUNPATH")
+    )
+    f.seek(elf.dt_rpath_offset)
+    f.write(struct.pack(dynamic_array_fmt, ELF_CONSTANTS.DT_RPATH, value))
+
+
+def set_rpath_and_pt_interp(
+    path: str,
+    rpath: Optional[bytes] = None,
+    pt_interp: Optional[bytes] = None,
+    force_rpath: bool = False,
+) -> bool:
+    """Sets the rpath and interpreter of an ELF file, if not None. Strings that don't fit in
+    place are moved to a new segment at the end of the file. Returns true if the file was
+    modified.
+
+    With ``force_rpath``, setting the rpath also turns a DT_RUNPATH entry into a DT_RPATH entry,
+    like ``patchelf --force-rpath`` does.
+
+    Raises ElfCStringUpdatesFailed if the file cannot be updated, e.g. because it has no
+    rpath to begin with. The file is left untouched in this case. Raises ElfParsingError if
+    the file cannot be parsed."""
+    with open(path, "rb+") as f:
+        elf = parse_elf(f, interpreter=True, dynamic_section=True)
+
+        rpath_action = pt_interp_action = None
+        if rpath is not None and (not elf.has_rpath or elf.dt_rpath_str != rpath):
+            rpath_action = UpdateCStringAction(
+                old_value=elf.dt_rpath_str if elf.has_rpath else b"",
+                new_value=rpath,
+                offset=(
+                    elf.pt_dynamic_strtab_offset + elf.rpath_strtab_offset if elf.has_rpath else -1
+                ),
+            )
+        if pt_interp is not None and (not elf.has_pt_interp or elf.pt_interp_str != pt_interp):
+            pt_interp_action = UpdateCStringAction(
+                old_value=elf.pt_interp_str if elf.has_pt_interp else b"",
+                new_value=pt_interp,
+                offset=elf.pt_interp_p_offset if elf.has_pt_interp else -1,
+            )
+
+        retag = rpath is not None and force_rpath and elf.has_rpath and elf.is_runpath
+
+        if not rpath_action and not pt_interp_action and not retag:
+            return False
+
+        # Adding entries to the dynamic section or program headers is not supported
+        if rpath_action and not elf.has_rpath or pt_interp_action and not elf.has_pt_interp:
+            raise ElfCStringUpdatesFailed(rpath_action, pt_interp_action)
+
+        try:
+            _apply_c_string_updates(f, elf, rpath_action, pt_interp_action)
+            if retag:
+                _retag_runpath_as_rpath(f, elf)
+        except struct.error as e:
+            raise ElfParsingError("Malformed ELF file") from e
+        return True
+
+
 def pt_interp(path: str) -> Optional[str]:
     """Retrieve the interpreter of an executable at `path`."""
     try:
@@ -21,6 +21,10 @@
 from llnl.util import tty
 from llnl.util.lang import dedupe
 
+#: Environment variable holding the active Spack environment. It's defined here, rather than in
+#: ``spack.environment``, so that it can be read without importing environments.
+spack_env_var = "SPACK_ENV"
+
 if sys.platform == "win32":
     SYSTEM_PATHS = [
         "C:\\",
@@ -52,10 +52,17 @@ def get_user():
 NOMATCH = object()
 
 
+def _active_environment_path():
+    # environments are slow to import, so import them only when $env is used
+    import spack.environment as ev
+
+    env = ev.active_environment()
+    return env.path if env else NOMATCH
+
+
 # Substitutions to perform
 def replacements():
     # break circular imports
-    import spack.environment as ev
     import spack.paths
 
     arch = architecture()
@@ -73,7 +80,7 @@ def replacements():
         "target": lambda: arch.target,
         "target_family": lambda: arch.target.family,
         "date": lambda: date.today().strftime("%Y-%m-%d"),
-        "env": lambda: ev.active_environment().path if ev.active_environment() else NOMATCH,
+        "env": _active_environment_path,
     }
 
 
@@ -36,6 +36,9 @@ def stop(self, name=None):
     def duration(self, name=None):
         return 0.0
 
+    def record(self, name, seconds):
+        pass
+
     @contextmanager
     def measure(self, name):
         yield self
@@ -115,6 +118,19 @@ def duration(self, name=global_timer_name):
         else:
             return 0.0
 
+    def record(self, name, seconds):
+        """
+        Record a named timer whose duration was measured elsewhere, for instance
+        by a thread or a process working in parallel.
+
+        Arguments:
+            name (str): Name of the timer
+            seconds (float): Duration to be added to the timer
+        """
+        now = self._now()
+        self._events.append(TimerEvent(now - seconds, True, name))
+        self._events.append(TimerEvent(now, False, name))
+
     @contextmanager
     def measure(self, name):
         """
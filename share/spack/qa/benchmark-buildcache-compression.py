@@ -0,0 +1,96 @@
+# Copyright 2013-2024 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Compare the throughput of the compression formats of buildcache tarballs.
+
+For each format, a tarball of a prefix is created as in ``spack buildcache push``, and then
+checksummed and extracted in a single pass as when installing from a buildcache. Run with:
+
+    spack python share/spack/qa/benchmark-buildcache-compression.py [-j 1,4,16] [PREFIX]
+"""
+import argparse
+import contextlib
+import gzip
+import os
+import tarfile
+import tempfile
+import time
+
+import spack.binary_distribution as bindist
+import spack.paths
+import spack.util.archive
+
+
+@contextlib.contextmanager
+def single_stream_gzip_tarfile(path, jobs):
+    """Tarball compressed by a single gzip stream, as written by previous versions of Spack"""
+    with open(path, "wb") as f, spack.util.archive.ChecksumWriter(f) as checksum, gzip.GzipFile(
+        filename="", mode="wb", compresslevel=6, mtime=0, fileobj=checksum
+    ) as gzip_file, tarfile.TarFile(name="", mode="w", fileobj=gzip_file) as tar:
+        yield tar, checksum
+
+
+@contextlib.contextmanager
+def parallel_gzip_tarfile(path, jobs):
+    """Tarball compressed in parallel blocks, as written by ``spack buildcache push``"""
+    with spack.util.archive.gzip_compressed_tarfile(path, jobs=jobs) as (tar, checksum, _):
+        yield tar, checksum
+
+
+def push(create_tarfile, prefix, path, jobs):
+    with create_tarfile(path, jobs) as (tar, checksum):
+        bindist.tarfile_of_spec_prefix(tar, prefix)
+    return checksum.hexdigest()
+
+
+def install(path, destination, expected_checksum):
+    with open(path, "rb") as f:
+        reader = spack.util.archive.ChecksumReader(f)
+        with tarfile.open(fileobj=reader, mode="r|*") as tar:
+            tar.extractall(destination)
+        reader.read_to_end()
+    assert reader.hexdigest() == expected_checksum
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("prefix", nargs="?", default=spack.paths.lib_path)
+    parser.add_argument(
+        "-j", "--jobs", default="1,2,4,8", help="comma separated numbers of compression threads"
+    )
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="number of runs per format")
+    args = parser.parse_args()
+
+    prefix = os.path.abspath(args.prefix)
+    formats = [("gzip", single_stream_gzip_tarfile, 1)] + [
+        (f"parallel-gzip -j{jobs}", parallel_gzip_tarfile, int(jobs))
+        for jobs in args.jobs.split(",")
+    ]
+
+    print(f"{'format':<20} {'size [MB]':>10} {'push [MB/s]':>12} {'install [MB/s]':>15}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tarball = os.path.join(tmpdir, "package.tar.gz")
+        for name, create_tarfile, jobs in formats:
+            push_time = install_time = float("inf")
+            for i in range(args.repeat):
+                start = time.perf_counter()
+                checksum = push(create_tarfile, prefix, tarball, jobs)
+                push_time = min(push_time, time.perf_counter() - start)
+
+                destination = os.path.join(tmpdir, f"install-{name}-{i}".replace(" ", ""))
+                start = time.perf_counter()
+                install(tarball, destination, checksum)
+                install_time = min(install_time, time.perf_counter() - start)
+
+            with gzip.open(tarball) as f:
+                size = sum(len(chunk) for chunk in iter(lambda: f.read(1 << 20), b"")) / 1e6
+            compressed = os.path.getsize(tarball) / 1e6
+            print(
+                f"{name:<20} {compressed:>10.1f} {size / push_time:>12.1f} "
+                f"{size / install_time:>15.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
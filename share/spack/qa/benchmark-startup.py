@@ -0,0 +1,66 @@
+# Copyright 2013-2024 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""Check that the startup time of trivial Spack invocations stays within a budget.
+
+Each invocation is run in a new process several times, and the fastest run is compared with
+its budget. Invocations exceeding their budget are reported, and the script exits with a non-zero
+status. Run with:
+
+    spack python share/spack/qa/benchmark-startup.py [-r 5] [--scale 1.0]
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+import spack.paths
+
+#: Budget in seconds of the startup time of each invocation. Invocations that don't need
+#: configuration shouldn't import it, and the ones run in login shells shouldn't import
+#: environments or all the commands.
+BUDGETS = {"--version": 0.5, "--print-shell-vars sh": 1.5, "location -r": 2.5}
+
+
+def startup_time(spack_args, repeat):
+    """Returns the fastest wall-clock time of ``repeat`` runs of spack with some arguments"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, spack.paths.spack_script, *spack_args],
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="number of runs per command")
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="multiply budgets by this factor on slow machines"
+    )
+    args = parser.parse_args()
+
+    print(f"{'command':<30} {'time [s]':>9} {'budget [s]':>11}")
+    over_budget = []
+    for command, budget in BUDGETS.items():
+        elapsed = startup_time(command.split(), args.repeat)
+        budget *= args.scale
+        status = "" if elapsed <= budget else "  OVER BUDGET"
+        print(f"{'spack ' + command:<30} {elapsed:>9.3f} {budget:>11.3f}{status}")
+        if elapsed > budget:
+            over_budget.append(command)
+
+    if over_budget:
+        print("\nTo see which modules are imported, run:")
+        for command in over_budget:
+            print(f"    spack debug startup -- {command}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()